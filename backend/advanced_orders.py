@@ -142,7 +142,7 @@ class AdvancedOrderManager:
                 "price": price,
                 "pnl": 0,  # Calculate based on position
                 "reason": reason,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
             
             await db.trades_collection.insert_one(trade)
@@ -12,6 +12,7 @@ from datetime import datetime, timezone, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -95,7 +96,7 @@ class AIBodyguard:
             
             recent_trades = await self.db.trades.find({
                 'bot_id': bot_id,
-                'timestamp': {'$gte': one_hour_ago}
+                **timestamp_range(one_hour_ago)
             }).to_list(1000)
             
             if not recent_trades:
@@ -165,7 +166,7 @@ class AIBodyguard:
             one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
             hourly_trades = await self.db.trades.count_documents({
                 'bot_id': bot_id,
-                'timestamp': {'$gte': one_hour_ago}
+                **timestamp_range(one_hour_ago)
             })
             
             if hourly_trades > 100:
@@ -213,7 +214,7 @@ class AIBodyguard:
             
             today_trades = await self.db.trades.find({
                 'user_id': user_id,
-                'timestamp': {'$gte': today_start}
+                **timestamp_range(today_start)
             }).to_list(10000)
             
             if today_trades:
@@ -6,6 +6,7 @@ Implements all critical AI commands for full system control
 import asyncio
 from datetime import datetime, timezone, timedelta
 import database as db
+from services.system_mode_service import system_mode_service
 from engines.bot_manager import bot_manager
 from engines.trade_limiter import trade_limiter
 from logger_config import logger
@@ -85,7 +86,7 @@ class AIProductionHandler:
                 
                 # Send WebSocket
                 if result['success']:
-                    from websocket_manager import manager
+                    from websocket_manager_redis import manager
                     await manager.send_message(user_id, {
                         "type": "bot_created",
                         "bot": result.get('bot')
@@ -99,7 +100,7 @@ class AIProductionHandler:
                 result = await bot_manager.delete_bot(user_id, bot_name=bot_name)
                 
                 if result['success']:
-                    from websocket_manager import manager
+                    from websocket_manager_redis import manager
                     await manager.send_message(user_id, {"type": "force_refresh"})
                 
                 return result
@@ -111,7 +112,7 @@ class AIProductionHandler:
                 if bot:
                     result = await bot_manager.update_bot_status(user_id, bot['id'], 'paused')
                     if result['success']:
-                        from websocket_manager import manager
+                        from websocket_manager_redis import manager
                         await manager.send_message(user_id, {"type": "force_refresh"})
                     return result
                 return {"success": False, "message": "❌ Bot not found"}
@@ -123,7 +124,7 @@ class AIProductionHandler:
                 if bot:
                     result = await bot_manager.update_bot_status(user_id, bot['id'], 'active')
                     if result['success']:
-                        from websocket_manager import manager
+                        from websocket_manager_redis import manager
                         await manager.send_message(user_id, {"type": "force_refresh"})
                     return result
                 return {"success": False, "message": "❌ Bot not found"}
@@ -134,7 +135,7 @@ class AIProductionHandler:
                     {"user_id": user_id, "status": "active"},
                     {"$set": {"status": "paused"}}
                 )
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 return {"success": True, "message": f"✅ Paused {result.modified_count} bots"}
             
@@ -144,14 +145,14 @@ class AIProductionHandler:
                     {"user_id": user_id, "status": "paused"},
                     {"$set": {"status": "active"}}
                 )
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 return {"success": True, "message": f"✅ Resumed {result.modified_count} bots"}
             
             # DELETE ALL BOTS (complete removal, not pause)
             elif command == "delete_all_bots":
                 result = await db.bots_collection.delete_many({"user_id": user_id})
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 return {"success": True, "message": f"🗑️ Deleted {result.deleted_count} bots permanently"}
             
@@ -163,7 +164,8 @@ class AIProductionHandler:
                     {"$set": {"autopilot": enabled}},
                     upsert=True
                 )
-                from websocket_manager import manager
+                system_mode_service.invalidate_modes(user_id)
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "system_mode_update"})
                 return {"success": True, "message": f"✅ Autopilot {'ON' if enabled else 'OFF'}"}
             
@@ -175,7 +177,8 @@ class AIProductionHandler:
                     {"$set": {"paperTrading": enabled}},
                     upsert=True
                 )
-                from websocket_manager import manager
+                system_mode_service.invalidate_modes(user_id)
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "system_mode_update"})
                 return {"success": True, "message": f"✅ Paper Trading {'ON' if enabled else 'OFF'}"}
             
@@ -187,7 +190,8 @@ class AIProductionHandler:
                     {"$set": {"liveTrading": enabled}},
                     upsert=True
                 )
-                from websocket_manager import manager
+                system_mode_service.invalidate_modes(user_id)
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "system_mode_update"})
                 return {"success": True, "message": f"✅ Live Trading {'ON' if enabled else 'OFF'}"}
             
@@ -209,7 +213,8 @@ class AIProductionHandler:
                     }},
                     upsert=True
                 )
-                from websocket_manager import manager
+                system_mode_service.invalidate_modes(user_id)
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 return {"success": True, "message": "🚨 EMERGENCY STOP - All bots paused, trading disabled"}
             
@@ -223,7 +228,8 @@ class AIProductionHandler:
                     }},
                     upsert=True
                 )
-                from websocket_manager import manager
+                system_mode_service.invalidate_modes(user_id)
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 return {"success": True, "message": "✅ Trading resumed - Paper mode enabled"}
             
@@ -312,6 +318,11 @@ class AIProductionHandler:
                 # Delete ALL user data (trades, logs, EVERYTHING)
                 import database as db
                 await db.trades_collection.delete_many({"user_id": user_id})
+                try:
+                    from services.pnl_rollups import get_pnl_rollups
+                    await get_pnl_rollups().invalidate(user_id=user_id)
+                except Exception as e:
+                    logger.warning(f"PnL rollup invalidation failed: {e}")
                 await db.learning_logs_collection.delete_many({"user_id": user_id})
                 await db.learning_data_collection.delete_many({"user_id": user_id})
                 await db.autopilot_actions_collection.delete_many({"user_id": user_id})
@@ -339,9 +350,10 @@ class AIProductionHandler:
                     }},
                     upsert=True
                 )
+                system_mode_service.invalidate_modes(user_id)
                 
                 # Send refresh
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {"type": "force_refresh"})
                 
                 return {"success": True, "message": "🔄 COMPLETE RESET! All profits, trades, graphs, learning data → ZERO. Fresh start!"}
@@ -11,6 +11,7 @@ from datetime import datetime, timezone, timedelta
 from logger_config import logger
 import database as db
 import os
+from utils.timestamps import parse_timestamp, timestamp_range
 
 
 class AISuperBrain:
@@ -55,7 +56,7 @@ class AISuperBrain:
         
         trades = await db.trades_collection.find({
             "user_id": user_id,
-            "timestamp": {"$gte": seven_days_ago}
+            **timestamp_range(seven_days_ago)
         }, {"_id": 0}).to_list(10000)
         
         bots = await db.bots_collection.find(
@@ -98,7 +99,7 @@ class AISuperBrain:
         hour_performance = {}
         for trade in trades:
             try:
-                ts = datetime.fromisoformat(trade.get('timestamp', ''))
+                ts = parse_timestamp(trade.get('timestamp'))
                 hour = ts.hour
                 if hour not in hour_performance:
                     hour_performance[hour] = {'wins': 0, 'losses': 0}
@@ -1,168 +1,475 @@
 """
 Backtesting Engine
-- Test strategies on historical data
-- Performance simulation
-- Strategy optimization
+- Replays stored OHLCV candles through the paper engine's decision pipeline
+  (regime, trend, position sizing, exchange fees, slippage)
+- Strategy-parameter sweeps run in a process pool
+- Results cached by (strategy params, candle data hash)
+
+Candles come from the on-disk candle store, which backfills from the exchange
+on first use. Each decision bar computes, from candles up to its close:
+- the 24h regime exactly as MarketRegimeDetector does (trend_pct, volatility,
+  confidence from sample count) and the 5m-style trend of analyze_trend
+  (mean of the last 5 closes vs the 10 before)
+- the trend override when regime confidence > 0.7, as in execute_smart_trade
+A long position is opened at the next bar's open, sized by POSITION_SIZES and
+AGREEMENT_SIZE_BOOST, and closed on stop loss / take profit (checked against
+bar lows / highs, stop first) or after hold_minutes. Fees use EXCHANGE_FEES
+taker rates both ways; slippage uses calculate_slippage against the traded
+24h quote volume of the candles.
+
+ML prediction, Flokx and Fetch.ai signals have no history, so they are
+treated as absent: the engine's two-source quality filter is not applied and
+AI agreement counts a confident regime and a bullish trend.
+
+run_backtest() is a pure function of (candles, params) so that sweeps can be
+farmed out to worker processes.
 """
 
 import asyncio
-from datetime import datetime, timezone, timedelta
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
 from logger_config import logger
-import random
+from paper_trading_engine import (
+    AGREEMENT_SIZE_BOOST,
+    EXCHANGE_FEES,
+    MAX_POSITION_SIZE,
+    POSITION_SIZES,
+    calculate_slippage,
+)
+from services.candle_store import TIMEFRAME_SECONDS, candle_store
+
+# Trade frequency based on risk
+TRADES_PER_DAY = {
+    'safe': 2,
+    'balanced': 4,
+    'risky': 6,
+    'aggressive': 6
+}
+
+DEFAULT_STRATEGY = {
+    "risk_mode": "safe",
+    "exchange": "luno",
+    "trading_pair": "BTC/ZAR",
+    "timeframe": "5m",
+    "trades_per_day": None,       # Defaults to TRADES_PER_DAY[risk_mode]
+    "hold_minutes": 60,
+    "take_profit_pct": 2.0,
+    "stop_loss_pct": 1.5,
+    "min_trend": 0,               # 1 = only bullish, 0 = skip bearish, -1 = always enter
+    "trend_threshold_pct": 0.4,   # analyze_trend
+    "regime_trend_pct": 2.0       # MarketRegimeDetector
+}
+
+DEFAULT_DAILY_VOLUME = 1000000000  # Same assumption as the paper engine when candles carry no volume
+MIN_POOL_BATCH = 4                 # Smaller sweeps run inline rather than paying process overhead
+
+
+def resolve_strategy(params: Dict) -> Dict:
+    """Strategy params merged over DEFAULT_STRATEGY (the cache key is the resolved dict)"""
+    resolved = {**DEFAULT_STRATEGY, **{k: v for k, v in (params or {}).items() if v is not None}}
+    if resolved["timeframe"] not in TIMEFRAME_SECONDS:
+        raise ValueError(f"Unsupported timeframe: {resolved['timeframe']}")
+    if not resolved.get("trades_per_day"):
+        resolved["trades_per_day"] = TRADES_PER_DAY.get(resolved["risk_mode"], 2)
+    return resolved
+
+
+def candles_hash(candles: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(candles, dtype=np.float64).tobytes()).hexdigest()
+
+
+def run_backtest(candles: np.ndarray, params: Dict, initial_capital: float = 1000,
+                 include_trades: bool = True) -> Dict:
+    """
+    Replay candles through the decision pipeline
+
+    Args:
+        candles: (n, 6) rows of [timestamp_ms, open, high, low, close, volume]
+        params: Strategy params (see DEFAULT_STRATEGY)
+        initial_capital: Starting capital
+        include_trades: Return the per-trade list (metrics are always returned)
+
+    Returns:
+        {"trades": [...], "metrics": {...}}
+    """
+    p = resolve_strategy(params)
+    candles = np.asarray(candles, dtype=np.float64)
+    n = len(candles)
+    bar_seconds = TIMEFRAME_SECONDS[p["timeframe"]]
+    bars_per_day = max(86400 // bar_seconds, 1)
+    hold = max(int(round(p["hold_minutes"] * 60 / bar_seconds)), 1)
+    step = max(bars_per_day // int(p["trades_per_day"]), 1)
+
+    # Decide at the close of bar i (needs 15 bars of trend history), enter at the open of i + 1
+    decisions = np.arange(15, n - hold, step) if n > hold + 15 else np.array([], dtype=np.int64)
+    if not len(decisions):
+        return {"trades": [], "metrics": _metrics(np.array([]), np.array([]), initial_capital, candles)}
+
+    timestamps, opens, highs, lows, closes, volumes = candles.T
+    trend, volatile_regime, daily_volume, agreement = _signals(closes, volumes, bars_per_day, decisions, p)
+
+    # Exits for every candidate entry at once
+    entry_idx = decisions + 1
+    entry_px = opens[entry_idx]
+    window = np.lib.stride_tricks.sliding_window_view
+    highs_w = window(highs, hold)[entry_idx]
+    lows_w = window(lows, hold)[entry_idx]
+    stop_px = entry_px * (1 - p["stop_loss_pct"] / 100)
+    take_px = entry_px * (1 + p["take_profit_pct"] / 100)
+
+    hit_stop = lows_w <= stop_px[:, None]
+    hit_take = highs_w >= take_px[:, None]
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), hold)
+    first_take = np.where(hit_take.any(axis=1), hit_take.argmax(axis=1), hold)
+
+    stopped = (first_stop < hold) & (first_stop <= first_take)
+    took = ~stopped & (first_take < hold)
+    offset = np.where(stopped, first_stop, np.where(took, first_take, hold - 1))
+    exit_idx = entry_idx + offset
+    # Gaps through a level fill at the bar's open
+    exit_px = np.where(
+        stopped, np.minimum(stop_px, opens[exit_idx]),
+        np.where(took, np.maximum(take_px, opens[exit_idx]), closes[exit_idx])
+    )
+    exit_reason = np.where(stopped, "stop_loss", np.where(took, "take_profit", "time"))
+
+    size = np.minimum(
+        POSITION_SIZES.get(p["risk_mode"], 0.20) * np.array([AGREEMENT_SIZE_BOOST.get(int(a), 1.0) for a in agreement]),
+        MAX_POSITION_SIZE
+    )
+    fee_rate = EXCHANGE_FEES.get(p["exchange"], {"maker": 0.001, "taker": 0.001}).get("taker", 0.001)
+    enter = trend >= int(p["min_trend"])
+
+    # Capital compounds, one position at a time
+    capital = float(initial_capital)
+    free_at = -1
+    pnls, capital_after, trades = [], [], []
+    for j in np.flatnonzero(enter):
+        if decisions[j] < free_at or capital <= 0:
+            continue
+        amount = capital * size[j]
+        move = exit_px[j] / entry_px[j] - 1
+        fees = amount * fee_rate * 2  # Entry + exit
+        slippage = amount * calculate_slippage(amount, daily_volume[j])
+        if abs(move) * 100 > 2 or volatile_regime[j]:  # Volatile market
+            slippage *= 1.5
+        pnl = amount * move - fees - slippage
+        capital += pnl
+        free_at = exit_idx[j]
+
+        pnls.append(pnl)
+        capital_after.append(capital)
+        if include_trades:
+            trades.append({
+                "date": _iso(timestamps[entry_idx[j]]),
+                "exit_date": _iso(timestamps[exit_idx[j]]),
+                "side": "buy",
+                "entry_price": round(float(entry_px[j]), 8),
+                "exit_price": round(float(exit_px[j]), 8),
+                "amount": round(amount, 2),
+                "fees": round(fees, 4),
+                "slippage": round(slippage, 4),
+                "pnl": round(pnl, 2),
+                "capital_after": round(capital, 2),
+                "exit_reason": str(exit_reason[j]),
+                "trend": {1: "bullish", -1: "bearish"}.get(int(trend[j]), "neutral")
+            })
+
+    return {
+        "trades": trades,
+        "metrics": _metrics(np.array(pnls), np.array(capital_after), initial_capital, candles)
+    }
+
+
+def _signals(closes: np.ndarray, volumes: np.ndarray, bars_per_day: int, decisions: np.ndarray, p: Dict):
+    """Trend / regime / volume at each decision bar, from rolling sums"""
+    cs = np.concatenate(([0.0], np.cumsum(closes)))
+    cs2 = np.concatenate(([0.0], np.cumsum(closes * closes)))
+    cv = np.concatenate(([0.0], np.cumsum(closes * volumes)))
+    i = decisions
+
+    # analyze_trend: last 5 closes vs the 10 before
+    recent = (cs[i + 1] - cs[i - 4]) / 5
+    older = (cs[i - 4] - cs[i - 14]) / 10
+    change_pct = (recent - older) / older * 100
+    threshold = p["trend_threshold_pct"]
+    short_trend = np.where(change_pct > threshold, 1, np.where(change_pct < -threshold, -1, 0))
+
+    # MarketRegimeDetector over the last 24h of closes
+    start = np.maximum(i + 1 - bars_per_day, 0)
+    count = i + 1 - start
+    mean = (cs[i + 1] - cs[start]) / count
+    variance = np.maximum((cs2[i + 1] - cs2[start]) / count - mean * mean, 0.0)
+    volatility_pct = np.sqrt(variance) / mean * 100
+    trend_pct = (closes[i] - closes[start]) / closes[start] * 100
+    regime_trend = np.where(trend_pct > p["regime_trend_pct"], 1, np.where(trend_pct < -p["regime_trend_pct"], -1, 0))
+    confidence = np.where(count >= 10, np.minimum(count / 50, 1.0), 0.0)
+
+    # Override trend with the regime if confidence is high
+    confident = confidence > 0.7
+    trend = np.where(confident, regime_trend, short_trend)
+    agreement = confident.astype(int) + (short_trend == 1)
+
+    daily_volume = cv[i + 1] - cv[start]
+    daily_volume = np.where(daily_volume > 0, daily_volume, DEFAULT_DAILY_VOLUME)
+    return trend, volatility_pct > 5, daily_volume, agreement
+
+
+def _metrics(pnls: np.ndarray, capital_after: np.ndarray, initial_capital: float,
+             candles: Optional[np.ndarray] = None) -> Dict:
+    """Performance metrics from per-trade P&L and capital after each trade"""
+    metrics = {}
+    if candles is not None and len(candles):
+        first, last = candles[0, 4], candles[-1, 4]
+        metrics["buy_and_hold_return"] = round(float((last - first) / first * 100), 2) if first else 0.0
+    if not len(pnls):
+        return {**metrics, "total_trades": 0, "total_return": 0.0, "final_capital": round(initial_capital, 2)}
+
+    final_capital = float(capital_after[-1])
+    wins, losses = pnls[pnls > 0], pnls[pnls < 0]
+    total_profit = float(wins.sum())
+    total_loss = abs(float(losses.sum()))
+
+    # Max drawdown
+    peaks = np.maximum.accumulate(np.concatenate(([initial_capital], capital_after)))[1:]
+    max_drawdown = float(np.max((peaks - capital_after) / peaks) * 100) if len(peaks) else 0.0
+
+    # Sharpe ratio (simplified)
+    returns = pnls / initial_capital
+    std_dev = float(returns.std())
+    sharpe = (float(returns.mean()) / std_dev) * math.sqrt(252) if std_dev > 0 else 0
+
+    return {
+        **metrics,
+        "total_trades": int(len(pnls)),
+        "winning_trades": int(len(wins)),
+        "losing_trades": int(len(losses)),
+        "win_rate": round(len(wins) / len(pnls) * 100, 2),
+        "total_return": round((final_capital - initial_capital) / initial_capital * 100, 2),
+        "final_capital": round(final_capital, 2),
+        "profit_factor": round(total_profit / total_loss if total_loss > 0 else total_profit, 2),
+        "max_drawdown": round(max(max_drawdown, 0.0), 2),
+        "sharpe_ratio": round(sharpe, 2),
+        "avg_trade_pnl": round(float(pnls.mean()), 2)
+    }
+
+
+def _run_chunk(candles: np.ndarray, param_sets: List[Dict], initial_capital: float,
+               include_trades: bool) -> List[Dict]:
+    """Worker entry point: one candle array, many strategies"""
+    results = []
+    for params in param_sets:
+        try:
+            results.append(run_backtest(candles, params, initial_capital, include_trades))
+        except Exception as e:
+            results.append({"error": str(e)})
+    return results
+
+
+def _iso(timestamp_ms: float) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
+
+
+def _parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
 
 
 class BacktestingEngine:
-    def __init__(self):
-        self.results_cache = {}
-    
+    def __init__(self, workers: Optional[int] = None, cache_size: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        if workers is None or cache_size is None:
+            from config import BACKTEST_WORKERS, BACKTEST_CACHE_SIZE
+            workers = BACKTEST_WORKERS if workers is None else workers
+            cache_size = BACKTEST_CACHE_SIZE if cache_size is None else cache_size
+
+        self.workers = workers
+        self.cache_size = cache_size
+        self.clock = clock
+        self.results_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._datasets: "OrderedDict[Tuple, Tuple[np.ndarray, str]]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"runs": 0, "cache_hits": 0, "pool_batches": 0}
+
     async def backtest_strategy(self, strategy_params: dict, start_date: str, end_date: str, initial_capital: float = 1000) -> dict:
-        """Backtest a trading strategy"""
+        """Backtest a trading strategy on stored candles"""
         try:
             logger.info(f"Starting backtest: {start_date} to {end_date}")
-            
-            # Simulate historical trades
-            trades = await self._simulate_trades(
-                strategy_params,
-                start_date,
-                end_date,
-                initial_capital
-            )
-            
-            # Calculate performance metrics
-            metrics = self._calculate_metrics(trades, initial_capital)
-            
-            result = {
+
+            results = await self.sweep([strategy_params], start_date, end_date, initial_capital, include_trades=True)
+            result = results[0]
+            if "error" in result:
+                return {"error": result["error"]}
+
+            return {
                 "strategy": strategy_params,
                 "period": {"start": start_date, "end": end_date},
                 "initial_capital": initial_capital,
-                "trades": trades,
-                "metrics": metrics,
+                "trades": result["trades"],
+                "metrics": result["metrics"],
+                "data": result["data"],
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
-            
-            return result
-            
+
         except Exception as e:
             logger.error(f"Backtesting failed: {e}")
             return {"error": str(e)}
-    
-    async def _simulate_trades(self, params: dict, start_date: str, end_date: str, capital: float) -> list:
-        """Simulate trades over historical period"""
-        trades = []
-        current_capital = capital
-        
-        # Parse dates
-        start = datetime.fromisoformat(start_date)
-        end = datetime.fromisoformat(end_date)
-        days = (end - start).days
-        
-        # Simulate trades (simplified - would use real historical data in production)
-        risk_mode = params.get('risk_mode', 'safe')
-        
-        # Trade frequency based on risk
-        trades_per_day = {
-            'safe': 2,
-            'balanced': 4,
-            'risky': 6
-        }.get(risk_mode, 2)
-        
-        total_trades = days * trades_per_day
-        
-        # Win rate based on risk
-        win_rate = {
-            'safe': 0.60,
-            'balanced': 0.55,
-            'risky': 0.50
-        }.get(risk_mode, 0.55)
-        
-        for i in range(total_trades):
-            # Simulate trade
-            is_win = random.random() < win_rate
-            
-            if is_win:
-                pnl = current_capital * random.uniform(0.005, 0.02)  # 0.5-2% gain
-            else:
-                pnl = -current_capital * random.uniform(0.003, 0.015)  # 0.3-1.5% loss
-            
-            current_capital += pnl
-            
-            trade = {
-                "date": (start + timedelta(days=i/trades_per_day)).isoformat(),
-                "pnl": round(pnl, 2),
-                "capital_after": round(current_capital, 2),
-                "side": "buy" if is_win else "sell"
+
+    async def sweep(self, param_sets: List[Dict], start_date: str, end_date: str,
+                    initial_capital: float = 1000, include_trades: bool = False) -> List[Dict]:
+        """
+        Backtest many strategies over the same period
+
+        Param sets are grouped by market (exchange, pair, timeframe) so each
+        candle series is loaded once; cached results are reused and the rest
+        run in the process pool.
+
+        Returns:
+            One result per param set, in order: {"strategy", "metrics", "data"
+            [, "trades"]} or {"strategy", "error"}
+        """
+        start, end = _parse_date(start_date), _parse_date(end_date)
+        if end <= start:
+            raise ValueError("end_date must be after start_date")
+
+        results: List[Optional[Dict]] = [None] * len(param_sets)
+        markets: Dict[Tuple, List[int]] = {}
+        resolved = []
+        for idx, params in enumerate(param_sets):
+            try:
+                p = resolve_strategy(params)
+            except ValueError as e:
+                results[idx] = {"strategy": params, "error": str(e)}
+                resolved.append(None)
+                continue
+            resolved.append(p)
+            markets.setdefault((p["exchange"], p["trading_pair"], p["timeframe"]), []).append(idx)
+
+        for (exchange, symbol, timeframe), indexes in markets.items():
+            candles, data_hash = await self.load_candles(exchange, symbol, timeframe, start, end)
+            data = {
+                "exchange": exchange, "symbol": symbol, "timeframe": timeframe,
+                "candles": int(len(candles)), "data_hash": data_hash
             }
-            
-            trades.append(trade)
-        
-        return trades
-    
-    def _calculate_metrics(self, trades: list, initial_capital: float) -> dict:
-        """Calculate performance metrics"""
-        if not trades:
-            return {}
-        
-        final_capital = trades[-1]['capital_after']
-        total_return = ((final_capital - initial_capital) / initial_capital) * 100
-        
-        winning_trades = [t for t in trades if t['pnl'] > 0]
-        losing_trades = [t for t in trades if t['pnl'] < 0]
-        
-        win_rate = (len(winning_trades) / len(trades)) * 100 if trades else 0
-        
-        total_profit = sum(t['pnl'] for t in winning_trades)
-        total_loss = abs(sum(t['pnl'] for t in losing_trades))
-        profit_factor = total_profit / total_loss if total_loss > 0 else total_profit
-        
-        # Calculate max drawdown
-        peak = initial_capital
-        max_drawdown = 0
-        
-        for trade in trades:
-            capital = trade['capital_after']
-            if capital > peak:
-                peak = capital
-            drawdown = ((peak - capital) / peak) * 100
-            max_drawdown = max(max_drawdown, drawdown)
-        
-        # Sharpe ratio (simplified)
-        returns = [t['pnl'] / initial_capital for t in trades]
-        avg_return = sum(returns) / len(returns)
-        import math
-        std_dev = math.sqrt(sum((r - avg_return) ** 2 for r in returns) / len(returns))
-        sharpe = (avg_return / std_dev) * math.sqrt(252) if std_dev > 0 else 0
-        
-        return {
-            "total_trades": len(trades),
-            "winning_trades": len(winning_trades),
-            "losing_trades": len(losing_trades),
-            "win_rate": round(win_rate, 2),
-            "total_return": round(total_return, 2),
-            "final_capital": round(final_capital, 2),
-            "profit_factor": round(profit_factor, 2),
-            "max_drawdown": round(max_drawdown, 2),
-            "sharpe_ratio": round(sharpe, 2),
-            "avg_trade_pnl": round(sum(t['pnl'] for t in trades) / len(trades), 2)
-        }
-    
+            if not len(candles):
+                for idx in indexes:
+                    results[idx] = {"strategy": param_sets[idx], "error": f"No historical candles for {symbol} on {exchange}"}
+                continue
+
+            misses = []
+            for idx in indexes:
+                key = self._cache_key(resolved[idx], data_hash, initial_capital, include_trades)
+                cached = self.results_cache.get(key)
+                if cached is not None:
+                    self.results_cache.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+                    results[idx] = {"strategy": param_sets[idx], **cached, "data": data}
+                else:
+                    misses.append(idx)
+
+            if misses:
+                outputs = await self._run_many(candles, [resolved[i] for i in misses], initial_capital, include_trades)
+                for idx, output in zip(misses, outputs):
+                    if "error" not in output:
+                        self._cache_put(self._cache_key(resolved[idx], data_hash, initial_capital, include_trades), output)
+                    results[idx] = {"strategy": param_sets[idx], **output, "data": data}
+
+        return results
+
     async def optimize_strategy(self, base_params: dict, start_date: str, end_date: str) -> dict:
         """Optimize strategy parameters"""
-        best_result = None
-        best_return = float('-inf')
-        
         risk_modes = ['safe', 'balanced', 'risky']
-        
-        for risk_mode in risk_modes:
-            params = {**base_params, 'risk_mode': risk_mode}
-            result = await self.backtest_strategy(params, start_date, end_date)
-            
-            if 'metrics' in result:
-                total_return = result['metrics'].get('total_return', 0)
-                if total_return > best_return:
-                    best_return = total_return
-                    best_result = result
-        
-        return best_result or {}
+        candidates = [{**base_params, 'risk_mode': risk_mode} for risk_mode in risk_modes]
+        results = await self.sweep(candidates, start_date, end_date)
+
+        scored = [r for r in results if 'metrics' in r]
+        if not scored:
+            return {}
+        best = max(scored, key=lambda r: r['metrics'].get('total_return', 0))
+        return await self.backtest_strategy(best['strategy'], start_date, end_date)
+
+    async def load_candles(self, exchange: str, symbol: str, timeframe: str,
+                           start: datetime, end: datetime) -> Tuple[np.ndarray, str]:
+        """
+        Candles for [start, end) as an (n, 6) array plus its content hash
+
+        Reads the candle store, which backfills missing history from the
+        exchange. Recently used series are kept in memory, except ranges that
+        end within one candle interval of now: their last bar may still be
+        forming and new bars keep arriving, so they are always read fresh.
+        """
+        start_ms, end_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+        key = (exchange.lower(), symbol, timeframe, start_ms, end_ms)
+        settled = end_ms <= (self.clock() - TIMEFRAME_SECONDS[timeframe]) * 1000
+        dataset = self._datasets.get(key) if settled else None
+        if dataset is not None:
+            self._datasets.move_to_end(key)
+            return dataset
+
+        stored = await candle_store.get_candles(exchange, symbol, timeframe, start=start_ms, end=end_ms)
+        candles = stored.as_array().reshape(-1, 6)
+
+        dataset = (candles, candles_hash(candles))
+        if settled and len(candles):
+            self._datasets[key] = dataset
+            while len(self._datasets) > 16:
+                self._datasets.popitem(last=False)
+        return dataset
+
+    async def _run_many(self, candles: np.ndarray, param_sets: List[Dict], initial_capital: float,
+                        include_trades: bool) -> List[Dict]:
+        self.stats["runs"] += len(param_sets)
+        if self.workers <= 1 or len(param_sets) < MIN_POOL_BATCH:
+            return await asyncio.to_thread(_run_chunk, candles, param_sets, initial_capital, include_trades)
+
+        chunk_size = math.ceil(len(param_sets) / self.workers)
+        chunks = [param_sets[i:i + chunk_size] for i in range(0, len(param_sets), chunk_size)]
+        loop = asyncio.get_running_loop()
+        try:
+            pool = self._get_pool()
+            outputs = await asyncio.gather(*(
+                loop.run_in_executor(pool, _run_chunk, candles, chunk, initial_capital, include_trades)
+                for chunk in chunks
+            ))
+            self.stats["pool_batches"] += 1
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Backtest process pool unavailable, running inline: {e}")
+            self.shutdown()
+            return await asyncio.to_thread(_run_chunk, candles, param_sets, initial_capital, include_trades)
+        return [result for chunk in outputs for result in chunk]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    @staticmethod
+    def _cache_key(params: Dict, data_hash: str, initial_capital: float, include_trades: bool) -> Tuple:
+        return (json.dumps(params, sort_keys=True, default=str), data_hash, float(initial_capital), include_trades)
+
+    def _cache_put(self, key: Tuple, result: Dict):
+        self.results_cache[key] = result
+        while len(self.results_cache) > self.cache_size:
+            self.results_cache.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "cached_results": len(self.results_cache), "datasets": len(self._datasets), "workers": self.workers}
+
+    def shutdown(self):
+        """Stop the worker processes (recreated on the next sweep)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
 
 # Global instance
@@ -3,11 +3,12 @@ Bot DNA Evolution System
 - Genetic algorithm for bot optimization
 - Mutation and crossover of successful bots
 - Natural selection based on performance
+- Candidate offspring are scored by backtesting on stored candles
 """
 
 import asyncio
 import random
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from logger_config import logger
 import database as db
 from performance_ranker import performance_ranker
@@ -18,6 +19,8 @@ class BotDNAEvolution:
         self.mutation_rate = 0.15  # 15% chance of mutation
         self.elite_percent = 0.30  # Top 30% survive
         self.generation = 0
+        self.candidates_per_bot = 8  # Offspring backtested per weak bot; the fittest is kept
+        self.backtest_days = 30
     
     async def evolve_bots(self, user_id: str):
         """Run evolution cycle on user's bots"""
@@ -42,17 +45,13 @@ class BotDNAEvolution:
             # Evolve weak bots based on elite DNA
             evolved_count = 0
             
-            for weak_bot in weak_bots:
-                # Select two elite parents
-                parent1 = random.choice(elite_bots)
-                parent2 = random.choice(elite_bots)
-                
-                # Create child DNA
-                new_dna = self._crossover(parent1, parent2)
-                
-                # Apply mutation
-                new_dna = self._mutate(new_dna)
-                
+            candidates = [
+                [self._mutate(self._crossover(*random.choices(elite_bots, k=2))) for _ in range(self.candidates_per_bot)]
+                for _ in weak_bots
+            ]
+            fittest = await self._select_fittest(candidates)
+            
+            for weak_bot, new_dna in zip(weak_bots, fittest):
                 # Update weak bot with new DNA
                 await self._update_bot_dna(weak_bot['id'], new_dna)
                 evolved_count += 1
@@ -113,6 +112,44 @@ class BotDNAEvolution:
         
         return dna
     
+    async def _select_fittest(self, candidates: list) -> list:
+        """
+        Backtest every candidate DNA in one sweep and keep the best per slot
+        
+        Falls back to the first candidate when no historical data is available.
+        """
+        try:
+            from backtesting_engine import backtesting_engine
+            
+            end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+            start = end - timedelta(days=self.backtest_days)
+            flat = [dna for slot in candidates for dna in slot]
+            results = await backtesting_engine.sweep(
+                [self._strategy_params(dna) for dna in flat], start.isoformat(), end.isoformat()
+            )
+            fitness = [
+                r['metrics'].get('total_return', 0) if 'metrics' in r else float('-inf')
+                for r in results
+            ]
+        except Exception as e:
+            logger.warning(f"Backtest fitness unavailable, keeping first offspring: {e}")
+            return [slot[0] for slot in candidates]
+        
+        fittest, offset = [], 0
+        for slot in candidates:
+            scores = fitness[offset:offset + len(slot)]
+            offset += len(slot)
+            fittest.append(slot[scores.index(max(scores))])
+        return fittest
+    
+    @staticmethod
+    def _strategy_params(dna: dict) -> dict:
+        return {
+            "risk_mode": dna.get('risk_mode') or 'safe',
+            "trading_pair": dna.get('trading_pair', 'BTC/ZAR'),
+            "exchange": dna.get('exchange', 'luno')
+        }
+    
     async def _update_bot_dna(self, bot_id: str, new_dna: dict):
         """Update bot with evolved DNA"""
         try:
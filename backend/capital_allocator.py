@@ -17,6 +17,7 @@ from datetime import datetime, timezone
 import database as db
 from logger_config import logger
 from performance_ranker import performance_ranker
+from utils.timestamps import timestamp_range
 
 
 class CapitalAllocator:
@@ -117,7 +118,7 @@ class CapitalAllocator:
             
             trades_today = await db.trades_collection.find({
                 "user_id": user_id,
-                "timestamp": {"$gte": today_start}
+                **timestamp_range(today_start)
             }, {"_id": 0}).to_list(10000)
             
             daily_profit = sum(t.get('pnl', 0) for t in trades_today)
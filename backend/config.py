@@ -60,6 +60,74 @@ REQUIRE_API_KEYS_FOR_LIVE = os.getenv('REQUIRE_API_KEYS_FOR_LIVE', 'true').lower
 # Supported Exchanges for Paper Trading (PRODUCTION)
 PAPER_SUPPORTED_EXCHANGES = {'luno', 'binance', 'kucoin'}  # Only these exchanges in paper loop
 
+# Trading scheduler execution
+# 'sequential' = legacy one-trade-at-a-time loop, 'pooled' = one bounded worker pool per exchange
+TRADING_SCHEDULER_MODE = os.getenv('TRADING_SCHEDULER_MODE', 'sequential').lower()
+# System-wide throughput target; sets the per-tick trade budget (30/min = 5 per 10s tick)
+TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE = int(os.getenv('TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE', '30'))
+
+# Write-behind batching for paper trade inserts and bot state updates
+# Max seconds a buffered write waits before being flushed, and the batch size that forces an early flush
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '500'))
+# Max queued trade inserts before writers wait for a flush, and where inserts unflushed at shutdown are kept
+WRITE_BEHIND_MAX_PENDING_INSERTS = int(os.getenv('WRITE_BEHIND_MAX_PENDING_INSERTS', '10000'))
+WRITE_BEHIND_DEAD_LETTER_PATH = os.getenv('WRITE_BEHIND_DEAD_LETTER_PATH', 'data/write_behind_dead_letter.jsonl')
+
+# In-process cache of per-user system_modes docs (invalidated on every mode write)
+# Max seconds a cached doc is trusted, as a safety net for writes made by other workers
+SYSTEM_MODE_CACHE_TTL = float(os.getenv('SYSTEM_MODE_CACHE_TTL', '10'))
+
+# AI signal fan-out for paper trades (regime, ML, Flokx, Fetch.ai, trend run concurrently)
+# Default per-source timeout, and the overall budget no source may exceed
+SIGNAL_SOURCE_TIMEOUT = float(os.getenv('SIGNAL_SOURCE_TIMEOUT', '2.5'))
+SIGNAL_LATENCY_BUDGET = float(os.getenv('SIGNAL_LATENCY_BUDGET', '3.0'))
+
+# Paper fills walk the L2 order book (levels fetched per book)
+# Optional recorded snapshot file of books to use instead of the network (offline / replayed runs)
+ORDER_BOOK_DEPTH = int(os.getenv('ORDER_BOOK_DEPTH', '50'))
+ORDER_BOOK_SNAPSHOT_PATH = os.getenv('ORDER_BOOK_SNAPSHOT_PATH', '')
+
+# Backtesting on stored candles: worker processes for parameter sweeps (<= 1 runs inline)
+# and the number of (strategy params, data hash) results kept in memory
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(max((os.cpu_count() or 2) - 1, 1))))
+BACKTEST_CACHE_SIZE = int(os.getenv('BACKTEST_CACHE_SIZE', '5000'))
+
+# On-disk OHLCV history: one memory-mapped file per (exchange, symbol, timeframe)
+# Relative paths resolve against the backend directory
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', 'data/candles')
+
+# SSE dashboard producers: seconds between resyncs when no events arrive
+SSE_REFRESH_INTERVAL = float(os.getenv('SSE_REFRESH_INTERVAL', '60'))
+
+# WebSocket fan-out: outbound messages buffered per connection, seconds before a stuck send drops it
+WS_SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '100'))
+WS_SEND_TIMEOUT = float(os.getenv('WS_SEND_TIMEOUT', '10'))
+
+# Cross-worker realtime bus: messages kept per user for last_event_id reconnect replay
+REALTIME_REPLAY_LIMIT = int(os.getenv('REALTIME_REPLAY_LIMIT', '50'))
+
+# Regime detector: seconds a symbol's fitted HMM/GMM is reused before a warm-started refit
+REGIME_REFIT_INTERVAL = float(os.getenv('REGIME_REFIT_INTERVAL', '900'))
+
+# Price history: points kept per symbol in the shared 24h tick ring buffer
+PRICE_HISTORY_CAPACITY = int(os.getenv('PRICE_HISTORY_CAPACITY', '20000'))
+
+# Risk engine: seconds before a user's in-memory exposure book is reconciled against MongoDB
+EXPOSURE_RECONCILE_INTERVAL = float(os.getenv('EXPOSURE_RECONCILE_INTERVAL', '60'))
+
+# Rate limiter: max seconds acquire() waits for exchange capacity before giving up
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '15'))
+
+# Alpha fusion: max signal input fetches in flight during a portfolio fusion cycle
+FUSION_MAX_CONCURRENCY = int(os.getenv('FUSION_MAX_CONCURRENCY', '8'))
+
+# Chat commands: seconds before a user's cached bot name index is reloaded from MongoDB
+BOT_NAME_INDEX_MAX_AGE = float(os.getenv('BOT_NAME_INDEX_MAX_AGE', '300'))
+
+# PnL rollups: seconds between checks of a user's rollup counts against trades / fills_ledger
+PNL_ROLLUP_VERIFY_INTERVAL = float(os.getenv('PNL_ROLLUP_VERIFY_INTERVAL', '300'))
+
 # Safe mode: All trading disabled by default
 # Enable gradually:
 # 1. ENABLE_CCXT=true (price data only)
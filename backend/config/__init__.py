@@ -105,6 +105,65 @@ REQUIRE_API_KEYS_FOR_LIVE = os.getenv('REQUIRE_API_KEYS_FOR_LIVE', 'true').lower
 # Supported Exchanges for Paper Trading
 PAPER_SUPPORTED_EXCHANGES = {'luno', 'binance', 'kucoin'}
 
+# Trading scheduler execution ('sequential' or 'pooled')
+TRADING_SCHEDULER_MODE = os.getenv('TRADING_SCHEDULER_MODE', 'sequential').lower()
+TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE = int(os.getenv('TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE', '30'))
+
+# Write-behind batching for paper trade inserts and bot state updates
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '500'))
+WRITE_BEHIND_MAX_PENDING_INSERTS = int(os.getenv('WRITE_BEHIND_MAX_PENDING_INSERTS', '10000'))
+WRITE_BEHIND_DEAD_LETTER_PATH = os.getenv('WRITE_BEHIND_DEAD_LETTER_PATH', 'data/write_behind_dead_letter.jsonl')
+
+# In-process system_modes cache (seconds before a cached doc is re-read)
+SYSTEM_MODE_CACHE_TTL = float(os.getenv('SYSTEM_MODE_CACHE_TTL', '10'))
+
+# Concurrent AI signal fan-out (per-source timeout and overall latency budget, seconds)
+SIGNAL_SOURCE_TIMEOUT = float(os.getenv('SIGNAL_SOURCE_TIMEOUT', '2.5'))
+SIGNAL_LATENCY_BUDGET = float(os.getenv('SIGNAL_LATENCY_BUDGET', '3.0'))
+
+# L2 order book fill simulation (depth per book, optional recorded snapshot file)
+ORDER_BOOK_DEPTH = int(os.getenv('ORDER_BOOK_DEPTH', '50'))
+ORDER_BOOK_SNAPSHOT_PATH = os.getenv('ORDER_BOOK_SNAPSHOT_PATH', '')
+
+# Backtesting (sweep worker processes, cached results)
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(max((os.cpu_count() or 2) - 1, 1))))
+BACKTEST_CACHE_SIZE = int(os.getenv('BACKTEST_CACHE_SIZE', '5000'))
+
+# Memory-mapped OHLCV candle store (relative to the backend directory)
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', 'data/candles')
+
+# SSE dashboard producers: seconds between resyncs when no events arrive
+SSE_REFRESH_INTERVAL = float(os.getenv('SSE_REFRESH_INTERVAL', '60'))
+
+# WebSocket fan-out: outbound messages buffered per connection, seconds before a stuck send drops it
+WS_SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '100'))
+WS_SEND_TIMEOUT = float(os.getenv('WS_SEND_TIMEOUT', '10'))
+
+# Cross-worker realtime bus: messages kept per user for last_event_id reconnect replay
+REALTIME_REPLAY_LIMIT = int(os.getenv('REALTIME_REPLAY_LIMIT', '50'))
+
+# Regime detector: seconds a symbol's fitted HMM/GMM is reused before a warm-started refit
+REGIME_REFIT_INTERVAL = float(os.getenv('REGIME_REFIT_INTERVAL', '900'))
+
+# Price history: points kept per symbol in the shared 24h tick ring buffer
+PRICE_HISTORY_CAPACITY = int(os.getenv('PRICE_HISTORY_CAPACITY', '20000'))
+
+# Risk engine: seconds before a user's in-memory exposure book is reconciled against MongoDB
+EXPOSURE_RECONCILE_INTERVAL = float(os.getenv('EXPOSURE_RECONCILE_INTERVAL', '60'))
+
+# Rate limiter: max seconds acquire() waits for exchange capacity before giving up
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '15'))
+
+# Alpha fusion: max signal input fetches in flight during a portfolio fusion cycle
+FUSION_MAX_CONCURRENCY = int(os.getenv('FUSION_MAX_CONCURRENCY', '8'))
+
+# Chat commands: seconds before a user's cached bot name index is reloaded from MongoDB
+BOT_NAME_INDEX_MAX_AGE = float(os.getenv('BOT_NAME_INDEX_MAX_AGE', '300'))
+
+# PnL rollups: seconds between checks of a user's rollup counts against trades / fills_ledger
+PNL_ROLLUP_VERIFY_INTERVAL = float(os.getenv('PNL_ROLLUP_VERIFY_INTERVAL', '300'))
+
 __all__ = [
     'PAPER_TRAINING_DAYS', 'MIN_WIN_RATE', 'MIN_PROFIT_PERCENT', 'MIN_TRADES_FOR_PROMOTION',
     'EXCHANGE_BOT_LIMITS', 'EXCHANGE_TRADE_LIMITS',
@@ -116,5 +175,15 @@ __all__ = [
     'ENABLE_TRADING', 'ENABLE_PAPER_TRADING', 'ENABLE_LIVE_TRADING', 'ENABLE_AUTOPILOT',
     'ENABLE_BODYGUARD', 'ENABLE_REALTIME', 'ENABLE_SELF_LEARNING', 'ENABLE_SELF_HEALING',
     'ENABLE_CCXT', 'ENABLE_UAGENTS', 'PAYMENT_AGENT_ENABLED',
-    'REQUIRE_WALLET_FUNDED', 'REQUIRE_API_KEYS_FOR_LIVE', 'PAPER_SUPPORTED_EXCHANGES'
+    'REQUIRE_WALLET_FUNDED', 'REQUIRE_API_KEYS_FOR_LIVE', 'PAPER_SUPPORTED_EXCHANGES',
+    'TRADING_SCHEDULER_MODE', 'TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE',
+    'WRITE_BEHIND_FLUSH_INTERVAL', 'WRITE_BEHIND_MAX_BATCH',
+    'WRITE_BEHIND_MAX_PENDING_INSERTS', 'WRITE_BEHIND_DEAD_LETTER_PATH',
+    'SYSTEM_MODE_CACHE_TTL', 'SIGNAL_SOURCE_TIMEOUT', 'SIGNAL_LATENCY_BUDGET',
+    'ORDER_BOOK_DEPTH', 'ORDER_BOOK_SNAPSHOT_PATH',
+    'BACKTEST_WORKERS', 'BACKTEST_CACHE_SIZE', 'CANDLE_STORE_DIR', 'SSE_REFRESH_INTERVAL',
+    'WS_SEND_QUEUE_SIZE', 'WS_SEND_TIMEOUT', 'REALTIME_REPLAY_LIMIT',
+    'REGIME_REFIT_INTERVAL', 'PRICE_HISTORY_CAPACITY',
+    'EXPOSURE_RECONCILE_INTERVAL', 'RATE_LIMIT_MAX_WAIT', 'FUSION_MAX_CONCURRENCY',
+    'BOT_NAME_INDEX_MAX_AGE', 'PNL_ROLLUP_VERIFY_INTERVAL'
 ]
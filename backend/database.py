@@ -274,6 +274,17 @@ async def init_db():
             await trades_collection.create_index("user_id")
             await trades_collection.create_index("timestamp")
             await trades_collection.create_index([("bot_id", 1), ("timestamp", -1)])
+            await trades_collection.create_index([("user_id", 1), ("timestamp", -1)])
+            await trades_collection.create_index([("user_id", 1), ("status", 1), ("timestamp", -1)])
+        
+        # PnL rollup indexes (services/pnl_rollups.py)
+        if db is not None:
+            await db.pnl_rollups.create_index(
+                [("source", 1), ("user_id", 1), ("bot_id", 1), ("trading_mode", 1), ("period", 1), ("bucket", 1)],
+                unique=True
+            )
+            await db.pnl_rollups.create_index([("source", 1), ("user_id", 1), ("period", 1), ("bucket", 1)])
+            await db.pnl_rollup_state.create_index([("source", 1), ("user_id", 1)], unique=True)
         
         # API key indexes
         if api_keys_collection is not None:
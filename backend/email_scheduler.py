@@ -9,6 +9,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from email_service import email_service
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -106,7 +107,7 @@ class EmailScheduler:
             # Get today's trades
             trades = await self.db.trades.find({
                 'user_id': user_id,
-                'timestamp': {'$gte': today_start}
+                **timestamp_range(today_start)
             }).to_list(10000)
             
             # Get all user bots
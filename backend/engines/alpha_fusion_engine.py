@@ -8,15 +8,23 @@ Combines signals from multiple sources:
 - Macro news events
 
 Generates unified trading signals with confidence scores
+
+Portfolio fusion computes shared inputs once per cycle (macro signal once,
+whale activity and sentiment once per coin, OFI once per symbol), fetches
+them concurrently under a semaphore and publishes a timestamped signal
+matrix bots can read instead of re-fusing.
 """
 
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+import asyncio
 import logging
 import numpy as np
 
+from config import FUSION_MAX_CONCURRENCY
+
 from engines.regime_detector import regime_detector, MarketRegime, RegimeState
 from engines.order_flow_imbalance import ofi_calculator, OFISignal
 from engines.on_chain_monitor import whale_monitor, WhaleSignal
@@ -66,6 +74,22 @@ class FusedSignal:
     reasoning: List[str]
 
 
+@dataclass
+class SignalMatrix:
+    """Fused signals for a set of symbols from one portfolio fusion cycle"""
+    timestamp: datetime
+    signals: Dict[str, FusedSignal] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)  # symbol -> why it has no signal
+
+    def age_seconds(self) -> float:
+        return (datetime.now(timezone.utc) - self.timestamp).total_seconds()
+
+
+def symbol_coin(symbol: str) -> str:
+    """Base coin of a trading pair (e.g., "BTC/USDT" -> "BTC")"""
+    return symbol.split('/')[0]
+
+
 class AlphaFusionEngine:
     """
     Fuses signals from multiple data sources into unified trading recommendations
@@ -78,7 +102,8 @@ class AlphaFusionEngine:
         ofi_weight: float = 0.20,
         whale_weight: float = 0.20,
         sentiment_weight: float = 0.20,
-        macro_weight: float = 0.15
+        macro_weight: float = 0.15,
+        max_concurrency: int = FUSION_MAX_CONCURRENCY
     ):
         """
         Initialize alpha fusion engine
@@ -89,6 +114,7 @@ class AlphaFusionEngine:
             whale_weight: Weight for whale activity signal (default: 0.20)
             sentiment_weight: Weight for sentiment signal (default: 0.20)
             macro_weight: Weight for macro news signal (default: 0.15)
+            max_concurrency: Max input fetches in flight during portfolio fusion
         """
         # Normalize weights to sum to 1.0
         total = regime_weight + ofi_weight + whale_weight + sentiment_weight + macro_weight
@@ -100,6 +126,8 @@ class AlphaFusionEngine:
             'sentiment': sentiment_weight / total,
             'macro': macro_weight / total
         }
+        self.max_concurrency = max_concurrency
+        self.latest_matrix: Optional[SignalMatrix] = None
         
         logger.info(f"Alpha Fusion Engine initialized with weights: {self.weights}")
     
@@ -246,15 +274,26 @@ class AlphaFusionEngine:
             FusedSignal with unified recommendation
         """
         # Collect all signals
-        regime_state = regime_detector.current_regimes.get(symbol)
         ofi_signal = await ofi_calculator.get_signal(symbol)
         
-        # Extract coin from symbol (e.g., "BTC/USDT" -> "BTC")
-        coin = symbol.split('/')[0]
+        coin = symbol_coin(symbol)
         whale_signal = await whale_monitor.get_whale_signal(coin)
         sentiment_signal = await sentiment_analyzer.analyze_coin_sentiment(coin, hours=24)
         macro_signal = await macro_monitor.get_macro_signal()
         
+        return self._fuse(symbol, ofi_signal, whale_signal, sentiment_signal, macro_signal)
+    
+    def _fuse(
+        self,
+        symbol: str,
+        ofi_signal: Optional[OFISignal],
+        whale_signal: Optional[WhaleSignal],
+        sentiment_signal: Optional[AggregatedSentiment],
+        macro_signal: Optional[MacroSignal]
+    ) -> FusedSignal:
+        """Combine already-collected component signals for a symbol"""
+        regime_state = regime_detector.current_regimes.get(symbol)
+        
         # Convert each signal to score
         regime_score, regime_conf = self._regime_to_score(regime_state)
         ofi_score, ofi_conf = self._ofi_to_score(ofi_signal)
@@ -383,17 +422,77 @@ class AlphaFusionEngine:
         Returns:
             Dictionary of symbol -> FusedSignal
         """
-        signals = {}
+        matrix = await self.fuse_portfolio(symbols)
+        return matrix.signals
+    
+    async def fuse_portfolio(self, symbols: List[str]) -> SignalMatrix:
+        """
+        Fuse signals for many symbols, fetching each shared input once
         
+        The macro signal is fetched once, whale activity and sentiment once
+        per coin (BTC/USDT and BTC/ZAR share them) and OFI once per symbol,
+        all concurrently with at most max_concurrency fetches in flight.
+        A symbol whose inputs fail is left out (its error is recorded).
+        
+        Args:
+            symbols: List of trading pairs
+            
+        Returns:
+            SignalMatrix, also kept as latest_matrix for readers
+        """
+        symbols = list(dict.fromkeys(symbols))
+        coins = list(dict.fromkeys(symbol_coin(symbol) for symbol in symbols))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+        
+        macro_task = bounded(macro_monitor.get_macro_signal())
+        whale_tasks = [bounded(whale_monitor.get_whale_signal(coin)) for coin in coins]
+        sentiment_tasks = [bounded(sentiment_analyzer.analyze_coin_sentiment(coin, hours=24)) for coin in coins]
+        ofi_tasks = [bounded(ofi_calculator.get_signal(symbol)) for symbol in symbols]
+        
+        results = await asyncio.gather(
+            macro_task, *whale_tasks, *sentiment_tasks, *ofi_tasks, return_exceptions=True
+        )
+        macro_signal = results[0]
+        n = len(coins)
+        whale_by_coin = dict(zip(coins, results[1:1 + n]))
+        sentiment_by_coin = dict(zip(coins, results[1 + n:1 + 2 * n]))
+        ofi_by_symbol = dict(zip(symbols, results[1 + 2 * n:]))
+        
+        matrix = SignalMatrix(timestamp=datetime.now(timezone.utc))
         for symbol in symbols:
+            coin = symbol_coin(symbol)
+            inputs = (ofi_by_symbol[symbol], whale_by_coin[coin], sentiment_by_coin[coin], macro_signal)
+            error = next((r for r in inputs if isinstance(r, Exception)), None)
             try:
-                signal = await self.fuse_signals(symbol)
-                if signal:
-                    signals[symbol] = signal
+                if error is not None:
+                    raise error
+                matrix.signals[symbol] = self._fuse(symbol, *inputs)
             except Exception as e:
                 logger.error(f"Error fusing signals for {symbol}: {e}")
+                matrix.errors[symbol] = str(e)
         
-        return signals
+        self.latest_matrix = matrix
+        return matrix
+    
+    def get_latest_signal(self, symbol: str, max_age: Optional[float] = None) -> Optional[FusedSignal]:
+        """
+        Fused signal for a symbol from the last portfolio cycle, without recomputing
+        
+        Args:
+            symbol: Trading pair
+            max_age: Ignore the matrix if older than this many seconds
+            
+        Returns:
+            FusedSignal, or None if not fused recently
+        """
+        matrix = self.latest_matrix
+        if matrix is None or (max_age is not None and matrix.age_seconds() > max_age):
+            return None
+        return matrix.signals.get(symbol)
     
     def get_summary(self, signals: Dict[str, FusedSignal]) -> Dict:
         """
@@ -86,7 +86,7 @@ class ProductionAutopilot:
                             logger.info(f"🤖 Autopilot: Created Auto-Bot-{bot_number} on {exchange}")
                             
                             # Send WebSocket notification
-                            from websocket_manager import manager
+                            from websocket_manager_redis import manager
                             await manager.send_message(user_id, {
                                 "type": "force_refresh",
                                 "message": f"🤖 Autopilot created new bot: Auto-Bot-{bot_number}"
@@ -155,7 +155,7 @@ class ProductionAutopilot:
                 logger.info(f"💰 Autopilot: Reinvested R{total_to_reinvest:.2f} into top {len(top_bots)} bots")
                 
                 # Send WebSocket notification
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(user_id, {
                     "type": "force_refresh",
                     "message": f"💰 Autopilot reinvested R{total_to_reinvest:.2f} into top performers"
@@ -260,7 +260,7 @@ class ProductionAutopilot:
             logger.info(f"⚖️ Autopilot: Rebalanced R{total_to_move:.2f} from {len(bottom_performers)} to {len(top_performers)} bots")
             
             # Send WebSocket notification
-            from websocket_manager import manager
+            from websocket_manager_redis import manager
             await manager.send_message(user_id, {
                 "type": "force_refresh",
                 "message": f"⚖️ Autopilot rebalanced R{total_to_move:.2f} to top performers"
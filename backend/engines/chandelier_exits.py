@@ -3,13 +3,18 @@ Chandelier Exits - ATR-Based Dynamic Stop Losses
 Implements volatility-adjusted stops using Average True Range (ATR)
 Formula: StopLoss_Long = HighestHigh_period - (ATR × multiplier)
          StopLoss_Short = LowestLow_period + (ATR × multiplier)
+
+Candle history uses the same array-backed ring buffer as the regime
+detectors (services.price_history), so ATR and the high/low lookback are
+computed on numpy slices rather than lists of dicts.
 """
 
 import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 import numpy as np
-from collections import deque
+
+from services.price_history import PriceRingBuffer
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +44,7 @@ class ChandelierExits:
         self.lookback_period = lookback_period
         
         # Store price history per symbol
-        self.price_history: Dict[str, deque] = {}
+        self.price_history: Dict[str, PriceRingBuffer] = {}
         
         logger.info(
             f"Chandelier Exits initialized: ATR({atr_period}) × {atr_multiplier}, "
@@ -65,14 +70,21 @@ class ChandelierExits:
             timestamp: Data timestamp
         """
         if symbol not in self.price_history:
-            self.price_history[symbol] = deque(maxlen=max(self.atr_period, self.lookback_period) + 1)
-        
-        self.price_history[symbol].append({
-            'high': high,
-            'low': low,
-            'close': close,
-            'timestamp': timestamp or datetime.now(timezone.utc)
-        })
+            self.price_history[symbol] = self._new_buffer()
+        
+        self.price_history[symbol].append(
+            timestamp.timestamp() if timestamp else None,
+            high=high, low=low, close=close
+        )
+    
+    def _new_buffer(self) -> PriceRingBuffer:
+        """Enough candles for ATR and the lookback; oldest overwritten, no time expiry"""
+        return PriceRingBuffer(
+            capacity=max(self.atr_period, self.lookback_period) + 1,
+            window_seconds=None,
+            fields=('high', 'low', 'close'),
+            stats_field='close'
+        )
     
     def calculate_atr(self, symbol: str) -> Optional[float]:
         """
@@ -87,33 +99,27 @@ class ChandelierExits:
         if symbol not in self.price_history:
             return None
         
-        history = list(self.price_history[symbol])
+        history = self.price_history[symbol]
         
         if len(history) < self.atr_period + 1:
             logger.debug(f"Insufficient data for ATR: {len(history)} < {self.atr_period + 1}")
             return None
         
-        # Calculate True Range for each period
-        true_ranges = []
+        # Only the last N true ranges are averaged
+        n = self.atr_period + 1
+        high = history.values('high')[-n:]
+        low = history.values('low')[-n:]
+        prev_close = history.values('close')[-n:-1]
         
-        for i in range(1, len(history)):
-            current = history[i]
-            previous = history[i-1]
-            
-            # True Range = max(high-low, |high-prevClose|, |low-prevClose|)
-            tr = max(
-                current['high'] - current['low'],
-                abs(current['high'] - previous['close']),
-                abs(current['low'] - previous['close'])
-            )
-            
-            true_ranges.append(tr)
+        # True Range = max(high-low, |high-prevClose|, |low-prevClose|)
+        true_ranges = np.maximum.reduce([
+            high[1:] - low[1:],
+            np.abs(high[1:] - prev_close),
+            np.abs(low[1:] - prev_close)
+        ])
         
         # Average True Range = average of last N true ranges
-        if len(true_ranges) < self.atr_period:
-            return None
-        
-        atr = np.mean(true_ranges[-self.atr_period:])
+        atr = float(np.mean(true_ranges))
         
         return atr
     
@@ -140,7 +146,7 @@ class ChandelierExits:
             logger.warning(f"No price history for {symbol}")
             return None
         
-        history = list(self.price_history[symbol])
+        history = self.price_history[symbol]
         
         if len(history) < self.lookback_period:
             logger.debug(f"Insufficient data for Chandelier: {len(history)} < {self.lookback_period}")
@@ -155,11 +161,12 @@ class ChandelierExits:
         multiplier = custom_multiplier or self.atr_multiplier
         
         # Get recent high/low
-        recent_candles = history[-self.lookback_period:]
+        recent_highs = history.values('high')[-self.lookback_period:]
+        recent_lows = history.values('low')[-self.lookback_period:]
         
         if side.lower() == 'long':
             # Long position: Stop = Highest High - (ATR × multiplier)
-            highest_high = max(c['high'] for c in recent_candles)
+            highest_high = float(recent_highs.max())
             stop_loss = highest_high - (atr * multiplier)
             
             # Ensure stop is below entry
@@ -175,7 +182,7 @@ class ChandelierExits:
             
         elif side.lower() == 'short':
             # Short position: Stop = Lowest Low + (ATR × multiplier)
-            lowest_low = min(c['low'] for c in recent_candles)
+            lowest_low = float(recent_lows.min())
             stop_loss = lowest_low + (atr * multiplier)
             
             # Ensure stop is above entry
@@ -310,17 +317,17 @@ class ChandelierExits:
         if symbol not in self.price_history:
             return None
         
-        history = list(self.price_history[symbol])
+        history = self.price_history[symbol]
         
         if not history:
             return None
         
-        current_price = history[-1]['close']
+        current_price = history.last
         atr_pct = (atr / current_price) * 100
         
         # Calculate ATR over different periods for comparison
-        recent_highs = [c['high'] for c in history[-self.lookback_period:]]
-        recent_lows = [c['low'] for c in history[-self.lookback_period:]]
+        recent_highs = history.values('high')[-self.lookback_period:]
+        recent_lows = history.values('low')[-self.lookback_period:]
         
         return {
             'symbol': symbol,
@@ -328,8 +335,8 @@ class ChandelierExits:
             'atr_pct': atr_pct,
             'current_price': current_price,
             'period': self.atr_period,
-            'highest_high': max(recent_highs) if recent_highs else None,
-            'lowest_low': min(recent_lows) if recent_lows else None,
+            'highest_high': float(recent_highs.max()) if len(recent_highs) else None,
+            'lowest_low': float(recent_lows.min()) if len(recent_lows) else None,
             'data_points': len(history),
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
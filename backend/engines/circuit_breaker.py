@@ -10,6 +10,7 @@ from datetime import datetime, timezone, timedelta
 import logging
 
 import database as db
+from services.system_mode_service import system_mode_service
 from config import MAX_DRAWDOWN_PERCENT
 
 logger = logging.getLogger(__name__)
@@ -287,6 +288,7 @@ class CircuitBreaker:
                 }},
                 upsert=True
             )
+            system_mode_service.invalidate_modes(user_id)
             
             # Create critical alert
             await db.alerts_collection.insert_one({
@@ -14,6 +14,7 @@ import os
 
 import database as db
 from engines.audit_logger import audit_logger
+from utils.timestamps import with_timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +51,7 @@ class EmailReporter:
             # Get yesterday's date range
             yesterday = datetime.now(timezone.utc) - timedelta(days=1)
             yesterday_start = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-            yesterday_end = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
+            yesterday_end = yesterday_start + timedelta(days=1)
             
             # Get all bots
             bots = await db.bots_collection.find(
@@ -60,13 +61,7 @@ class EmailReporter:
             
             # Get yesterday's trades
             trades = await db.trades_collection.find(
-                {
-                    "user_id": user_id,
-                    "timestamp": {
-                        "$gte": yesterday_start.isoformat(),
-                        "$lte": yesterday_end.isoformat()
-                    }
-                },
+                with_timestamp_range({"user_id": user_id}, yesterday_start, yesterday_end),
                 {"_id": 0}
             ).to_list(10000)
             
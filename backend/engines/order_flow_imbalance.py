@@ -3,17 +3,24 @@ Order Flow Imbalance (OFI) Calculator
 Implements micro-scale entry decision-making using order book imbalances
 Formula: e_n = I{P^b_n >= P^b_{n-1}}q^b_n - I{P^b_n <= P^b_{n-1}}q^b_{n-1} 
               - I{P^a_n <= P^a_{n-1}}q^a_n + I{P^a_n >= P^a_{n-1}}q^a_{n-1}
+
+Snapshots are kept in a per-symbol NumPy ring buffer (one row per snapshot,
+one column per book level). OFI is computed for a whole batch of snapshots
+at once and per level (multi-level OFI), combined with level weights, and a
+running prefix sum answers windowed aggregates without rescanning history.
 """
 
 import numpy as np
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+from datetime import datetime, timezone
 from dataclasses import dataclass
-from collections import deque
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+SNAPSHOTS_PER_SECOND = 10  # Buffer sizing: lookback_seconds * this rows per symbol
+
 
 @dataclass
 class OrderBookSnapshot:
@@ -36,129 +43,339 @@ class OFISignal:
     recommendation: str  # 'buy', 'sell', 'neutral'
 
 
+def compute_ofi(
+    bid_price: np.ndarray,
+    bid_qty: np.ndarray,
+    ask_price: np.ndarray,
+    ask_qty: np.ndarray
+) -> np.ndarray:
+    """
+    OFI between consecutive snapshots, for every row and level at once
+    
+    Formula:
+    e_n = I{P^b_n >= P^b_{n-1}}q^b_n - I{P^b_n <= P^b_{n-1}}q^b_{n-1}
+          - I{P^a_n <= P^a_{n-1}}q^a_n + I{P^a_n >= P^a_{n-1}}q^a_{n-1}
+    
+    Where:
+    - P^b = Bid price, P^a = Ask price
+    - q^b = Bid quantity, q^a = Ask quantity
+    - I{condition} = Indicator function (1 if true, 0 if false)
+    - n = current snapshot, n-1 = previous snapshot
+    
+    Positive OFI indicates buying pressure (bid side strengthening)
+    Negative OFI indicates selling pressure (ask side strengthening)
+    
+    Args:
+        bid_price, bid_qty, ask_price, ask_qty: Arrays of shape (n, levels), oldest first
+        
+    Returns:
+        Per-level OFI of shape (n - 1, levels) for snapshots 1..n-1
+    """
+    return (
+        (bid_price[1:] >= bid_price[:-1]) * bid_qty[1:]
+        - (bid_price[1:] <= bid_price[:-1]) * bid_qty[:-1]
+        - (ask_price[1:] <= ask_price[:-1]) * ask_qty[1:]
+        + (ask_price[1:] >= ask_price[:-1]) * ask_qty[:-1]
+    )
+
+
+class OFISeries:
+    """Read-only view of a buffer's OFI values, indexable as (timestamp, ofi)"""
+    
+    def __init__(self, buffer: "OFIRingBuffer"):
+        self.buffer = buffer
+    
+    def __len__(self) -> int:
+        return self.buffer.ofi_count
+    
+    def __getitem__(self, index: int) -> Tuple[datetime, float]:
+        count = self.buffer.ofi_count
+        if not -count <= index < count:
+            raise IndexError("OFI history index out of range")
+        slot = self.buffer._slot(self.buffer.size - count + index % count)
+        return (
+            datetime.fromtimestamp(self.buffer.timestamps[slot], tz=timezone.utc),
+            float(self.buffer.ofi[slot])
+        )
+    
+    def values(self) -> np.ndarray:
+        return self.buffer.recent_ofi(self.buffer.ofi_count)
+
+
+class OFIRingBuffer:
+    """
+    Order book snapshots and their OFI for one symbol
+    
+    Fixed capacity, the oldest rows are overwritten. cum_ofi holds the running
+    OFI total through each row, so any suffix sum is total - cum_before(row).
+    """
+    
+    def __init__(self, capacity: int, levels: int = 1, level_weights: Optional[Sequence[float]] = None):
+        self.capacity = max(2, int(capacity))
+        self.levels = levels
+        self.level_weights = np.ones(levels) if level_weights is None else np.asarray(level_weights, dtype=float)
+        
+        shape = (self.capacity, levels)
+        self.bid_price = np.zeros(shape)
+        self.bid_qty = np.zeros(shape)
+        self.ask_price = np.zeros(shape)
+        self.ask_qty = np.zeros(shape)
+        self.timestamps = np.zeros(self.capacity)
+        self.level_ofi = np.zeros(shape)
+        self.ofi = np.zeros(self.capacity)      # Combined OFI (0 for the very first snapshot)
+        self.cum_ofi = np.zeros(self.capacity)  # Running OFI total through each row
+        
+        self.head = 0       # Slot of the oldest row
+        self.size = 0
+        self.appended = 0   # Rows ever appended
+        self.total = 0.0    # Running OFI total through the newest row
+        self.series = OFISeries(self)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __getitem__(self, index: int) -> OrderBookSnapshot:
+        """Top-of-book view of one stored snapshot"""
+        if not -self.size <= index < self.size:
+            raise IndexError("snapshot index out of range")
+        slot = self._slot(index % self.size)
+        return OrderBookSnapshot(
+            timestamp=datetime.fromtimestamp(self.timestamps[slot], tz=timezone.utc),
+            bid_price=float(self.bid_price[slot, 0]),
+            bid_qty=float(self.bid_qty[slot, 0]),
+            ask_price=float(self.ask_price[slot, 0]),
+            ask_qty=float(self.ask_qty[slot, 0])
+        )
+    
+    @property
+    def ofi_count(self) -> int:
+        """Stored rows with an OFI value (every row but the first snapshot ever)"""
+        return self.size if self.appended > self.size else max(0, self.size - 1)
+    
+    def _slot(self, index: int) -> int:
+        return (self.head + index) % self.capacity
+    
+    def append(
+        self,
+        timestamps: np.ndarray,
+        bid_price: np.ndarray,
+        bid_qty: np.ndarray,
+        ask_price: np.ndarray,
+        ask_qty: np.ndarray
+    ) -> np.ndarray:
+        """
+        Append a batch of snapshots (book arrays of shape (n, levels), oldest first)
+        
+        Returns:
+            Combined OFI of the batch rows that have one
+        """
+        n = len(timestamps)
+        if n == 0:
+            return np.empty(0)
+        
+        batch = (bid_price, bid_qty, ask_price, ask_qty)
+        if self.size:
+            last = self._slot(self.size - 1)
+            previous = (self.bid_price, self.bid_qty, self.ask_price, self.ask_qty)
+            level_ofi = compute_ofi(*(
+                np.concatenate((column[last:last + 1], rows)) for column, rows in zip(previous, batch)
+            ))
+        else:
+            level_ofi = np.vstack((np.zeros((1, self.levels)), compute_ofi(*batch)))
+        
+        ofi = level_ofi @ self.level_weights
+        cum_ofi = self.total + np.cumsum(ofi)
+        self.total = float(cum_ofi[-1])
+        first_ever = self.appended == 0
+        self.appended += n
+        
+        # Only the newest `capacity` rows fit; they overwrite the oldest in order
+        keep = slice(max(0, n - self.capacity), n)
+        m = keep.stop - keep.start
+        slots = (self.head + self.size + np.arange(m)) % self.capacity
+        self.timestamps[slots] = timestamps[keep]
+        self.bid_price[slots] = bid_price[keep]
+        self.bid_qty[slots] = bid_qty[keep]
+        self.ask_price[slots] = ask_price[keep]
+        self.ask_qty[slots] = ask_qty[keep]
+        self.level_ofi[slots] = level_ofi[keep]
+        self.ofi[slots] = ofi[keep]
+        self.cum_ofi[slots] = cum_ofi[keep]
+        
+        evicted = max(0, self.size + m - self.capacity)
+        self.size += m - evicted
+        if evicted:
+            wrapped = self.head + evicted >= self.capacity
+            self.head = (self.head + evicted) % self.capacity
+            if wrapped:
+                self._rebase()
+        
+        return ofi[1:] if first_ever else ofi
+    
+    def _rebase(self) -> None:
+        """Shift prefix sums so the oldest row starts from 0 (bounds float growth; once per wrap)"""
+        base = self.cum_ofi[self.head] - self.ofi[self.head]
+        self.cum_ofi -= base
+        self.total -= base
+    
+    def _first_at_or_after(self, since: float) -> int:
+        """Binary search the (time-ordered) ring for the first row at or after `since`"""
+        end = self.head + self.size
+        if end <= self.capacity:
+            return int(np.searchsorted(self.timestamps[self.head:end], since))
+        older = self.timestamps[self.head:]
+        if since <= older[-1]:
+            return int(np.searchsorted(older, since))
+        return len(older) + int(np.searchsorted(self.timestamps[:end - self.capacity], since))
+    
+    def window_sum(self, since: float) -> Tuple[float, int]:
+        """Sum and count of OFI values at or after `since`, from prefix sums"""
+        first = max(self._first_at_or_after(since), self.size - self.ofi_count)
+        if first >= self.size:
+            return 0.0, 0
+        slot = self._slot(first)
+        return self.total - (self.cum_ofi[slot] - self.ofi[slot]), self.size - first
+    
+    def recent_ofi(self, n: int) -> np.ndarray:
+        """Newest n OFI values (oldest first)"""
+        n = min(n, self.ofi_count)
+        slots = (self.head + self.size - n + np.arange(n)) % self.capacity
+        return self.ofi[slots]
+
+
 class OrderFlowImbalanceCalculator:
     """
     Calculates Order Flow Imbalance (OFI) for micro-scale trading decisions
     Aggregates imbalances over configurable intervals (default: 1 second)
     """
     
-    def __init__(self, aggregation_window: int = 1, lookback_seconds: int = 60):
+    def __init__(
+        self,
+        aggregation_window: int = 1,
+        lookback_seconds: int = 60,
+        levels: int = 1,
+        level_weights: Optional[Sequence[float]] = None,
+        capacity: Optional[int] = None,
+        clock=time.time
+    ):
         """
         Initialize OFI calculator
         
         Args:
             aggregation_window: Seconds to aggregate OFI (default: 1)
             lookback_seconds: History to maintain (default: 60)
+            levels: Order book levels per snapshot (multi-level OFI, default: 1)
+            level_weights: Weight of each level in the combined OFI (default: equal)
+            capacity: Snapshots kept per symbol (default: lookback_seconds * 10)
+            clock: Epoch-seconds time source (injectable for tests)
         """
         self.aggregation_window = aggregation_window
         self.lookback_seconds = lookback_seconds
+        self.levels = levels
+        self.level_weights = level_weights
+        self.capacity = capacity or lookback_seconds * SNAPSHOTS_PER_SECOND
+        self.clock = clock
         
-        # Store order book snapshots per symbol
-        self.snapshots: Dict[str, deque] = {}
+        # Order book snapshots (and their OFI) per symbol
+        self.snapshots: Dict[str, OFIRingBuffer] = {}
         
-        # Store calculated OFI values per symbol
-        self.ofi_history: Dict[str, deque] = {}
-        
-        # Aggregated OFI per symbol
-        self.aggregated_ofi: Dict[str, List[float]] = {}
+        # Calculated OFI values per symbol (views over the snapshot buffers)
+        self.ofi_history: Dict[str, OFISeries] = {}
+    
+    def _buffer(self, symbol: str) -> OFIRingBuffer:
+        buffer = self.snapshots.get(symbol)
+        if buffer is None:
+            buffer = self.snapshots[symbol] = OFIRingBuffer(self.capacity, self.levels, self.level_weights)
+            self.ofi_history[symbol] = buffer.series
+        return buffer
     
-    def _indicator(self, condition: bool) -> int:
-        """Indicator function: I{condition} = 1 if True, 0 if False"""
-        return 1 if condition else 0
+    def _as_levels(self, values, n: int, pad_mode: str) -> np.ndarray:
+        """(n, levels) float array; shallow books are padded (prices repeat the deepest level, quantities 0)"""
+        array = np.asarray(values, dtype=float).reshape(n, -1)[:, :self.levels]
+        missing = self.levels - array.shape[1]
+        if missing > 0:
+            array = np.pad(array, ((0, 0), (0, missing)), mode=pad_mode)
+        return array
     
     async def add_snapshot(
         self,
         symbol: str,
-        bid_price: float,
-        bid_qty: float,
-        ask_price: float,
-        ask_qty: float
+        bid_price,
+        bid_qty,
+        ask_price,
+        ask_qty,
+        timestamp: Optional[float] = None
     ) -> None:
         """
         Add order book snapshot
         
         Args:
             symbol: Trading pair
-            bid_price: Best bid price
-            bid_qty: Quantity at best bid
-            ask_price: Best ask price
-            ask_qty: Quantity at best ask
+            bid_price: Best bid price (or one price per level)
+            bid_qty: Quantity at best bid (or one per level)
+            ask_price: Best ask price (or one price per level)
+            ask_qty: Quantity at best ask (or one per level)
+            timestamp: Epoch seconds (default: now)
         """
-        if symbol not in self.snapshots:
-            self.snapshots[symbol] = deque(maxlen=self.lookback_seconds * 10)
-            self.ofi_history[symbol] = deque(maxlen=self.lookback_seconds * 10)
-            self.aggregated_ofi[symbol] = []
-        
-        snapshot = OrderBookSnapshot(
-            timestamp=datetime.now(timezone.utc),
-            bid_price=bid_price,
-            bid_qty=bid_qty,
-            ask_price=ask_price,
-            ask_qty=ask_qty
+        await self.add_snapshots(
+            symbol,
+            [np.atleast_1d(bid_price)],
+            [np.atleast_1d(bid_qty)],
+            [np.atleast_1d(ask_price)],
+            [np.atleast_1d(ask_qty)],
+            None if timestamp is None else [timestamp]
         )
-        
-        self.snapshots[symbol].append(snapshot)
-        
-        # Calculate OFI if we have previous snapshot
-        if len(self.snapshots[symbol]) >= 2:
-            ofi = self._calculate_ofi(symbol)
-            if ofi is not None:
-                self.ofi_history[symbol].append((snapshot.timestamp, ofi))
     
-    def _calculate_ofi(self, symbol: str) -> Optional[float]:
+    async def add_snapshots(
+        self,
+        symbol: str,
+        bid_prices,
+        bid_qtys,
+        ask_prices,
+        ask_qtys,
+        timestamps: Optional[Sequence[float]] = None
+    ) -> np.ndarray:
         """
-        Calculate Order Flow Imbalance for latest snapshot
-        
-        Formula:
-        e_n = I{P^b_n >= P^b_{n-1}}q^b_n - I{P^b_n <= P^b_{n-1}}q^b_{n-1}
-              - I{P^a_n <= P^a_{n-1}}q^a_n + I{P^a_n >= P^a_{n-1}}q^a_{n-1}
-        
-        Where:
-        - P^b = Bid price, P^a = Ask price
-        - q^b = Bid quantity, q^a = Ask quantity
-        - I{condition} = Indicator function (1 if true, 0 if false)
-        - n = current snapshot, n-1 = previous snapshot
-        
-        Positive OFI indicates buying pressure (bid side strengthening)
-        Negative OFI indicates selling pressure (ask side strengthening)
+        Add a batch of snapshots and compute their OFI in one pass
         
         Args:
             symbol: Trading pair
+            bid_prices, bid_qtys, ask_prices, ask_qtys: One row per snapshot,
+                oldest first; shape (n,) for top of book or (n, levels)
+            timestamps: Epoch seconds per snapshot (default: now for all)
             
         Returns:
-            OFI value (positive = buying pressure, negative = selling pressure)
+            Combined OFI for the added snapshots that have a predecessor
         """
-        if len(self.snapshots[symbol]) < 2:
-            return None
+        n = len(bid_prices)
+        if n == 0:
+            return np.empty(0)
+        
+        if timestamps is None:
+            timestamps = np.full(n, self.clock())
+        
+        return self._buffer(symbol).append(
+            np.asarray(timestamps, dtype=float),
+            self._as_levels(bid_prices, n, 'edge'),
+            self._as_levels(bid_qtys, n, 'constant'),
+            self._as_levels(ask_prices, n, 'edge'),
+            self._as_levels(ask_qtys, n, 'constant')
+        )
+    
+    async def add_order_book(self, symbol: str, order_book: Dict, timestamp: Optional[float] = None) -> bool:
+        """
+        Add a snapshot from a ccxt-style book ({"bids": [[price, qty], ...], "asks": [...]})
         
-        # Get current and previous snapshots
-        current = self.snapshots[symbol][-1]  # n
-        previous = self.snapshots[symbol][-2]  # n-1
-        
-        # Extract values
-        P_b_n = current.bid_price
-        P_b_n_1 = previous.bid_price
-        q_b_n = current.bid_qty
-        q_b_n_1 = previous.bid_qty
-        
-        P_a_n = current.ask_price
-        P_a_n_1 = previous.ask_price
-        q_a_n = current.ask_qty
-        q_a_n_1 = previous.ask_qty
-        
-        # Calculate OFI using the formula
-        # Term 1: Bid improvement component
-        term1 = self._indicator(P_b_n >= P_b_n_1) * q_b_n
-        # Term 2: Bid deterioration component
-        term2 = self._indicator(P_b_n <= P_b_n_1) * q_b_n_1
-        # Term 3: Ask deterioration component
-        term3 = self._indicator(P_a_n <= P_a_n_1) * q_a_n
-        # Term 4: Ask improvement component
-        term4 = self._indicator(P_a_n >= P_a_n_1) * q_a_n_1
-        
-        e_n = term1 - term2 - term3 + term4
-        
-        return e_n
+        Returns:
+            False if either side of the book is empty
+        """
+        bids = np.asarray([level[:2] for level in (order_book.get('bids') or [])[:self.levels]], dtype=float)
+        asks = np.asarray([level[:2] for level in (order_book.get('asks') or [])[:self.levels]], dtype=float)
+        if not len(bids) or not len(asks):
+            return False
+        
+        await self.add_snapshot(symbol, bids[:, 0], bids[:, 1], asks[:, 0], asks[:, 1], timestamp)
+        return True
     
     async def get_aggregated_ofi(
         self,
@@ -175,25 +392,18 @@ class OrderFlowImbalanceCalculator:
         Returns:
             Aggregated OFI value
         """
-        if symbol not in self.ofi_history or len(self.ofi_history[symbol]) == 0:
+        buffer = self.snapshots.get(symbol)
+        if buffer is None or buffer.ofi_count == 0:
             return None
         
         if window_seconds is None:
             window_seconds = self.aggregation_window
         
-        cutoff_time = datetime.now(timezone.utc) - timedelta(seconds=window_seconds)
-        
-        # Aggregate OFI values within window
-        recent_ofi = [
-            ofi for ts, ofi in self.ofi_history[symbol]
-            if ts >= cutoff_time
-        ]
+        aggregated, count = buffer.window_sum(self.clock() - window_seconds)
         
-        if not recent_ofi:
+        if count == 0:
             return None
         
-        aggregated = sum(recent_ofi)
-        
         return aggregated
     
     async def get_signal(self, symbol: str, threshold: float = 0.1) -> Optional[OFISignal]:
@@ -207,7 +417,8 @@ class OrderFlowImbalanceCalculator:
         Returns:
             OFISignal with recommendation
         """
-        if symbol not in self.ofi_history or len(self.ofi_history[symbol]) < 5:
+        buffer = self.snapshots.get(symbol)
+        if buffer is None or buffer.ofi_count < 5:
             return None
         
         # Get aggregated OFI
@@ -217,18 +428,18 @@ class OrderFlowImbalanceCalculator:
             return None
         
         # Get current OFI
-        current_time, current_ofi = self.ofi_history[symbol][-1]
+        current_time, current_ofi = buffer.series[-1]
         
         # Calculate signal strength (normalized)
         # Use recent history to normalize
-        recent_values = [ofi for _, ofi in list(self.ofi_history[symbol])[-30:]]
+        recent_values = buffer.recent_ofi(30)
         std_dev = np.std(recent_values) if len(recent_values) > 1 else 1.0
         
         if std_dev == 0:
             std_dev = 1.0
         
         signal_strength = aggregated_ofi / (std_dev * 3)  # 3-sigma normalization
-        signal_strength = max(-1.0, min(1.0, signal_strength))  # Clip to [-1, 1]
+        signal_strength = float(max(-1.0, min(1.0, signal_strength)))  # Clip to [-1, 1]
         
         # Generate recommendation
         if signal_strength > threshold:
@@ -264,14 +475,12 @@ class OrderFlowImbalanceCalculator:
         Returns:
             Dictionary of features
         """
-        if symbol not in self.ofi_history or len(self.ofi_history[symbol]) < 10:
+        buffer = self.snapshots.get(symbol)
+        if buffer is None or buffer.ofi_count < 10:
             return None
         
         # Get recent OFI values
-        recent_ofi = [ofi for _, ofi in list(self.ofi_history[symbol])[-30:]]
-        
-        if len(recent_ofi) < 10:
-            return None
+        recent_ofi = buffer.recent_ofi(30)
         
         # Calculate features
         features = {
@@ -282,8 +491,8 @@ class OrderFlowImbalanceCalculator:
             'ofi_current': float(recent_ofi[-1]),
             'ofi_trend': float(np.mean(recent_ofi[-5:]) - np.mean(recent_ofi[-10:-5])),
             'ofi_momentum': float(recent_ofi[-1] - recent_ofi[-5]),
-            'buy_pressure_ratio': float(sum(1 for x in recent_ofi if x > 0) / len(recent_ofi)),
-            'sell_pressure_ratio': float(sum(1 for x in recent_ofi if x < 0) / len(recent_ofi))
+            'buy_pressure_ratio': float(np.mean(recent_ofi > 0)),
+            'sell_pressure_ratio': float(np.mean(recent_ofi < 0))
         }
         
         return features
@@ -298,10 +507,11 @@ class OrderFlowImbalanceCalculator:
         Returns:
             Dictionary of OFI statistics
         """
-        if symbol not in self.ofi_history or len(self.ofi_history[symbol]) == 0:
+        buffer = self.snapshots.get(symbol)
+        if buffer is None or buffer.ofi_count == 0:
             return None
         
-        ofi_values = [ofi for _, ofi in self.ofi_history[symbol]]
+        ofi_values = buffer.series.values()
         
         aggregated = await self.get_aggregated_ofi(symbol)
         signal = await self.get_signal(symbol)
@@ -309,15 +519,16 @@ class OrderFlowImbalanceCalculator:
         
         stats = {
             'symbol': symbol,
-            'total_snapshots': len(self.snapshots.get(symbol, [])),
+            'levels': self.levels,
+            'total_snapshots': len(buffer),
             'total_ofi_calculations': len(ofi_values),
-            'current_ofi': ofi_values[-1] if ofi_values else None,
+            'current_ofi': float(ofi_values[-1]),
             'aggregated_ofi': aggregated,
             'mean_ofi': float(np.mean(ofi_values)),
             'std_ofi': float(np.std(ofi_values)),
             'min_ofi': float(np.min(ofi_values)),
             'max_ofi': float(np.max(ofi_values)),
-            'positive_ofi_ratio': sum(1 for x in ofi_values if x > 0) / len(ofi_values),
+            'positive_ofi_ratio': float(np.mean(ofi_values > 0)),
             'signal': {
                 'recommendation': signal.recommendation if signal else 'unknown',
                 'strength': signal.signal_strength if signal else 0.0
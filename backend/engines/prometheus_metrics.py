@@ -40,6 +40,14 @@ class PrometheusMetrics:
             registry=self.registry
         )
         
+        self.signal_source_latency = Histogram(
+            'amarktai_signal_source_latency_seconds',
+            'Latency per AI signal source (status: ok, cached, timeout, error)',
+            ['source', 'status'],
+            buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0],
+            registry=self.registry
+        )
+        
         # Golden Signal 2: Traffic
         self.trades_total = Counter(
             'amarktai_trades_total',
@@ -91,6 +99,28 @@ class PrometheusMetrics:
             registry=self.registry
         )
         
+        self.trade_queue_depth = Gauge(
+            'amarktai_trade_queue_depth',
+            'Trade requests queued in the staggerer',
+            ['exchange'],
+            registry=self.registry
+        )
+        
+        self.trade_queue_wait = Histogram(
+            'amarktai_trade_queue_wait_seconds',
+            'Time a trade request waited in the staggerer queue',
+            ['exchange'],
+            buckets=[0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 1800.0],
+            registry=self.registry
+        )
+        
+        self.websocket_messages_dropped = Counter(
+            'amarktai_websocket_messages_dropped_total',
+            'Outbound WebSocket messages dropped for slow clients (reason: coalesced, overflow)',
+            ['reason'],
+            registry=self.registry
+        )
+        
         self.api_rate_limit_remaining = Gauge(
             'amarktai_api_rate_limit_remaining',
             'Remaining API rate limit',
@@ -159,6 +189,10 @@ class PrometheusMetrics:
         """Record signal generation latency"""
         self.signal_generation_latency.labels(signal_type=signal_type).observe(latency_seconds)
     
+    def record_signal_source_latency(self, source: str, status: str, latency_seconds: float):
+        """Record latency of one AI signal source fetch"""
+        self.signal_source_latency.labels(source=source, status=status).observe(latency_seconds)
+    
     # Traffic Tracking
     def record_trade(self, exchange: str, symbol: str, side: str, mode: str):
         """Record trade execution"""
@@ -209,6 +243,18 @@ class PrometheusMetrics:
         """Update capital utilization ratio"""
         self.capital_utilization.set(ratio)
     
+    def update_trade_queue_depth(self, exchange: str, depth: int):
+        """Update staggerer queue depth"""
+        self.trade_queue_depth.labels(exchange=exchange).set(depth)
+    
+    def record_trade_queue_wait(self, exchange: str, wait_seconds: float):
+        """Record how long a dequeued trade request waited"""
+        self.trade_queue_wait.labels(exchange=exchange).observe(wait_seconds)
+    
+    def record_websocket_drop(self, reason: str):
+        """Count an outbound WebSocket message dropped for a slow client"""
+        self.websocket_messages_dropped.labels(reason=reason).inc()
+    
     def update_rate_limit(self, exchange: str, remaining: int):
         """Update API rate limit remaining"""
         self.api_rate_limit_remaining.labels(exchange=exchange).set(remaining)
@@ -13,6 +13,7 @@ from config import (
     MIN_PROFIT_PERCENT, 
     MIN_TRADES_FOR_PROMOTION
 )
+from utils.timestamps import timestamp_range
 
 
 class PromotionEngine:
@@ -234,7 +235,7 @@ class PromotionEngine:
             paper_trades = await db.trades_collection.find({
                 "bot_id": bot_id,
                 "is_paper": True,
-                "timestamp": {"$gte": seven_days_ago}
+                **timestamp_range(seven_days_ago)
             }, {"_id": 0}).to_list(1000)
             
             # 3. Check minimum trades requirement
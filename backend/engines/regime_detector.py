@@ -2,15 +2,26 @@
 Regime-Adaptive Intelligence Module
 Uses Hidden Markov Models (HMM) and Gaussian Mixture Models (GMM) to detect market regimes
 Identifies: Bullish/Calm, Bearish/Volatile, Squeeze states
+
+Models are kept per symbol and reused for prediction between refits. A refit
+happens on a schedule (REGIME_REFIT_INTERVAL) or when recent features drift
+away from the training data, and warm-starts from the previous parameters.
+
+Price history lives in services.price_history ring buffers; the global
+detector shares its buffers with MarketRegimeDetector.
 """
 
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timezone, timedelta
+import copy
 import logging
+import time
 from dataclasses import dataclass
 from enum import Enum
 
+from services.price_history import PriceHistoryStore, price_history_store
+
 try:
     from hmmlearn import hmm
     from sklearn.mixture import GaussianMixture
@@ -31,6 +42,24 @@ class MarketRegime(Enum):
     UNKNOWN = "unknown"
 
 
+# Refit early when the recent mean of any feature is this many training
+# standard deviations away from the training mean
+DRIFT_Z_THRESHOLD = 3.0
+DRIFT_WINDOW = 10
+WARM_REFIT_ITERATIONS = 20  # Warm-started HMM refits converge in far fewer EM steps
+
+
+@dataclass
+class SymbolModels:
+    """Fitted models for one symbol, reused for prediction between refits"""
+    hmm: Optional[object] = None
+    gmm: Optional[object] = None
+    fitted_at: float = 0.0
+    feature_mean: Optional[np.ndarray] = None
+    feature_std: Optional[np.ndarray] = None
+    refits: int = 0
+
+
 @dataclass
 class RegimeState:
     """Current market regime state"""
@@ -48,20 +77,38 @@ class RegimeDetector:
     Adapts trading strategies based on detected market conditions
     """
     
-    def __init__(self, n_regimes: int = 3, lookback_periods: int = 100):
+    def __init__(
+        self,
+        n_regimes: int = 3,
+        lookback_periods: int = 100,
+        refit_interval: Optional[float] = None,
+        clock=time.monotonic,
+        history: Optional[PriceHistoryStore] = None
+    ):
         """
         Initialize regime detector
         
         Args:
             n_regimes: Number of market regimes to detect (default: 3)
             lookback_periods: Historical periods for training (default: 100)
+            refit_interval: Seconds a fitted model is reused (default: REGIME_REFIT_INTERVAL)
+            clock: Monotonic time source (injectable for tests)
+            history: Price history store (default: a private one)
         """
+        if refit_interval is None:
+            from config import REGIME_REFIT_INTERVAL
+            refit_interval = REGIME_REFIT_INTERVAL
+        
         self.n_regimes = n_regimes
         self.lookback_periods = lookback_periods
-        self.price_history: Dict[str, List[Dict]] = {}
+        self.refit_interval = refit_interval
+        self.clock = clock
+        self.price_history = history if history is not None else PriceHistoryStore()
         self.current_regimes: Dict[str, RegimeState] = {}
+        self.models: Dict[str, SymbolModels] = {}
+        self._seeded: set = set()  # Symbols already seeded from the candle store
         
-        # Initialize models if libraries available
+        # Unfitted templates, copied per symbol
         if hmm is not None:
             self.hmm_model = hmm.GaussianHMM(
                 n_components=n_regimes,
@@ -77,6 +124,7 @@ class RegimeDetector:
             self.gmm_model = GaussianMixture(
                 n_components=n_regimes,
                 covariance_type='full',
+                warm_start=True,
                 random_state=42
             )
         else:
@@ -92,21 +140,38 @@ class RegimeDetector:
             price: Current price
             volume: Current volume (optional)
         """
-        if symbol not in self.price_history:
-            self.price_history[symbol] = []
-        
-        self.price_history[symbol].append({
-            'price': price,
-            'volume': volume,
-            'timestamp': datetime.now(timezone.utc)
-        })
-        
-        # Keep only recent history
-        cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
-        self.price_history[symbol] = [
-            p for p in self.price_history[symbol]
-            if p['timestamp'] > cutoff
-        ]
+        # O(1): the ring buffer expires points older than 24 hours as it goes
+        self.price_history.append(symbol, price, volume)
+    
+    async def load_history(self, symbol: str, exchange: str = 'luno', timeframe: str = '5m') -> int:
+        """
+        Seed price history from the candle store (last 24 hours of closes)
+        
+        Lets detection run right after a restart instead of waiting for
+        fresh price updates. Runs once per symbol (later calls, e.g. for other
+        exchanges quoting it, return 0); candles only go in front of points
+        already buffered.
+        
+        Returns:
+            Number of points loaded
+        """
+        if symbol in self._seeded:
+            return 0
+        self._seeded.add(symbol)
+        
+        try:
+            from services.candle_store import candle_store
+            
+            since = datetime.now(timezone.utc) - timedelta(hours=24)
+            candles = await candle_store.get_candles(exchange, symbol, timeframe, start=int(since.timestamp() * 1000))
+        except Exception as e:
+            logger.debug(f"No stored candle history for {symbol}: {e}")
+            return 0
+        
+        # Ticks may have arrived while loading: candles go in front of them, in time order
+        return self.price_history.buffer(symbol).backfill(
+            np.asarray(candles.timestamp, dtype=float) / 1000, price=candles.close, volume=candles.volume
+        )
     
     def _extract_features(self, prices: np.ndarray) -> np.ndarray:
         """
@@ -129,20 +194,27 @@ class RegimeDetector:
         
         # Calculate log returns
         log_returns = np.diff(np.log(prices))
-        
-        # Calculate rolling volatility (std of returns)
-        window = min(20, len(log_returns) // 2)
-        volatility = np.array([
-            np.std(log_returns[max(0, i-window):i+1])
-            for i in range(len(log_returns))
-        ])
-        
-        # Calculate momentum (rate of change)
-        momentum = np.array([
-            (prices[i] - prices[max(0, i-window)]) / prices[max(0, i-window)]
-            if prices[max(0, i-window)] != 0 else 0
-            for i in range(1, len(prices))
-        ])
+        n = len(log_returns)
+        
+        # Calculate rolling volatility (std of returns over the trailing window,
+        # shorter at the start) from cumulative sums in O(n)
+        window = min(20, n // 2)
+        idx = np.arange(n)
+        lo = np.maximum(0, idx - window)
+        counts = idx + 1 - lo
+        centered = log_returns - log_returns.mean()  # Same std, less cancellation
+        sums = np.concatenate(([0.0], np.cumsum(centered)))
+        sq_sums = np.concatenate(([0.0], np.cumsum(centered ** 2)))
+        means = (sums[idx + 1] - sums[lo]) / counts
+        variances = (sq_sums[idx + 1] - sq_sums[lo]) / counts - means ** 2
+        volatility = np.sqrt(np.maximum(variances, 0.0))
+        
+        # Calculate momentum (rate of change over the window)
+        base = prices[np.maximum(0, np.arange(1, len(prices)) - window)]
+        momentum = np.divide(
+            prices[1:] - base, base,
+            out=np.zeros(n, dtype=float), where=base != 0
+        )
         
         # Calculate z-score of prices
         price_mean = np.mean(prices[:-1])
@@ -160,62 +232,90 @@ class RegimeDetector:
         
         return features
     
-    def _detect_with_hmm(self, features: np.ndarray) -> Tuple[int, float]:
+    def _needs_refit(self, models: SymbolModels, features: np.ndarray) -> bool:
+        """Refit when never fitted, on schedule, or when recent features drift"""
+        if models.fitted_at == 0.0 or self.clock() - models.fitted_at >= self.refit_interval:
+            return True
+        
+        recent = features[-DRIFT_WINDOW:].mean(axis=0)
+        z = np.abs(recent - models.feature_mean) / models.feature_std
+        return bool(np.max(z) > DRIFT_Z_THRESHOLD)
+    
+    def _refit(self, symbol: str, models: SymbolModels, features: np.ndarray) -> None:
+        """Fit (first time) or warm-start refit the symbol's models"""
+        if self.hmm_model is not None:
+            try:
+                if models.hmm is None:
+                    models.hmm = copy.deepcopy(self.hmm_model)
+                models.hmm.fit(features)
+                # Later fits start from the fitted parameters
+                models.hmm.init_params = ""
+                models.hmm.n_iter = WARM_REFIT_ITERATIONS
+            except Exception as e:
+                logger.error(f"HMM fit error for {symbol}: {e}")
+                models.hmm = None  # Cold start next time
+        
+        if self.gmm_model is not None:
+            try:
+                if models.gmm is None:
+                    models.gmm = copy.deepcopy(self.gmm_model)
+                models.gmm.fit(features)
+            except Exception as e:
+                logger.error(f"GMM fit error for {symbol}: {e}")
+                models.gmm = None
+        
+        models.fitted_at = self.clock()
+        models.feature_mean = features.mean(axis=0)
+        models.feature_std = np.maximum(features.std(axis=0), 1e-12)
+        models.refits += 1
+    
+    def _detect_with_hmm(self, model, features: np.ndarray) -> Tuple[int, float]:
         """
-        Detect regime using Hidden Markov Model
+        Detect regime using a fitted Hidden Markov Model
         
         Args:
+            model: Fitted GaussianHMM (None if unavailable)
             features: Feature matrix
             
         Returns:
             (regime_id, confidence)
         """
-        if self.hmm_model is None or len(features) < 10:
+        if model is None or len(features) < 10:
             return -1, 0.0
         
         try:
-            # Train or update HMM
-            self.hmm_model.fit(features)
-            
-            # Predict current state
-            hidden_states = self.hmm_model.predict(features)
-            current_state = hidden_states[-1]
-            
-            # Calculate confidence from state probabilities
-            state_probs = self.hmm_model.predict_proba(features)
+            # Posterior state probabilities; the last row is the current state
+            state_probs = model.predict_proba(features)
+            current_state = int(np.argmax(state_probs[-1]))
             confidence = state_probs[-1, current_state]
             
-            return int(current_state), float(confidence)
+            return current_state, float(confidence)
             
         except Exception as e:
             logger.error(f"HMM detection error: {e}")
             return -1, 0.0
     
-    def _detect_with_gmm(self, features: np.ndarray) -> Tuple[int, float]:
+    def _detect_with_gmm(self, model, features: np.ndarray) -> Tuple[int, float]:
         """
-        Detect regime using Gaussian Mixture Model
+        Detect regime using a fitted Gaussian Mixture Model
         
         Args:
+            model: Fitted GaussianMixture (None if unavailable)
             features: Feature matrix
             
         Returns:
             (regime_id, confidence)
         """
-        if self.gmm_model is None or len(features) < 10:
+        if model is None or len(features) < 10:
             return -1, 0.0
         
         try:
-            # Train GMM
-            self.gmm_model.fit(features)
-            
-            # Predict current cluster
-            current_cluster = self.gmm_model.predict(features[-1:])
+            # Calculate confidence from posterior probabilities of the latest sample
+            probs = model.predict_proba(features[-1:])
+            current_cluster = int(np.argmax(probs[0]))
+            confidence = probs[0, current_cluster]
             
-            # Calculate confidence from posterior probabilities
-            probs = self.gmm_model.predict_proba(features[-1:])
-            confidence = probs[0, current_cluster[0]]
-            
-            return int(current_cluster[0]), float(confidence)
+            return current_cluster, float(confidence)
             
         except Exception as e:
             logger.error(f"GMM detection error: {e}")
@@ -266,21 +366,24 @@ class RegimeDetector:
         else:
             return MarketRegime.BEARISH_VOLATILE
     
-    async def detect_regime(self, symbol: str) -> Optional[RegimeState]:
+    async def detect_regime(self, symbol: str, exchange: str = 'luno') -> Optional[RegimeState]:
         """
         Detect current market regime for a symbol
         
         Args:
             symbol: Trading pair symbol
+            exchange: Exchange whose stored candles seed a cold symbol
             
         Returns:
             RegimeState with detected regime and confidence
         """
+        await self.load_history(symbol, exchange)
         if symbol not in self.price_history:
             logger.warning(f"No price history for {symbol}")
             return None
         
         history = self.price_history[symbol]
+        history.expire()
         
         if len(history) < 20:
             logger.debug(f"Insufficient data for {symbol}: {len(history)} points")
@@ -294,7 +397,7 @@ class RegimeDetector:
             )
         
         # Extract prices
-        prices = np.array([h['price'] for h in history])
+        prices = history.values('price')
         
         # Extract features
         features = self._extract_features(prices)
@@ -302,11 +405,16 @@ class RegimeDetector:
         if len(features) < 10:
             return None
         
+        # Reuse the symbol's fitted models; refit only on schedule or drift
+        models = self.models.setdefault(symbol, SymbolModels())
+        if self._needs_refit(models, features):
+            self._refit(symbol, models, features)
+        
         # Detect with HMM (primary method)
-        hmm_regime, hmm_confidence = self._detect_with_hmm(features)
+        hmm_regime, hmm_confidence = self._detect_with_hmm(models.hmm, features)
         
         # Detect with GMM (validation method)
-        gmm_regime, gmm_confidence = self._detect_with_gmm(features)
+        gmm_regime, gmm_confidence = self._detect_with_gmm(models.gmm, features)
         
         # Use HMM result if available, otherwise GMM
         regime_id = hmm_regime if hmm_regime >= 0 else gmm_regime
@@ -414,4 +522,4 @@ class RegimeDetector:
 
 
 # Global instance
-regime_detector = RegimeDetector()
+regime_detector = RegimeDetector(history=price_history_store)
@@ -181,7 +181,7 @@ class RiskManagement:
                 "profit_loss": pnl_amount,
                 "profit_loss_pct": pnl_pct,
                 "exit_reason": reason,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
             
             await db.trades_collection.insert_one(trade)
@@ -7,6 +7,7 @@ from datetime import datetime, timezone, timedelta
 import database as db
 from logger_config import logger
 from config import MAX_HOURLY_LOSS_PERCENT, MAX_DRAWDOWN_PERCENT
+from utils.timestamps import timestamp_range
 
 
 class SelfHealingSystem:
@@ -29,7 +30,7 @@ class SelfHealingSystem:
             # Get trades in last hour
             recent_trades = await db.trades_collection.find({
                 "bot_id": bot_id,
-                "timestamp": {"$gte": one_hour_ago}
+                **timestamp_range(one_hour_ago)
             }, {"_id": 0}).to_list(1000)
             
             if not recent_trades:
@@ -168,7 +169,7 @@ class SelfHealingSystem:
             
             # Send WebSocket notification
             try:
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 await manager.send_message(bot['user_id'], {
                     "type": "rogue_bot_detected",
                     "bot_name": bot_name,
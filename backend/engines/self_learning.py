@@ -14,6 +14,7 @@ from statistics import mean, stdev
 
 import database as db
 from engines.ai_model_router import ai_model_router
+from utils.timestamps import parse_timestamp, timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +46,7 @@ class SelfLearningEngine:
             recent_trades = await db.trades_collection.find(
                 {
                     "bot_id": bot_id,
-                    "timestamp": {"$gte": thirty_days_ago}
+                    **timestamp_range(thirty_days_ago)
                 },
                 {"_id": 0}
             ).sort("timestamp", -1).limit(50).to_list(50)
@@ -100,8 +101,8 @@ class SelfLearningEngine:
             patterns = {}
             
             # Time-of-day pattern
-            winning_hours = [datetime.fromisoformat(t['timestamp'].replace('Z', '+00:00')).hour for t in wins]
-            losing_hours = [datetime.fromisoformat(t['timestamp'].replace('Z', '+00:00')).hour for t in losses]
+            winning_hours = [parse_timestamp(t['timestamp']).hour for t in wins]
+            losing_hours = [parse_timestamp(t['timestamp']).hour for t in losses]
             
             if winning_hours:
                 patterns['best_trading_hours'] = max(set(winning_hours), key=winning_hours.count)
@@ -30,6 +30,7 @@ from typing import Dict, List, Optional, Tuple
 import database as db
 from exchange_limits import EXCHANGE_LIMITS, get_exchange_limits
 import logging
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -126,7 +127,7 @@ class TradeBudgetManager:
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
         trades_today = await db.trades_collection.count_documents({
             "bot_id": bot_id,
-            "timestamp": {"$gte": today_start.isoformat()}
+            **timestamp_range(today_start)
         })
         
         remaining = max(0, daily_budget - trades_today)
@@ -185,7 +186,7 @@ class TradeBudgetManager:
         
         recent_trades = await db.trades_collection.count_documents({
             "exchange": exchange,
-            "timestamp": {"$gte": ten_seconds_ago.isoformat()}
+            **timestamp_range(ten_seconds_ago)
         })
         
         limits = get_exchange_limits(exchange)
@@ -254,7 +255,7 @@ class TradeBudgetManager:
             today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
             trades_today = await db.trades_collection.count_documents({
                 "exchange": exchange,
-                "timestamp": {"$gte": today_start.isoformat()}
+                **timestamp_range(today_start)
             })
             
             remaining = max(0, total_budget - trades_today)
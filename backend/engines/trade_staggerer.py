@@ -3,66 +3,147 @@ Trade Staggerer - 24/7 Staggered Trade Execution
 - Spreads trades across the day to avoid rate limits
 - Manages concurrent execution across exchanges
 - Prevents API overload with intelligent queuing
+
+Queue layout (per exchange):
+- pending heap keyed by earliest-eligible time (bot cooldown end)
+- ready heap keyed by (-priority, arrival) for requests whose time has come
+- a bot_id index dedups requests; re-queueing a bot only raises its priority
+Dequeueing is O(log n) instead of a scan of the whole queue.
 """
 
 import asyncio
-from typing import Dict, List
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timezone, timedelta
-from collections import deque
 import logging
 
 import database as db
+from exchange_limits import EXCHANGE_LIMITS
 
 logger = logging.getLogger(__name__)
 
+# Requests that are still not executable after this long are dropped
+STALE_REQUEST_SECONDS = 30 * 60
+
+
+class _QueuedTrade:
+    __slots__ = ("request", "bot_id", "exchange", "priority", "seq", "enqueued_at", "eligible_at", "removed")
+
+    def __init__(self, request: Dict, seq: int, enqueued_at: float, eligible_at: float):
+        self.request = request
+        self.bot_id = request['bot_id']
+        self.exchange = request['exchange']
+        self.priority = request['priority']
+        self.seq = seq
+        self.enqueued_at = enqueued_at
+        self.eligible_at = eligible_at
+        self.removed = False
+
+
 class TradeStaggerer:
     def __init__(self):
         # Queue management
-        self.trade_queue = deque()
+        self._pending: Dict[str, List[Tuple[float, int, _QueuedTrade]]] = {}  # exchange -> (eligible_at, seq, entry)
+        self._ready: Dict[str, List[Tuple[int, int, _QueuedTrade]]] = {}      # exchange -> (-priority, seq, entry)
+        self._queued: Dict[str, _QueuedTrade] = {}                            # bot_id -> live entry
+        self._depth: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self.queue_stats = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "reprioritized": 0,
+            "dequeued": 0,
+            "dropped_stale": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0
+        }
         self.active_trades = {}  # {bot_id: timestamp}
         
-        # Rate limiting per exchange
+        # Scheduling pace per exchange (order quotas are enforced by rate_limiter)
         self.exchange_limits = {
-            'luno': {'max_concurrent': 2, 'min_delay': 10},      # 2 concurrent, 10s between
-            'binance': {'max_concurrent': 5, 'min_delay': 2},    # 5 concurrent, 2s between
-            'kucoin': {'max_concurrent': 3, 'min_delay': 3},     # 3 concurrent, 3s between
-            'ovex': {'max_concurrent': 3, 'min_delay': 5},       # 3 concurrent, 5s between
-            'valr': {'max_concurrent': 2, 'min_delay': 8}        # 2 concurrent, 8s between
+            exchange: {'max_concurrent': limits['max_concurrent'], 'min_delay': limits['min_trade_delay']}
+            for exchange, limits in EXCHANGE_LIMITS.items()
         }
         
         self.last_trade_per_exchange = {}
         self.concurrent_trades_per_exchange = {}
+        self.next_start_per_exchange: Dict[str, List[float]] = {}  # exchange -> monotonic next start per concurrency slot
         
         # Initialize counters
         for exchange in self.exchange_limits.keys():
             self.last_trade_per_exchange[exchange] = None
             self.concurrent_trades_per_exchange[exchange] = 0
     
+    def get_exchange_limits(self, exchange: str) -> Dict:
+        """Get rate limits for an exchange (binance limits as fallback)"""
+        return self.exchange_limits.get((exchange or '').lower(), self.exchange_limits['binance'])
+
+    def get_tick_capacity(self, exchange: str, window_seconds: float) -> int:
+        """Max trades an exchange can start within a window without breaking min_delay per slot"""
+        limits = self.get_exchange_limits(exchange)
+        slots_per_window = max(1, math.ceil(window_seconds / max(limits['min_delay'], 1)))
+        return limits['max_concurrent'] * slots_per_window
+
+    def reserve_start(self, exchange: str) -> float:
+        """Claim the exchange's earliest start slot; returns seconds to wait before starting
+
+        Each of the exchange's max_concurrent slots starts at most one trade per
+        min_delay, the pace get_tick_capacity budgets for.
+        """
+        limits = self.get_exchange_limits(exchange)
+        slots = self.next_start_per_exchange.setdefault((exchange or '').lower(), [0.0] * limits['max_concurrent'])
+        now = time.monotonic()
+        i = min(range(len(slots)), key=slots.__getitem__)
+        start = max(now, slots[i])
+        slots[i] = start + limits['min_delay']
+        return start - now
+
+    def get_bot_cooldown(self, bot_id: str) -> int:
+        """Seconds remaining before a bot may trade again (0 = ready)"""
+        if bot_id in self.active_trades:
+            elapsed = (datetime.now(timezone.utc) - self.active_trades[bot_id]).seconds
+            if elapsed < 60:  # Wait at least 1 minute between bot trades
+                return 60 - elapsed
+        return 0
+
+    def get_queued_bot_ids(self) -> Set[str]:
+        """Bot IDs that currently have a queued trade request"""
+        return set(self._queued)
+
+    def is_queued(self, bot_id: str) -> bool:
+        return bot_id in self._queued
+
+    def get_exchange_wait(self, exchange: str) -> Tuple[bool, str]:
+        """Check the exchange-level limits (max_concurrent and min_delay)"""
+        limits = self.get_exchange_limits(exchange)
+
+        # Check concurrent limit
+        concurrent = self.concurrent_trades_per_exchange.get(exchange, 0)
+        if concurrent >= limits['max_concurrent']:
+            return False, f"Exchange concurrent limit reached ({concurrent}/{limits['max_concurrent']})"
+
+        # Check minimum delay between trades on this exchange
+        last_trade = self.last_trade_per_exchange.get(exchange)
+        if last_trade:
+            elapsed = (datetime.now(timezone.utc) - last_trade).seconds
+            if elapsed < limits['min_delay']:
+                return False, f"Exchange rate limit ({limits['min_delay'] - elapsed}s remaining)"
+
+        return True, "OK"
+
     async def can_execute_now(self, bot_id: str, exchange: str) -> tuple[bool, str]:
         """Check if a bot can execute a trade now"""
         try:
             # Check if bot already has an active trade
-            if bot_id in self.active_trades:
-                elapsed = (datetime.now(timezone.utc) - self.active_trades[bot_id]).seconds
-                if elapsed < 60:  # Wait at least 1 minute between bot trades
-                    return False, f"Bot cooldown active ({60 - elapsed}s remaining)"
-            
+            cooldown = self.get_bot_cooldown(bot_id)
+            if cooldown:
+                return False, f"Bot cooldown active ({cooldown}s remaining)"
+
             # Check exchange rate limits
-            limits = self.exchange_limits.get(exchange.lower(), self.exchange_limits['binance'])
-            
-            # Check concurrent limit
-            concurrent = self.concurrent_trades_per_exchange.get(exchange, 0)
-            if concurrent >= limits['max_concurrent']:
-                return False, f"Exchange concurrent limit reached ({concurrent}/{limits['max_concurrent']})"
-            
-            # Check minimum delay between trades on this exchange
-            last_trade = self.last_trade_per_exchange.get(exchange)
-            if last_trade:
-                elapsed = (datetime.now(timezone.utc) - last_trade).seconds
-                if elapsed < limits['min_delay']:
-                    return False, f"Exchange rate limit ({limits['min_delay'] - elapsed}s remaining)"
-            
-            return True, "OK"
+            return self.get_exchange_wait(exchange)
             
         except Exception as e:
             logger.error(f"Can execute check error: {e}")
@@ -98,59 +179,172 @@ class TradeStaggerer:
             logger.error(f"Register trade complete error: {e}")
     
     async def add_to_queue(self, bot_id: str, exchange: str, priority: int = 0):
-        """Add a trade request to the queue"""
+        """Add a trade request to the queue (one request per bot; re-adding can only raise priority)"""
         try:
-            trade_request = {
-                "bot_id": bot_id,
-                "exchange": exchange,
-                "priority": priority,
-                "queued_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            # Higher priority goes first
-            if priority > 0:
-                self.trade_queue.appendleft(trade_request)
+            existing = self._queued.get(bot_id)
+            if existing is not None:
+                if priority <= existing.priority:
+                    self.queue_stats["deduplicated"] += 1
+                    return
+                # Replace with a higher-priority entry, keeping the original wait time
+                existing.removed = True
+                self._depth[existing.exchange.lower()] -= 1
+                self.queue_stats["reprioritized"] += 1
+                request = {**existing.request, "priority": priority}
+                enqueued_at = existing.enqueued_at
             else:
-                self.trade_queue.append(trade_request)
+                request = {
+                    "bot_id": bot_id,
+                    "exchange": exchange,
+                    "priority": priority,
+                    "queued_at": datetime.now(timezone.utc).isoformat()
+                }
+                enqueued_at = time.monotonic()
+                self.queue_stats["enqueued"] += 1
+
+            entry = _QueuedTrade(
+                request,
+                next(self._seq),
+                enqueued_at,
+                eligible_at=time.monotonic() + self.get_bot_cooldown(bot_id)
+            )
+            key = exchange.lower()
+            self._queued[bot_id] = entry
+            self._depth[key] = self._depth.get(key, 0) + 1
+            heapq.heappush(self._pending.setdefault(key, []), (entry.eligible_at, entry.seq, entry))
+            self._publish_depth(key)
             
-            logger.info(f"📥 Queued trade: {bot_id[:8]} on {exchange} (queue size: {len(self.trade_queue)})")
+            logger.info(f"📥 Queued trade: {bot_id[:8]} on {exchange} (queue size: {len(self._queued)})")
             
         except Exception as e:
             logger.error(f"Add to queue error: {e}")
+
+    def _peek_ready(self, key: str, now: float) -> Optional[_QueuedTrade]:
+        """Best ready entry for an exchange, after promoting pending entries whose time has come"""
+        pending = self._pending.get(key)
+        ready = self._ready.setdefault(key, [])
+        while pending and pending[0][0] <= now:
+            _, seq, entry = heapq.heappop(pending)
+            if not entry.removed:
+                heapq.heappush(ready, (-entry.priority, seq, entry))
+        while ready and ready[0][2].removed:
+            heapq.heappop(ready)
+        return ready[0][2] if ready else None
+
+    def _take(self, key: str, entry: _QueuedTrade, now: float) -> bool:
+        """Pop a ready entry; re-key it by its cooldown (or drop it) if the bot is not ready after all"""
+        heapq.heappop(self._ready[key])
+        cooldown = self.get_bot_cooldown(entry.bot_id)
+        if cooldown:
+            if now - entry.enqueued_at < STALE_REQUEST_SECONDS:
+                entry.eligible_at = now + cooldown
+                heapq.heappush(self._pending[key], (entry.eligible_at, entry.seq, entry))
+            else:
+                self._remove(key, entry)
+                self.queue_stats["dropped_stale"] += 1
+                logger.warning(f"⏰ Dropped stale trade request: {entry.bot_id[:8]} (age: {(now - entry.enqueued_at) / 60:.1f}m)")
+            return False
+
+        self._remove(key, entry)
+        wait = now - entry.enqueued_at
+        self.queue_stats["dequeued"] += 1
+        self.queue_stats["total_wait_seconds"] += wait
+        self.queue_stats["max_wait_seconds"] = max(self.queue_stats["max_wait_seconds"], wait)
+        self._publish_wait(key, wait)
+        return True
+
+    def _remove(self, key: str, entry: _QueuedTrade):
+        entry.removed = True
+        if self._queued.get(entry.bot_id) is entry:
+            del self._queued[entry.bot_id]
+        self._depth[key] -= 1
+        self._publish_depth(key)
+
+    def _next_ready(self, now: float, exchange_open) -> Optional[Tuple[str, _QueuedTrade]]:
+        """Highest-priority ready entry across the exchanges for which exchange_open(key, entry) holds"""
+        best = None
+        for key in self._pending:
+            entry = self._peek_ready(key, now)
+            if entry is None or not exchange_open(key, entry):
+                continue
+            if best is None or (-entry.priority, entry.seq) < (-best[1].priority, best[1].seq):
+                best = (key, entry)
+        return best
     
     async def get_next_trade(self) -> Dict | None:
         """Get next trade from queue that can execute now"""
         try:
-            if not self.trade_queue:
-                return None
-            
-            # Try each item in queue until we find one that can execute
-            for _ in range(len(self.trade_queue)):
-                trade_request = self.trade_queue.popleft()
-                
-                bot_id = trade_request['bot_id']
-                exchange = trade_request['exchange']
-                
-                can_execute, reason = await self.can_execute_now(bot_id, exchange)
-                
-                if can_execute:
-                    return trade_request
-                else:
-                    # Put back in queue if still relevant
-                    queued_time = datetime.fromisoformat(trade_request['queued_at'].replace('Z', '+00:00'))
-                    age_minutes = (datetime.now(timezone.utc) - queued_time).seconds / 60
-                    
-                    if age_minutes < 30:  # Only re-queue if less than 30 minutes old
-                        self.trade_queue.append(trade_request)
-                    else:
-                        logger.warning(f"⏰ Dropped stale trade request: {bot_id[:8]} (age: {age_minutes:.1f}m)")
-            
-            return None
-            
+            now = time.monotonic()
+            while True:
+                best = self._next_ready(now, lambda key, entry: self.get_exchange_wait(entry.exchange)[0])
+                if best is None:
+                    return None
+                key, entry = best
+                if self._take(key, entry, now):
+                    return entry.request
+
         except Exception as e:
             logger.error(f"Get next trade error: {e}")
             return None
-    
+
+    async def get_ready_trades(self, max_trades: int, window_seconds: float) -> List[Dict]:
+        """
+        Dequeue up to max_trades requests for a pooled tick.
+
+        Only bot-level readiness is checked here; exchange concurrency is enforced
+        by the caller's per-exchange worker pool. Each exchange is capped at the
+        number of trades its limits allow within window_seconds.
+        """
+        ready = []
+        try:
+            now = time.monotonic()
+            per_exchange = {}
+
+            def has_capacity(key, entry):
+                return per_exchange.get(key, 0) < self.get_tick_capacity(key, window_seconds)
+
+            while len(ready) < max_trades:
+                best = self._next_ready(now, has_capacity)
+                if best is None:
+                    break
+                key, entry = best
+                if self._take(key, entry, now):
+                    per_exchange[key] = per_exchange.get(key, 0) + 1
+                    ready.append(entry.request)
+
+            return ready
+
+        except Exception as e:
+            logger.error(f"Get ready trades error: {e}")
+            return ready
+
+    def get_queue_metrics(self) -> Dict:
+        """Queue depth and wait-time metrics"""
+        now = time.monotonic()
+        dequeued = self.queue_stats["dequeued"]
+        oldest = min((e.enqueued_at for e in self._queued.values()), default=None)
+        return {
+            "depth": len(self._queued),
+            "depth_by_exchange": {k: d for k, d in self._depth.items() if d},
+            "oldest_wait_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            "avg_wait_seconds": round(self.queue_stats["total_wait_seconds"] / dequeued, 3) if dequeued else 0.0,
+            **self.queue_stats
+        }
+
+    def _publish_depth(self, key: str):
+        try:
+            from engines.prometheus_metrics import prometheus_metrics
+            prometheus_metrics.update_trade_queue_depth(key, self._depth.get(key, 0))
+        except Exception as e:
+            logger.debug(f"Queue depth metric unavailable: {e}")
+
+    def _publish_wait(self, key: str, wait: float):
+        try:
+            from engines.prometheus_metrics import prometheus_metrics
+            prometheus_metrics.record_trade_queue_wait(key, wait)
+        except Exception as e:
+            logger.debug(f"Queue wait metric unavailable: {e}")
+
     async def calculate_daily_schedule(self, user_id: str) -> Dict:
         """Calculate staggered schedule for all active bots"""
         try:
@@ -200,17 +394,22 @@ class TradeStaggerer:
     async def get_queue_status(self) -> Dict:
         """Get current queue and execution status"""
         try:
+            next_up = heapq.nsmallest(
+                10, self._queued.values(), key=lambda e: (e.eligible_at, -e.priority, e.seq)
+            )
             return {
-                "queue_size": len(self.trade_queue),
+                "queue_size": len(self._queued),
                 "active_trades": len(self.active_trades),
                 "concurrent_by_exchange": dict(self.concurrent_trades_per_exchange),
+                "queue_metrics": self.get_queue_metrics(),
                 "queue_items": [
                     {
-                        "bot_id": item['bot_id'][:8],
-                        "exchange": item['exchange'],
-                        "queued_at": item['queued_at']
+                        "bot_id": entry.bot_id[:8],
+                        "exchange": entry.exchange,
+                        "priority": entry.priority,
+                        "queued_at": entry.request['queued_at']
                     }
-                    for item in list(self.trade_queue)[:10]  # Show first 10
+                    for entry in next_up  # Show next 10
                 ]
             }
             
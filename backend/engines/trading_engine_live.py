@@ -13,6 +13,9 @@ import logging
 import database as db
 from ccxt_service import CCXTService
 from engines.risk_management import risk_management
+from services.exposure_book import exposure_book
+from rate_limiter import rate_limiter
+from services.pnl_rollups import get_pnl_rollups
 from utils.trading_gates import enforce_live_trading_gates, TradingGateError
 from config import *
 
@@ -83,9 +86,19 @@ class LiveTradingEngine:
             logger.error(f"Failed to fetch price for {symbol}: {e}")
             return None
     
+    async def _acquire(self, exchange: ccxt.Exchange, endpoint: str, bot_id: Optional[str] = None) -> bool:
+        """Wait for shared exchange (and, for orders, per-bot) rate-limit capacity for one call"""
+        allowed, reason = await rate_limiter.acquire(getattr(exchange, 'id', ''), endpoint, bot_id=bot_id)
+        if not allowed:
+            logger.error(f"⏳ Rate limit: {reason}")
+        return allowed
+    
     async def place_limit_order(self, exchange: ccxt.Exchange, symbol: str, 
-                               side: str, amount: float, price: float) -> Optional[Dict]:
+                               side: str, amount: float, price: float,
+                               bot_id: Optional[str] = None) -> Optional[Dict]:
         """Place real limit order"""
+        if not await self._acquire(exchange, "create_order", bot_id):
+            return None
         try:
             order = await asyncio.to_thread(
                 exchange.create_limit_order,
@@ -110,8 +123,11 @@ class LiveTradingEngine:
             return None
     
     async def place_market_order(self, exchange: ccxt.Exchange, symbol: str, 
-                                 side: str, amount: float) -> Optional[Dict]:
+                                 side: str, amount: float,
+                                 bot_id: Optional[str] = None) -> Optional[Dict]:
         """Place real market order"""
+        if not await self._acquire(exchange, "create_order", bot_id):
+            return None
         try:
             order = await asyncio.to_thread(
                 exchange.create_market_order,
@@ -138,6 +154,8 @@ class LiveTradingEngine:
     async def check_order_status(self, exchange: ccxt.Exchange, order_id: str, 
                                  symbol: str) -> Optional[Dict]:
         """Check status of an order"""
+        if not await self._acquire(exchange, "fetch_order"):
+            return None
         try:
             order = await asyncio.to_thread(
                 exchange.fetch_order,
@@ -151,6 +169,8 @@ class LiveTradingEngine:
     async def cancel_order(self, exchange: ccxt.Exchange, order_id: str, 
                           symbol: str) -> bool:
         """Cancel an open order"""
+        if not await self._acquire(exchange, "cancel_order"):
+            return False
         try:
             await asyncio.to_thread(exchange.cancel_order, order_id, symbol)
             logger.info(f"✅ Order {order_id} cancelled")
@@ -255,10 +275,10 @@ class LiveTradingEngine:
                 # Place order
                 if price:
                     # Limit order
-                    order = await self.place_limit_order(exchange, normalized_symbol, side, amount, price)
+                    order = await self.place_limit_order(exchange, normalized_symbol, side, amount, price, bot_id=bot_id)
                 else:
                     # Market order
-                    order = await self.place_market_order(exchange, normalized_symbol, side, amount)
+                    order = await self.place_market_order(exchange, normalized_symbol, side, amount, bot_id=bot_id)
                 
                 if not order:
                     return {
@@ -401,6 +421,10 @@ class LiveTradingEngine:
                     "closed_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            try:
+                await get_pnl_rollups().record_trade({**trade, "status": "closed", "profit_loss": pnl, "exit_price": exit_price})
+            except Exception as e:
+                logger.warning(f"PnL rollup update failed for trade {trade['id']}: {e}")
             
             # Update bot capital
             new_capital = bot['current_capital'] + pnl
@@ -409,6 +433,11 @@ class LiveTradingEngine:
                 {"$set": {"current_capital": new_capital}}
             )
             
+            # Keep the risk engine's exposure book current
+            exposure_book.close_trade(bot['user_id'], trade['id'])
+            exposure_book.set_bot_capital(bot['user_id'], bot['id'], new_capital)
+            exposure_book.record_pnl(bot['user_id'], pnl, trade['id'])
+            
             # Create alert
             await db.alerts_collection.insert_one({
                 "user_id": bot['user_id'],
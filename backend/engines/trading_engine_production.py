@@ -84,7 +84,7 @@ class TradingEngineProduction:
                 "profit_loss": net_profit,
                 "fees": fees,
                 "trading_mode": bot.get('trading_mode', 'paper'),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "status": "completed"
             }
             
@@ -109,7 +109,7 @@ class TradingEngineProduction:
             
             # Send WebSocket notifications
             try:
-                from websocket_manager import manager
+                from websocket_manager_redis import manager
                 from realtime_events import rt_events
                 
                 # Trade executed notification
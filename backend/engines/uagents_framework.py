@@ -267,10 +267,9 @@ class AlphaFusionAgent:
             try:
                 # Example: fuse signals for main symbols
                 symbols = ["BTC/USDT", "ETH/USDT"]
+                matrix = await alpha_fusion.fuse_portfolio(symbols)
                 
-                for symbol in symbols:
-                    fused_signal = await alpha_fusion.fuse_signals(symbol)
-                    
+                for symbol, fused_signal in matrix.signals.items():
                     if fused_signal:
                         ctx.logger.info(
                             f"Fused signal: {symbol} -> {fused_signal.signal.value} "
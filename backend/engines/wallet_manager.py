@@ -22,6 +22,7 @@ import database as db
 from ccxt_service import CCXTService
 from utils.env_utils import env_bool
 from services.ledger_service import get_ledger_service
+from services.market_data_service import market_data_service
 from routes.api_key_management import get_decrypted_key
 
 logger = logging.getLogger(__name__)
@@ -93,7 +94,9 @@ class WalletManager:
         """Get BTC/ZAR price - uses XBTZAR for Luno"""
         try:
             # Luno uses XBTZAR, not BTC/ZAR
-            ticker = await asyncio.to_thread(exchange.fetch_ticker, 'XBT/ZAR')
+            ticker = await market_data_service.get_ticker(
+                'luno', 'XBT/ZAR', lambda: asyncio.to_thread(exchange.fetch_ticker, 'XBT/ZAR')
+            )
             return ticker.get('last', 0)
         except:
             return None
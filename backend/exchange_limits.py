@@ -35,6 +35,9 @@ EXCHANGE_LIMITS = {
         "max_orders_per_minute": 60,
         "max_orders_per_10_seconds": 10,
         "max_orders_per_bot_per_day": 50,
+        "max_request_weight_per_minute": 300,  # 300 API calls/min
+        "max_concurrent": 2,  # Trade staggering: concurrent trades
+        "min_trade_delay": 10,  # Trade staggering: seconds between trade starts
         "fee_maker": 0.002,  # 0.2%
         "fee_taker": 0.0025,  # 0.25%
     },
@@ -44,6 +47,9 @@ EXCHANGE_LIMITS = {
         "max_orders_per_minute": 60,
         "max_orders_per_10_seconds": 10,
         "max_orders_per_bot_per_day": 50,
+        "max_request_weight_per_minute": 6000,  # REQUEST_WEIGHT limit
+        "max_concurrent": 5,
+        "min_trade_delay": 2,
         "fee_maker": 0.001,  # 0.1%
         "fee_taker": 0.001,  # 0.1%
     },
@@ -53,6 +59,9 @@ EXCHANGE_LIMITS = {
         "max_orders_per_minute": 60,
         "max_orders_per_10_seconds": 10,
         "max_orders_per_bot_per_day": 50,
+        "max_request_weight_per_minute": 1000,  # Conservative: public+private pools
+        "max_concurrent": 3,
+        "min_trade_delay": 3,
         "fee_maker": 0.001,  # 0.1%
         "fee_taker": 0.001,  # 0.1%
     },
@@ -62,6 +71,9 @@ EXCHANGE_LIMITS = {
         "max_orders_per_minute": 60,
         "max_orders_per_10_seconds": 10,
         "max_orders_per_bot_per_day": 50,
+        "max_request_weight_per_minute": 600,  # Conservative
+        "max_concurrent": 3,
+        "min_trade_delay": 5,
         "fee_maker": 0.001,  # 0.1%
         "fee_taker": 0.0015,  # 0.15%
     },
@@ -71,11 +83,29 @@ EXCHANGE_LIMITS = {
         "max_orders_per_minute": 60,
         "max_orders_per_10_seconds": 10,
         "max_orders_per_bot_per_day": 50,
+        "max_request_weight_per_minute": 600,  # Conservative
+        "max_concurrent": 2,
+        "min_trade_delay": 8,
         "fee_maker": 0.0007,  # 0.07%
         "fee_taker": 0.00075,  # 0.075%
     },
 }
 
+# Request weight per ccxt endpoint, counted against max_request_weight_per_minute
+# (Binance publishes weights; exchanges that count plain calls use 1 throughout)
+ENDPOINT_WEIGHTS = {
+    "binance": {
+        "create_order": 1,
+        "cancel_order": 1,
+        "fetch_order": 4,
+        "fetch_ticker": 2,
+        "fetch_order_book": 5,  # Depth up to 100 levels
+        "fetch_ohlcv": 2,
+        "fetch_balance": 20,
+    },
+}
+DEFAULT_ENDPOINT_WEIGHT = 1
+
 def get_exchange_limits(exchange: str) -> dict:
     """Get limits for an exchange"""
     return EXCHANGE_LIMITS.get(exchange.lower(), EXCHANGE_LIMITS["luno"])
@@ -84,3 +114,7 @@ def get_fee_rate(exchange: str, order_type: str = "taker") -> float:
     """Get fee rate for exchange"""
     limits = get_exchange_limits(exchange)
     return limits.get(f"fee_{order_type}", 0.0025)
+
+def get_endpoint_weight(exchange: str, endpoint: str) -> int:
+    """Request weight of one call to a ccxt endpoint on an exchange"""
+    return ENDPOINT_WEIGHTS.get(exchange.lower(), {}).get(endpoint, DEFAULT_ENDPOINT_WEIGHT)
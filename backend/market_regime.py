@@ -2,46 +2,54 @@
 Market Regime Detection
 - Detects trending up/down, sideways, high/low volatility
 - Adjusts bot parameters based on market conditions
+- Price history is a shared 24h ring buffer with streaming mean/variance,
+  so detection is O(1) per call instead of rescanning the day's ticks
 """
 
 import asyncio
 from datetime import datetime, timezone, timedelta
 import database as db
 from logger_config import logger
-import math
+import time
+from typing import Optional
+
+from services.price_history import PriceHistoryStore, price_history_store
+
+# Skip recording a tick when the shared buffer got one this recently
+# (the market stream already samples into it)
+MIN_SAMPLE_SPACING_SECONDS = 1.0
 
 
 class MarketRegimeDetector:
-    def __init__(self):
-        self.price_history = {}  # Store recent prices
+    def __init__(self, history: Optional[PriceHistoryStore] = None):
+        self.price_history = history if history is not None else PriceHistoryStore()
         self.current_regime = {}
     
     async def detect_regime(self, pair: str, exchange: str = 'luno') -> dict:
         """Detect current market regime for a trading pair"""
         try:
-            from paper_trading_engine import paper_engine
-            
-            # Get current price
-            current_price = await paper_engine.get_real_price(pair, exchange)
-            
-            # Store in history
-            if pair not in self.price_history:
-                self.price_history[pair] = []
-            
-            self.price_history[pair].append({
-                'price': current_price,
-                'timestamp': datetime.now(timezone.utc)
-            })
-            
-            # Keep only last 24 hours
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-            self.price_history[pair] = [
-                p for p in self.price_history[pair]
-                if p['timestamp'] > cutoff_time
-            ]
+            from services.market_data_service import market_data_service
+            
+            # Get current price - reuse the snapshot the paper engine just cached for this trade
+            current_price = market_data_service.peek_price(exchange, pair)
+            if current_price is None:
+                from paper_trading_engine import paper_engine
+                current_price = await paper_engine.get_real_price(pair, exchange)
+            
+            # Store in history (seeded from stored candles after a restart)
+            history = self.price_history.get(pair)
+            if not history:
+                history = await self._load_history(pair, exchange)
+            
+            # Appending expires points older than 24 hours
+            now = time.time()
+            if history.last_timestamp is None or now - history.last_timestamp >= MIN_SAMPLE_SPACING_SECONDS:
+                history.append(now, price=current_price)
+            else:
+                history.expire(now)
             
             # Need at least 10 data points
-            if len(self.price_history[pair]) < 10:
+            if len(history) < 10:
                 return {
                     "regime": "unknown",
                     "trend": "neutral",
@@ -49,12 +57,8 @@ class MarketRegimeDetector:
                     "confidence": 0
                 }
             
-            prices = [p['price'] for p in self.price_history[pair]]
-            
             # Calculate trend
-            first_price = prices[0]
-            last_price = prices[-1]
-            trend_pct = ((last_price - first_price) / first_price) * 100
+            trend_pct = history.trend_pct()
             
             # Determine trend
             if trend_pct > 2:
@@ -64,11 +68,8 @@ class MarketRegimeDetector:
             else:
                 trend = "sideways"
             
-            # Calculate volatility (standard deviation)
-            mean_price = sum(prices) / len(prices)
-            variance = sum((p - mean_price) ** 2 for p in prices) / len(prices)
-            std_dev = math.sqrt(variance)
-            volatility_pct = (std_dev / mean_price) * 100
+            # Calculate volatility (standard deviation, maintained online)
+            volatility_pct = (history.std / history.mean) * 100
             
             if volatility_pct > 5:
                 volatility = "high"
@@ -97,7 +98,7 @@ class MarketRegimeDetector:
                 "volatility": volatility,
                 "trend_pct": round(trend_pct, 2),
                 "volatility_pct": round(volatility_pct, 2),
-                "confidence": min(len(prices) / 50, 1.0),  # More data = higher confidence
+                "confidence": min(len(history) / 50, 1.0),  # More data = higher confidence
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
@@ -115,6 +116,19 @@ class MarketRegimeDetector:
                 "confidence": 0
             }
     
+    async def _load_history(self, pair: str, exchange: str):
+        """Seed the pair's buffer with the last 24 hours of stored 5m closes, so detection does not start cold"""
+        history = self.price_history.buffer(pair)
+        try:
+            from services.candle_store import candle_store
+            
+            since = datetime.now(timezone.utc) - timedelta(hours=24)
+            candles = await candle_store.get_candles(exchange, pair, '5m', start=int(since.timestamp() * 1000))
+            history.backfill([ts / 1000 for ts in candles.timestamp], price=candles.close)
+        except Exception as e:
+            logger.debug(f"No stored candle history for {pair}: {e}")
+        return history
+    
     async def adjust_bot_for_regime(self, bot: dict, regime: dict):
         """Adjust bot parameters based on market regime"""
         try:
@@ -173,4 +187,4 @@ class MarketRegimeDetector:
 
 
 # Global instance
-market_regime_detector = MarketRegimeDetector()
+market_regime_detector = MarketRegimeDetector(history=price_history_store)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Migration Script - Convert Trade Timestamps to BSON Datetimes
+Rewrites ISO-string `timestamp` fields on trades and fills_ledger as native
+datetimes and creates the compound (user_id/bot_id, timestamp) indexes.
+Safe, idempotent and resumable: only string timestamps are touched, and each
+update is conditional on the original value.
+
+Once verification reports zero string timestamps, set TIMESTAMP_DUAL_READ=false.
+"""
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+# Add parent directory to path (migrations -> backend)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database as db
+from logger_config import logger
+from utils.timestamps import parse_timestamp
+
+BATCH_SIZE = 1000
+
+# Compound indexes backing the dashboard range queries
+INDEXES = {
+    "trades": [
+        [("user_id", 1), ("timestamp", -1)],
+        [("bot_id", 1), ("timestamp", -1)],
+        [("user_id", 1), ("status", 1), ("timestamp", -1)],
+    ],
+    "fills_ledger": [
+        [("user_id", 1), ("timestamp", -1)],
+        [("bot_id", 1), ("timestamp", -1)],
+    ],
+}
+
+
+async def convert_collection(collection, field: str = "timestamp", batch_size: int = BATCH_SIZE) -> dict:
+    """Convert string timestamps in one collection; returns converted/skipped counts"""
+    converted = 0
+    skipped = 0
+    batch = []
+
+    cursor = collection.find({field: {"$type": "string"}}, {"_id": 1, field: 1})
+    async for doc in cursor:
+        value = doc.get(field)
+        parsed = parse_timestamp(value)
+        if parsed is None:
+            skipped += 1
+            continue
+
+        # Stored as naive UTC, like every other BSON datetime Motor writes
+        batch.append(UpdateOne(
+            {"_id": doc["_id"], field: value},
+            {"$set": {field: parsed.replace(tzinfo=None)}}
+        ))
+        if len(batch) >= batch_size:
+            result = await collection.bulk_write(batch, ordered=False)
+            converted += result.modified_count
+            batch = []
+
+    if batch:
+        result = await collection.bulk_write(batch, ordered=False)
+        converted += result.modified_count
+
+    return {"converted": converted, "skipped": skipped}
+
+
+async def migrate_collection(name: str) -> bool:
+    """Convert one collection's timestamps and ensure its indexes"""
+    print("\n" + "="*60)
+    print(f"MIGRATING {name.upper()} TIMESTAMPS")
+    print("="*60)
+
+    try:
+        collection = db.get_database()[name]
+        counts = await convert_collection(collection)
+        print(f"  ✓ Converted {counts['converted']} timestamps")
+        if counts["skipped"]:
+            print(f"  ⚠️  Skipped {counts['skipped']} unparseable timestamps")
+
+        for keys in INDEXES.get(name, []):
+            await collection.create_index(keys)
+        print(f"  ✓ Ensured {len(INDEXES.get(name, []))} compound indexes")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error migrating {name}: {e}")
+        logger.error(f"Timestamp migration error ({name}): {e}")
+        return False
+
+
+async def verify_migration() -> bool:
+    """Verify that no string timestamps remain"""
+    print("\n" + "="*60)
+    print("VERIFYING MIGRATION")
+    print("="*60)
+
+    try:
+        remaining = 0
+        for name in INDEXES:
+            count = await db.get_database()[name].count_documents({"timestamp": {"$type": "string"}})
+            print(f"{name} with string timestamps: {count}")
+            remaining += count
+
+        if remaining == 0:
+            print("\n✅ Migration verification PASSED - TIMESTAMP_DUAL_READ can be disabled")
+            return True
+        else:
+            print("\n⚠️  String timestamps remain - keep TIMESTAMP_DUAL_READ enabled")
+            return False
+
+    except Exception as e:
+        print(f"\n❌ Error verifying migration: {e}")
+        logger.error(f"Verification error: {e}")
+        return False
+
+
+async def main():
+    """Main migration entry point"""
+    print("\n" + "="*60)
+    print("TRADE TIMESTAMP MIGRATION SCRIPT")
+    print("="*60)
+    print(f"Started at: {datetime.now(timezone.utc).isoformat()}")
+
+    try:
+        # Connect to database
+        print("\nConnecting to database...")
+        await db.connect()
+        print("✅ Database connected")
+
+        # Run migrations
+        results = [await migrate_collection(name) for name in INDEXES]
+
+        # Verify
+        if all(results) and await verify_migration():
+            print("\n" + "="*60)
+            print("✅ MIGRATION COMPLETED SUCCESSFULLY")
+            print("="*60)
+            return True
+
+        print("\n" + "="*60)
+        print("⚠️  MIGRATION COMPLETED WITH WARNINGS")
+        print("="*60)
+        return False
+
+    except Exception as e:
+        print(f"\n❌ Migration error: {e}")
+        logger.error(f"Migration error: {e}")
+        return False
+    finally:
+        # Disconnect from database
+        if hasattr(db, 'client') and db.client:
+            db.client.close()
+            print("\nDatabase connection closed")
+
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(0 if result else 1)
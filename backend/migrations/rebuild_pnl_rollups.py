@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Migration Script - Rebuild PnL Rollups
+Recomputes the pnl_rollups buckets for every user from the raw trades and
+fills_ledger. Safe to re-run: each user's buckets are replaced, not added to.
+Reads build missing rollups lazily, so this is only needed to backfill ahead
+of traffic or to repair rollups after manual edits to trades.
+"""
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone
+
+# Add parent directory to path (migrations -> backend)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database as db
+from logger_config import logger
+from services.pnl_rollups import get_pnl_rollups
+
+
+async def rebuild_source(source: str, collection) -> bool:
+    """Rebuild one source's rollups for every user that has records"""
+    print("\n" + "="*60)
+    print(f"REBUILDING {source.upper()} ROLLUPS")
+    print("="*60)
+
+    try:
+        rollups = get_pnl_rollups()
+        user_ids = [u for u in await collection.distinct("user_id") if u]
+        print(f"Found {len(user_ids)} users")
+
+        buckets = 0
+        for user_id in user_ids:
+            buckets += await rollups.rebuild(user_id, source)
+        print(f"  ✓ Wrote {buckets} buckets")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error rebuilding {source} rollups: {e}")
+        logger.error(f"PnL rollup rebuild error ({source}): {e}")
+        return False
+
+
+async def main():
+    """Main migration entry point"""
+    print("\n" + "="*60)
+    print("PNL ROLLUP REBUILD SCRIPT")
+    print("="*60)
+    print(f"Started at: {datetime.now(timezone.utc).isoformat()}")
+
+    try:
+        # Connect to database
+        print("\nConnecting to database...")
+        await db.connect()
+        print("✅ Database connected")
+
+        database = db.get_database()
+        trades_ok = await rebuild_source("trades", database["trades"])
+        ledger_ok = await rebuild_source("ledger", database["fills_ledger"])
+
+        if trades_ok and ledger_ok:
+            print("\n" + "="*60)
+            print("✅ REBUILD COMPLETED SUCCESSFULLY")
+            print("="*60)
+            return True
+
+        print("\n" + "="*60)
+        print("❌ REBUILD FAILED")
+        print("="*60)
+        return False
+
+    except Exception as e:
+        print(f"\n❌ Migration error: {e}")
+        logger.error(f"Migration error: {e}")
+        return False
+    finally:
+        # Disconnect from database
+        if hasattr(db, 'client') and db.client:
+            db.client.close()
+            print("\nDatabase connection closed")
+
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(0 if result else 1)
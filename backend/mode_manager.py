@@ -10,6 +10,7 @@ Ensures clean separation of paper and live trading data:
 import database as db
 from logger_config import logger
 from datetime import datetime, timezone
+from utils.timestamps import timestamp_range
 
 
 class ModeManager:
@@ -40,26 +41,26 @@ class ModeManager:
             
             paper_trades_today = await db.trades_collection.count_documents({
                 "user_id": user_id,
-                "timestamp": {"$gte": today_start},
+                **timestamp_range(today_start),
                 "mode": "paper"
             })
             
             live_trades_today = await db.trades_collection.count_documents({
                 "user_id": user_id,
-                "timestamp": {"$gte": today_start},
+                **timestamp_range(today_start),
                 "mode": "live"
             })
             
             # Get today's PnL
             paper_trades = await db.trades_collection.find({
                 "user_id": user_id,
-                "timestamp": {"$gte": today_start},
+                **timestamp_range(today_start),
                 "mode": "paper"
             }, {"_id": 0}).to_list(10000)
             
             live_trades = await db.trades_collection.find({
                 "user_id": user_id,
-                "timestamp": {"$gte": today_start},
+                **timestamp_range(today_start),
                 "mode": "live"
             }, {"_id": 0}).to_list(10000)
             
@@ -34,6 +34,7 @@ EXPECTED RESULTS:
 import ccxt.async_support as ccxt
 import asyncio
 import random
+import time
 from datetime import datetime, timezone
 from typing import Dict, Tuple
 import logging
@@ -42,7 +43,16 @@ from exchange_limits import get_fee_rate
 from rate_limiter import rate_limiter
 from risk_engine import risk_engine
 from services.order_validation import order_validator
+from services.exposure_book import exposure_book
+from services.market_data_service import market_data_service
+from services.market_stream_service import market_stream_service
+from services.write_behind import write_behind
+from services.signal_gatherer import SignalSource, signal_gatherer
+from services.order_book_service import order_book_service, round_trip_slippage
+from services.candle_store import candle_store
+from services.pnl_rollups import get_pnl_rollups
 from utils.trading_gates import enforce_trading_gates, TradingGateError
+from utils.timestamps import parse_timestamp
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +65,32 @@ EXCHANGE_FEES = {
     "ovex": {"maker": 0.001, "taker": 0.002}      # 0.1% maker, 0.2% taker
 }
 
+# TRADE OUTCOME MODEL (shared with services/paper_simulator.py)
+# Base position size per risk mode, as a fraction of current capital
+POSITION_SIZES = {
+    'safe': 0.20,       # 20% per trade (was 15%)
+    'balanced': 0.30,   # 30% (was 20%)
+    'risky': 0.40,      # 40% (was 25%)
+    'aggressive': 0.50  # 50% (was 30%)
+}
+MAX_POSITION_SIZE = 0.60
+WIN_RATE = 0.55             # 55% win rate (realistic)
+ORDER_SUCCESS_RATE = 0.97   # 97% success rate (2-5% of orders fail in reality)
+# Number of agreeing AI sources -> position size boost / outcome boost
+AGREEMENT_SIZE_BOOST = {4: 1.5, 3: 1.25, 2: 1.1}
+AGREEMENT_OUTCOME_BOOST = {4: 1.5, 3: 1.3, 2: 1.1}
+# Daily volume assumed by the calculate_slippage fallback when no order book is available
+ASSUMED_DAILY_VOLUME_USD = 1_000_000_000
+
+# Seconds each AI signal source result is reused for trades on the same exchange/symbol
+SIGNAL_SOURCE_TTLS = {
+    "regime": 60,
+    "prediction": 300,  # 1h-timeframe prediction
+    "flokx": 120,
+    "fetchai": 60,
+    "trend": 15         # 5m candles, already cached by market_data_service
+}
+
 # EXCHANGE SYMBOL RULES (basic validation rules)
 EXCHANGE_RULES = {
     "binance": {
@@ -328,6 +364,22 @@ class PaperTradingEngine:
             return self.KUCOIN_PAIRS
         return self.BINANCE_PAIRS
     
+    async def get_order_books(self, exchange: str = 'luno') -> list:
+        """Current L2 books for every pair the engine trades on an exchange (batched via prefetch)"""
+        pairs = await self.get_available_pairs(exchange)
+        exchange_obj = self._get_exchange_obj(exchange)
+        await order_book_service.prefetch(exchange, exchange_obj, pairs)
+        books = await asyncio.gather(*(order_book_service.get_order_book(exchange, pair, exchange_obj) for pair in pairs))
+        return [book for book in books if book]
+    
+    def _get_exchange_obj(self, exchange: str):
+        """Public ccxt client for an exchange (Luno by default)"""
+        if exchange == 'binance':
+            return self.binance_exchange
+        elif exchange == 'kucoin':
+            return self.kucoin_exchange
+        return self.luno_exchange
+    
     async def get_real_price(self, symbol: str, exchange: str = 'luno', with_label: bool = False) -> float:
         """
         Fetch REAL price using PUBLIC or AUTHENTICATED endpoints depending on mode
@@ -341,24 +393,35 @@ class PaperTradingEngine:
             If with_label=False: float price
             If with_label=True: dict with {'price': float, 'mode': str, 'label': str, ...}
         """
+        # Streaming mode: live top-of-book table, no network round trip
+        streamed_price = market_stream_service.get_price(exchange, symbol)
+        if streamed_price is not None:
+            self.price_cache[symbol] = streamed_price
+            if with_label:
+                return {
+                    'price': streamed_price,
+                    'symbol': symbol,
+                    'exchange': exchange,
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'source': 'stream',
+                    **self.get_mode_label()
+                }
+            return streamed_price
+        
         try:
             if not self.luno_exchange and not self.binance_exchange:
                 await self.init_exchanges()
             
             # Select exchange
-            if exchange == 'luno':
-                exchange_obj = self.luno_exchange
-            elif exchange == 'binance':
-                exchange_obj = self.binance_exchange
-            elif exchange == 'kucoin':
-                exchange_obj = self.kucoin_exchange
-            else:
-                exchange_obj = self.luno_exchange  # Default to Luno
+            exchange_obj = self._get_exchange_obj(exchange)
             
             if exchange_obj:
                 # Use fetch_ticker which is PUBLIC on most exchanges
                 # In verified mode with Luno, this also benefits from authenticated rate limits
-                ticker = await exchange_obj.fetch_ticker(symbol)
+                # Shared snapshot cache: repeat reads within the TTL cost no REST call
+                ticker = await market_data_service.get_ticker(
+                    exchange, symbol, lambda: exchange_obj.fetch_ticker(symbol)
+                )
                 price = ticker.get('last') or ticker.get('close') or ticker.get('bid')
                 
                 # Guard against None price
@@ -437,7 +500,14 @@ class PaperTradingEngine:
             if not exchange_obj:
                 return 'neutral'
             
-            ohlcv = await exchange_obj.fetch_ohlcv(symbol, '5m', limit=20)
+            # Persistent candle store: only bars newer than the last stored one are fetched
+            async def fetch():
+                candles = await candle_store.get_candles(exchange, symbol, '5m', limit=20, exchange_obj=exchange_obj, max_age=0)
+                if not len(candles) or candles.timestamp[-1] < (time.time() - 900) * 1000:
+                    raise ValueError(f"No recent 5m candles for {symbol}")  # Sync failed and history is stale
+                return candles.rows()
+            
+            ohlcv = await market_data_service.get_ohlcv(exchange, symbol, '5m', 20, fetch)
             
             if len(ohlcv) < 10:
                 return 'neutral'
@@ -503,8 +573,8 @@ class PaperTradingEngine:
                 logger.warning(f"Daily trade limit reached: {bot_data['name'][:15]} - {trades_today}/{max_daily_trades}")
                 return {"success": False, "bot_id": bot_id, "error": f"Daily trade limit reached"}
             
-            # 1. CHECK RATE LIMITER
-            can_trade, reason = rate_limiter.can_trade(bot_id, exchange)
+            # 1. ACQUIRE RATE LIMIT CAPACITY (checked and charged in one atomic step)
+            can_trade, reason = await rate_limiter.acquire(exchange, bot_id=bot_id)
             if not can_trade:
                 logger.warning(f"Rate limit: {bot_data['name'][:15]} - {reason}")
                 return {"success": False, "bot_id": bot_id, "error": reason}
@@ -543,24 +613,27 @@ class PaperTradingEngine:
                 self.last_error = f"Invalid price: {current_price}"
                 return {"success": False, "bot_id": bot_id, "error": f"Invalid price for {symbol}"}
             
-            # 2. AI INTELLIGENCE: Check market regime
+            # 2-5. AI INTELLIGENCE: market regime, ML prediction, Flokx and Fetch.ai signals
+            # plus the REAL trend (fallback if AI fails) - fetched concurrently; a slow or
+            # failing source is recorded as degraded and contributes no confidence
             from market_regime import market_regime_detector
-            regime = await market_regime_detector.detect_regime(symbol, exchange)
-            
-            # 3. AI INTELLIGENCE: Get ML prediction
             from ml_predictor import ml_predictor
-            prediction = await ml_predictor.predict_price(symbol, timeframe="1h")
-            
-            # 4. AI INTELLIGENCE: Get Flokx signals (if available)
             from flokx_integration import flokx
-            flokx_data = await flokx.fetch_market_coefficients(symbol)
-            
-            # 5. AI INTELLIGENCE: Get Fetch.ai signals (if available)
             from fetchai_integration import fetchai
-            fetchai_data = await fetchai.fetch_market_signals(symbol)
             
-            # Analyze REAL trend (fallback if AI fails)
-            trend = await self.analyze_trend(symbol, exchange)
+            signals = await signal_gatherer.gather((exchange, symbol), {
+                "regime": SignalSource(lambda: market_regime_detector.detect_regime(symbol, exchange), {}, SIGNAL_SOURCE_TTLS["regime"]),
+                "prediction": SignalSource(lambda: ml_predictor.predict_price(symbol, timeframe="1h"), {}, SIGNAL_SOURCE_TTLS["prediction"]),
+                "flokx": SignalSource(lambda: flokx.fetch_market_coefficients(symbol), {}, SIGNAL_SOURCE_TTLS["flokx"]),
+                "fetchai": SignalSource(lambda: fetchai.fetch_market_signals(symbol), {}, SIGNAL_SOURCE_TTLS["fetchai"]),
+                "trend": SignalSource(lambda: self.analyze_trend(symbol, exchange), 'neutral', SIGNAL_SOURCE_TTLS["trend"])
+            })
+            regime = signals["regime"].value or {}
+            prediction = signals["prediction"].value or {}
+            flokx_data = signals["flokx"].value or {}
+            fetchai_data = signals["fetchai"].value or {}
+            trend = signals["trend"].value or 'neutral'
+            degraded_signals = [name for name, result in signals.items() if result.degraded]
             
             # Override trend with AI intelligence if confidence is high
             if regime.get('confidence', 0) > 0.7:
@@ -606,17 +679,7 @@ class PaperTradingEngine:
             
             # Position sizing - OPTIMIZED for quality over quantity
             # Larger positions on high-confidence AI signals
-            position_sizes = {
-                'safe': 0.20,       # 20% per trade (was 15%)
-                'balanced': 0.30,   # 30% (was 20%)
-                'risky': 0.40,      # 40% (was 25%)
-                'aggressive': 0.50  # 50% (was 30%)
-            }
-            
-            base_position_size = position_sizes.get(risk_mode, 0.20)
-            
-            # BOOST position size on HIGH-CONFIDENCE AI signals (up to +50% larger)
-            confidence_boost = 1.0
+            base_position_size = POSITION_SIZES.get(risk_mode, 0.20)
             
             # If multiple AI sources agree, increase position
             ai_agreement = 0
@@ -629,15 +692,11 @@ class PaperTradingEngine:
             if flokx_data.get('strength', 0) > 75:
                 ai_agreement += 1
             
-            # Boost: 1-2 sources = 1.0x, 3 sources = 1.25x, 4 sources = 1.5x
-            if ai_agreement >= 4:
-                confidence_boost = 1.5
-            elif ai_agreement >= 3:
-                confidence_boost = 1.25
-            elif ai_agreement >= 2:
-                confidence_boost = 1.1
+            # BOOST position size on HIGH-CONFIDENCE AI signals (up to +50% larger)
+            # 2 sources = 1.1x, 3 sources = 1.25x, 4 sources = 1.5x
+            confidence_boost = AGREEMENT_SIZE_BOOST.get(ai_agreement, 1.0)
             
-            final_position_size = min(base_position_size * confidence_boost, 0.60)  # Cap at 60%
+            final_position_size = min(base_position_size * confidence_boost, MAX_POSITION_SIZE)  # Cap at 60%
             trade_amount = current_capital * final_position_size
             
             # 2. CHECK RISK ENGINE
@@ -669,7 +728,7 @@ class PaperTradingEngine:
             # Simulate realistic win/loss ratio (not 100% wins)
             
             trade_outcome = random.random()
-            if trade_outcome < 0.55:  # 55% win rate (realistic)
+            if trade_outcome < WIN_RATE:
                 # Winning trade - small profit
                 base_multiplier = random.uniform(1.005, 1.020)  # 0.5% to 2% profit
             else:
@@ -677,13 +736,7 @@ class PaperTradingEngine:
                 base_multiplier = random.uniform(0.985, 0.997)  # 0.3% to 1.5% loss
             
             # Boost if strong AI confidence (high confidence = better outcomes)
-            confidence_multiplier = 1.0
-            if ai_agreement >= 4:
-                confidence_multiplier = 1.5
-            elif ai_agreement >= 3:
-                confidence_multiplier = 1.3
-            elif ai_agreement >= 2:
-                confidence_multiplier = 1.1
+            confidence_multiplier = AGREEMENT_OUTCOME_BOOST.get(ai_agreement, 1.0)
             
             # Apply AI confidence boost
             if base_multiplier > 1.0:  # Winning trade
@@ -731,21 +784,33 @@ class PaperTradingEngine:
             fee_rate = exchange_fee_struct.get('taker', 0.001)  # Assume taker fee
             fees = trade_amount * fee_rate * 2  # Entry + exit
             
-            # 4. SIMULATE SLIPPAGE - Enhanced calculation based on order size vs volume
-            # Calculate slippage based on order size and market depth
-            daily_volume_usd = 1000000000  # Assume 1B daily volume for major pairs
-            order_size_usd = trade_amount  # Approximate USD value
-            
-            slippage_rate = calculate_slippage(order_size_usd, daily_volume_usd)
-            slippage_cost = trade_amount * slippage_rate
-            
-            # Additional slippage for volatile markets
-            if abs(profit_pct) > 2:  # Volatile market
-                slippage_cost *= 1.5
+            # 4. SIMULATE SLIPPAGE - Walk the L2 order book for the actual order size
+            # Round trip vs mid: buy trade_amount on the asks, sell crypto_amount on the bids
+            book_slippage = None
+            order_book = await order_book_service.get_order_book(exchange, symbol, self._get_exchange_obj(exchange))
+            if order_book:
+                book_slippage = round_trip_slippage(order_book, trade_amount, qty=crypto_amount)
+            
+            if book_slippage:
+                slippage_model = 'order_book'
+                slippage_rate, exhausted = book_slippage
+                slippage_cost = trade_amount * slippage_rate
+                if exhausted:
+                    logger.warning(f"Order of {trade_amount:.2f} exceeds visible {symbol} book depth on {exchange}")
+            else:
+                # No book available - fall back to the order size vs volume estimate
+                slippage_model = 'volume_estimate'
+                order_size_usd = trade_amount  # Approximate USD value
+                
+                slippage_rate = calculate_slippage(order_size_usd, ASSUMED_DAILY_VOLUME_USD)
+                slippage_cost = trade_amount * slippage_rate
+                
+                # Additional slippage for volatile markets
+                if abs(profit_pct) > 2:  # Volatile market
+                    slippage_cost *= 1.5
             
             # 5. SIMULATE ORDER FAILURES (2-5% of orders fail in reality)
-            order_success_rate = 0.97  # 97% success rate
-            if random.random() > order_success_rate:
+            if random.random() > ORDER_SUCCESS_RATE:
                 return {
                     "success": False, 
                     "bot_id": bot_id, 
@@ -782,17 +847,19 @@ class PaperTradingEngine:
             
             is_profitable = net_profit > 0
             
-            # 4. RECORD TRADE FOR RATE LIMITER
-            rate_limiter.record_trade(bot_id, exchange)
+            # Generate unique trade ID
+            from uuid import uuid4
+            trade_id = str(uuid4())[:8]
             
             # 5. RECORD RESULT FOR RISK ENGINE
-            await risk_engine.record_trade_result(user_id, net_profit)
+            await risk_engine.record_trade_result(user_id, net_profit, trade_id)
             
             # Calculate trade quality score (1-10)
             quality_score = self._calculate_trade_quality(net_profit, fees, trade_amount, profit_pct)
             
             trade_result = {
                 "success": True,
+                "trade_id": trade_id,
                 "bot_id": bot_id,
                 "symbol": symbol,
                 "exchange": exchange,
@@ -818,6 +885,7 @@ class PaperTradingEngine:
                 "data_source": data_source,  # Use determined data source
                 "fee_rate": round(fee_rate * 100, 3),  # Display as percentage
                 "slippage_rate": round(slippage_rate * 100, 4),  # Display slippage as percentage
+                "slippage_model": slippage_model,
                 # AI Intelligence metadata
                 "ai_regime": regime.get('regime', 'unknown'),
                 "ai_confidence": round(regime.get('confidence', 0), 2),
@@ -826,7 +894,8 @@ class PaperTradingEngine:
                 "flokx_strength": round(flokx_data.get('strength', 0), 1),
                 "flokx_sentiment": flokx_data.get('sentiment', 'neutral'),
                 "fetchai_signal": fetchai_data.get('signal', 'HOLD'),
-                "fetchai_confidence": round(fetchai_data.get('confidence', 0), 1)
+                "fetchai_confidence": round(fetchai_data.get('confidence', 0), 1),
+                "degraded_signals": degraded_signals
             }
             
             emoji = "🟢" if is_profitable else "🔴"
@@ -887,30 +956,6 @@ class PaperTradingEngine:
             bots_collection = db_collections['bots']
             trades_collection = db_collections['trades']
             
-            # CRITICAL FIX: Fetch fresh bot data to avoid stale capital in concurrent trades
-            fresh_bot = await bots_collection.find_one({"id": bot_id}, {"_id": 0})
-            if not fresh_bot:
-                return None
-            
-            # Use fresh current_capital for accurate calculation
-            new_capital = fresh_bot['current_capital'] + trade_result['profit_loss']
-            total_profit = new_capital - fresh_bot['initial_capital']
-            
-            # Update bot with calculated values
-            await bots_collection.update_one(
-                {"id": bot_id},
-                {
-                    "$set": {
-                        "current_capital": round(new_capital, 2),
-                        "total_profit": round(total_profit, 2),
-                        "last_trade": datetime.now(timezone.utc).isoformat(),
-                        "status": "active"
-                    },
-                    "$inc": {"trades_count": 1}
-                }
-            )
-            
-            # Save trade
             # CRITICAL: Validate trade_doc has all required fields before insertion
             required_fields = [
                 'success', 'bot_id', 'symbol', 'exchange', 'entry_price', 'exit_price',
@@ -923,29 +968,59 @@ class PaperTradingEngine:
                 logger.error(f"Trade result: {trade_result}")
                 return None
             
-            # Generate unique trade ID
+            # Atomic $inc instead of read-modify-write: concurrent trades (or an unflushed
+            # previous update) can never overwrite each other's capital change
+            profit_loss = trade_result['profit_loss']
+            bot_filter = {"id": bot_id}
+            await write_behind.update_one(
+                bots_collection,
+                bot_filter,
+                set_fields={
+                    "last_trade": datetime.now(timezone.utc).isoformat(),
+                    "status": "active"
+                },
+                inc_fields={
+                    "current_capital": profit_loss,
+                    "total_profit": profit_loss,
+                    "trades_count": 1
+                }
+            )
+            
+            # Projected values for the trade record and realtime events: the bot snapshot
+            # plus every capital change not yet flushed (just this trade when writing through)
+            if write_behind.is_running:
+                capital_change = write_behind.pending_increment(bots_collection, bot_filter, "current_capital")
+            else:
+                capital_change = profit_loss
+            new_capital = bot_data.get('current_capital', 0) + capital_change
+            total_profit = new_capital - bot_data.get('initial_capital', new_capital - profit_loss)
+            exposure_book.set_bot_capital(bot_data['user_id'], bot_id, new_capital)
+            
+            # ID assigned when the result was recorded with the risk engine
             from uuid import uuid4
-            trade_id = str(uuid4())[:8]
+            trade_id = trade_result.pop('trade_id', None) or str(uuid4())[:8]
             
+            slippage_pct = trade_result.get('slippage_rate', 0)  # Stored as a percentage
             trade_doc = {
                 "id": trade_id,
                 **trade_result,
                 "user_id": bot_data['user_id'],
                 "bot_id": bot_id,
+                "timestamp": parse_timestamp(trade_result['timestamp']),  # BSON datetime, not ISO string
                 "pair": trade_result.get('symbol'),
                 "side": "BUY",  # Paper trades simulate BUY->SELL
                 "status": "closed",  # Paper trades are immediately closed
                 "new_capital": round(new_capital, 2),
                 "total_profit": round(total_profit, 2),
                 # Paper trading realism ledger fields (TASK F)
-                "price_source": data_source,  # e.g., "LUNO_PUBLIC", "REAL_BINANCE"
-                "mid_price": round(entry_price, 6),  # Mid-market price at execution
-                "spread": round(slippage_rate * 100, 4),  # Bid-ask spread approximation
-                "slippage_bps": round(slippage_rate * 10000, 2),  # Slippage in basis points
-                "fee_rate": round(fee_rate, 6),  # Fee rate applied
-                "fee_amount": round(fees, 2),  # Total fees charged
-                "gross_pnl": round(gross_profit, 2),  # PnL before fees
-                "net_pnl": round(net_profit, 2),  # PnL after fees
+                "price_source": trade_result.get('data_source'),  # e.g., "LUNO_PUBLIC", "REAL_BINANCE"
+                "mid_price": trade_result['entry_price'],  # Mid-market price at execution
+                "spread": slippage_pct,  # Bid-ask spread approximation
+                "slippage_bps": round(slippage_pct * 100, 2),  # Slippage in basis points
+                "fee_rate": round(trade_result.get('fee_rate', 0) / 100, 6),  # Fee rate applied
+                "fee_amount": trade_result['fees'],  # Total fees charged
+                "gross_pnl": trade_result.get('gross_profit', 0),  # PnL before fees
+                "net_pnl": trade_result.get('net_profit', profit_loss),  # PnL after fees
                 "trading_mode": "paper"  # Explicitly mark as paper trade
             }
             
@@ -954,8 +1029,12 @@ class PaperTradingEngine:
                 logger.error(f"CRITICAL: Attempted to insert empty trade document for bot {bot_id}")
                 return None
             
-            await trades_collection.insert_one(trade_doc)
-            logger.info(f"✅ Trade inserted: id={trade_id}, profit={trade_result['profit_loss']:.2f}")
+            await write_behind.insert_one(trades_collection, trade_doc)
+            try:
+                await get_pnl_rollups().record_trade(trade_doc)
+            except Exception as e:
+                logger.warning(f"PnL rollup update failed for trade {trade_id}: {e}")
+            logger.info(f"✅ Trade queued: id={trade_id}, profit={profit_loss:.2f}")
             
             return {
                 "bot_id": bot_id,
@@ -1011,7 +1090,8 @@ class PaperTradingEngine:
             "mode_label": mode_info['label'],
             "mode_description": mode_info['description'],
             "luno_keys_available": self.luno_keys_available,
-            "user_id": self.user_id
+            "user_id": self.user_id,
+            "signal_sources": signal_gatherer.get_stats()
         }
 
 # Global instance
@@ -1,93 +1,329 @@
-"""Rate limiter for exchange API calls"""
-from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+"""Rate limiter for exchange API calls
+
+One budget per exchange shared by every worker process. Each limit is a
+GCRA token bucket (a smoothed sliding window: at most `limit` units in any
+`window`-second span, refilling continuously rather than on a fixed boundary):
+- orders per exchange: burst (10s), per minute and rolling day
+- orders per bot: rolling day
+- request weight per exchange per minute, with per-endpoint weights
+  (exchange_limits.ENDPOINT_WEIGHTS)
+
+Every limit a request touches is checked and charged in one atomic step:
+a Lua script on Redis (REDIS_URL) or a plain function on the in-process
+backend, so concurrent workers can never jointly overrun an exchange.
+acquire() waits for capacity (up to max_wait) instead of rejecting.
+"""
+import asyncio
 import logging
-from exchange_limits import get_exchange_limits
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import RATE_LIMIT_MAX_WAIT
+from exchange_limits import get_endpoint_weight, get_exchange_limits
 
 logger = logging.getLogger(__name__)
 
+ORDER_ENDPOINT = "create_order"
+DAY_SECONDS = 86400
+
+
+class RateLimitExceeded(Exception):
+    """No capacity within the allowed wait"""
+
+
+class Limit(NamedTuple):
+    key: str
+    limit: float
+    window: float  # Seconds
+    cost: float
+    reason: str    # Message when this limit is the one blocking
+
+
+def gcra(tat: float, now: float, limit: float, window: float, cost: float) -> Tuple[float, float]:
+    """New theoretical arrival time and seconds to wait (0 = allowed) for one charge"""
+    new_tat = max(tat, now) + cost * window / limit
+    return new_tat, max(0.0, new_tat - window - now)
+
+
+class LocalLimiterBackend:
+    """In-process limiter state (single worker, or shared by several limiters in tests)"""
+
+    name = "local"
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.tats: Dict[str, float] = {}
+
+    async def reserve(self, limits: List[Limit], mode: str = "check") -> Tuple[float, int]:
+        """
+        Charge all limits atomically if all allow it
+
+        Args:
+            mode: "check" charges only when allowed, "peek" never charges,
+                "force" always charges (for calls that already happened)
+
+        Returns:
+            (seconds to wait, index of the binding limit); (0, -1) when allowed
+        """
+        now = self.clock()
+        updates = []
+        wait, binding = 0.0, -1
+        for i, limit in enumerate(limits):
+            new_tat, retry = gcra(self.tats.get(limit.key, 0.0), now, limit.limit, limit.window, limit.cost)
+            updates.append(new_tat)
+            if retry > wait:
+                wait, binding = retry, i
+
+        if mode == "force" or (mode == "check" and wait <= 0):
+            for limit, new_tat in zip(limits, updates):
+                self.tats[limit.key] = new_tat
+        return wait, binding
+
+    async def usage(self, limits: List[Limit]) -> List[float]:
+        """Units currently counted against each limit"""
+        now = self.clock()
+        return [max(0.0, self.tats.get(l.key, 0.0) - now) * l.limit / l.window for l in limits]
+
+    async def close(self):
+        pass
+
+
+# KEYS: one per limit. ARGV: mode, then (limit, window, cost) per key.
+# Uses the Redis server clock so workers with skewed clocks agree.
+RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local mode = ARGV[1]
+local wait, binding = 0, -1
+local tats = {}
+for i, key in ipairs(KEYS) do
+  local base = 1 + (i - 1) * 3
+  local limit, window, cost = tonumber(ARGV[base + 1]), tonumber(ARGV[base + 2]), tonumber(ARGV[base + 3])
+  local tat = tonumber(redis.call('GET', key) or '0')
+  if tat < now then tat = now end
+  tats[i] = tat + cost * window / limit
+  local retry = tats[i] - window - now
+  if retry > wait then wait, binding = retry, i - 1 end
+end
+if mode == 'force' or (mode == 'check' and wait <= 0) then
+  for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000) + 1000)
+  end
+end
+return {tostring(wait), binding}
+"""
+
+USAGE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local out = {}
+for i, key in ipairs(KEYS) do
+  local tat = tonumber(redis.call('GET', key) or '0')
+  out[i] = tostring(math.max(0, tat - now))
+end
+return out
+"""
+
+
+class RedisLimiterBackend:
+    """Redis limiter state (redis.asyncio or fakeredis.aioredis client)"""
+
+    name = "redis"
+
+    def __init__(self, client, key_prefix: str = "amarktai:ratelimit"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _keys(self, limits: List[Limit]) -> List[str]:
+        return [f"{self.key_prefix}:{l.key}" for l in limits]
+
+    async def reserve(self, limits: List[Limit], mode: str = "check") -> Tuple[float, int]:
+        args = [mode]
+        for limit in limits:
+            args.extend((limit.limit, limit.window, limit.cost))
+        wait, binding = await self.client.eval(RESERVE_SCRIPT, len(limits), *self._keys(limits), *args)
+        return float(wait), int(binding)
+
+    async def usage(self, limits: List[Limit]) -> List[float]:
+        remaining = await self.client.eval(USAGE_SCRIPT, len(limits), *self._keys(limits))
+        return [float(r) * l.limit / l.window for r, l in zip(remaining, limits)]
+
+    async def close(self):
+        await self.client.close()
+
+
+async def create_redis_backend(redis_url: str) -> RedisLimiterBackend:
+    """Connect to Redis (redis-py, else legacy aioredis) and return a limiter backend"""
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        import aioredis
+
+    client = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+    await client.ping()
+    return RedisLimiterBackend(client)
+
+
 class RateLimiter:
-    def __init__(self):
+    def __init__(self, backend=None, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.backend = backend or LocalLimiterBackend()
+        self.max_wait = max_wait
+        self.redis_enabled = False
+
+        # Process-local counters for health/status reporting
         self.orders_today = defaultdict(int)  # {exchange: count}
-        self.orders_this_minute = defaultdict(lambda: {"count": 0, "reset_time": datetime.now(timezone.utc)})
-        self.orders_per_10_seconds = defaultdict(lambda: {"count": 0, "reset_time": datetime.now(timezone.utc)})  # Burst protection
         self.bot_orders_today = defaultdict(int)  # {bot_id: count}
+        self.waits = defaultdict(int)  # {exchange: acquires that had to wait}
+        self.rejections = defaultdict(int)  # {exchange: acquires that timed out}
         self.last_reset = datetime.now(timezone.utc).date()
-    
+
+    async def init_redis(self):
+        """Share limiter state through Redis when REDIS_URL is configured"""
+        try:
+            redis_url = os.getenv('REDIS_URL', os.getenv('REDIS_HOST'))
+            if not redis_url:
+                logger.info("Redis not configured, rate limits are per worker")
+                return
+
+            self.backend = await create_redis_backend(redis_url)
+            self.redis_enabled = True
+            logger.info("✅ Rate limiter sharing exchange budgets through Redis")
+
+        except ImportError:
+            logger.warning("redis not installed, rate limits are per worker")
+        except Exception as e:
+            logger.warning(f"Redis connection failed, rate limits are per worker: {e}")
+
+    async def close(self):
+        try:
+            await self.backend.close()
+        except Exception as e:
+            logger.error(f"Error closing rate limiter backend: {e}")
+
     def _reset_if_needed(self):
-        """Reset daily counters at midnight"""
+        """Reset daily status counters at midnight"""
         today = datetime.now(timezone.utc).date()
         if today > self.last_reset:
             self.orders_today.clear()
             self.bot_orders_today.clear()
             self.last_reset = today
             logger.info("Rate limiter: Daily counters reset")
-    
-    def _reset_minute_if_needed(self, exchange: str):
-        """Reset per-minute counter after 60 seconds"""
-        now = datetime.now(timezone.utc)
-        minute_data = self.orders_this_minute[exchange]
-        if (now - minute_data["reset_time"]).total_seconds() >= 60:
-            minute_data["count"] = 0
-            minute_data["reset_time"] = now
-    
-    def _reset_10_seconds_if_needed(self, exchange: str):
-        """Reset per-10-seconds counter (BURST PROTECTION)"""
-        now = datetime.now(timezone.utc)
-        burst_data = self.orders_per_10_seconds[exchange]
-        if (now - burst_data["reset_time"]).total_seconds() >= 10:
-            burst_data["count"] = 0
-            burst_data["reset_time"] = now
-    
-    def can_trade(self, bot_id: str, exchange: str) -> tuple[bool, str]:
-        """Check if bot can trade on exchange (with BURST PROTECTION)"""
-        self._reset_if_needed()
-        self._reset_minute_if_needed(exchange)
-        self._reset_10_seconds_if_needed(exchange)
-        
+
+    def _limits(self, exchange: str, endpoint: str, bot_id: Optional[str] = None) -> List[Limit]:
+        """Every limit one call to an endpoint counts against"""
+        exchange = (exchange or "").lower()
         limits = get_exchange_limits(exchange)
-        
-        # Check BURST PROTECTION (10 orders per 10 seconds)
-        if self.orders_per_10_seconds[exchange]["count"] >= limits.get("max_orders_per_10_seconds", 10):
-            return False, f"Burst limit reached for {exchange.upper()} (max 10 orders per 10 seconds)"
-        
-        # Check daily exchange limit
-        if self.orders_today[exchange] >= limits["max_orders_per_day"]:
-            return False, f"Daily limit reached for {exchange.upper()} ({limits['max_orders_per_day']} orders)"
-        
-        # Check per-minute limit
-        if self.orders_this_minute[exchange]["count"] >= limits["max_orders_per_minute"]:
-            return False, f"Per-minute limit reached for {exchange.upper()}"
-        
-        # Check per-bot daily limit
-        if self.bot_orders_today[bot_id] >= limits["max_orders_per_bot_per_day"]:
-            return False, f"Bot daily limit reached ({limits['max_orders_per_bot_per_day']} orders)"
-        
+        name = exchange.upper()
+        rules = []
+
+        if endpoint == ORDER_ENDPOINT:
+            burst = limits.get("max_orders_per_10_seconds", 10)
+            rules += [
+                Limit(f"{exchange}:orders:10s", burst, 10, 1,
+                      f"Burst limit reached for {name} (max {burst} orders per 10 seconds)"),
+                Limit(f"{exchange}:orders:day", limits["max_orders_per_day"], DAY_SECONDS, 1,
+                      f"Daily limit reached for {name} ({limits['max_orders_per_day']} orders)"),
+                Limit(f"{exchange}:orders:min", limits["max_orders_per_minute"], 60, 1,
+                      f"Per-minute limit reached for {name}"),
+            ]
+            if bot_id:
+                rules.append(Limit(f"bot:{bot_id}:orders:day", limits["max_orders_per_bot_per_day"], DAY_SECONDS, 1,
+                                   f"Bot daily limit reached ({limits['max_orders_per_bot_per_day']} orders)"))
+
+        weight_limit = limits.get("max_request_weight_per_minute")
+        if weight_limit:
+            rules.append(Limit(f"{exchange}:weight:min", weight_limit, 60, get_endpoint_weight(exchange, endpoint),
+                               f"Request weight limit reached for {name} ({weight_limit}/min)"))
+        return rules
+
+    async def _reserve(self, limits: List[Limit], mode: str) -> Tuple[float, int]:
+        try:
+            return await self.backend.reserve(limits, mode)
+        except Exception as e:
+            # Shared state unreachable: keep limiting in-process rather than not at all
+            logger.error(f"Rate limiter backend failed, falling back to per-worker limits: {e}")
+            self.backend = LocalLimiterBackend()
+            self.redis_enabled = False
+            return await self.backend.reserve(limits, mode)
+
+    async def acquire(self, exchange: str, endpoint: str = ORDER_ENDPOINT, bot_id: Optional[str] = None,
+                      max_wait: Optional[float] = None) -> tuple[bool, str]:
+        """Wait until the call fits every limit it counts against, then charge it
+
+        Returns (False, reason) only if that would take longer than max_wait.
+        """
+        limits = self._limits(exchange, endpoint, bot_id)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        waited = False
+
+        while True:
+            wait, binding = await self._reserve(limits, "check")
+            if wait <= 0:
+                self._record_local(exchange, endpoint, bot_id)
+                return True, "OK"
+            if loop.time() + wait > deadline:
+                self.rejections[exchange] += 1
+                return False, limits[binding].reason
+            if not waited:
+                self.waits[exchange] += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    async def can_trade(self, bot_id: str, exchange: str) -> tuple[bool, str]:
+        """Check if bot can trade on exchange now (with BURST PROTECTION), without charging"""
+        limits = self._limits(exchange, ORDER_ENDPOINT, bot_id)
+        wait, binding = await self._reserve(limits, "peek")
+        if wait > 0:
+            return False, limits[binding].reason
         return True, "OK"
-    
-    def record_trade(self, bot_id: str, exchange: str):
+
+    async def record_trade(self, bot_id: str, exchange: str):
         """Record a trade for rate limiting"""
+        await self._reserve(self._limits(exchange, ORDER_ENDPOINT, bot_id), "force")
+        self._record_local(exchange, ORDER_ENDPOINT, bot_id)
+        logger.debug(f"Rate limiter: {exchange} orders today (this worker): {self.orders_today[exchange]}")
+
+    def _record_local(self, exchange: str, endpoint: str, bot_id: Optional[str]):
+        if endpoint != ORDER_ENDPOINT:
+            return
+        self._reset_if_needed()
         self.orders_today[exchange] += 1
-        self.orders_this_minute[exchange]["count"] += 1
-        self.orders_per_10_seconds[exchange]["count"] += 1  # Burst tracking
-        self.bot_orders_today[bot_id] += 1
-        logger.debug(f"Rate limiter: {exchange} orders today: {self.orders_today[exchange]}, burst: {self.orders_per_10_seconds[exchange]['count']}/10")
-    
+        if bot_id:
+            self.bot_orders_today[bot_id] += 1
+
+    async def get_usage(self, exchange: str) -> dict:
+        """Shared usage of each exchange-wide limit (all workers)"""
+        limits = self._limits(exchange, ORDER_ENDPOINT)
+        used = await self.backend.usage(limits)
+        return {
+            limit.key.split(":", 1)[1]: {"used": round(u, 2), "limit": limit.limit, "window_seconds": limit.window}
+            for limit, u in zip(limits, used)
+        }
+
     def get_stats(self, exchange: str = None) -> dict:
-        """Get current rate limit statistics"""
+        """Get current rate limit statistics (this worker's granted orders)"""
+        self._reset_if_needed()
         if exchange:
             limits = get_exchange_limits(exchange)
             return {
                 "exchange": exchange,
                 "orders_today": self.orders_today[exchange],
                 "max_daily": limits["max_orders_per_day"],
-                "orders_this_minute": self.orders_this_minute[exchange]["count"],
                 "max_per_minute": limits["max_orders_per_minute"],
+                "waits": self.waits[exchange],
+                "rejections": self.rejections[exchange],
+                "shared": self.redis_enabled,
             }
-        
+
         return {
             "orders_by_exchange": dict(self.orders_today),
             "total_orders_today": sum(self.orders_today.values()),
+            "backend": self.backend.name,
         }
 
 # Global instance
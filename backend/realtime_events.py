@@ -2,7 +2,7 @@
 Real-Time Event Manager - Ensures ALL dashboard updates happen via WebSocket
 """
 import asyncio
-from websocket_manager import manager
+from websocket_manager_redis import manager
 from logger_config import logger
 from typing import Dict, List, Callable
 from collections import defaultdict
@@ -42,13 +42,19 @@ class RealTimeEventBus:
 event_bus = RealTimeEventBus()
 
 
+async def _publish(user_id: str, message: dict):
+    """Send to the user's WebSockets and mirror onto the event bus (SSE, etc.)"""
+    await manager.send_message(user_id, message)
+    await event_bus.emit(message["type"], {"user_id": user_id, **message})
+
+
 class RealTimeEvents:
     """Centralized real-time event broadcasting"""
     
     @staticmethod
     async def bot_created(user_id: str, bot_data: dict):
         """Broadcast when bot is created"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_created",
             "bot": bot_data,
             "message": f"✅ Bot '{bot_data.get('name')}' created"
@@ -58,7 +64,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_updated(user_id: str, bot_id: str, changes: dict):
         """Broadcast when bot is updated"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_updated",
             "bot_id": bot_id,
             "changes": changes,
@@ -68,7 +74,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_deleted(user_id: str, bot_name: str):
         """Broadcast when bot is deleted"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_deleted",
             "message": f"🗑️ Bot '{bot_name}' deleted"
         })
@@ -76,7 +82,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_paused(user_id: str, bot_data: dict):
         """Broadcast when bot is paused"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_paused",
             "bot": bot_data,
             "message": f"⏸️ Bot '{bot_data.get('name')}' paused"
@@ -86,7 +92,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_resumed(user_id: str, bot_data: dict):
         """Broadcast when bot is resumed"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_resumed",
             "bot": bot_data,
             "message": f"▶️ Bot '{bot_data.get('name')}' resumed"
@@ -96,7 +102,7 @@ class RealTimeEvents:
     @staticmethod
     async def trade_executed(user_id: str, trade_data: dict):
         """Broadcast when trade executes"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "trade_executed",
             "trade": trade_data,
             "message": f"📊 Trade executed: {trade_data.get('pair')}"
@@ -109,7 +115,7 @@ class RealTimeEvents:
         if bot_name:
             msg = f"💰 {bot_name} profit: R{new_profit:.2f}"
         
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "profit_updated",
             "total_profit": new_profit,
             "bot_name": bot_name,
@@ -119,7 +125,7 @@ class RealTimeEvents:
     @staticmethod
     async def system_mode_changed(user_id: str, mode: str, enabled: bool):
         """Broadcast system mode changes"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "system_mode_update",
             "mode": mode,
             "enabled": enabled,
@@ -130,7 +136,7 @@ class RealTimeEvents:
     async def api_key_connected(user_id: str, provider: str, status: str):
         """Broadcast API key connection status"""
         emoji = "✅" if status == "connected" else "❌"
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "api_key_update",
             "provider": provider,
             "status": status,
@@ -140,7 +146,7 @@ class RealTimeEvents:
     @staticmethod
     async def autopilot_action(user_id: str, action_type: str, details: dict):
         """Broadcast autopilot actions"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "autopilot_action",
             "action_type": action_type,
             "details": details,
@@ -150,7 +156,7 @@ class RealTimeEvents:
     @staticmethod
     async def self_healing_action(user_id: str, bot_name: str, reason: str):
         """Broadcast self-healing actions"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "self_healing",
             "bot_name": bot_name,
             "reason": reason,
@@ -160,7 +166,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_promoted(user_id: str, bot_name: str):
         """Broadcast bot promotion to live"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_promoted",
             "bot_name": bot_name,
             "message": f"🎉 '{bot_name}' promoted to LIVE trading!"
@@ -169,7 +175,7 @@ class RealTimeEvents:
     @staticmethod
     async def force_refresh(user_id: str, reason: str = None):
         """Force complete dashboard refresh"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "force_refresh",
             "message": reason or "Dashboard updated"
         })
@@ -177,7 +183,7 @@ class RealTimeEvents:
     @staticmethod
     async def countdown_updated(user_id: str, days: int, current_capital: float):
         """Broadcast countdown updates"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "countdown_update",
             "days": days,
             "current_capital": current_capital,
@@ -187,7 +193,7 @@ class RealTimeEvents:
     @staticmethod
     async def ai_evolution(user_id: str, action: str, details: dict):
         """Broadcast AI learning/evolution actions"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "ai_evolution",
             "action": action,
             "details": details,
@@ -197,7 +203,7 @@ class RealTimeEvents:
     @staticmethod
     async def balance_updated(user_id: str, balance_data: dict):
         """Broadcast wallet balance updates"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "balance_updated",
             "balance": balance_data,
             "master_wallet": balance_data.get('master_wallet', {}),
@@ -209,7 +215,7 @@ class RealTimeEvents:
     @staticmethod
     async def wallet_update(user_id: str, wallet_data: dict):
         """Broadcast general wallet updates"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "wallet",
             "event": "balance_update",
             "data": wallet_data,
@@ -219,7 +225,7 @@ class RealTimeEvents:
     @staticmethod
     async def training_completed(user_id: str, bot_data: dict):
         """Broadcast when bot completes training"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "training_completed",
             "bot": bot_data,
             "message": f"🎓 Bot '{bot_data.get('name')}' training complete - ready for activation"
@@ -229,7 +235,7 @@ class RealTimeEvents:
     @staticmethod
     async def training_failed(user_id: str, bot_data: dict):
         """Broadcast when bot training fails"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "training_failed",
             "bot": bot_data,
             "message": f"❌ Bot '{bot_data.get('name')}' training failed: {bot_data.get('training_failed_reason')}"
@@ -239,7 +245,7 @@ class RealTimeEvents:
     @staticmethod
     async def key_saved(user_id: str, provider: str, display_name: str):
         """Broadcast when API key is saved"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "key_saved",
             "provider": provider,
             "display_name": display_name,
@@ -255,7 +261,7 @@ class RealTimeEvents:
         if not success and error:
             message += f": {error}"
         
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "key_tested",
             "provider": provider,
             "display_name": display_name,
@@ -268,7 +274,7 @@ class RealTimeEvents:
     @staticmethod
     async def key_deleted(user_id: str, provider: str, display_name: str):
         """Broadcast when API key is deleted"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "key_deleted",
             "provider": provider,
             "display_name": display_name,
@@ -280,7 +286,7 @@ class RealTimeEvents:
     async def mode_switched(user_id: str, mode: str, mode_data: dict):
         """Broadcast when system mode is switched"""
         emoji = "📝" if mode == "paper" else "🚀" if mode == "live" else "🤖"
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "mode_switched",
             "mode": mode,
             "mode_data": mode_data,
@@ -303,7 +309,7 @@ class RealTimeEvents:
         if reason:
             message += f" - {reason}"
         
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "bot_status_changed",
             "bot_id": bot_id,
             "status": status,
@@ -315,7 +321,7 @@ class RealTimeEvents:
     @staticmethod
     async def metrics_updated(user_id: str, metrics: dict):
         """Broadcast metrics updates (P&L, win rate, positions)"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "metrics_updated",
             "metrics": metrics,
             "message": "📊 Metrics updated"
@@ -325,7 +331,7 @@ class RealTimeEvents:
     @staticmethod
     async def overview_updated(user_id: str, overview: dict):
         """Broadcast overview summary (portfolio value, active bots, etc.)"""
-        await manager.send_message(user_id, {
+        await _publish(user_id, {
             "type": "overview_updated",
             "overview": overview,
             "message": "📈 Overview updated"
@@ -1,35 +1,44 @@
 """Central risk engine for capital protection"""
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from typing import Optional
 import logging
 import database as db
 from exchange_limits import get_exchange_limits
+from services.exposure_book import ExposureBook, UserExposure, exposure_book
 
 logger = logging.getLogger(__name__)
 
 class RiskEngine:
-    def __init__(self):
+    def __init__(self, book: Optional[ExposureBook] = None):
+        self.book = book or exposure_book
         self.user_daily_loss = {}  # {user_id: loss_today}
         self.last_reset = datetime.now(timezone.utc).date()
     
     async def check_trade_risk(self, user_id: str, bot_id: str, exchange: str, 
                                proposed_notional: float, risk_mode: str) -> tuple[bool, str]:
-        """Comprehensive risk check before allowing trade"""
-        
-        # Get bot details
-        bot = await db.bots_collection.find_one({"id": bot_id}, {"_id": 0})
+        """Comprehensive risk check before allowing trade
+        
+        Answers from the user's in-memory exposure book (services.exposure_book);
+        MongoDB is only read when the book is first loaded or reconciled.
+        """
+        
+        # Get bot details (a bot created since the last load forces one reload)
+        book = await self.book.get(user_id)
+        bot = book.bots.get(bot_id)
+        if bot is None:
+            book = await self.book.reconcile(user_id)
+            bot = book.bots.get(bot_id)
         if not bot:
             return False, "Bot not found"
         
         # Get user's total equity
-        user_bots = await db.bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(100)
-        total_equity = sum(b.get("current_capital", 0) for b in user_bots)
+        total_equity = book.total_equity
         
         if total_equity <= 0:
             return False, "No capital available"
         
         # 1. Check daily loss limit (5% max)
-        await self._check_daily_loss(user_id, total_equity)
+        self._check_daily_loss(user_id, book)
         daily_loss = self.user_daily_loss.get(user_id, 0)
         max_daily_loss = total_equity * 0.05
         
@@ -51,38 +60,16 @@ class RiskEngine:
         if proposed_notional > max_notional:
             return False, f"Trade size too large for {risk_mode} mode (max R{max_notional:.2f})"
         
-        # 3. Check per-asset exposure
-        # Extract asset from proposed trade (e.g., BTC from BTC/ZAR)
-        # For now, assume we can extract asset from context
-        # In production, would need asset parameter passed in
-        
-        # Get all user's trades to calculate current exposure
-        recent_open_trades = await db.trades_collection.find({
-            "user_id": user_id,
-            "status": {"$in": ["open", "pending"]},  # Only open positions
-            "timestamp": {"$gte": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()}
-        }, {"_id": 0}).to_list(1000)
-        
-        # Calculate per-asset exposure
-        asset_exposure = {}
-        for trade in recent_open_trades:
-            pair = trade.get('pair', '')
-            if '/' in pair:
-                asset = pair.split('/')[0]  # e.g., BTC from BTC/ZAR
-                trade_value = trade.get('entry_price', 0) * trade.get('amount', 0)
-                asset_exposure[asset] = asset_exposure.get(asset, 0) + trade_value
-        
+        # 3. Check per-asset exposure (open/pending trades, kept per asset in the book)
         # Check if any single asset exceeds 35% of total equity
-        for asset, exposure in asset_exposure.items():
+        for asset, exposure in book.asset_exposure.items():
             exposure_pct = (exposure / total_equity) if total_equity > 0 else 0
             if exposure_pct > 0.35:
                 return False, f"Too much exposure to {asset} ({exposure_pct*100:.1f}% > 35% limit)"
         
         # 4. Check per-exchange exposure (only if user has multiple exchanges)
-        exchanges_used = set(b.get("exchange") for b in user_bots)
-        
-        if len(exchanges_used) > 1:  # Only enforce if using multiple exchanges
-            exchange_capital = sum(b.get("current_capital", 0) for b in user_bots if b.get("exchange") == exchange)
+        if len(book.exchanges) > 1:  # Only enforce if using multiple exchanges
+            exchange_capital = book.exchange_capital(exchange)
             max_exchange_exposure = total_equity * 0.60  # 60% max per exchange
             
             if exchange_capital > max_exchange_exposure:
@@ -95,8 +82,8 @@ class RiskEngine:
         
         return True, "Risk check passed"
     
-    async def _check_daily_loss(self, user_id: str, total_equity: float):
-        """Calculate today's realized loss"""
+    def _check_daily_loss(self, user_id: str, book: UserExposure):
+        """Today's realized loss, from the book's running daily PnL"""
         today = datetime.now(timezone.utc).date()
         
         # Reset if new day
@@ -104,18 +91,12 @@ class RiskEngine:
             self.user_daily_loss.clear()
             self.last_reset = today
         
-        # Calculate today's loss
-        today_start = datetime.combine(today, datetime.min.time()).replace(tzinfo=timezone.utc)
-        trades_today = await db.trades_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": today_start.isoformat()}
-        }, {"_id": 0}).to_list(1000)
-        
-        total_pnl = sum(t.get("profit_loss", 0) for t in trades_today)
-        self.user_daily_loss[user_id] = total_pnl if total_pnl < 0 else 0
+        book.roll_day(today)
+        self.user_daily_loss[user_id] = book.daily_pnl if book.daily_pnl < 0 else 0
     
-    async def record_trade_result(self, user_id: str, profit_loss: float):
+    async def record_trade_result(self, user_id: str, profit_loss: float, trade_id: Optional[str] = None):
         """Record trade result for risk tracking"""
+        self.book.record_pnl(user_id, profit_loss, trade_id)
         current_loss = self.user_daily_loss.get(user_id, 0)
         if profit_loss < 0:
             self.user_daily_loss[user_id] = current_loss + profit_loss
@@ -6,6 +6,7 @@ User management, system monitoring, and administrative actions
 from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
+import asyncio
 import logging
 from datetime import datetime, timezone
 import bcrypt
@@ -17,7 +18,9 @@ import random
 from auth import get_current_user
 import database as db
 from engines.audit_logger import audit_logger
+from services.pnl_rollups import get_pnl_rollups
 from json_utils import serialize_doc, serialize_list
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -128,6 +131,24 @@ class BotExchangeChangeRequest(BaseModel):
     exchange: str = Field(..., description="Exchange: luno, binance, kucoin, valr, ovex")
 
 
+class PaperSimulationRequest(BaseModel):
+    bots: Optional[List[Dict]] = Field(
+        None,
+        description="Bot configs (risk_mode, current_capital, exchange); defaults to all active paper bots"
+    )
+    days: int = Field(30, ge=1, le=365, description="Simulated days")
+    paths: int = Field(1000, ge=1, le=10000, description="Monte Carlo paths per bot")
+    trades_per_day: Optional[int] = Field(None, ge=1, le=200, description="Trades per bot per day")
+    seed: Optional[int] = Field(None, description="RNG seed for reproducible runs")
+    agreement_probs: Optional[Dict[int, float]] = Field(
+        None, description="Probability of 2 / 3 / 4 agreeing AI sources per trade"
+    )
+    per_bot: bool = Field(True, description="Include per-bot distributions")
+    use_order_books: bool = Field(
+        True, description="Charge book-walk slippage from current L2 books (else the volume estimate)"
+    )
+
+
 @router.post("/unlock")
 async def unlock_admin_panel(
     request: AdminUnlockRequest,
@@ -274,7 +295,7 @@ async def get_all_users(admin_id: str = Depends(require_admin)):
             
             trades_last_24h = await db.trades_collection.count_documents({
                 "user_id": user_id,
-                "timestamp": {"$gte": yesterday.isoformat()}
+                **timestamp_range(yesterday)
             })
             
             total_trades = await db.trades_collection.count_documents({"user_id": user_id})
@@ -553,6 +574,10 @@ async def delete_user(
         
         # Delete all user's trades
         trades_result = await db.trades_collection.delete_many({"user_id": user_id})
+        try:
+            await get_pnl_rollups().invalidate(user_id=user_id)
+        except Exception as e:
+            logger.warning(f"PnL rollup invalidation failed: {e}")
         
         # Delete all user's API keys
         api_keys_result = await db.api_keys_collection.delete_many({"user_id": user_id})
@@ -1672,3 +1697,68 @@ async def get_user_resource_usage(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/paper-simulation")
+async def run_paper_simulation(
+    request: PaperSimulationRequest,
+    admin_id: str = Depends(require_admin),
+    req: Request = None
+):
+    """
+    Monte Carlo what-if simulation of paper trading for capacity planning
+    
+    Runs the paper engine's trade outcome model vectorized across
+    bots x days x paths and returns equity, drawdown and fee drag distributions.
+    Slippage walks the current order books of each bot's exchange.
+    """
+    try:
+        from services.paper_simulator import simulate_paper_trading
+        from paper_trading_engine import paper_engine
+        
+        bots = request.bots
+        if bots is None:
+            bots = await db.bots_collection.find(
+                {"status": "active", "trading_mode": "paper"},
+                {"_id": 0, "id": 1, "risk_mode": 1, "current_capital": 1, "initial_capital": 1,
+                 "exchange": 1, "max_daily_trades": 1}
+            ).to_list(10000)
+            if not bots:
+                raise HTTPException(status_code=400, detail="No active paper bots to simulate")
+        
+        order_books = None
+        if request.use_order_books:
+            exchanges = list(dict.fromkeys(b.get("exchange", "luno") for b in bots))
+            books = await asyncio.gather(*(paper_engine.get_order_books(e) for e in exchanges))
+            order_books = dict(zip(exchanges, books))
+        
+        started = datetime.now(timezone.utc)
+        result = await asyncio.to_thread(
+            simulate_paper_trading,
+            bots,
+            days=request.days,
+            paths=request.paths,
+            trades_per_day=request.trades_per_day,
+            seed=request.seed,
+            agreement_probs=request.agreement_probs,
+            order_books=order_books
+        )
+        summary = result.summary(per_bot=request.per_bot)
+        summary["elapsed_seconds"] = round((datetime.now(timezone.utc) - started).total_seconds(), 3)
+        
+        await log_admin_action(
+            admin_id=admin_id,
+            action="paper_simulation",
+            target_type="system",
+            target_id="paper_simulator",
+            details={"bots": len(bots), "days": request.days, "paths": request.paths, "seed": request.seed},
+            request=req
+        )
+        
+        return {"success": True, "simulation": summary}
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Paper simulation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -11,9 +11,10 @@ import json
 
 from auth import get_current_user
 import database as db
+from services.system_mode_service import system_mode_service
 from ai_super_brain import AISuperBrain
 from engines.trade_budget_manager import trade_budget_manager
-from websocket_manager import manager
+from websocket_manager_redis import manager
 
 logger = logging.getLogger(__name__)
 
@@ -115,6 +116,7 @@ class AIActionRouter:
                     {"$set": {"emergencyStop": True}},
                     upsert=True
                 )
+                system_mode_service.invalidate_modes(user_id)
                 # Pause all bots
                 await db.bots_collection.update_many(
                     {"user_id": user_id, "status": "active"},
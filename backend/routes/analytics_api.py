@@ -10,6 +10,7 @@ import logging
 
 from auth import get_current_user
 import database as db
+from utils.timestamps import iso_timestamp, with_timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -126,10 +127,7 @@ async def get_performance_summary(
         
         # Get trades in period
         trades = await db.trades_collection.find(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": start_time.isoformat()}
-            },
+            with_timestamp_range({"user_id": user_id}, start_time),
             {"_id": 0}
         ).to_list(10000)
         
@@ -200,10 +198,7 @@ async def get_exchange_comparison(
         
         # Get all trades in range
         trades = await db.trades_collection.find(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": start_time.isoformat()}
-            },
+            with_timestamp_range({"user_id": user_id}, start_time),
             {"_id": 0}
         ).to_list(10000)
         
@@ -302,10 +297,7 @@ async def get_equity_curve(
         
         # Get trades in time range
         trades = await db.trades_collection.find(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": start_time.isoformat()}
-            },
+            with_timestamp_range({"user_id": user_id}, start_time),
             {"_id": 0, "timestamp": 1, "profit_loss": 1, "fee": 1}
         ).sort("timestamp", 1).to_list(10000)
         
@@ -329,7 +321,7 @@ async def get_equity_curve(
                 cumulative_fees += trade.get('fee', 0)
                 
                 equity_points.append({
-                    "timestamp": trade['timestamp'],
+                    "timestamp": iso_timestamp(trade['timestamp']),
                     "equity": initial_capital + cumulative_pnl,
                     "realized_pnl": cumulative_pnl,
                     "unrealized_pnl": 0,  # Paper trading has no open positions
@@ -395,10 +387,7 @@ async def get_drawdown_analysis(
         
         # Get trades in time range
         trades = await db.trades_collection.find(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": start_time.isoformat()}
-            },
+            with_timestamp_range({"user_id": user_id}, start_time),
             {"_id": 0, "timestamp": 1, "profit_loss": 1}
         ).sort("timestamp", 1).to_list(10000)
         
@@ -439,7 +428,7 @@ async def get_drawdown_analysis(
             if peak_equity > 0:
                 drawdown_pct = ((peak_equity - equity) / peak_equity) * 100
                 drawdown_points.append({
-                    "timestamp": trade['timestamp'],
+                    "timestamp": iso_timestamp(trade['timestamp']),
                     "drawdown_pct": round(drawdown_pct, 2),
                     "equity": round(equity, 2),
                     "peak_equity": round(peak_equity, 2)
@@ -507,10 +496,7 @@ async def get_win_rate_stats(
         
         # Get trades in period
         trades = await db.trades_collection.find(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": start_time.isoformat()}
-            },
+            with_timestamp_range({"user_id": user_id}, start_time),
             {"_id": 0}
         ).to_list(10000)
         
@@ -10,9 +10,10 @@ import logging
 
 from auth import get_current_user
 import database as db
-from websocket_manager import manager
+from websocket_manager_redis import manager
 from realtime_events import rt_events
 from services.bot_quarantine import quarantine_service
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -504,14 +505,14 @@ async def get_bot_detailed_status(bot_id: str, user_id: str = Depends(get_curren
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
         trades_today = await db.trades_collection.count_documents({
             "bot_id": bot_id,
-            "timestamp": {"$gte": today_start.isoformat()}
+            **timestamp_range(today_start)
         })
         
         # Calculate profit today
         today_trades = await db.trades_collection.find(
             {
                 "bot_id": bot_id,
-                "timestamp": {"$gte": today_start.isoformat()}
+                **timestamp_range(today_start)
             },
             {"_id": 0}
         ).to_list(1000)
@@ -10,6 +10,7 @@ import logging
 
 from auth import get_current_user
 from models import User
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -135,7 +136,7 @@ async def get_metrics_summary(user_id: str = Depends(get_current_user)):
         yesterday = datetime.now(timezone.utc) - timedelta(days=1)
         recent_trades = await db.trades_collection.count_documents({
             "user_id": user_id,
-            "timestamp": {"$gte": yesterday.isoformat()}
+            **timestamp_range(yesterday)
         })
         
         # Get profit metrics
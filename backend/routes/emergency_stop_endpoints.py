@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 
 from auth import get_current_user
 import database as db
+from services.system_mode_service import system_mode_service
 from engines.audit_logger import audit_logger
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,7 @@ async def activate_emergency_stop(
             },
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         
         # Pause all active bots
         result = await db.bots_collection.update_many(
@@ -95,6 +97,7 @@ async def deactivate_emergency_stop(user_id: str = Depends(get_current_user)):
                 }
             }
         )
+        system_mode_service.invalidate_modes(user_id)
         
         # Resume paused bots (user can manually activate them)
         # Note: We don't auto-activate to give user control
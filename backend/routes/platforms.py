@@ -12,6 +12,7 @@ from auth import get_current_user
 import database as db
 from services.profit_service import profit_service
 import platforms  # Import authoritative platform registry
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -115,7 +116,7 @@ async def get_platforms_summary(
             today_trades_query = {
                 "bot_id": {"$in": bot_ids},
                 "status": "closed",
-                "timestamp": {"$gte": today_start.isoformat()}
+                **timestamp_range(today_start)
             }
             
             today_trades_cursor = db.trades_collection.find(
@@ -11,7 +11,7 @@ from datetime import datetime, timezone
 import time
 
 import database as db
-from websocket_manager import manager
+from websocket_manager_redis import manager
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +11,7 @@ import logging
 from auth import get_current_user
 from engines.trade_budget_manager import trade_budget_manager
 import database as db
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -135,7 +136,7 @@ async def get_bot_limits(bot_id: str, user_id: str = Depends(get_current_user)):
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
         trades_today = await db.trades_collection.count_documents({
             "bot_id": bot_id,
-            "timestamp": {"$gte": today_start.isoformat()}
+            **timestamp_range(today_start)
         })
         
         return {
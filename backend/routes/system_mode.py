@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 
 from auth import get_current_user, is_admin
 import database as db
+from services.system_mode_service import system_mode_service
 from realtime_events import rt_events
 
 logger = logging.getLogger(__name__)
@@ -48,6 +49,7 @@ async def get_system_mode() -> dict:
             "updated_by": "system"
         }
         await db.system_modes_collection.insert_one(default_mode)
+        system_mode_service.invalidate_modes()
         return default_mode
     
     return mode_doc
@@ -95,6 +97,7 @@ async def set_system_mode(mode: str, user_id: str) -> dict:
         {"$set": new_state},
         upsert=True
     )
+    system_mode_service.invalidate_modes()
     
     logger.info(f"📊 System mode switched to {mode.upper()} by user {user_id[:8]}")
     
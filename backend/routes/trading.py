@@ -5,6 +5,7 @@ import logging
 
 from models import User, UserLogin, Bot, BotCreate, APIKey, APIKeyCreate, Trade, SystemMode, Alert, ChatMessage, BotRiskMode
 import database as db
+from services.system_mode_service import system_mode_service
 from auth import create_access_token, get_current_user, get_password_hash, verify_password
 
 logger = logging.getLogger(__name__)
@@ -146,6 +147,7 @@ async def toggle_system_mode(data: dict, user_id: str = Depends(get_current_user
             {"$set": update_fields},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         
         # Get updated modes
         updated_modes = await db.system_modes_collection.find_one({"user_id": user_id}, {"_id": 0})
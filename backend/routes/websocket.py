@@ -91,14 +91,14 @@ async def websocket_endpoint(
             
             # Handle client messages
             if data.get('type') == 'ping':
-                await websocket.send_json({
+                await manager.send_personal_message({
                     'type': 'pong',
                     'timestamp': data.get('timestamp')
-                })
+                }, websocket)
             elif data.get('type') == 'request_replay':
                 # Client requests replay from specific sequence
                 last_seq = data.get('last_sequence', last_event_id or 0)
-                await manager._replay_messages(websocket, user_id, last_seq)
+                await manager.replay(websocket, user_id, last_seq)
                 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for user {user_id[:8]}")
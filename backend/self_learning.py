@@ -10,6 +10,7 @@ import asyncio
 from datetime import datetime, timezone, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 from ai_service import ai_service
+from utils.timestamps import parse_timestamp, with_timestamp_range
 import os
 import logging
 
@@ -37,13 +38,9 @@ class SelfLearningSystem:
             yesterday_start = (datetime.now(timezone.utc) - timedelta(days=1)).replace(hour=0, minute=0, second=0)
             yesterday_end = yesterday_start + timedelta(days=1)
             
-            trades = await self.db.trades_collection.find({
-                'user_id': user_id,
-                'timestamp': {
-                    '$gte': yesterday_start.isoformat(),
-                    '$lt': yesterday_end.isoformat()
-                }
-            }).to_list(10000)
+            trades = await self.db.trades_collection.find(
+                with_timestamp_range({'user_id': user_id}, yesterday_start, yesterday_end)
+            ).to_list(10000)
             
             if not trades:
                 logger.info(f"No trades to analyze for user {user_id}")
@@ -122,7 +119,7 @@ class SelfLearningSystem:
             hour_performance = {}
             for trade in trades:
                 try:
-                    trade_time = datetime.fromisoformat(trade['timestamp'])
+                    trade_time = parse_timestamp(trade['timestamp'])
                     hour = trade_time.hour
                     pnl = trade.get('profit_loss', 0)
                     if hour not in hour_performance:
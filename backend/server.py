@@ -44,12 +44,15 @@ from models import (
     ChatMessage, BotRiskMode, ProfileUpdate
 )
 import database as db
+from services.system_mode_service import system_mode_service
 from auth import create_access_token, get_current_user, get_password_hash, verify_password
 from ai_service import ai_service
 from ccxt_service import ccxt_service
-from websocket_manager import manager
+from websocket_manager_redis import manager
 from trading_scheduler import trading_scheduler
 from utils.env_utils import env_bool
+from utils.timestamps import parse_timestamp, timestamp_range
+from services.pnl_rollups import get_pnl_rollups
 import ccxt.async_support as ccxt
 
 api_router = APIRouter()
@@ -152,6 +155,19 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Could not start Bot Quarantine Service: {e}")
     
+    # Cross-worker realtime bus (Redis when REDIS_URL is set, in-process otherwise)
+    try:
+        await manager.init_redis()
+    except Exception as e:
+        logger.warning(f"Could not initialize realtime bus: {e}")
+    
+    # Exchange rate limits shared across workers (Redis when REDIS_URL is set)
+    try:
+        from rate_limiter import rate_limiter
+        await rate_limiter.init_redis()
+    except Exception as e:
+        logger.warning(f"Could not initialize shared rate limiter: {e}")
+    
     logger.info("🚀 All autonomous systems operational")
     
     yield
@@ -186,6 +202,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error stopping quarantine service: {e}")
     
+    # Stop backtest sweep worker processes
+    try:
+        from backtesting_engine import backtesting_engine
+        backtesting_engine.shutdown()
+    except Exception as e:
+        logger.error(f"Error stopping backtest workers: {e}")
+    
     # Close CCXT async sessions if trading/ccxt enabled
     enable_trading = env_bool('ENABLE_TRADING', False)
     enable_ccxt = env_bool('ENABLE_CCXT', True)
@@ -206,6 +229,25 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error closing AI service: {e}")
     
+    # Flush and close the realtime bus
+    try:
+        await manager.close()
+    except Exception as e:
+        logger.error(f"Error closing realtime bus: {e}")
+    
+    try:
+        from rate_limiter import rate_limiter
+        await rate_limiter.close()
+    except Exception as e:
+        logger.error(f"Error closing rate limiter: {e}")
+    
+    # Stop shared SSE producers
+    try:
+        from services.sse_broadcaster import sse_broadcaster
+        await sse_broadcaster.stop()
+    except Exception as e:
+        logger.error(f"Error stopping SSE broadcaster: {e}")
+    
     # Close database connection
     try:
         await db.close_db()
@@ -230,8 +272,12 @@ app.add_middleware(
 # ============================================================================
 
 @app.websocket("/api/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str = None):
-    """WebSocket endpoint with token authentication"""
+async def websocket_endpoint(websocket: WebSocket, token: str = None, last_event_id: Optional[int] = None):
+    """WebSocket endpoint with token authentication
+
+    Reconnects pass the last received sequence as ?last_event_id=N to get
+    the messages missed meanwhile (from the realtime bus replay buffer).
+    """
     user_id = None
     try:
         # Get token from query params
@@ -254,7 +300,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
             return
         
         # Connect via manager (handles accept internally)
-        await manager.connect(websocket, user_id)
+        await manager.connect(websocket, user_id, last_event_id)
         
         try:
             while True:
@@ -265,19 +311,22 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
                     try:
                         msg = json.loads(data)
                         if msg.get('type') == 'ping':
-                            await websocket.send_json({
+                            # Through the connection's send queue, never interleaved with broadcasts
+                            await manager.send_personal_message({
                                 'type': 'pong',
                                 'timestamp': msg.get('timestamp')
-                            })
+                            }, websocket)
+                        elif msg.get('type') == 'request_replay':
+                            await manager.replay(websocket, user_id, msg.get('last_sequence', last_event_id or 0))
                     except:
                         pass
         except WebSocketDisconnect:
-            await manager.disconnect(websocket, user_id)
+            manager.disconnect(websocket, user_id)
             logger.info(f"WebSocket disconnected for user: {user_id}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         if user_id:
-            await manager.disconnect(websocket, user_id)
+            manager.disconnect(websocket, user_id)
         try:
             await websocket.close(code=1011, reason=str(e))
         except:
@@ -494,7 +543,10 @@ async def update_bot(bot_id: str, update: dict, user_id: str = Depends(get_curre
             {"id": bot_id},
             {"$set": update_data}
         )
-    
+        # Keeps the bot name index, exposure book and dashboards current
+        from realtime_events import rt_events
+        await rt_events.bot_updated(user_id, bot_id, update_data)
+
     updated_bot = await db.bots_collection.find_one({"id": bot_id}, {"_id": 0})
     return updated_bot
 
@@ -680,6 +732,7 @@ async def update_system_mode(data: dict, user_id: str = Depends(get_current_user
             {"$set": current_modes},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         
         # NOTE: Trading scheduler runs globally but checks each user's modes
         # The scheduler respects autopilot/paperTrading settings per user
@@ -983,7 +1036,7 @@ async def bodyguard_system_check(user_id: str = Depends(get_current_user)):
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
         trades_today = await db.trades_collection.count_documents({
             "user_id": user_id,
-            "timestamp": {"$gte": today_start}
+            **timestamp_range(today_start)
         })
         
         # System health
@@ -1390,7 +1443,7 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
             daily_profits = defaultdict(float)
             
             for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
+                trade_date = parse_timestamp(trade['timestamp'])
                 days_ago = (today.date() - trade_date.date()).days
                 
                 if 0 <= days_ago < 7:
@@ -1415,7 +1468,7 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
             weekly_profits = defaultdict(float)
             
             for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
+                trade_date = parse_timestamp(trade['timestamp'])
                 days_ago = (today.date() - trade_date.date()).days
                 week_index = min(days_ago // 7, 3)  # 0-3 for 4 weeks
                 if week_index < 4:
@@ -1436,7 +1489,7 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
             monthly_profits = defaultdict(float)
             
             for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
+                trade_date = parse_timestamp(trade['timestamp'])
                 month_diff = (today.year - trade_date.year) * 12 + (today.month - trade_date.month)
                 if 0 <= month_diff < 6:
                     monthly_profits[5 - month_diff] += trade.get('profit_loss', 0)
@@ -1536,11 +1589,11 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
         thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
         recent_trades = await db.trades_collection.find({
             "user_id": user_id,
-            "timestamp": {"$gte": thirty_days_ago}
+            **timestamp_range(thirty_days_ago)
         }).to_list(None)  # None = no limit
         
         # REQUIRE MINIMUM 3 DAYS OF TRADING DATA for any realistic projection
-        unique_trade_days = len(set(t.get('timestamp', '')[:10] for t in recent_trades))
+        unique_trade_days = len({ts.date() for ts in (parse_timestamp(t.get('timestamp')) for t in recent_trades) if ts})
         
         # Need at least 3 full days of trading history
         if len(recent_trades) >= 30 and unique_trade_days >= 3:
@@ -1620,7 +1673,7 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
             "metrics": {
                 "avg_daily_profit": round(avg_daily_profit, 2),
                 "daily_roi_pct": round(daily_roi_pct, 3),
-                "days_of_data": len(set(t.get('timestamp', '')[:10] for t in recent_trades)),
+                "days_of_data": len({ts.date() for ts in (parse_timestamp(t.get('timestamp')) for t in recent_trades) if ts}),
                 "total_trades": len(recent_trades)
             },
             "projections": {
@@ -1997,9 +2050,10 @@ async def confirm_live_switch(data: dict, user_id: str = Depends(get_current_use
                 {"$set": {"liveTrading": True}},
                 upsert=True
             )
+            system_mode_service.invalidate_modes(user_id)
             
             # Send WebSocket notification
-            from websocket_manager import manager
+            from websocket_manager_redis import manager
             await manager.send_message(user_id, {"type": "force_refresh"})
             
             return {
@@ -2081,6 +2135,7 @@ async def enable_autopilot(user_id: str = Depends(get_current_user)):
             {"$set": {"autopilot": True}},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         logger.info(f"Autopilot enabled for user {user_id}")
         return {"message": "Autopilot enabled", "autopilot": True}
     except Exception as e:
@@ -2095,6 +2150,7 @@ async def disable_autopilot(user_id: str = Depends(get_current_user)):
             {"$set": {"autopilot": False}},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         logger.info(f"Autopilot disabled for user {user_id}")
         return {"message": "Autopilot disabled", "autopilot": False}
     except Exception as e:
@@ -2131,6 +2187,7 @@ async def start_paper_trading(user_id: str = Depends(get_current_user)):
             {"$set": {"paperTrading": True, "liveTrading": False}},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         logger.info(f"Paper trading started for user {user_id}")
         return {"message": "Paper trading started", "mode": "paper"}
     except Exception as e:
@@ -2149,6 +2206,7 @@ async def start_live_trading(data: dict, user_id: str = Depends(get_current_user
             {"$set": {"paperTrading": False, "liveTrading": True}},
             upsert=True
         )
+        system_mode_service.invalidate_modes(user_id)
         
         logger.warning(f"LIVE TRADING started for user {user_id}")
         return {"message": "Live trading started - using REAL funds", "mode": "live"}
@@ -2232,6 +2290,10 @@ async def delete_user(target_user_id: str, user_id: str = Depends(get_current_us
         
         # 2. Delete all user's trades
         await db.trades_collection.delete_many({"user_id": target_user_id})
+        try:
+            await get_pnl_rollups().invalidate(user_id=target_user_id)
+        except Exception as e:
+            logger.warning(f"PnL rollup invalidation failed: {e}")
         
         # 3. Delete all user's API keys
         await db.api_keys_collection.delete_many({"user_id": target_user_id})
@@ -2244,6 +2306,7 @@ async def delete_user(target_user_id: str, user_id: str = Depends(get_current_us
         
         # 6. Delete user's system modes
         await db.system_modes_collection.delete_many({"user_id": target_user_id})
+        system_mode_service.invalidate_modes(target_user_id)
         
         # 7. Finally, delete the user
         result = await db.users_collection.delete_one({"id": target_user_id})
@@ -3,7 +3,7 @@ Production-Grade AI Command Router
 Version 2.0 - Enhanced with Fuzzy Matching, Synonym Support, and Tool Registry
 
 Features:
-- Fuzzy bot name matching using rapidfuzz
+- Fuzzy bot name matching using rapidfuzz (cached per-user bot name index)
 - Comprehensive synonym mapping for natural language
 - Multi-command parsing ("pause alpha and beta")
 - Structured command output schema
@@ -17,7 +17,8 @@ import re
 import logging
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime, timezone
-from rapidfuzz import fuzz, process
+
+from services.bot_name_index import bot_name_index
 
 logger = logging.getLogger(__name__)
 
@@ -399,6 +400,8 @@ class ToolRegistry:
                 },
                 upsert=True
             )
+            from services.system_mode_service import system_mode_service
+            system_mode_service.invalidate_modes(user_id)
             
             return CommandOutputSchema.success(
                 "emergency_stop",
@@ -573,46 +576,21 @@ class EnhancedAICommandRouter:
         return text_lower
     
     async def find_bot_fuzzy(self, user_id: str, bot_identifier: str, threshold: int = 80) -> Optional[Dict]:
-        """Find bot using fuzzy matching"""
-        # Get all user's bots
-        bots = await self.bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-        
-        if not bots:
-            return None
-        
-        # Try exact ID match first
-        for bot in bots:
-            if bot.get("id") == bot_identifier:
-                return bot
-        
-        # Try fuzzy name matching
-        bot_names = {bot.get("name"): bot for bot in bots}
-        
-        # Use rapidfuzz to find best match - WRatio for better handling of different length strings
-        match = process.extractOne(
-            bot_identifier,
-            bot_names.keys(),
-            scorer=fuzz.WRatio,  # WRatio better for strings of different lengths
-            score_cutoff=threshold
-        )
-        
-        if match:
-            matched_name, score, _ = match
-            logger.info(f"Fuzzy matched '{bot_identifier}' to '{matched_name}' (score: {score})")
-            return bot_names[matched_name]
-        
-        return None
+        """Find bot ({id, name}) by ID or fuzzy name, from the cached per-user bot name index"""
+        return await bot_name_index.resolve(self.bots_collection, user_id, bot_identifier, threshold)
     
     async def parse_multi_command(self, message: str) -> List[Tuple[str, List[str]]]:
-        """Parse multi-command input like 'pause alpha and beta'"""
+        """Parse multi-command input like 'pause alpha and beta' or 'pause alpha, beta and gamma'"""
         # Check for multi-bot pattern
-        pattern = r"(?:pause|stop|resume|start)\s+(?:bots?\s+)?(.+?)\s+(?:and|,)\s+(.+)"
+        pattern = r"(?:pause|stop|resume|start)\s+(?:bots?\s+)?(.+?(?:\s+and\s+|\s*,\s*).+)"
         match = re.search(pattern, message.lower())
         
         if match:
             action = re.search(r"(pause|stop|resume|start)", message.lower()).group(1)
-            bot1 = match.group(1).strip()
-            bot2 = match.group(2).strip()
+            bot_names = [
+                name.strip() for name in re.split(r"\s*,\s*(?:and\s+)?|\s+and\s+", match.group(1))
+                if name.strip()
+            ]
             
             command_map = {
                 "pause": "pause_bot",
@@ -621,10 +599,7 @@ class EnhancedAICommandRouter:
                 "start": "start_bot"
             }
             
-            return [
-                (command_map.get(action, "pause_bot"), [bot1]),
-                (command_map.get(action, "pause_bot"), [bot2])
-            ]
+            return [(command_map.get(action, "pause_bot"), [name]) for name in bot_names]
         
         return []
     
@@ -806,6 +781,8 @@ class EnhancedAICommandRouter:
         elif command == "bot_status":
             bot_identifier = match_groups[-1] if match_groups else None
             bot = await self.find_bot_fuzzy(user_id, bot_identifier)
+            if bot:
+                bot = await self.bots_collection.find_one({"id": bot["id"], "user_id": user_id}, {"_id": 0})
             if not bot:
                 return CommandOutputSchema.error(command, f"Bot '{bot_identifier}' not found", "BOT_NOT_FOUND")
             
@@ -339,6 +339,8 @@ class AICommandRouter:
             },
             upsert=True
         )
+        from services.system_mode_service import system_mode_service
+        system_mode_service.invalidate_modes(user_id)
         
         return {
             "success": True,
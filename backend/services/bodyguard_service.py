@@ -9,7 +9,7 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional, Tuple
 import database as db
 from realtime_events import rt_events
-from websocket_manager import manager
+from websocket_manager_redis import manager
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,149 @@
+"""
+Bot Name Index - Cached per-user bot identities for chat command resolution
+
+The AI command router resolves "pause alpha, beta and gamma" to bot IDs
+several times per message. Instead of reading every bot document per
+lookup, each user's bot identities are kept in-process:
+- id -> name, for exact ID matches
+- normalized name -> id, for exact name matches
+- normalized choice list, scored directly by rapidfuzz (no per-call processing)
+
+A user's index is loaded with one projected query on first use and kept
+current by realtime bus events (bot_created, bot_updated with a name change,
+bot_deleted). Bots can also be renamed or removed by paths that emit no
+event or on another worker, so an index is reloaded once it is older than
+BOT_NAME_INDEX_MAX_AGE.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from config import BOT_NAME_INDEX_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+BOT_EVENTS = ("bot_created", "bot_updated", "bot_deleted")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip punctuation and surrounding whitespace"""
+    return default_process(name or "")
+
+
+@dataclass
+class UserBotIndex:
+    """One user's bot identities"""
+    names: Dict[str, str] = field(default_factory=dict)      # bot_id -> name
+    by_name: Dict[str, str] = field(default_factory=dict)    # normalized name -> bot_id
+    choices: List[str] = field(default_factory=list)         # normalized names, parallel to choice_ids
+    choice_ids: List[str] = field(default_factory=list)
+    loaded_at: float = 0.0
+
+    def add(self, bot_id: str, name: str):
+        self.names[bot_id] = name
+        self._rebuild()
+
+    def _rebuild(self):
+        self.by_name = {}
+        for bot_id, name in self.names.items():
+            self.by_name[normalize_name(name)] = bot_id
+        self.choice_ids = list(self.by_name.values())
+        self.choices = list(self.by_name.keys())
+
+    def identity(self, bot_id: str) -> Dict:
+        return {"id": bot_id, "name": self.names[bot_id]}
+
+    def resolve(self, identifier: str, threshold: int = 80) -> Optional[Dict]:
+        """Exact ID, then exact normalized name, then best fuzzy match above threshold"""
+        if identifier in self.names:
+            return self.identity(identifier)
+
+        query = normalize_name(identifier)
+        bot_id = self.by_name.get(query)
+        if bot_id is not None:
+            return self.identity(bot_id)
+        if not query or not self.choices:
+            return None
+
+        # WRatio for better handling of different length strings; choices are already normalized
+        match = process.extractOne(query, self.choices, scorer=fuzz.WRatio, processor=None, score_cutoff=threshold)
+        if match:
+            _, score, i = match
+            logger.info(f"Fuzzy matched '{identifier}' to '{self.names[self.choice_ids[i]]}' (score: {score})")
+            return self.identity(self.choice_ids[i])
+        return None
+
+
+class BotNameIndex:
+    """Per-user bot name indexes, event-driven with a max age"""
+
+    def __init__(self, max_age: float = BOT_NAME_INDEX_MAX_AGE, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self.users: Dict[str, UserBotIndex] = {}
+        self._bus_subscribed = False
+        self.loads = 0
+
+    async def get(self, bots_collection, user_id: str) -> UserBotIndex:
+        """The user's index, loading it on first use or when older than max_age"""
+        self._ensure_subscribed()
+        index = self.users.get(user_id)
+        if index is None or self.clock() - index.loaded_at >= self.max_age:
+            index = await self.load(bots_collection, user_id)
+        return index
+
+    async def load(self, bots_collection, user_id: str) -> UserBotIndex:
+        """Rebuild a user's index from MongoDB (ids and names only)"""
+        bots = await bots_collection.find({"user_id": user_id}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
+        index = UserBotIndex(loaded_at=self.clock())
+        index.names = {bot["id"]: bot.get("name") or "" for bot in bots if bot.get("id")}
+        index._rebuild()
+        self.users[user_id] = index
+        self.loads += 1
+        return index
+
+    async def resolve(self, bots_collection, user_id: str, identifier: str, threshold: int = 80) -> Optional[Dict]:
+        """{id, name} of the user's bot matching identifier, or None"""
+        index = await self.get(bots_collection, user_id)
+        return index.resolve(identifier, threshold)
+
+    def invalidate(self, user_id: str):
+        """Drop a user's index; the next lookup reloads it"""
+        self.users.pop(user_id, None)
+
+    def _ensure_subscribed(self):
+        if not self._bus_subscribed:
+            try:
+                from realtime_events import event_bus
+                for event_type in BOT_EVENTS:
+                    event_bus.subscribe(event_type, self._on_event)
+                self._bus_subscribed = True
+            except Exception as e:
+                logger.warning(f"Bot name index not subscribed to realtime events: {e}")
+
+    def _on_event(self, data: Dict):
+        index = self.users.get(data.get("user_id"))
+        if index is None:
+            return
+
+        event_type = data.get("type")
+        if event_type == "bot_created":
+            bot = data.get("bot") or {}
+            if bot.get("id"):
+                index.add(bot["id"], bot.get("name") or "")
+        elif event_type == "bot_updated":
+            changes = data.get("changes") or {}
+            if data.get("bot_id") in index.names and "name" in changes:
+                index.add(data["bot_id"], changes["name"] or "")
+        elif event_type == "bot_deleted":
+            # Payload names the bot only; reload on the next lookup
+            self.invalidate(data.get("user_id"))
+
+
+# Global instance
+bot_name_index = BotNameIndex()
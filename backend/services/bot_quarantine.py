@@ -7,6 +7,7 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict
 import logging
 import database as db
+from services.pnl_rollups import get_pnl_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -164,6 +165,10 @@ class BotQuarantineService:
                 # Delete bot and its trades
                 await db.bots_collection.delete_one({"id": bot_id})
                 await db.trades_collection.delete_many({"bot_id": bot_id})
+                try:
+                    await get_pnl_rollups().invalidate(bot_id=bot_id)
+                except Exception as e:
+                    logger.warning(f"PnL rollup invalidation failed: {e}")
                 
                 # Auto-generate replacement bot
                 logger.info(f"🤖 Auto-generating replacement bot for user {user_id[:8]}")
@@ -0,0 +1,360 @@
+"""
+Candle Store - Persistent, memory-mapped OHLCV history
+
+One columnar .npy file per (exchange, symbol, timeframe) under
+CANDLE_STORE_DIR, shaped (6, capacity): timestamp (ms), open, high, low,
+close, volume, each column contiguous on disk:
+- Reads are zero-copy, read-only slices of the memory map (binary search on
+  the timestamp column for range queries)
+- Appends write in place; unused capacity is NaN-padded, so the row count is
+  recovered from the file alone and other workers see new rows on next read
+- sync() fills gaps incrementally from ccxt: new bars since the last stored
+  one (re-fetching it, as it may have been partial), older history when a
+  query reaches further back, and holes inside the stored range
+- History survives restarts, so regime detectors and indicators start warm
+  instead of waiting for fresh ticks
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '4h': 14400, '1d': 86400
+}
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+MIN_CAPACITY = 4096
+OHLCV_PAGE_LIMIT = 1000
+DEFAULT_LOOKBACK_BARS = 1000   # Bars fetched when a series is first synced
+MAX_GAP_FILLS = 5              # Holes re-fetched per sync
+
+
+class Candles(NamedTuple):
+    """Column views over a slice of stored candles"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def as_array(self) -> np.ndarray:
+        """(n, 6) row-major copy: [timestamp, open, high, low, close, volume]"""
+        return np.column_stack(self)
+
+    def rows(self) -> List[List[float]]:
+        """ccxt-style OHLCV rows"""
+        return self.as_array().tolist()
+
+
+class _Series:
+    __slots__ = ("path", "mm", "stat")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mm: Optional[np.memmap] = None
+        self.stat: Optional[int] = None
+
+
+def _empty_candles() -> Candles:
+    return Candles(*(np.empty(0) for _ in COLUMNS))
+
+
+class CandleStore:
+    """Memory-mapped OHLCV files with incremental exchange backfill"""
+
+    def __init__(self, root: Optional[str] = None, clock=time.time):
+        if root is None:
+            from config import CANDLE_STORE_DIR
+            root = CANDLE_STORE_DIR
+        if not os.path.isabs(root):
+            root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), root)
+
+        self.root = root
+        self._clock = clock
+        self._series: Dict[Tuple[str, str, str], _Series] = {}
+        self._locks: Dict[Tuple[str, str, str], asyncio.Lock] = {}
+        self._last_sync: Dict[Tuple[str, str, str], float] = {}
+        self._attempted_gaps: set = set()
+        self.stats = {"reads": 0, "syncs": 0, "fetches": 0, "rows_written": 0, "rewrites": 0}
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def read(
+        self,
+        exchange: str,
+        symbol: str,
+        timeframe: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Candles:
+        """
+        Stored candles with start <= timestamp < end (ms), oldest first
+
+        With limit, only the newest `limit` candles of the range are returned.
+        The arrays are read-only views of the file - copy before mutating.
+        """
+        self.stats["reads"] += 1
+        mm, count = self._open(self._key(exchange, symbol, timeframe))
+        if mm is None or count == 0:
+            return _empty_candles()
+
+        ts = mm[0, :count]
+        lo = int(np.searchsorted(ts, start, side="left")) if start is not None else 0
+        hi = int(np.searchsorted(ts, end, side="left")) if end is not None else count
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        view = mm[:, lo:hi]
+        view.flags.writeable = False
+        return Candles(*view)
+
+    def last_timestamp(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        mm, count = self._open(self._key(exchange, symbol, timeframe))
+        return int(mm[0, count - 1]) if mm is not None and count else None
+
+    async def get_candles(
+        self,
+        exchange: str,
+        symbol: str,
+        timeframe: str,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        exchange_obj: Any = None,
+        max_age: Optional[float] = None
+    ) -> Candles:
+        """
+        Query candles, syncing from the exchange first when needed
+
+        A sync runs when the series has not been synced for max_age seconds
+        (default: one bar) or the query reaches before the stored history.
+        Sync failures are logged and whatever is stored is returned.
+        """
+        key = self._key(exchange, symbol, timeframe)
+        bar_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        max_age = TIMEFRAME_SECONDS[timeframe] if max_age is None else max_age
+
+        mm, count = self._open(key)
+        first_ts = int(mm[0, 0]) if mm is not None and count else None
+        wanted_since = start
+        if wanted_since is None and limit is not None:
+            wanted_since = int(self._clock() * 1000) - limit * bar_ms
+
+        stale = self._clock() - self._last_sync.get(key, float("-inf")) >= max_age
+        reaches_back = wanted_since is not None and (first_ts is None or wanted_since < first_ts - bar_ms)
+        if stale or reaches_back:
+            try:
+                await self.sync(exchange, symbol, timeframe, exchange_obj, since=wanted_since)
+            except Exception as e:
+                logger.warning(f"Candle sync for {symbol} {timeframe} on {exchange} failed: {e}")
+
+        return self.read(exchange, symbol, timeframe, start=start, end=end, limit=limit)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def write(self, exchange: str, symbol: str, timeframe: str, rows) -> int:
+        """
+        Merge OHLCV rows ([ts, o, h, l, c, v], ...) into the series
+
+        Rows for an already stored timestamp replace it (a forming bar gets
+        updated); rows newer than the last stored bar are appended in place;
+        anything else (backfill, gap fill) merges and rewrites the file.
+        """
+        new = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        new = new[~np.isnan(new[:, 0])]
+        if not len(new):
+            return 0
+        new[:, 5] = np.nan_to_num(new[:, 5])
+        # Sort and keep the last row per timestamp
+        new = new[np.argsort(new[:, 0], kind="stable")]
+        keep = np.append(new[1:, 0] != new[:-1, 0], True)
+        new = new[keep].T
+
+        key = self._key(exchange, symbol, timeframe)
+        mm, count = self._open(key)
+        if mm is None or count == 0:
+            self._rewrite(key, new)
+        elif new[0, 0] >= mm[0, count - 1]:
+            # Fast path: optional overwrite of the last bar, then append
+            start = count - 1 if new[0, 0] == mm[0, count - 1] else count
+            if start + new.shape[1] > mm.shape[1]:
+                merged = np.concatenate([np.array(mm[:, :start]), new], axis=1)
+                self._rewrite(key, merged)
+            else:
+                end = start + new.shape[1]
+                mm[1:, start:end] = new[1:]
+                mm[0, start:end] = new[0]  # Timestamps last: rows become visible once complete
+                mm.flush()
+        else:
+            existing = np.array(mm[:, :count])
+            merged = np.concatenate([existing, new], axis=1)
+            order = np.argsort(merged[0], kind="stable")
+            merged = merged[:, order]
+            keep = np.append(merged[0, 1:] != merged[0, :-1], True)  # New rows sort after existing ones
+            self._rewrite(key, merged[:, keep])
+            self.stats["rewrites"] += 1
+
+        self.stats["rows_written"] += new.shape[1]
+        return new.shape[1]
+
+    async def sync(
+        self,
+        exchange: str,
+        symbol: str,
+        timeframe: str,
+        exchange_obj: Any = None,
+        since: Optional[int] = None,
+        lookback_bars: int = DEFAULT_LOOKBACK_BARS
+    ) -> int:
+        """
+        Fill the series from the exchange
+
+        Fetches bars since the last stored one, older bars back to `since`
+        (or lookback_bars for an empty series) and a few internal holes.
+        Returns the number of rows written.
+        """
+        if exchange_obj is None:
+            exchange_obj = self._default_exchange_obj(exchange)
+        if exchange_obj is None:
+            return 0
+
+        key = self._key(exchange, symbol, timeframe)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            self.stats["syncs"] += 1
+            bar_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+            now_ms = int(self._clock() * 1000)
+            mm, count = self._open(key)
+
+            ranges: List[Tuple[int, int]] = []
+            if mm is None or count == 0:
+                ranges.append((since if since is not None else now_ms - lookback_bars * bar_ms, now_ms))
+            else:
+                ts = np.array(mm[0, :count])
+                if since is not None and since < ts[0]:
+                    ranges.append((since, int(ts[0])))
+                ranges.append((int(ts[-1]), now_ms))
+                for gap in self._gaps(ts, bar_ms)[:MAX_GAP_FILLS]:
+                    if (key, gap) not in self._attempted_gaps:
+                        self._attempted_gaps.add((key, gap))
+                        ranges.append(gap)
+
+            written = 0
+            for start, end in ranges:
+                rows = await self._fetch_range(exchange_obj, symbol, timeframe, start, end)
+                if rows:
+                    written += self.write(exchange, symbol, timeframe, rows)
+            self._last_sync[key] = self._clock()
+            return written
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    async def _fetch_range(self, exchange_obj: Any, symbol: str, timeframe: str, start: int, end: int) -> List[List]:
+        rows: List[List] = []
+        bar_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        cursor = start
+        while cursor <= end:
+            self.stats["fetches"] += 1
+            page = await exchange_obj.fetch_ohlcv(symbol, timeframe, since=cursor, limit=OHLCV_PAGE_LIMIT)
+            if not page:
+                break
+            rows.extend(row for row in page if start <= row[0] <= end)
+            if page[-1][0] < cursor or len(page) < 2:
+                break
+            cursor = page[-1][0] + bar_ms
+        return rows
+
+    @staticmethod
+    def _gaps(ts: np.ndarray, bar_ms: int) -> List[Tuple[int, int]]:
+        """(start, end) of holes inside the stored range, most recent first"""
+        holes = np.flatnonzero(np.diff(ts) > bar_ms)
+        return [(int(ts[i]) + bar_ms, int(ts[i + 1]) - bar_ms) for i in holes[::-1]]
+
+    def _open(self, key: Tuple[str, str, str]) -> Tuple[Optional[np.memmap], int]:
+        """Memory map for a series (re-opened if another writer replaced the file) and its row count"""
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self._path(key))
+
+        stat = self._file_stat(series.path)
+        if stat is None:
+            series.mm, series.stat = None, None
+            return None, 0
+        if series.mm is None or stat != series.stat:
+            series.mm = np.lib.format.open_memmap(series.path, mode="r+")
+            series.stat = stat
+
+        # Unused capacity has NaN timestamps, which sort after every real one
+        count = int(np.searchsorted(series.mm[0], np.inf, side="right"))
+        return series.mm, count
+
+    def _rewrite(self, key: Tuple[str, str, str], columns: np.ndarray):
+        """Write columns to a new file with spare capacity and swap it in atomically"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        n = columns.shape[1]
+        capacity = max(MIN_CAPACITY, 1 << (2 * n - 1).bit_length()) if n else MIN_CAPACITY
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        mm = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(len(COLUMNS), capacity))
+        mm[:, n:] = np.nan
+        mm[:, :n] = columns
+        mm.flush()
+        del mm
+        os.replace(tmp, path)
+
+        series = self._series.setdefault(key, _Series(path))
+        series.mm = np.lib.format.open_memmap(path, mode="r+")
+        series.stat = self._file_stat(path)
+
+    @staticmethod
+    def _file_stat(path: str) -> Optional[int]:
+        """Inode of the series file: changes only when the file is replaced"""
+        try:
+            return os.stat(path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _path(self, key: Tuple[str, str, str]) -> str:
+        exchange, symbol, timeframe = key
+        return os.path.join(self.root, exchange, symbol.replace("/", "_").replace(":", "_"), f"{timeframe}.npy")
+
+    @staticmethod
+    def _key(exchange: str, symbol: str, timeframe: str) -> Tuple[str, str, str]:
+        if timeframe not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        return (exchange or "").lower(), symbol, timeframe
+
+    @staticmethod
+    def _default_exchange_obj(exchange: str):
+        try:
+            from paper_trading_engine import paper_engine
+            return paper_engine._get_exchange_obj(exchange)
+        except Exception as e:
+            logger.debug(f"No exchange client for candle sync on {exchange}: {e}")
+            return None
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "open_series": len(self._series), "root": self.root}
+
+
+# Global singleton
+candle_store = CandleStore()
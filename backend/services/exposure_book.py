@@ -0,0 +1,228 @@
+"""
+Exposure Book - Live per-user exposure state for the risk engine
+
+Keeps, per user, what RiskEngine.check_trade_risk needs without querying
+MongoDB on every candidate trade:
+- bots: capital and exchange per bot (total equity, per-exchange capital)
+- open/pending trades of the last 7 days (per-asset exposure)
+- today's realized PnL (daily loss limit)
+
+State is loaded from MongoDB on first use and kept current by events:
+realtime bus events (trade_executed, bot_created/updated/deleted) and
+direct calls from the trading paths (record_pnl, set_bot_capital,
+close_trade). No path opens positions in-process, so open trades enter
+the book when it is loaded or reconciled. Capital can also change in places
+that emit no event (allocators, autopilot), so each user's book is
+reconciled against MongoDB in the background once it is older than
+EXPOSURE_RECONCILE_INTERVAL; checks keep answering from the current book meanwhile.
+
+PnL recorded with a trade id stays unconfirmed until a reconcile finds that
+trade in MongoDB, so a reconcile neither drops PnL of trades still queued in
+the write-behind buffer nor PnL recorded while its queries were in flight.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+import database as db
+from config import EXPOSURE_RECONCILE_INTERVAL
+from utils.timestamps import timestamp_range
+
+logger = logging.getLogger(__name__)
+
+OPEN_TRADE_LOOKBACK_DAYS = 7
+BOT_EVENTS = ("trade_executed", "bot_created", "bot_updated", "bot_deleted")
+
+
+def trade_asset(trade: Dict) -> Optional[str]:
+    """Base asset of a trade's pair (BTC for BTC/ZAR)"""
+    pair = trade.get('pair', '')
+    return pair.split('/')[0] if '/' in pair else None
+
+
+@dataclass
+class UserExposure:
+    """One user's exposure state"""
+    bots: Dict[str, Dict] = field(default_factory=dict)                      # bot_id -> {current_capital, exchange}
+    open_trades: Dict[str, Tuple[str, float]] = field(default_factory=dict)  # trade key -> (asset, value)
+    asset_exposure: Dict[str, float] = field(default_factory=dict)
+    daily_pnl: float = 0.0
+    unconfirmed_pnl: Dict[str, float] = field(default_factory=dict)          # trade id -> PnL not yet seen in MongoDB
+    day: Optional[date] = None
+    reconciled_at: float = 0.0
+
+    @property
+    def total_equity(self) -> float:
+        return sum(b.get("current_capital", 0) or 0 for b in self.bots.values())
+
+    @property
+    def exchanges(self) -> Set[str]:
+        return set(b.get("exchange") for b in self.bots.values())
+
+    def exchange_capital(self, exchange: str) -> float:
+        return sum(b.get("current_capital", 0) or 0 for b in self.bots.values() if b.get("exchange") == exchange)
+
+    def add_trade(self, key: str, trade: Dict):
+        asset = trade_asset(trade)
+        if asset is None or key in self.open_trades:
+            return
+        value = (trade.get('entry_price', 0) or 0) * (trade.get('amount', 0) or 0)
+        self.open_trades[key] = (asset, value)
+        self.asset_exposure[asset] = self.asset_exposure.get(asset, 0) + value
+
+    def remove_trade(self, key: str):
+        entry = self.open_trades.pop(key, None)
+        if entry:
+            asset, value = entry
+            self.asset_exposure[asset] = self.asset_exposure.get(asset, 0) - value
+            if abs(self.asset_exposure[asset]) < 1e-9:
+                del self.asset_exposure[asset]
+
+    def roll_day(self, today: date):
+        if self.day != today:
+            self.day = today
+            self.daily_pnl = 0.0
+            self.unconfirmed_pnl.clear()
+
+
+class ExposureBook:
+    """Per-user exposure books, event-driven with periodic MongoDB reconciliation"""
+
+    def __init__(self, reconcile_interval: float = EXPOSURE_RECONCILE_INTERVAL, clock=time.monotonic):
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self.users: Dict[str, UserExposure] = {}
+        self._reconciling: Dict[str, asyncio.Task] = {}
+        self._bus_subscribed = False
+        self.reconciles = 0
+
+    async def get(self, user_id: str) -> UserExposure:
+        """The user's book: loaded on first use, refreshed in the background when stale"""
+        self._ensure_subscribed()
+        book = self.users.get(user_id)
+        if book is None:
+            return await self.reconcile(user_id)
+
+        book.roll_day(datetime.now(timezone.utc).date())
+        if self.clock() - book.reconciled_at >= self.reconcile_interval:
+            self._reconcile_soon(user_id)
+        return book
+
+    def invalidate(self, user_id: str):
+        """Drop a user's book; the next check reloads it"""
+        self.users.pop(user_id, None)
+
+    def _reconcile_soon(self, user_id: str):
+        task = self._reconciling.get(user_id)
+        if task is None or task.done():
+            self._reconciling[user_id] = asyncio.create_task(self._background_reconcile(user_id))
+
+    async def _background_reconcile(self, user_id: str):
+        try:
+            await self.reconcile(user_id)
+        except Exception as e:
+            logger.warning(f"Exposure reconcile failed for user {user_id[:8]}: {e}")
+        finally:
+            self._reconciling.pop(user_id, None)
+
+    async def reconcile(self, user_id: str) -> UserExposure:
+        """Rebuild a user's book from MongoDB (bots, open trades, today's PnL)"""
+        now = datetime.now(timezone.utc)
+        today_start = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=timezone.utc)
+
+        user_bots, open_trades, trades_today = await asyncio.gather(
+            db.bots_collection.find(
+                {"user_id": user_id}, {"_id": 0, "id": 1, "current_capital": 1, "exchange": 1}
+            ).to_list(100),
+            db.trades_collection.find({
+                "user_id": user_id,
+                "status": {"$in": ["open", "pending"]},  # Only open positions
+                **timestamp_range(now - timedelta(days=OPEN_TRADE_LOOKBACK_DAYS))
+            }, {"_id": 0, "id": 1, "pair": 1, "entry_price": 1, "amount": 1}).to_list(1000),
+            db.trades_collection.find(
+                {"user_id": user_id, **timestamp_range(today_start)}, {"_id": 0, "id": 1, "profit_loss": 1}
+            ).to_list(1000)
+        )
+
+        # PnL recorded in-process (also while the queries ran) for trades MongoDB does not have yet
+        previous = self.users.get(user_id)
+        stored_ids = {t.get("id") for t in trades_today}
+        unconfirmed = {
+            trade_id: pnl for trade_id, pnl in previous.unconfirmed_pnl.items() if trade_id not in stored_ids
+        } if previous is not None and previous.day == now.date() else {}
+
+        book = UserExposure(day=now.date(), reconciled_at=self.clock())
+        for bot in user_bots:
+            book.bots[bot.get("id")] = {"current_capital": bot.get("current_capital", 0), "exchange": bot.get("exchange")}
+        for i, trade in enumerate(open_trades):
+            book.add_trade(trade.get("id") or f"_{i}", trade)
+        book.daily_pnl = sum(t.get("profit_loss", 0) or 0 for t in trades_today) + sum(unconfirmed.values())
+        book.unconfirmed_pnl = unconfirmed
+
+        self.users[user_id] = book
+        self.reconciles += 1
+        return book
+
+    # Event-driven updates (no-ops for users without a loaded book)
+
+    def record_pnl(self, user_id: str, profit_loss: float, trade_id: Optional[str] = None):
+        book = self.users.get(user_id)
+        if book is not None:
+            book.roll_day(datetime.now(timezone.utc).date())
+            book.daily_pnl += profit_loss
+            if trade_id:
+                book.unconfirmed_pnl[trade_id] = book.unconfirmed_pnl.get(trade_id, 0.0) + profit_loss
+
+    def set_bot_capital(self, user_id: str, bot_id: str, capital: float):
+        book = self.users.get(user_id)
+        if book is not None and bot_id in book.bots:
+            book.bots[bot_id]["current_capital"] = capital
+
+    def close_trade(self, user_id: str, trade_id: str):
+        book = self.users.get(user_id)
+        if book is not None:
+            book.remove_trade(trade_id)
+
+    def _ensure_subscribed(self):
+        if not self._bus_subscribed:
+            try:
+                from realtime_events import event_bus
+                for event_type in BOT_EVENTS:
+                    event_bus.subscribe(event_type, self._on_event)
+                self._bus_subscribed = True
+            except Exception as e:
+                logger.warning(f"Exposure book not subscribed to realtime events: {e}")
+
+    def _on_event(self, data: Dict):
+        user_id = data.get("user_id")
+        book = self.users.get(user_id)
+        if book is None:
+            return
+
+        event_type = data.get("type")
+        if event_type == "trade_executed":
+            trade = data.get("trade") or {}
+            if trade.get("bot_id") and trade.get("new_capital") is not None:
+                self.set_bot_capital(user_id, trade["bot_id"], trade["new_capital"])
+        elif event_type == "bot_created":
+            bot = data.get("bot") or {}
+            if bot.get("id"):
+                book.bots[bot["id"]] = {"current_capital": bot.get("current_capital", 0), "exchange": bot.get("exchange")}
+        elif event_type == "bot_updated":
+            bot = book.bots.get(data.get("bot_id"))
+            changes = data.get("changes") or {}
+            if bot is not None:
+                for key in ("current_capital", "exchange"):
+                    if key in changes:
+                        bot[key] = changes[key]
+        elif event_type == "bot_deleted":
+            # Payload names the bot only; reload on the next check
+            self.invalidate(user_id)
+
+
+# Global instance
+exposure_book = ExposureBook()
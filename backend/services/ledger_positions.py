@@ -0,0 +1,430 @@
+"""
+Ledger Positions - Materialized position / PnL state for the ledger
+
+Keeps derived state current as fills are appended instead of replaying the
+whole fills_ledger on every read:
+- ledger_positions: one doc per (user_id, bot_id, symbol) with open FIFO lots,
+  cumulative realized PnL, cumulative fees and a replay checkpoint
+- ledger_equity_state: one doc per (scope, scope_id, currency) with the
+  running cash-flow equity curve (high-water mark, max drawdown)
+
+Every doc records how many fills it has applied and the last applied fill
+(the checkpoint). Readers compare that against fills_ledger; missing fills are
+replayed from the checkpoint and out-of-order or conflicting writes mark the
+doc stale so the next read rebuilds it from scratch. verify() replays the full
+ledger in memory and diffs it against the materialized state.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+import numpy as np
+
+from services.lot_matching import FillColumns, consume_fifo, lots_deque, match_fifo
+
+logger = logging.getLogger(__name__)
+
+# Fills replayed between checkpoint writes during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+
+def position_key(doc: Dict) -> Tuple[str, str, str]:
+    """Lot-matching key of a fill or position: lots are never shared across bots"""
+    return doc.get("user_id"), doc.get("bot_id"), doc["symbol"]
+
+
+def position_label(key: Tuple[str, str, str]) -> str:
+    """Readable user/bot/symbol label (ids may be missing on legacy fills)"""
+    return "/".join(str(part) for part in key)
+
+
+def new_position(user_id: str, bot_id: str, symbol: str, exchange: Optional[str] = None) -> Dict:
+    return {
+        "user_id": user_id,
+        "bot_id": bot_id,
+        "symbol": symbol,
+        "exchange": exchange,
+        "lots": [],  # [[qty, price], ...] oldest first
+        "realized_pnl": 0.0,
+        "fees": 0.0,
+        "fill_count": 0,
+        "checkpoint": None,
+        "stale": False
+    }
+
+
+def apply_fill_to_position(position: Dict, fill: Dict) -> float:
+    """
+    Apply one fill to a position using FIFO lot matching
+
+    Sells with no open lots left are ignored (same as the legacy replay).
+    Returns the PnL realized by this fill.
+    """
+    realized = 0.0
+    if fill["side"] == "buy":
+        position["lots"].append([fill["qty"], fill["price"]])
+    elif fill["side"] == "sell":
+        lots = lots_deque(position["lots"])
+        realized, _ = consume_fifo(lots, fill["qty"], fill["price"])
+        position["lots"] = [list(lot) for lot in lots]
+
+    position["realized_pnl"] += realized
+    position["fees"] += fill.get("fee", 0) or 0
+    position["fill_count"] += 1
+    position["checkpoint"] = {"timestamp": fill["timestamp"], "fill_id": fill.get("_id")}
+    if fill.get("exchange"):
+        position["exchange"] = fill["exchange"]
+    return realized
+
+
+def apply_fills_to_positions(positions: Dict[Tuple[str, str, str], Dict], fills: List[Dict]):
+    """Apply a chronological batch of fills to positions keyed by (user_id, bot_id, symbol)"""
+    if not fills:
+        return
+    columns = FillColumns.from_fills(fills, key=position_key)
+    for key in columns.keys:
+        if key not in positions:
+            positions[key] = new_position(*key)
+    result = match_fifo(columns, initial_lots={k: positions[k]["lots"] for k in columns.keys})
+
+    realized = np.bincount(columns.key, weights=result.realized, minlength=len(columns.keys))
+    fees = np.bincount(columns.key, weights=columns.fee, minlength=len(columns.keys))
+    counts = np.bincount(columns.key, minlength=len(columns.keys))
+    for code, key in enumerate(columns.keys):
+        position = positions[key]
+        position["lots"] = [list(lot) for lot in result.open_lots[key]]
+        position["realized_pnl"] += float(realized[code])
+        position["fees"] += float(fees[code])
+        position["fill_count"] += int(counts[code])
+
+    for fill in fills:  # Last fill per key wins
+        position = positions[position_key(fill)]
+        position["checkpoint"] = {"timestamp": fill["timestamp"], "fill_id": fill.get("_id")}
+        if fill.get("exchange"):
+            position["exchange"] = fill["exchange"]
+
+
+def new_equity_state(scope: str, scope_id: str, currency: str, starting_capital: float) -> Dict:
+    return {
+        "scope": scope,
+        "scope_id": scope_id,
+        "currency": currency,
+        "starting_capital": starting_capital,
+        "cash_flow": 0.0,
+        "peak_equity": starting_capital,
+        "max_drawdown": 0.0,
+        "fill_count": 0,
+        "checkpoint": None,
+        "stale": False
+    }
+
+
+def apply_fill_to_equity(state: Dict, fill: Dict):
+    """Advance the cash-flow equity curve by one fill (buys debit, sells credit, fees debit)"""
+    trade_value = fill["qty"] * fill["price"]
+    if fill["side"] == "buy":
+        state["cash_flow"] -= trade_value
+    else:
+        state["cash_flow"] += trade_value
+    state["cash_flow"] -= fill.get("fee", 0) or 0
+
+    equity = state["starting_capital"] + state["cash_flow"]
+    if equity > state["peak_equity"]:
+        state["peak_equity"] = equity
+    peak = state["peak_equity"]
+    drawdown = (peak - equity) / peak if peak > 0 else 0
+    state["max_drawdown"] = max(state["max_drawdown"], drawdown)
+
+    state["fill_count"] += 1
+    state["checkpoint"] = {"timestamp": fill["timestamp"], "fill_id": fill.get("_id")}
+
+
+def equity_drawdown(state: Dict) -> Tuple[float, float]:
+    """(current_drawdown_pct, max_drawdown_pct) from an equity state"""
+    peak = state["peak_equity"]
+    if state["fill_count"] == 0 or peak == 0:
+        return 0.0, 0.0
+    equity = state["starting_capital"] + state["cash_flow"]
+    current = (peak - equity) / peak if peak > 0 else 0
+    return current, state["max_drawdown"]
+
+
+def _after_checkpoint(fill: Dict, checkpoint: Optional[Dict]) -> bool:
+    """True if fill sorts after the checkpoint in (timestamp, _id) order"""
+    if not checkpoint:
+        return True
+    if fill["timestamp"] != checkpoint["timestamp"]:
+        return fill["timestamp"] > checkpoint["timestamp"]
+    if checkpoint.get("fill_id") is None or fill.get("_id") is None:
+        return False
+    return fill["_id"] > checkpoint["fill_id"]
+
+
+class LedgerPositionStore:
+    """Materialized positions and equity curves derived from fills_ledger"""
+
+    def __init__(self, db):
+        self.db = db
+        self.fills_ledger = db["fills_ledger"]
+        self.ledger_events = db["ledger_events"]
+        self.positions = db["ledger_positions"]
+        self.equity_state = db["ledger_equity_state"]
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+        self._ensure_indexes()
+
+    def _ensure_indexes(self):
+        try:
+            self.positions.create_index([("user_id", 1), ("bot_id", 1), ("symbol", 1)], unique=True)
+            self.positions.create_index([("bot_id", 1)])
+            self.equity_state.create_index([("scope", 1), ("scope_id", 1), ("currency", 1)], unique=True)
+        except Exception as e:
+            logger.warning(f"Position index creation warning (may already exist): {e}")
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        # All state of one user is serialized in-process; cross-worker races are
+        # caught by the fill_count guard on writes
+        if user_id not in self._locks:
+            self._locks[user_id] = asyncio.Lock()
+        return self._locks[user_id]
+
+    # ------------------------------------------------------------------
+    # Incremental path
+    # ------------------------------------------------------------------
+
+    async def apply_fill(self, fill: Dict) -> Optional[float]:
+        """
+        Fold a freshly appended fill into the materialized state
+
+        Returns the PnL the fill realized, or None if its position was left
+        for a rebuild (stale, backdated or conflicting write).
+        """
+        user_id, bot_id, _ = position_key(fill)
+        async with self._lock(user_id):
+            realized = await self._apply_fill_to_position_doc(fill)
+            for scope, scope_id in (("user", user_id), ("bot", bot_id)):
+                if scope_id is not None:
+                    await self._apply_fill_to_equity_docs(scope, scope_id, fill)
+        return realized
+
+    async def _apply_fill_to_position_doc(self, fill: Dict) -> Optional[float]:
+        user_id, bot_id, symbol = position_key(fill)
+        key = {"user_id": user_id, "bot_id": bot_id, "symbol": symbol}
+        doc = await self.positions.find_one(key, {"_id": 0})
+
+        if doc is None:
+            doc = new_position(user_id, bot_id, symbol, fill.get("exchange"))
+        elif doc.get("stale"):
+            return None  # Rebuilt on next read
+        elif not _after_checkpoint(fill, doc.get("checkpoint")):
+            # Backdated fill changes FIFO order - replay from scratch on next read
+            await self.positions.update_one(key, {"$set": {"stale": True}})
+            return None
+
+        previous_count = doc["fill_count"]
+        realized = apply_fill_to_position(doc, fill)
+        doc["updated_at"] = datetime.utcnow()
+        if await self._guarded_replace(self.positions, key, previous_count, doc):
+            return realized
+        return None
+
+    async def _apply_fill_to_equity_docs(self, scope: str, scope_id: str, fill: Dict):
+        # Only curves that were already materialized are advanced; others are built on first read
+        docs = await self.equity_state.find({"scope": scope, "scope_id": scope_id}, {"_id": 0}).to_list(length=100)
+        for doc in docs:
+            key = {"scope": scope, "scope_id": scope_id, "currency": doc["currency"]}
+            if doc.get("stale"):
+                continue
+            if not _after_checkpoint(fill, doc.get("checkpoint")):
+                await self.equity_state.update_one(key, {"$set": {"stale": True}})
+                continue
+            previous_count = doc["fill_count"]
+            apply_fill_to_equity(doc, fill)
+            doc["updated_at"] = datetime.utcnow()
+            await self._guarded_replace(self.equity_state, key, previous_count, doc)
+
+    async def _guarded_replace(self, collection, key: Dict, previous_count: int, doc: Dict) -> bool:
+        """Write doc only if nobody else advanced it meanwhile; otherwise mark it stale"""
+        try:
+            result = await collection.replace_one(
+                {**key, "fill_count": previous_count},
+                doc,
+                upsert=previous_count == 0
+            )
+            if result.matched_count or getattr(result, "upserted_id", None) is not None:
+                return True
+        except Exception as e:
+            logger.debug(f"Materialized state write conflict for {key}: {e}")
+        await collection.update_one(key, {"$set": {"stale": True}})
+        return False
+
+    async def mark_equity_stale(self, user_id: Optional[str] = None, bot_id: Optional[str] = None):
+        """Funding changes the starting capital of a curve - force a rebuild"""
+        if user_id:
+            await self.equity_state.update_many({"scope": "user", "scope_id": user_id}, {"$set": {"stale": True}})
+        if bot_id:
+            await self.equity_state.update_many({"scope": "bot", "scope_id": bot_id}, {"$set": {"stale": True}})
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+
+    async def get_positions(self, target_field: str, target_id: str) -> List[Dict]:
+        """Position docs for a user or bot, caught up with fills_ledger"""
+        query = {target_field: target_id}
+        user_id = target_id if target_field == "user_id" else None
+
+        async def load():
+            docs = await self.positions.find(query, {"_id": 0}).to_list(length=None)
+            applied = sum(d.get("fill_count", 0) for d in docs)
+            total = await self.fills_ledger.count_documents(query)
+            return docs, applied, total
+
+        docs, applied, total = await load()
+        if applied == total and not any(d.get("stale") for d in docs):
+            return docs
+
+        if user_id is None:
+            sample = docs[0] if docs else await self.fills_ledger.find_one(query, {"user_id": 1})
+            user_id = sample["user_id"] if sample else target_id
+
+        async with self._lock(user_id):
+            docs, applied, total = await load()
+            if any(d.get("stale") for d in docs) or applied > total:
+                docs = await self.rebuild_positions(target_field, target_id)
+            elif applied < total:
+                docs = await self._replay_positions(query, docs)
+        return docs
+
+    async def get_equity_state(self, target_field: str, target_id: str, currency: str) -> Dict:
+        """Equity curve for a user or bot, caught up with fills_ledger"""
+        scope = "user" if target_field == "user_id" else "bot"
+        key = {"scope": scope, "scope_id": target_id, "currency": currency}
+        query = {target_field: target_id}
+
+        doc = await self.equity_state.find_one(key, {"_id": 0})
+        total = await self.fills_ledger.count_documents(query)
+        if doc and not doc.get("stale") and doc["fill_count"] == total:
+            return doc
+
+        if doc is None or doc.get("stale") or doc["fill_count"] > total:
+            starting_capital = await self._starting_capital(target_field, target_id, currency)
+            doc = new_equity_state(scope, target_id, currency, starting_capital)
+
+        cursor = self.fills_ledger.find(self._since_query(query, doc.get("checkpoint"))).sort(
+            [("timestamp", 1), ("_id", 1)]
+        )
+        async for fill in cursor:
+            if _after_checkpoint(fill, doc.get("checkpoint")):
+                apply_fill_to_equity(doc, fill)
+
+        doc["stale"] = False
+        doc["updated_at"] = datetime.utcnow()
+        await self.equity_state.replace_one(key, doc, upsert=True)
+        return doc
+
+    # ------------------------------------------------------------------
+    # Rebuild / consistency
+    # ------------------------------------------------------------------
+
+    async def rebuild_positions(self, target_field: str, target_id: str) -> List[Dict]:
+        """Discard and replay all positions of a user or bot from fills_ledger"""
+        query = {target_field: target_id}
+        await self.positions.delete_many(query)
+        docs = await self._replay_positions(query, [])
+        logger.info(f"Rebuilt {len(docs)} ledger positions for {target_field}={target_id}")
+        return docs
+
+    async def _replay_positions(self, query: Dict, docs: List[Dict]) -> List[Dict]:
+        """Replay fills after each position's checkpoint, persisting every REBUILD_BATCH_SIZE fills"""
+        positions = {position_key(d): d for d in docs}
+        checkpoints = [d.get("checkpoint") for d in docs]
+        start = min((c for c in checkpoints if c), key=lambda c: c["timestamp"], default=None)
+        if any(c is None for c in checkpoints):
+            start = None
+
+        batch: List[Dict] = []
+        cursor = self.fills_ledger.find(self._since_query(query, start)).sort([("timestamp", 1), ("_id", 1)])
+        async for fill in cursor:
+            position = positions.get(position_key(fill))
+            if position is not None and not _after_checkpoint(fill, position.get("checkpoint")):
+                continue
+            batch.append(fill)
+
+            # Persist progress so an interrupted rebuild resumes from here
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                await self._replay_batch(positions, batch)
+                batch = []
+
+        await self._replay_batch(positions, batch)
+        return list(positions.values())
+
+    async def _replay_batch(self, positions: Dict, batch: List[Dict]):
+        apply_fills_to_positions(positions, batch)
+        await self._save_positions(positions, {position_key(f) for f in batch})
+
+    async def _save_positions(self, positions: Dict, keys):
+        for key in keys:
+            doc = positions[key]
+            doc["stale"] = False
+            doc["updated_at"] = datetime.utcnow()
+            await self.positions.replace_one(
+                {"user_id": key[0], "bot_id": key[1], "symbol": key[2]}, doc, upsert=True
+            )
+
+    async def verify(self, target_field: str, target_id: str, tolerance: float = 1e-6) -> Dict:
+        """Replay the full ledger in memory and compare it with the materialized positions"""
+        expected: Dict[Tuple[str, str, str], Dict] = {}
+        batch: List[Dict] = []
+        cursor = self.fills_ledger.find({target_field: target_id}).sort([("timestamp", 1), ("_id", 1)])
+        async for fill in cursor:
+            batch.append(fill)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                apply_fills_to_positions(expected, batch)
+                batch = []
+        apply_fills_to_positions(expected, batch)
+
+        stored = {
+            position_key(d): d
+            for d in await self.positions.find({target_field: target_id}, {"_id": 0}).to_list(length=None)
+        }
+
+        mismatches = []
+        for key in set(expected) | set(stored):
+            exp, got = expected.get(key), stored.get(key)
+            if exp is None or got is None:
+                mismatches.append({"position": position_label(key), "issue": "missing" if got is None else "orphaned"})
+                continue
+            for field in ("realized_pnl", "fees"):
+                if abs(exp[field] - got[field]) > tolerance:
+                    mismatches.append({"position": position_label(key), "field": field,
+                                       "expected": exp[field], "materialized": got[field]})
+            exp_open = sum(q for q, _ in exp["lots"])
+            got_open = sum(q for q, _ in got["lots"])
+            if abs(exp_open - got_open) > tolerance:
+                mismatches.append({"position": position_label(key), "field": "open_qty",
+                                   "expected": exp_open, "materialized": got_open})
+
+        return {
+            "status": "ok" if not mismatches else "mismatch",
+            "positions_checked": len(expected),
+            "mismatches": mismatches
+        }
+
+    # ------------------------------------------------------------------
+
+    async def _starting_capital(self, target_field: str, target_id: str, currency: str) -> float:
+        events = await self.ledger_events.find({
+            target_field: target_id,
+            "event_type": "funding",
+            "currency": currency
+        }).to_list(length=None)
+        return sum(event.get("amount", 0) for event in events)
+
+    @staticmethod
+    def _since_query(query: Dict, checkpoint: Optional[Dict]) -> Dict:
+        if not checkpoint:
+            return query
+        return {**query, "timestamp": {"$gte": checkpoint["timestamp"]}}
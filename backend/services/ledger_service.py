@@ -7,15 +7,30 @@ This service provides the single source of truth for:
 - Derived metrics (equity, PnL, drawdown, fees)
 
 Phase 1: Read-only + parallel write (opt-in via feature flag)
+
+Derived metrics are served from materialized position state
+(services/ledger_positions.py) kept current by append_fill; the full FIFO
+replay remains as the fallback and for time-windowed queries. Profit series
+read pre-aggregated daily buckets (services/pnl_rollups.py).
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
 from bson import ObjectId
 import logging
 
+import numpy as np
+
+from services.ledger_positions import LedgerPositionStore, equity_drawdown, position_key
+from services.pnl_rollups import PnLRollupStore
+from services.lot_matching import FillColumns, match_fifo
+
 logger = logging.getLogger(__name__)
 
+# Fills held in memory at once by full-history replays
+REPLAY_BATCH_SIZE = 5000
+CHRONOLOGICAL = [("timestamp", 1), ("_id", 1)]
+
 
 class LedgerService:
     """
@@ -24,6 +39,8 @@ class LedgerService:
     Collections:
     - fills_ledger: Immutable fill records
     - ledger_events: Funding, transfer, allocation events
+    - ledger_positions / ledger_equity_state: Materialized derived state
+    - pnl_rollups: Per-day / per-hour realized PnL buckets
     """
     
     def __init__(self, db):
@@ -31,6 +48,18 @@ class LedgerService:
         self.fills_ledger = db["fills_ledger"]
         self.ledger_events = db["ledger_events"]
         
+        try:
+            self.positions = LedgerPositionStore(db)
+        except Exception as e:
+            logger.warning(f"Materialized positions disabled, falling back to full replay: {e}")
+            self.positions = None
+        
+        try:
+            self.rollups = PnLRollupStore(db)
+        except Exception as e:
+            logger.warning(f"PnL rollups disabled, profit series will replay fills: {e}")
+            self.rollups = None
+        
         # Create indexes for performance
         self._ensure_indexes()
     
@@ -96,10 +125,30 @@ class LedgerService:
             result = await self.fills_ledger.insert_one(fill_doc)
             fill_id = str(result.inserted_id)
             logger.info(f"Appended fill {fill_id} for bot {bot_id}: {side} {qty} {symbol} @ {price}")
-            return fill_id
         except Exception as e:
             logger.error(f"Failed to append fill: {e}")
             raise
+        
+        # The fill is committed; a failed state update is caught up on the next read
+        realized = None
+        if self.positions is not None:
+            try:
+                fill_doc["_id"] = result.inserted_id
+                realized = await self.positions.apply_fill(fill_doc)
+            except Exception as e:
+                logger.warning(f"Position state update deferred for fill {fill_id}: {e}")
+        
+        # Unapplied fills (e.g. backdated) can't be folded in; the next read rebuilds
+        if self.rollups is not None:
+            try:
+                if realized is None:
+                    await self.rollups.mark_stale(user_id, "ledger")
+                else:
+                    await self.rollups.record_fill(fill_doc, realized)
+            except Exception as e:
+                logger.warning(f"PnL rollup update deferred for fill {fill_id}: {e}")
+        
+        return fill_id
     
     async def append_event(
         self,
@@ -133,10 +182,17 @@ class LedgerService:
             result = await self.ledger_events.insert_one(event_doc)
             event_id = str(result.inserted_id)
             logger.info(f"Appended event {event_id}: {event_type} {amount} {currency}")
-            return event_id
         except Exception as e:
             logger.error(f"Failed to append event: {e}")
             raise
+        
+        if event_type == "funding" and self.positions is not None:
+            try:
+                await self.positions.mark_equity_stale(user_id=user_id, bot_id=bot_id)
+            except Exception as e:
+                logger.warning(f"Could not invalidate equity state after funding event {event_id}: {e}")
+        
+        return event_id
     
     async def get_fills(
         self,
@@ -169,6 +225,84 @@ class LedgerService:
         
         return fills
     
+    @staticmethod
+    async def _batches(cursor) -> AsyncIterator[List[Dict]]:
+        """Everything a cursor returns, REPLAY_BATCH_SIZE documents at a time (no cap on the total)"""
+        while True:
+            batch = await cursor.to_list(length=REPLAY_BATCH_SIZE)
+            if batch:
+                yield batch
+            if len(batch) < REPLAY_BATCH_SIZE:
+                return
+    
+    def _fill_batches(self, query: Dict, sort=CHRONOLOGICAL) -> AsyncIterator[List[Dict]]:
+        """All fills matching query in sort order, in batches"""
+        return self._batches(self.fills_ledger.find(query).sort(sort))
+    
+    async def _replay_fifo(self, query: Dict) -> Tuple[float, Dict[Hashable, List[Tuple[float, float]]], int, int]:
+        """
+        FIFO-match all fills matching query, batch by batch with open lots carried over
+        
+        Returns: (realized_pnl, open_lots per position key, wins, losses)
+        """
+        realized = 0.0
+        open_lots: Dict[Hashable, List[Tuple[float, float]]] = {}
+        wins = losses = 0
+        async for batch in self._fill_batches(query):
+            # Lots per (user, bot, symbol), as in the materialized positions
+            result = match_fifo(FillColumns.from_fills(batch, key=position_key), initial_lots=open_lots)
+            realized += result.total_realized
+            open_lots = result.open_lots
+            wins += result.wins
+            losses += result.losses
+        return realized, open_lots, wins, losses
+    
+    async def _materialized_positions(self, target_field: str, target_id: str) -> Optional[List[Dict]]:
+        """Materialized positions for a user or bot, or None to fall back to a full replay"""
+        if self.positions is None:
+            return None
+        try:
+            return await self.positions.get_positions(target_field, target_id)
+        except Exception as e:
+            logger.debug(f"Materialized positions unavailable for {target_field}={target_id}: {e}")
+            return None
+    
+    async def rebuild_positions(self, user_id: Optional[str] = None, bot_id: Optional[str] = None) -> int:
+        """
+        Rebuild materialized positions from the full fills ledger
+        
+        Returns: number of positions rebuilt
+        """
+        target_id = user_id or bot_id
+        target_field = "user_id" if user_id else "bot_id"
+        
+        if not target_id:
+            raise ValueError("Must provide either user_id or bot_id")
+        if self.positions is None:
+            raise RuntimeError("Materialized positions are not available")
+        
+        positions = await self.positions.rebuild_positions(target_field, target_id)
+        await self.positions.mark_equity_stale(user_id=user_id, bot_id=bot_id)
+        return len(positions)
+    
+    async def verify_positions(self, user_id: Optional[str] = None, bot_id: Optional[str] = None) -> Dict:
+        """
+        Compare materialized positions against a full replay of the fills ledger
+        
+        Returns: {"status": "ok" | "mismatch", "positions_checked": int, "mismatches": List[Dict]}
+        """
+        target_id = user_id or bot_id
+        target_field = "user_id" if user_id else "bot_id"
+        
+        if not target_id:
+            raise ValueError("Must provide either user_id or bot_id")
+        if self.positions is None:
+            raise RuntimeError("Materialized positions are not available")
+        
+        # Catch up first so in-flight fills are not reported as drift
+        await self.positions.get_positions(target_field, target_id)
+        return await self.positions.verify(target_field, target_id)
+    
     async def compute_equity(
         self,
         user_id: Optional[str] = None,
@@ -201,16 +335,25 @@ class LedgerService:
         
         starting_capital = sum(event.get("amount", 0) for event in funding_events)
         
-        # Get realized PnL from closed fills
-        realized_pnl = await self.compute_realized_pnl(user_id=user_id, bot_id=bot_id, currency=currency)
-        
-        # Get unrealized PnL from open positions
-        unrealized_pnl = 0
-        if include_unrealized:
-            unrealized_pnl = await self.compute_unrealized_pnl(user_id=user_id, bot_id=bot_id, currency=currency)
-        
-        # Get total fees paid
-        fees_paid = await self.compute_fees_paid(user_id=user_id, bot_id=bot_id, currency=currency)
+        positions = await self._materialized_positions(target_field, target_id)
+        if positions is not None:
+            # One read of the materialized state covers realized, unrealized and fees
+            realized_pnl = sum(p["realized_pnl"] for p in positions)
+            unrealized_pnl = 0
+            if include_unrealized:
+                unrealized_pnl = await self._mark_to_market(self._open_lots_by_symbol(positions))
+            fees_paid = sum(p["fees"] for p in positions)
+        else:
+            # Get realized PnL from closed fills
+            realized_pnl = await self.compute_realized_pnl(user_id=user_id, bot_id=bot_id, currency=currency)
+            
+            # Get unrealized PnL from open positions
+            unrealized_pnl = 0
+            if include_unrealized:
+                unrealized_pnl = await self.compute_unrealized_pnl(user_id=user_id, bot_id=bot_id, currency=currency)
+            
+            # Get total fees paid
+            fees_paid = await self.compute_fees_paid(user_id=user_id, bot_id=bot_id, currency=currency)
         
         equity = starting_capital + realized_pnl + unrealized_pnl - fees_paid
         
@@ -240,6 +383,11 @@ class LedgerService:
         if not target_id:
             raise ValueError("Must provide either user_id or bot_id")
         
+        if not (since or until):
+            positions = await self._materialized_positions(target_field, target_id)
+            if positions is not None:
+                return sum(p["realized_pnl"] for p in positions)
+        
         query = {target_field: target_id}
         if since or until:
             query["timestamp"] = {}
@@ -248,51 +396,7 @@ class LedgerService:
             if until:
                 query["timestamp"]["$lte"] = until
         
-        cursor = self.fills_ledger.find(query).sort("timestamp", 1)
-        fills = await cursor.to_list(length=10000)
-        
-        # Group by symbol
-        positions_by_symbol = {}
-        realized_pnl = 0.0
-        
-        for fill in fills:
-            symbol = fill["symbol"]
-            side = fill["side"]
-            qty = fill["qty"]
-            price = fill["price"]
-            
-            if symbol not in positions_by_symbol:
-                positions_by_symbol[symbol] = []
-            
-            if side == "buy":
-                # Add to position
-                positions_by_symbol[symbol].append({
-                    "qty": qty,
-                    "price": price
-                })
-            elif side == "sell":
-                # Close position using FIFO
-                remaining_qty = qty
-                sell_price = price
-                
-                while remaining_qty > 0 and positions_by_symbol[symbol]:
-                    buy = positions_by_symbol[symbol][0]
-                    
-                    if buy["qty"] <= remaining_qty:
-                        # Close entire buy
-                        closed_qty = buy["qty"]
-                        pnl = closed_qty * (sell_price - buy["price"])
-                        realized_pnl += pnl
-                        remaining_qty -= closed_qty
-                        positions_by_symbol[symbol].pop(0)
-                    else:
-                        # Partially close buy
-                        closed_qty = remaining_qty
-                        pnl = closed_qty * (sell_price - buy["price"])
-                        realized_pnl += pnl
-                        buy["qty"] -= closed_qty
-                        remaining_qty = 0
-        
+        realized_pnl, _, _, _ = await self._replay_fifo(query)
         return realized_pnl
     
     async def compute_unrealized_pnl(
@@ -318,51 +422,37 @@ class LedgerService:
         if not target_id:
             raise ValueError("Must provide either user_id or bot_id")
         
-        query = {target_field: target_id}
+        positions = await self._materialized_positions(target_field, target_id)
+        if positions is not None:
+            return await self._mark_to_market(self._open_lots_by_symbol(positions))
         
-        cursor = self.fills_ledger.find(query).sort("timestamp", 1)
-        fills = await cursor.to_list(length=10000)
+        query = {target_field: target_id}
         
-        # Group by symbol and calculate open positions using FIFO
+        # Open positions from FIFO matching per (user, bot, symbol), marked per symbol
+        _, open_lots, _, _ = await self._replay_fifo(query)
         positions_by_symbol = {}
+        for (_, _, symbol), lots in open_lots.items():
+            positions_by_symbol.setdefault(symbol, []).extend({"qty": qty, "price": price} for qty, price in lots)
         
-        for fill in fills:
-            symbol = fill["symbol"]
-            side = fill["side"]
-            qty = fill["qty"]
-            price = fill["price"]
-            
-            if symbol not in positions_by_symbol:
-                positions_by_symbol[symbol] = []
-            
-            if side == "buy":
-                # Add to position
-                positions_by_symbol[symbol].append({
-                    "qty": qty,
-                    "price": price
-                })
-            elif side == "sell":
-                # Close position using FIFO
-                remaining_qty = qty
-                
-                while remaining_qty > 0 and positions_by_symbol[symbol]:
-                    buy = positions_by_symbol[symbol][0]
-                    
-                    if buy["qty"] <= remaining_qty:
-                        # Close entire buy
-                        remaining_qty -= buy["qty"]
-                        positions_by_symbol[symbol].pop(0)
-                    else:
-                        # Partially close buy
-                        buy["qty"] -= remaining_qty
-                        remaining_qty = 0
-        
-        # Calculate unrealized PnL for remaining open positions
+        return await self._mark_to_market(positions_by_symbol)
+    
+    @staticmethod
+    def _open_lots_by_symbol(positions: List[Dict]) -> Dict[str, List[Dict]]:
+        """Open FIFO lots of materialized positions grouped by symbol"""
+        positions_by_symbol = {}
+        for position in positions:
+            lots = positions_by_symbol.setdefault(position["symbol"], [])
+            lots.extend({"qty": qty, "price": price} for qty, price in position["lots"])
+        return positions_by_symbol
+    
+    async def _mark_to_market(self, positions_by_symbol: Dict[str, List[Dict]]) -> float:
+        """Unrealized PnL of open lots at current mark prices"""
         unrealized_pnl = 0.0
         
         try:
             # Get price engine for mark prices
             from paper_trading_engine import paper_engine
+            from services.market_data_service import market_data_service
             
             for symbol, open_buys in positions_by_symbol.items():
                 if not open_buys:
@@ -376,7 +466,10 @@ class LedgerService:
                     else:
                         exchange = "binance"  # Default to binance for USDT pairs
                     
-                    current_price = await paper_engine.get_real_price(symbol, exchange)
+                    # Shared snapshot first; only hit the exchange when nothing recent is cached
+                    current_price = market_data_service.peek_price(exchange, symbol)
+                    if current_price is None:
+                        current_price = await paper_engine.get_real_price(symbol, exchange)
                     
                     # Calculate unrealized PnL for all open positions in this symbol
                     for buy in open_buys:
@@ -419,6 +512,11 @@ class LedgerService:
         if not target_id:
             raise ValueError("Must provide either user_id or bot_id")
         
+        if not (since or until):
+            positions = await self._materialized_positions(target_field, target_id)
+            if positions is not None:
+                return sum(p["fees"] for p in positions)
+        
         query = {target_field: target_id}
         if since or until:
             query["timestamp"] = {}
@@ -462,15 +560,12 @@ class LedgerService:
         if not target_id:
             raise ValueError("Must provide either user_id or bot_id")
         
-        # Get equity time series
-        fills = await self.get_fills(**{target_field: target_id}, limit=10000)
-        
-        if not fills:
-            return 0.0, 0.0
-        
-        # Calculate equity at each point
-        equity_series = []
-        running_equity = 0.0
+        if self.positions is not None:
+            try:
+                state = await self.positions.get_equity_state(target_field, target_id, currency)
+                return equity_drawdown(state)
+            except Exception as e:
+                logger.debug(f"Materialized equity curve unavailable for {target_field}={target_id}: {e}")
         
         # Get starting capital
         funding_query = {
@@ -482,44 +577,36 @@ class LedgerService:
         funding_events = await funding_cursor.to_list(length=1000)
         starting_capital = sum(event.get("amount", 0) for event in funding_events)
         
+        # Equity curve over the full fill history, tracking peak and drawdown as it goes
         running_equity = starting_capital
-        equity_series.append(running_equity)
+        peak = running_equity
+        max_equity = running_equity
+        max_dd = 0.0
+        has_fills = False
         
         # Simple approximation: add/subtract trade value and fees
-        for fill in reversed(fills):  # Reverse to go chronological
-            side = fill["side"]
-            qty = fill["qty"]
-            price = fill["price"]
-            fee = fill["fee"]
-            
-            trade_value = qty * price
-            
-            if side == "buy":
-                running_equity -= trade_value
-            else:  # sell
-                running_equity += trade_value
-            
-            running_equity -= fee
-            equity_series.append(running_equity)
+        async for batch in self._fill_batches({target_field: target_id}):
+            has_fills = True
+            for fill in batch:
+                trade_value = fill["qty"] * fill["price"]
+                
+                if fill["side"] == "buy":
+                    running_equity -= trade_value
+                else:  # sell
+                    running_equity += trade_value
+                
+                running_equity -= fill["fee"]
+                
+                max_equity = max(max_equity, running_equity)
+                peak = max(peak, running_equity)
+                dd = (peak - running_equity) / peak if peak > 0 else 0
+                max_dd = max(max_dd, dd)
         
-        if not equity_series or max(equity_series) == 0:
+        if not has_fills or max_equity == 0:
             return 0.0, 0.0
         
-        # Calculate drawdowns
-        peak = equity_series[0]
-        max_dd = 0.0
-        current_dd = 0.0
-        
-        for equity in equity_series:
-            if equity > peak:
-                peak = equity
-            
-            dd = (peak - equity) / peak if peak > 0 else 0
-            max_dd = max(max_dd, dd)
-        
         # Current drawdown
-        current_equity = equity_series[-1]
-        current_dd = (peak - current_equity) / peak if peak > 0 else 0
+        current_dd = (peak - running_equity) / peak if peak > 0 else 0
         
         return current_dd, max_dd
     
@@ -575,91 +662,79 @@ class LedgerService:
         else:
             raise ValueError(f"Invalid period: {period}")
         
-        # Get fills for the period
         since = datetime.utcnow() - (delta * limit)
-        fills = await self.get_fills(user_id=user_id, since=since, limit=10000)
-        
-        # Group by period
-        periods_data = {}
         
-        for fill in reversed(fills):  # Chronological order
+        if self.rollups is not None:
             try:
-                timestamp = self._normalize_timestamp(fill["timestamp"])
-            except ValueError:
-                continue  # Skip fills with invalid timestamps
-            date_key = timestamp.strftime(date_format)
+                days = await self.rollups.series(user_id, period="day", since=since, source="ledger")
+                return self._series_from_rollups(days, date_format)[-limit:]
+            except Exception as e:
+                logger.warning(f"PnL rollups unavailable, replaying fills: {e}")
+        
+        # Realized PnL, fees, volume and trade counts per period, one FIFO pass per batch
+        # of chronological fills with open lots carried over
+        totals: Dict[str, Dict[str, float]] = {}
+        open_lots: Dict[Hashable, List[Tuple[float, float]]] = {}
+        async for batch in self._fill_batches({"user_id": user_id, "timestamp": {"$gte": since}}):
+            dated_fills = []
+            date_keys = []
+            for fill in batch:
+                try:
+                    timestamp = self._normalize_timestamp(fill["timestamp"])
+                except ValueError:
+                    continue  # Skip fills with invalid timestamps
+                dated_fills.append(fill)
+                date_keys.append(timestamp.strftime(date_format))
             
-            if date_key not in periods_data:
-                periods_data[date_key] = {
-                    "date": date_key,
-                    "trades": 0,
-                    "fees": 0.0,
-                    "volume": 0.0
-                }
+            periods = sorted(set(date_keys))
+            period_index = {date_key: i for i, date_key in enumerate(periods)}
+            result = match_fifo(
+                FillColumns.from_fills(dated_fills, key=position_key),
+                initial_lots=open_lots,
+                period_codes=np.array([period_index[k] for k in date_keys], dtype=np.int64),
+                n_periods=len(periods)
+            )
+            open_lots = result.open_lots
             
-            periods_data[date_key]["trades"] += 1
-            periods_data[date_key]["fees"] += fill.get("fee", 0)
-            periods_data[date_key]["volume"] += fill["qty"] * fill["price"]
-        
-        # Calculate realized PnL per period using FIFO position tracking
-        # Tracks positions per symbol and calculates realized gains on each sell
-        positions = {}  # symbol -> [list of (qty, cost_basis)]
-        
-        # Pre-group fills by date_key for efficient processing (avoids O(n²))
-        fills_by_date = {}
-        for fill in fills:
-            try:
-                timestamp = self._normalize_timestamp(fill["timestamp"])
-            except ValueError:
-                continue  # Skip fills with invalid timestamps
-            date_key = timestamp.strftime(date_format)
-            if date_key not in fills_by_date:
-                fills_by_date[date_key] = []
-            fills_by_date[date_key].append(fill)
+            for i, date_key in enumerate(periods):
+                data = totals.setdefault(date_key, {"trades": 0, "fees": 0.0, "volume": 0.0, "realized_pnl": 0.0})
+                for field in data:
+                    data[field] += result.periods[field][i]
         
         series = []
-        for date_key in sorted(periods_data.keys()):
-            data = periods_data[date_key]
-            realized_pnl = 0.0
-            
-            # Get fills for this period (already grouped)
-            period_fills = fills_by_date.get(date_key, [])
-            
-            for fill in period_fills:
-                symbol = fill["symbol"]
-                side = fill["side"]
-                qty = fill["qty"]
-                price = fill["price"]
-                
-                if symbol not in positions:
-                    positions[symbol] = []
-                
-                if side == "buy":
-                    # Add to position
-                    positions[symbol].append((qty, price))
-                elif side == "sell":
-                    # Close position(s) and realize PnL using FIFO
-                    remaining_qty = qty
-                    while remaining_qty > 0 and positions[symbol]:
-                        pos_qty, pos_price = positions[symbol][0]
-                        
-                        if pos_qty <= remaining_qty:
-                            # Close entire position
-                            realized_pnl += (price - pos_price) * pos_qty
-                            remaining_qty -= pos_qty
-                            positions[symbol].pop(0)
-                        else:
-                            # Partial close
-                            realized_pnl += (price - pos_price) * remaining_qty
-                            positions[symbol][0] = (pos_qty - remaining_qty, pos_price)
-                            remaining_qty = 0
-            
-            data["realized_pnl"] = round(realized_pnl, 2)
+        for date_key in sorted(totals):
+            data = totals[date_key]
+            data = {
+                "date": date_key,
+                "trades": int(data["trades"]),
+                "fees": float(data["fees"]),
+                "volume": float(data["volume"]),
+                "realized_pnl": round(float(data["realized_pnl"]), 2)
+            }
             data["net_profit"] = round(data["realized_pnl"] - data["fees"], 2)
             series.append(data)
         
         return series[-limit:]
     
+    @staticmethod
+    def _series_from_rollups(days: Dict[datetime, Dict[str, float]], date_format: str) -> List[Dict]:
+        """Sum day buckets into profit_series periods"""
+        periods: Dict[str, Dict[str, float]] = {}
+        for day, totals in days.items():
+            data = periods.setdefault(day.strftime(date_format), {"trades": 0, "fees": 0.0, "volume": 0.0, "realized_pnl": 0.0})
+            data["trades"] += int(totals["trades"])
+            data["fees"] += totals["fees"]
+            data["volume"] += totals["volume"]
+            data["realized_pnl"] += totals["gross_pnl"]
+        
+        series = []
+        for date_key in sorted(periods):
+            data = {"date": date_key, **periods[date_key]}
+            data["realized_pnl"] = round(data["realized_pnl"], 2)
+            data["net_profit"] = round(data["realized_pnl"] - data["fees"], 2)
+            series.append(data)
+        return series
+    
     async def get_stats(self, user_id: str, bot_id: Optional[str] = None) -> Dict:
         """
         Get comprehensive statistics
@@ -713,64 +788,13 @@ class LedgerService:
         - When a sell occurs, match against oldest buys
         - Track each closed trade as win/loss
         - Win rate = wins / (wins + losses)
-        
-        Note: For high-volume scenarios (>10k fills), consider implementing
-        pagination or streaming to avoid memory issues.
         """
         query = {"user_id": user_id}
         if bot_id:
             query["bot_id"] = bot_id
         
-        # Get all fills ordered by timestamp
-        # For very high-volume trading, this should be paginated
-        fills = await self.get_fills(user_id=user_id, bot_id=bot_id, limit=10000)
-        
-        if not fills:
-            return None
-        
-        positions = {}  # symbol -> [(qty, cost_basis), ...]
-        winning_trades = 0
-        losing_trades = 0
-        
-        for fill in reversed(fills):  # Process chronologically
-            symbol = fill["symbol"]
-            side = fill["side"]
-            qty = fill["qty"]
-            price = fill["price"]
-            
-            if symbol not in positions:
-                positions[symbol] = []
-            
-            if side == "buy":
-                # Add to position
-                positions[symbol].append((qty, price))
-            elif side == "sell":
-                # Close position(s) and track win/loss
-                remaining_qty = qty
-                while remaining_qty > 0 and positions[symbol]:
-                    pos_qty, pos_price = positions[symbol][0]
-                    
-                    if pos_qty <= remaining_qty:
-                        # Close entire position
-                        pnl = (price - pos_price) * pos_qty
-                        if pnl > 0:
-                            winning_trades += 1
-                        elif pnl < 0:
-                            losing_trades += 1
-                        # pnl == 0 is neither win nor loss (breakeven)
-                        
-                        remaining_qty -= pos_qty
-                        positions[symbol].pop(0)
-                    else:
-                        # Partial close
-                        pnl = (price - pos_price) * remaining_qty
-                        if pnl > 0:
-                            winning_trades += 1
-                        elif pnl < 0:
-                            losing_trades += 1
-                        
-                        positions[symbol][0] = (pos_qty - remaining_qty, pos_price)
-                        remaining_qty = 0
+        # Each matched lot chunk counts as one trade; breakeven chunks are neither
+        _, _, winning_trades, losing_trades = await self._replay_fifo(query)
         
         total_trades = winning_trades + losing_trades
         if total_trades == 0:
@@ -861,48 +885,16 @@ class LedgerService:
         if not fills:
             return 0
         
-        # Group fills by symbol to track positions
-        # Simplified: Check if recent trades resulted in losses
-        # This is a simplified heuristic - proper implementation would need full position tracking
-        consecutive = 0
-        positions = {}
+        # Simplified: only positions opened within the window are tracked
+        fills.reverse()  # Process chronologically
+        result = match_fifo(FillColumns.from_fills(fills, key=position_key))
         
-        for fill in reversed(fills):  # Process chronologically
-            symbol = fill["symbol"]
-            side = fill["side"]
-            qty = fill["qty"]
-            price = fill["price"]
-            
-            if symbol not in positions:
-                positions[symbol] = []
-            
-            if side == "buy":
-                positions[symbol].append({"qty": qty, "price": price})
-            elif side == "sell" and positions[symbol]:
-                # Close position
-                remaining_qty = qty
-                trade_pnl = 0
-                
-                while remaining_qty > 0 and positions[symbol]:
-                    buy = positions[symbol][0]
-                    
-                    if buy["qty"] <= remaining_qty:
-                        closed_qty = buy["qty"]
-                        trade_pnl += closed_qty * (price - buy["price"])
-                        remaining_qty -= closed_qty
-                        positions[symbol].pop(0)
-                    else:
-                        closed_qty = remaining_qty
-                        trade_pnl += closed_qty * (price - buy["price"])
-                        buy["qty"] -= closed_qty
-                        remaining_qty = 0
-                
-                # Check if this was a loss
-                if trade_pnl < 0:
-                    consecutive += 1
-                else:
-                    # Reset counter on a win
-                    consecutive = 0
+        consecutive = 0
+        for fill, trade_pnl, closed_qty in zip(fills, result.realized, result.matched_qty):
+            if fill["side"] != "sell" or closed_qty <= 0:
+                continue
+            # Reset counter on a win
+            consecutive = consecutive + 1 if trade_pnl < 0 else 0
         
         return consecutive
     
@@ -959,17 +951,17 @@ class LedgerService:
         try:
             # Get ledger equity
             ledger_equity = await self.compute_equity(user_id)
-            ledger_fills = await self.get_fills(user_id=user_id, limit=10000)
-            ledger_fills_count = len(ledger_fills)
+            ledger_fills_count = await self.fills_ledger.count_documents({"user_id": user_id})
             
             # Get trades collection data
             trades_collection = self.db["trades"]
-            trades_cursor = trades_collection.find({"user_id": user_id})
-            trades = await trades_cursor.to_list(length=10000)
-            trades_count = len(trades)
-            
-            # Calculate equity from trades collection
-            trades_equity = sum(trade.get("profit_loss", 0) for trade in trades)
+            trades_count = 0
+            trades_equity = 0
+            async for trades in self._batches(trades_collection.find({"user_id": user_id}, {"_id": 0, "profit_loss": 1})):
+                trades_count += len(trades)
+                
+                # Calculate equity from trades collection
+                trades_equity += sum(trade.get("profit_loss", 0) for trade in trades)
             
             # Check for discrepancies
             discrepancy = abs(ledger_equity - trades_equity)
@@ -1052,29 +1044,49 @@ class LedgerService:
                 checks_failed += 1
                 issues.append(f"Equity recomputation mismatch: {equity1} vs {equity2}")
             
-            # Check 2: Get all fills
-            fills = await self.get_fills(user_id=user_id, limit=10000)
+            # Checks 2-6 over all fills, streamed newest first
+            total_fills = 0
+            fills_without_fees = 0
+            client_order_ids = 0
+            unique_client_order_ids = set()
+            is_sorted = True
+            previous_timestamp = None
+            fills_missing_fields = 0
+            required_fields = ["user_id", "bot_id", "exchange", "symbol", "side", "qty", "price", "fee", "timestamp"]
+            async for batch in self._fill_batches({"user_id": user_id}, sort=[("timestamp", -1), ("_id", -1)]):
+                for fill in batch:
+                    total_fills += 1
+                    if fill.get("fee") is None:
+                        fills_without_fees += 1
+                    if fill.get("client_order_id"):
+                        client_order_ids += 1
+                        unique_client_order_ids.add(fill["client_order_id"])
+                    timestamp = fill.get("timestamp")
+                    if previous_timestamp is not None and timestamp is not None:
+                        try:
+                            is_sorted = is_sorted and previous_timestamp >= timestamp
+                        except TypeError:
+                            is_sorted = False
+                    previous_timestamp = timestamp
+                    if any(field not in fill for field in required_fields):
+                        fills_missing_fields += 1
             
             # Check 3: All fills have fees
-            fills_without_fees = [f for f in fills if f.get("fee") is None]
             if not fills_without_fees:
                 checks_passed += 1
             else:
                 checks_failed += 1
-                issues.append(f"{len(fills_without_fees)} fills missing fee information")
+                issues.append(f"{fills_without_fees} fills missing fee information")
             
             # Check 4: No duplicate client_order_ids
-            client_order_ids = [f.get("client_order_id") for f in fills if f.get("client_order_id")]
-            if len(client_order_ids) == len(set(client_order_ids)):
+            if client_order_ids == len(unique_client_order_ids):
                 checks_passed += 1
             else:
                 checks_failed += 1
-                duplicates = len(client_order_ids) - len(set(client_order_ids))
+                duplicates = client_order_ids - len(unique_client_order_ids)
                 issues.append(f"{duplicates} duplicate client_order_ids found")
             
             # Check 5: Chronological ordering
-            timestamps = [f["timestamp"] for f in fills]
-            is_sorted = all(timestamps[i] >= timestamps[i+1] for i in range(len(timestamps)-1))
             if is_sorted:
                 checks_passed += 1
             else:
@@ -1082,18 +1094,22 @@ class LedgerService:
                 issues.append("Fills are not in chronological order")
             
             # Check 6: Required fields present
-            required_fields = ["user_id", "bot_id", "exchange", "symbol", "side", "qty", "price", "fee", "timestamp"]
-            fills_missing_fields = []
-            for fill in fills:
-                missing = [field for field in required_fields if field not in fill]
-                if missing:
-                    fills_missing_fields.append((fill.get("_id"), missing))
-            
             if not fills_missing_fields:
                 checks_passed += 1
             else:
                 checks_failed += 1
-                issues.append(f"{len(fills_missing_fields)} fills missing required fields")
+                issues.append(f"{fills_missing_fields} fills missing required fields")
+            
+            # Check 7: Materialized positions match a full replay
+            try:
+                position_check = await self.verify_positions(user_id=user_id)
+                if position_check["status"] == "ok":
+                    checks_passed += 1
+                else:
+                    checks_failed += 1
+                    issues.append(f"{len(position_check['mismatches'])} materialized position mismatches (run rebuild_positions)")
+            except Exception as e:
+                logger.debug(f"Position consistency check skipped: {e}")
             
             # Determine status
             if checks_failed == 0:
@@ -1110,7 +1126,7 @@ class LedgerService:
                 "total_checks": checks_passed + checks_failed,
                 "issues": issues if issues else ["All integrity checks passed"],
                 "details": {
-                    "total_fills": len(fills),
+                    "total_fills": total_fills,
                     "equity": round(equity1, 2),
                     "user_id": user_id
                 },
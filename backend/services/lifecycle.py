@@ -48,12 +48,26 @@ class LifecycleManager:
             'enable_ccxt': env_bool('ENABLE_CCXT', True),
             'enable_schedulers': env_bool('ENABLE_SCHEDULERS', False),
             'disable_ai_bodyguard': env_bool('DISABLE_AI_BODYGUARD', False),
+            'enable_market_stream': env_bool('ENABLE_MARKET_STREAM', False),
         }
         logger.info(f"🎚️ Feature flags: {self.feature_flags}")
         
     def _register_subsystems(self):
         """Register all subsystems in startup order"""
         self.subsystems = [
+            # Write-Behind Buffer (first up, last down: drains after every writer has stopped)
+            SubsystemDefinition(
+                name="Write-Behind Buffer",
+                module_path="services.write_behind",
+                instance_name="write_behind"
+            ),
+            # Market Data Stream (before anything that reads prices)
+            SubsystemDefinition(
+                name="Market Data Stream",
+                module_path="services.market_stream_service",
+                instance_name="market_stream_service",
+                enabled_flag="enable_market_stream"
+            ),
             # Autopilot Engine
             SubsystemDefinition(
                 name="Autopilot Engine",
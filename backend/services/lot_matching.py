@@ -0,0 +1,203 @@
+"""
+Lot Matching - Shared FIFO lot-matching engine for ledger analytics
+
+Fills are matched per position key (symbol, or any hashable key such as
+(user_id, bot_id, symbol)) from columnar NumPy arrays instead of per-fill
+dicts:
+- Consumption is a clamped cumulative sum of sell quantity (sells beyond the
+  open lots are dropped, as in the original loops), computed with a running
+  minimum
+- Lot/sell overlaps come from merging the cumulative buy and sell breakpoints,
+  so realized PnL per fill, wins/losses, open lots and per-period aggregates
+  all fall out of one pass without Python-level loops over fills
+
+consume_fifo() is the incremental counterpart for applying a single fill to a
+deque of open lots.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+# Overlaps / remainders smaller than this are float residue, not lots
+QTY_EPSILON = 1e-12
+
+
+@dataclass
+class FillColumns:
+    """Fills as parallel arrays, in processing (chronological) order"""
+    timestamp: np.ndarray
+    side: np.ndarray       # int8: SIDE_BUY / SIDE_SELL / 0 (ignored)
+    qty: np.ndarray        # float64
+    price: np.ndarray      # float64
+    fee: np.ndarray        # float64
+    key: np.ndarray        # int32 code into keys
+    keys: List[Hashable] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.qty)
+
+    @classmethod
+    def from_fills(
+        cls,
+        fills: Iterable[Dict],
+        key: Callable[[Dict], Hashable] = lambda fill: fill["symbol"]
+    ) -> "FillColumns":
+        fills = list(fills)
+        codes: Dict[Hashable, int] = {}
+        key_codes = [codes.setdefault(key(f), len(codes)) for f in fills]
+        sides = {"buy": SIDE_BUY, "sell": SIDE_SELL}
+
+        return cls(
+            timestamp=np.array([f.get("timestamp") for f in fills], dtype=object),
+            side=np.array([sides.get(f["side"], 0) for f in fills], dtype=np.int8),
+            qty=np.array([f["qty"] for f in fills], dtype=np.float64),
+            price=np.array([f["price"] for f in fills], dtype=np.float64),
+            fee=np.array([f.get("fee", 0) or 0 for f in fills], dtype=np.float64),
+            key=np.array(key_codes, dtype=np.int32),
+            keys=list(codes)
+        )
+
+
+@dataclass
+class LotMatchResult:
+    realized: np.ndarray                 # Realized PnL per fill (0 for buys)
+    matched_qty: np.ndarray              # Quantity closed per fill (0 for buys)
+    open_lots: Dict[Hashable, List[Tuple[float, float]]]  # key -> [(qty, price)] oldest first
+    wins: int                            # Matched lot chunks closed in profit
+    losses: int                          # Matched lot chunks closed at a loss
+    periods: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def total_realized(self) -> float:
+        return float(self.realized.sum())
+
+
+def match_fifo(
+    fills: FillColumns,
+    initial_lots: Optional[Dict[Hashable, List[Tuple[float, float]]]] = None,
+    period_codes: Optional[np.ndarray] = None,
+    n_periods: Optional[int] = None
+) -> LotMatchResult:
+    """
+    FIFO-match fills per key
+
+    Args:
+        fills: Fills in chronological order
+        initial_lots: Lots already open before the first fill, per key
+        period_codes: Optional period index per fill (-1 to exclude) for
+            per-period realized / fees / volume / trade aggregates
+        n_periods: Number of periods (defaults to max code + 1)
+    """
+    initial_lots = initial_lots or {}
+    n = len(fills)
+    realized = np.zeros(n, dtype=np.float64)
+    matched_qty = np.zeros(n, dtype=np.float64)
+    open_lots: Dict[Hashable, List[Tuple[float, float]]] = {}
+    wins = losses = 0
+
+    key_codes = {k: code for code, k in enumerate(fills.keys)}
+    all_keys = list(fills.keys) + [k for k in initial_lots if k not in key_codes]
+
+    for key in all_keys:
+        code = key_codes.get(key)
+        idx = np.flatnonzero(fills.key == code) if code is not None else np.empty(0, dtype=np.int64)
+        init = initial_lots.get(key) or []
+        init_qty = np.array([lot[0] for lot in init], dtype=np.float64)
+        init_price = np.array([lot[1] for lot in init], dtype=np.float64)
+
+        side = fills.side[idx]
+        is_buy = side == SIDE_BUY
+        is_sell = side == SIDE_SELL
+        buy_idx = idx[is_buy]
+        sell_idx = idx[is_sell]
+
+        lot_qty = np.concatenate([init_qty, fills.qty[buy_idx]])
+        lot_price = np.concatenate([init_price, fills.price[buy_idx]])
+        lot_end = np.cumsum(lot_qty)
+
+        consumed = 0.0
+        if len(sell_idx) and len(lot_qty):
+            # Quantity bought so far at each sell, and the clamped cumulative quantity sold
+            bought = init_qty.sum() + np.cumsum(np.where(is_buy, fills.qty[idx], 0.0))[is_sell]
+            sold = np.cumsum(fills.qty[sell_idx])
+            closed = sold + np.minimum(0.0, np.minimum.accumulate(bought - sold))
+            consumed = float(closed[-1])
+
+            # Segments between consecutive breakpoints belong to exactly one lot and one sell
+            bounds = np.unique(np.concatenate([[0.0], lot_end, closed]))
+            bounds = bounds[bounds <= consumed]
+            lengths = np.diff(bounds)
+            keep = lengths > QTY_EPSILON
+            lengths = lengths[keep]
+            mids = bounds[:-1][keep] + lengths / 2
+
+            lot = np.searchsorted(lot_end, mids, side="right")
+            sell = np.searchsorted(closed, mids, side="left")
+            pnl = lengths * (fills.price[sell_idx][sell] - lot_price[lot])
+
+            realized[sell_idx] = np.bincount(sell, weights=pnl, minlength=len(sell_idx))
+            matched_qty[sell_idx] = np.diff(closed, prepend=0.0)
+            wins += int(np.count_nonzero(pnl > 0))
+            losses += int(np.count_nonzero(pnl < 0))
+
+        remaining = lot_end - np.maximum(lot_end - lot_qty, consumed)
+        still_open = remaining > QTY_EPSILON
+        open_lots[key] = list(zip(remaining[still_open].tolist(), lot_price[still_open].tolist()))
+
+    periods = None
+    if period_codes is not None:
+        period_codes = np.asarray(period_codes)
+        valid = period_codes >= 0
+        size = n_periods if n_periods is not None else int(period_codes.max(initial=-1)) + 1
+        codes = period_codes[valid]
+
+        def total(weights):
+            return np.bincount(codes, weights=weights[valid], minlength=size)
+
+        periods = {
+            "realized_pnl": total(realized),
+            "fees": total(fills.fee),
+            "volume": total(fills.qty * fills.price),
+            "trades": np.bincount(codes, minlength=size)
+        }
+
+    return LotMatchResult(
+        realized=realized,
+        matched_qty=matched_qty,
+        open_lots=open_lots,
+        wins=wins,
+        losses=losses,
+        periods=periods
+    )
+
+
+def consume_fifo(lots: Deque[List[float]], qty: float, price: float) -> Tuple[float, float]:
+    """
+    Close up to qty against a deque of open [qty, price] lots, oldest first
+
+    Returns: (realized_pnl, matched_qty)
+    """
+    remaining_qty = qty
+    realized = 0.0
+    while remaining_qty > 0 and lots:
+        lot = lots[0]
+        if lot[0] <= remaining_qty:
+            realized += lot[0] * (price - lot[1])
+            remaining_qty -= lot[0]
+            lots.popleft()
+        else:
+            realized += remaining_qty * (price - lot[1])
+            lot[0] -= remaining_qty
+            remaining_qty = 0
+    return realized, qty - remaining_qty
+
+
+def lots_deque(lots: Iterable) -> Deque[List[float]]:
+    """Mutable lot queue from stored [(qty, price), ...]"""
+    return deque([float(q), float(p)] for q, p in lots)
@@ -0,0 +1,226 @@
+"""
+Market Data Service - Shared ticker/OHLCV snapshot cache
+
+Single read path for market data used by the paper engine, regime detection,
+ledger mark-to-market and the wallet manager:
+- TTL cache per (exchange, symbol) ticker, per (exchange, symbol, timeframe, limit)
+  OHLCV and per (exchange, symbol) L2 order book
+- Request coalescing: at most one in-flight fetch per key
+- Stale-while-revalidate: within the stale window a cached value is returned
+  immediately and refreshed in the background
+- Every network fetch first acquires request weight from the shared exchange
+  rate limiter, so cache misses across workers stay inside exchange budgets
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from rate_limiter import RateLimitExceeded, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+# Cache key kind -> ccxt endpoint charged against the exchange's request weight
+KIND_ENDPOINTS = {
+    "ticker": "fetch_ticker",
+    "ohlcv": "fetch_ohlcv",
+    "order_book": "fetch_order_book",
+}
+
+
+class _CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class MarketDataService:
+    """TTL + stale-while-revalidate cache with per-key request coalescing"""
+
+    def __init__(
+        self,
+        ticker_ttl: float = 5.0,
+        ohlcv_ttl: float = 60.0,
+        order_book_ttl: float = 2.0,
+        stale_window: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+        limiter=None
+    ):
+        """
+        Args:
+            ticker_ttl: Seconds a ticker is considered fresh
+            ohlcv_ttl: Seconds an OHLCV series is considered fresh
+            order_book_ttl: Seconds an L2 order book is considered fresh
+            stale_window: Extra seconds past the TTL during which a stale value
+                is served while a background refresh runs
+            clock: Monotonic clock (injectable for tests)
+            limiter: RateLimiter fetches acquire from (None = unlimited)
+        """
+        self.ticker_ttl = ticker_ttl
+        self.ohlcv_ttl = ohlcv_ttl
+        self.order_book_ttl = order_book_ttl
+        self.stale_window = stale_window
+        self._clock = clock
+        self.limiter = limiter
+
+        self._entries: Dict[Tuple, _CacheEntry] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "fetches": 0,
+            "fetch_errors": 0,
+            "rate_limited": 0
+        }
+
+    @staticmethod
+    def ticker_key(exchange: str, symbol: str) -> Tuple:
+        return ("ticker", (exchange or "").lower(), symbol)
+
+    @staticmethod
+    def ohlcv_key(exchange: str, symbol: str, timeframe: str, limit: int) -> Tuple:
+        return ("ohlcv", (exchange or "").lower(), symbol, timeframe, limit)
+
+    @staticmethod
+    def order_book_key(exchange: str, symbol: str) -> Tuple:
+        return ("order_book", (exchange or "").lower(), symbol)
+
+    async def get_ticker(self, exchange: str, symbol: str, fetch: Fetcher) -> Dict:
+        """Get a ticker dict, calling fetch() only on a cache miss"""
+        return await self._get(self.ticker_key(exchange, symbol), self.ticker_ttl, fetch)
+
+    async def get_ohlcv(
+        self,
+        exchange: str,
+        symbol: str,
+        timeframe: str,
+        limit: int,
+        fetch: Fetcher
+    ) -> list:
+        """Get an OHLCV list, calling fetch() only on a cache miss"""
+        return await self._get(self.ohlcv_key(exchange, symbol, timeframe, limit), self.ohlcv_ttl, fetch)
+
+    async def get_order_book(self, exchange: str, symbol: str, fetch: Fetcher) -> Dict:
+        """Get an L2 order book dict (bids/asks), calling fetch() only on a cache miss"""
+        return await self._get(self.order_book_key(exchange, symbol), self.order_book_ttl, fetch)
+
+    def peek_order_book(self, exchange: str, symbol: str) -> Optional[Dict]:
+        """Return a fresh cached order book without fetching (None if absent or past its TTL)"""
+        entry = self._entries.get(self.order_book_key(exchange, symbol))
+        if entry is None or self._clock() - entry.fetched_at >= self.order_book_ttl:
+            return None
+        return entry.value
+
+    def put_order_book(self, exchange: str, symbol: str, order_book: Dict):
+        """Seed the cache with an order book obtained elsewhere (e.g. a batched fetch)"""
+        self._entries[self.order_book_key(exchange, symbol)] = _CacheEntry(order_book, self._clock())
+
+    def peek_ticker(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Return a cached ticker without fetching (None if absent or older than max_age)"""
+        entry = self._entries.get(self.ticker_key(exchange, symbol))
+        if entry is None:
+            return None
+        age = self._clock() - entry.fetched_at
+        if max_age is None:
+            max_age = self.ticker_ttl + self.stale_window
+        return entry.value if age <= max_age else None
+
+    def peek_price(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Last traded price from a cached ticker, without network access"""
+        ticker = self.peek_ticker(exchange, symbol, max_age)
+        return self.price_from_ticker(ticker) if ticker else None
+
+    @staticmethod
+    def price_from_ticker(ticker: Dict) -> Optional[float]:
+        price = ticker.get('last') or ticker.get('close') or ticker.get('bid')
+        if price is None or price <= 0:
+            return None
+        return float(price)
+
+    def put_ticker(self, exchange: str, symbol: str, ticker: Dict):
+        """Seed the cache with a ticker obtained elsewhere (e.g. a stream)"""
+        self._entries[self.ticker_key(exchange, symbol)] = _CacheEntry(ticker, self._clock())
+
+    def invalidate(self, exchange: Optional[str] = None, symbol: Optional[str] = None):
+        """Drop cached entries, optionally filtered by exchange and/or symbol"""
+        for key in list(self._entries.keys()):
+            if exchange is not None and key[1] != exchange.lower():
+                continue
+            if symbol is not None and key[2] != symbol:
+                continue
+            del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight)
+        }
+
+    async def _get(self, key: Tuple, ttl: float, fetch: Fetcher) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = self._clock() - entry.fetched_at
+            if age < ttl:
+                self.stats["hits"] += 1
+                return entry.value
+            if age < ttl + self.stale_window:
+                self.stats["stale_hits"] += 1
+                self._refresh(key, fetch)
+                return entry.value
+
+        self.stats["misses"] += 1
+        future = self._refresh(key, fetch)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if entry is not None:
+                # Expired but better than nothing - caller keeps working on the last snapshot
+                return entry.value
+            raise
+
+    def _refresh(self, key: Tuple, fetch: Fetcher) -> asyncio.Future:
+        """Start (or join) the single in-flight fetch for a key"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+
+        future = asyncio.ensure_future(self._fetch(key, fetch))
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._on_fetch_done(key, f))
+        return future
+
+    async def _fetch(self, key: Tuple, fetch: Fetcher) -> Any:
+        if self.limiter is not None:
+            allowed, reason = await self.limiter.acquire(key[1], KIND_ENDPOINTS[key[0]])
+            if not allowed:
+                self.stats["rate_limited"] += 1
+                raise RateLimitExceeded(reason)
+        self.stats["fetches"] += 1
+        value = await fetch()
+        self._entries[key] = _CacheEntry(value, self._clock())
+        return value
+
+    def _on_fetch_done(self, key: Tuple, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled():
+            return
+        error = future.exception()  # Mark retrieved so background refresh failures don't warn
+        if error is not None:
+            self.stats["fetch_errors"] += 1
+            logger.debug(f"Market data fetch failed for {key}: {error}")
+
+
+# Global singleton
+market_data_service = MarketDataService(limiter=rate_limiter)
@@ -0,0 +1,387 @@
+"""
+Market Stream Service - Streaming ticker / top-of-book ingestion
+
+Optional replacement for REST ticker polling (ENABLE_MARKET_STREAM=1):
+- One background task per exchange holds a live subscription
+  (ccxt.pro watch_ticker, watch_order_book where the exchange has no ticker
+  stream, or a raw websocket feed)
+- Keeps an in-memory last-price / best-bid-ask table that get_real_price,
+  the OFI calculator and the regime detector read with zero network latency
+- Every tick is mirrored into the shared market data cache
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from services.market_data_service import market_data_service
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError:
+    ccxtpro = None
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+@dataclass
+class TopOfBook:
+    """Latest streamed quote for one (exchange, symbol)"""
+    exchange: str
+    symbol: str
+    last: Optional[float]
+    bid: Optional[float]
+    bid_qty: Optional[float]
+    ask: Optional[float]
+    ask_qty: Optional[float]
+    received_at: float  # time.monotonic() when the tick arrived
+
+    @property
+    def price(self) -> Optional[float]:
+        if self.last:
+            return self.last
+        if self.bid and self.ask:
+            return (self.bid + self.ask) / 2
+        return self.bid or self.ask
+
+    def to_ticker(self) -> Dict:
+        """ccxt-style ticker dict"""
+        return {
+            'symbol': self.symbol,
+            'last': self.price,
+            'bid': self.bid,
+            'bidVolume': self.bid_qty,
+            'ask': self.ask,
+            'askVolume': self.ask_qty
+        }
+
+
+TickCallback = Callable[[TopOfBook], Awaitable[None]]
+
+
+class CcxtProTickerSource:
+    """Streams tickers for a set of symbols through ccxt.pro watch_ticker"""
+
+    REQUIRES = 'watchTicker'  # exchange.has capability this source needs
+
+    def __init__(self, exchange_id: str, symbols: List[str]):
+        self.exchange_id = exchange_id
+        self.symbols = symbols
+        self.exchange = None
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        if ccxtpro is None:
+            raise RuntimeError("ccxt.pro not available")
+
+        self.exchange = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True})
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+
+        async def watch(symbol: str):
+            try:
+                while True:
+                    _put_dropping_oldest(queue, await self._watch(symbol))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _put_dropping_oldest(queue, e)  # Surface the watcher's error to the reconnect loop
+
+        watchers = [asyncio.create_task(watch(symbol)) for symbol in self.symbols]
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+            await self.close()
+
+    async def close(self):
+        if self.exchange is not None:
+            try:
+                await self.exchange.close()
+            except Exception as e:
+                logger.debug(f"Error closing {self.exchange_id} stream: {e}")
+            self.exchange = None
+
+    async def _watch(self, symbol: str) -> Dict:
+        return await self.exchange.watch_ticker(symbol)
+
+
+class CcxtProOrderBookSource(CcxtProTickerSource):
+    """
+    Streams top of book through ccxt.pro watch_order_book
+
+    For exchanges without a ticker stream (Luno): each book update becomes a
+    ticker dict with best bid/ask and their sizes; the price is the mid.
+    """
+
+    REQUIRES = 'watchOrderBook'
+
+    async def _watch(self, symbol: str) -> Dict:
+        book = await self.exchange.watch_order_book(symbol)
+        bids, asks = book.get('bids') or [], book.get('asks') or []
+        return {
+            'symbol': symbol,
+            'last': None,
+            'bid': bids[0][0] if bids else None,
+            'bidVolume': bids[0][1] if bids else None,
+            'ask': asks[0][0] if asks else None,
+            'askVolume': asks[0][1] if asks else None
+        }
+
+
+def create_ccxtpro_source(exchange_id: str, symbols: List[str]):
+    """Ticker source if the exchange streams tickers, else order-book source, else None"""
+    if ccxtpro is None or not hasattr(ccxtpro, exchange_id):
+        return None
+    has = getattr(ccxtpro, exchange_id)().has
+    for source_class in (CcxtProTickerSource, CcxtProOrderBookSource):
+        if has.get(source_class.REQUIRES):
+            return source_class(exchange_id, symbols)
+    return None
+
+
+class WebSocketTickerSource:
+    """
+    Streams tickers from a raw websocket feed
+
+    Messages are JSON objects parsed by `parse` into ccxt-style ticker dicts
+    (symbol, last, bid, bidVolume, ask, askVolume). The default parser expects
+    that shape directly; return None from `parse` to skip a message.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        subscribe_message: Optional[Dict] = None,
+        parse: Optional[Callable[[Dict], Optional[Dict]]] = None
+    ):
+        self.url = url
+        self.subscribe_message = subscribe_message
+        self.parse = parse or (lambda message: message if 'symbol' in message else None)
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        if websockets is None:
+            raise RuntimeError("websockets not available")
+
+        async with websockets.connect(self.url) as connection:
+            if self.subscribe_message is not None:
+                await connection.send(json.dumps(self.subscribe_message))
+
+            async for raw in connection:
+                try:
+                    ticker = self.parse(json.loads(raw))
+                except (ValueError, TypeError) as e:
+                    logger.debug(f"Unparseable stream message from {self.url}: {e}")
+                    continue
+                if ticker:
+                    yield ticker
+
+
+class MarketStreamService:
+    """Holds live subscriptions and the in-memory top-of-book table"""
+
+    def __init__(self, max_age: float = 10.0, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        """
+        Args:
+            max_age: Seconds after which a streamed quote is ignored by readers
+            reconnect_delay: Initial backoff after a dropped subscription
+            max_reconnect_delay: Backoff ceiling
+        """
+        self.max_age = max_age
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.sources: Dict[str, object] = {}
+        self.book: Dict[Tuple[str, str], TopOfBook] = {}
+        self.subscribers: List[TickCallback] = []
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.background_tasks: Set[asyncio.Task] = set()  # History backfills started from ticks
+        self.is_running = False
+        self.tick_count = 0
+
+    def add_source(self, exchange: str, source):
+        """Register the stream source for an exchange (one per exchange)"""
+        self.sources[exchange.lower()] = source
+
+    def subscribe(self, callback: TickCallback):
+        """Register an async callback invoked for every tick"""
+        self.subscribers.append(callback)
+
+    def get_top_of_book(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> Optional[TopOfBook]:
+        """Latest quote for (exchange, symbol), or None if missing or stale"""
+        quote = self.book.get(((exchange or '').lower(), symbol))
+        if quote is None:
+            return None
+        if max_age is None:
+            max_age = self.max_age
+        if time.monotonic() - quote.received_at > max_age:
+            return None
+        return quote
+
+    def get_price(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Latest streamed price, or None so callers fall back to REST"""
+        if not self.is_running:
+            return None
+        quote = self.get_top_of_book(exchange, symbol, max_age)
+        return quote.price if quote else None
+
+    async def start(self):
+        """Start one ingestion task per configured exchange"""
+        if self.is_running:
+            return
+
+        if not self.sources:
+            self._configure_default_sources()
+        if not self.subscribers:
+            self._subscribe_default_consumers()
+
+        self.is_running = True
+        for exchange, source in self.sources.items():
+            self.tasks[exchange] = asyncio.create_task(self._run_source(exchange, source))
+
+        logger.info(f"📡 Market stream started for {', '.join(self.sources) or 'no exchanges'}")
+
+    async def stop(self):
+        """Cancel ingestion tasks and close connections"""
+        self.is_running = False
+        tasks = list(self.tasks.values()) + list(self.background_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
+        self.background_tasks.clear()
+        logger.info("📡 Market stream stopped")
+
+    async def handle_tick(self, exchange: str, ticker: Dict):
+        """Apply one normalized ticker to the table and fan it out"""
+        symbol = ticker.get('symbol')
+        if not symbol:
+            return
+
+        quote = TopOfBook(
+            exchange=exchange,
+            symbol=symbol,
+            last=_as_float(ticker.get('last') or ticker.get('close')),
+            bid=_as_float(ticker.get('bid')),
+            bid_qty=_as_float(ticker.get('bidVolume')),
+            ask=_as_float(ticker.get('ask')),
+            ask_qty=_as_float(ticker.get('askVolume')),
+            received_at=time.monotonic()
+        )
+        self.book[(exchange, symbol)] = quote
+        self.tick_count += 1
+
+        if quote.price:
+            market_data_service.put_ticker(exchange, symbol, quote.to_ticker())
+
+        for callback in self.subscribers:
+            try:
+                await callback(quote)
+            except Exception as e:
+                logger.warning(f"Market stream subscriber error: {e}")
+
+    def get_status(self) -> Dict:
+        return {
+            "is_running": self.is_running,
+            "exchanges": {
+                exchange: not task.done() for exchange, task in self.tasks.items()
+            },
+            "symbols": len(self.book),
+            "ticks": self.tick_count
+        }
+
+    async def _run_source(self, exchange: str, source):
+        delay = self.reconnect_delay
+        while self.is_running:
+            try:
+                async for ticker in source.stream():
+                    await self.handle_tick(exchange, ticker)
+                    delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Market stream for {exchange} dropped: {e} - reconnecting in {delay:.0f}s")
+            if not self.is_running:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _configure_default_sources(self):
+        from config import PAPER_SUPPORTED_EXCHANGES
+        from paper_trading_engine import PaperTradingEngine
+
+        default_pairs = {
+            'luno': PaperTradingEngine.LUNO_PAIRS,
+            'binance': PaperTradingEngine.BINANCE_PAIRS,
+            'kucoin': PaperTradingEngine.KUCOIN_PAIRS
+        }
+        for exchange in PAPER_SUPPORTED_EXCHANGES:
+            if exchange not in default_pairs:
+                continue
+            source = create_ccxtpro_source(exchange, default_pairs[exchange])
+            if source is None:
+                logger.warning(f"No ccxt.pro ticker or order book stream for {exchange}, not streaming it")
+                continue
+            self.add_source(exchange, source)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def _subscribe_default_consumers(self, regime_sample_seconds: float = 5.0):
+        """Feed OFI with every top-of-book change and the regime detector with sampled prices"""
+        from engines.order_flow_imbalance import ofi_calculator
+        from engines.regime_detector import regime_detector
+
+        last_regime_sample: Dict[Tuple[str, str], float] = {}
+
+        async def feed_ofi(quote: TopOfBook):
+            if quote.bid and quote.ask and quote.bid_qty is not None and quote.ask_qty is not None:
+                await ofi_calculator.add_snapshot(
+                    quote.symbol, quote.bid, quote.bid_qty, quote.ask, quote.ask_qty
+                )
+
+        async def feed_regime(quote: TopOfBook):
+            key = (quote.exchange, quote.symbol)
+            if quote.received_at - last_regime_sample.get(key, float('-inf')) < regime_sample_seconds:
+                return
+            if key not in last_regime_sample:
+                # Backfill off the tick path; ticks appended meanwhile stay behind the candles
+                self._spawn(regime_detector.load_history(quote.symbol, quote.exchange))
+            last_regime_sample[key] = quote.received_at
+            if quote.price:
+                await regime_detector.update_price_data(quote.symbol, quote.price)
+
+        self.subscribe(feed_ofi)
+        self.subscribe(feed_regime)
+
+
+def _put_dropping_oldest(queue: asyncio.Queue, item):
+    """Enqueue without blocking, dropping the oldest item when full"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+def _as_float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Global singleton
+market_stream_service = MarketStreamService()
@@ -8,6 +8,7 @@ import logging
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional, List
 import database as db
+from utils.timestamps import parse_timestamp, with_timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -59,13 +60,9 @@ class MetricsService:
             total_profit = gross_profit - total_injections
             
             # Calculate 24h change from actual trades
-            twenty_four_hours_ago = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+            twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
             recent_trades_cursor = db.trades_collection.find(
-                {
-                    "user_id": user_id,
-                    "status": "closed",
-                    "timestamp": {"$gte": twenty_four_hours_ago}
-                },
+                with_timestamp_range({"user_id": user_id, "status": "closed"}, twenty_four_hours_ago),
                 {"_id": 0, "profit_loss": 1}
             )
             recent_trades = await recent_trades_cursor.to_list(10000)
@@ -192,13 +189,9 @@ class MetricsService:
             
             # Get all trades in range
             trades_cursor = db.trades_collection.find(
-                {
-                    "user_id": user_id,
-                    "status": "closed",
-                    "timestamp": {"$gte": start_time.isoformat()}
-                },
+                with_timestamp_range({"user_id": user_id, "status": "closed"}, start_time),
                 {"_id": 0, "timestamp": 1, "profit_loss": 1}
-            ).sort("timestamp", 1)
+            ).sort("timestamp", 1)  # BSON orders legacy strings (older) before datetimes
             
             trades = await trades_cursor.to_list(10000)
             
@@ -233,7 +226,9 @@ class MetricsService:
             bucket_trades = []
             
             for trade in trades:
-                trade_time = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
+                trade_time = parse_timestamp(trade.get('timestamp'))
+                if trade_time is None:
+                    continue
                 
                 # Close buckets that are complete
                 while trade_time >= current_bucket_start + interval_delta:
@@ -0,0 +1,254 @@
+"""
+Order Book Service - L2 depth fill simulation for paper trading
+
+Replaces flat slippage assumptions with the volume-weighted fill price of
+walking the actual order book for the actual order size:
+- Books are cached per (exchange, symbol) in market_data_service (TTL,
+  stale-while-revalidate, one in-flight fetch per book)
+- On exchanges that support fetchOrderBooks, concurrent requests for
+  different symbols are batched into one call
+- A recorded snapshot file (ORDER_BOOK_SNAPSHOT_PATH, or load_snapshot() in
+  tests) takes precedence over the network, for offline / replayed runs
+
+walk_book() is the pure fill computation; round_trip_slippage() is the
+entry + exit slippage model shared by the paper engine and the simulator.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.market_data_service import market_data_service
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests arriving within this window share one fetchOrderBooks call
+BATCH_WINDOW_SECONDS = 0.02
+
+
+@dataclass
+class FillEstimate:
+    side: str
+    requested: float           # Base quantity, or quote amount for quote-sized orders
+    filled_qty: float          # Base quantity filled
+    avg_price: float           # Volume-weighted fill price
+    mid_price: float
+    best_price: float          # Top of book on the side walked
+    slippage_rate: float       # Adverse cost vs mid as a fraction (includes half the spread)
+    levels_used: int
+    exhausted: bool            # Order was larger than the visible book
+
+    @property
+    def notional(self) -> float:
+        return self.filled_qty * self.avg_price
+
+
+def walk_book(
+    order_book: Dict,
+    side: str,
+    qty: Optional[float] = None,
+    quote_amount: Optional[float] = None
+) -> Optional[FillEstimate]:
+    """
+    Volume-weighted fill for a market order against an L2 book
+
+    Buys walk the asks, sells walk the bids. The order is sized either in base
+    quantity (qty) or in quote currency (quote_amount). If the visible book is
+    too thin, the remainder is assumed to fill at the last visible level and
+    the estimate is flagged as exhausted.
+
+    Returns:
+        FillEstimate, or None if the side of the book is empty
+    """
+    if (qty is None) == (quote_amount is None):
+        raise ValueError("Specify exactly one of qty or quote_amount")
+
+    side = side.lower()
+    levels = _levels(order_book.get("asks" if side == "buy" else "bids"))
+    if levels is None:
+        return None
+    prices, sizes = levels[:, 0], levels[:, 1]
+
+    target = float(quote_amount if quote_amount is not None else qty)
+    capacity = prices * sizes if quote_amount is not None else sizes
+    before = np.cumsum(capacity) - capacity
+    taken = np.clip(target - before, 0.0, capacity)
+
+    remainder = max(target - float(capacity.sum()), 0.0)
+    if remainder > 0:
+        taken[-1] += remainder
+    levels_used = int(np.count_nonzero(taken))
+
+    base = taken / prices if quote_amount is not None else taken
+    filled_qty = float(base.sum())
+    if filled_qty <= 0:
+        return None
+    avg_price = float((base * prices).sum() / filled_qty)
+
+    best_bid = _best(order_book.get("bids"))
+    best_ask = _best(order_book.get("asks"))
+    best_price = float(prices[0])
+    mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else best_price
+    adverse = avg_price - mid_price if side == "buy" else mid_price - avg_price
+
+    return FillEstimate(
+        side=side,
+        requested=target,
+        filled_qty=filled_qty,
+        avg_price=avg_price,
+        mid_price=mid_price,
+        best_price=best_price,
+        slippage_rate=adverse / mid_price if mid_price > 0 else 0.0,
+        levels_used=levels_used,
+        exhausted=remainder > 0
+    )
+
+
+def round_trip_slippage(
+    order_book: Dict,
+    quote_amount: float,
+    qty: Optional[float] = None
+) -> Optional[Tuple[float, bool]]:
+    """
+    Slippage of a paper round trip: buy quote_amount on the asks, then sell
+    qty (default: the quantity bought) back on the bids
+
+    Returns:
+        (slippage_rate vs mid, exhausted), or None if either side is empty
+    """
+    entry = walk_book(order_book, 'buy', quote_amount=quote_amount)
+    if entry is None:
+        return None
+    exit_fill = walk_book(order_book, 'sell', qty=entry.filled_qty if qty is None else qty)
+    if exit_fill is None:
+        return None
+    rate = max(entry.slippage_rate, 0.0) + max(exit_fill.slippage_rate, 0.0)
+    return rate, entry.exhausted or exit_fill.exhausted
+
+
+def _levels(raw) -> Optional[np.ndarray]:
+    if not raw:
+        return None
+    levels = np.array([level[:2] for level in raw], dtype=np.float64)
+    levels = levels[(levels[:, 0] > 0) & (levels[:, 1] > 0)]
+    return levels if len(levels) else None
+
+
+def _best(raw) -> Optional[float]:
+    levels = _levels(raw)
+    return float(levels[0, 0]) if levels is not None else None
+
+
+class OrderBookService:
+    """Cached, batched L2 order books"""
+
+    def __init__(self, depth: Optional[int] = None, snapshot_path: Optional[str] = None):
+        if depth is None or snapshot_path is None:
+            from config import ORDER_BOOK_DEPTH, ORDER_BOOK_SNAPSHOT_PATH
+            depth = ORDER_BOOK_DEPTH if depth is None else depth
+            snapshot_path = ORDER_BOOK_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+
+        self.depth = depth
+        self._snapshots: Dict[Tuple[str, str], Dict] = {}
+        self._batches: Dict[str, Dict[str, asyncio.Future]] = {}
+        self.stats = {"snapshot_hits": 0, "batch_fetches": 0, "batched_symbols": 0, "fetch_errors": 0}
+
+        if snapshot_path:
+            try:
+                self.load_snapshot(snapshot_path)
+            except Exception as e:
+                logger.warning(f"Could not load order book snapshot {snapshot_path}: {e}")
+
+    def load_snapshot(self, path: str) -> int:
+        """Load recorded books: {exchange: {symbol: {"bids": [[p, q], ...], "asks": [...]}}}"""
+        with open(path) as f:
+            data = json.load(f)
+        for exchange, books in data.items():
+            for symbol, book in books.items():
+                self._snapshots[(exchange.lower(), symbol)] = book
+        logger.info(f"📚 Loaded {sum(len(b) for b in data.values())} recorded order books from {path}")
+        return len(self._snapshots)
+
+    def clear_snapshot(self):
+        self._snapshots.clear()
+
+    async def get_order_book(self, exchange: str, symbol: str, exchange_obj: Any = None) -> Optional[Dict]:
+        """Order book from the recorded snapshot, the cache, or the exchange (None if unavailable)"""
+        snapshot = self._snapshots.get(((exchange or "").lower(), symbol))
+        if snapshot is not None:
+            self.stats["snapshot_hits"] += 1
+            return snapshot
+        if exchange_obj is None:
+            return None
+
+        if getattr(exchange_obj, "has", {}).get("fetchOrderBooks"):
+            fetch = lambda: self._fetch_batched(exchange, exchange_obj, symbol)
+        else:
+            fetch = lambda: exchange_obj.fetch_order_book(symbol, limit=self.depth)
+
+        try:
+            return await market_data_service.get_order_book(exchange, symbol, fetch)
+        except Exception as e:
+            self.stats["fetch_errors"] += 1
+            logger.debug(f"Order book fetch for {symbol} on {exchange} failed: {e}")
+            return None
+
+    async def prefetch(self, exchange: str, exchange_obj: Any, symbols: Iterable[str]) -> List[str]:
+        """Warm the cache for several symbols at once; returns the symbols that were fetched"""
+        missing = [
+            s for s in dict.fromkeys(symbols)
+            if ((exchange or "").lower(), s) not in self._snapshots
+            and market_data_service.peek_order_book(exchange, s) is None
+        ]
+        if missing:
+            await asyncio.gather(*(self.get_order_book(exchange, s, exchange_obj) for s in missing))
+        return missing
+
+    async def _fetch_batched(self, exchange: str, exchange_obj: Any, symbol: str) -> Dict:
+        """Join (or open) this exchange's pending fetchOrderBooks batch"""
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(exchange)
+        if batch is None:
+            batch = self._batches[exchange] = {}
+            loop.call_later(
+                BATCH_WINDOW_SECONDS,
+                lambda: asyncio.ensure_future(self._flush_batch(exchange, exchange_obj))
+            )
+        future = batch.get(symbol)
+        if future is None:
+            future = batch[symbol] = loop.create_future()
+        return await future
+
+    async def _flush_batch(self, exchange: str, exchange_obj: Any):
+        batch = self._batches.pop(exchange, {})
+        if not batch:
+            return
+        try:
+            books = await exchange_obj.fetch_order_books(list(batch), self.depth)
+            self.stats["batch_fetches"] += 1
+            self.stats["batched_symbols"] += len(batch)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for symbol, future in batch.items():
+            if future.done():
+                continue
+            book = books.get(symbol)
+            if book:
+                future.set_result(book)
+            else:
+                future.set_exception(KeyError(f"No order book returned for {symbol}"))
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "snapshot_books": len(self._snapshots), "pending_batches": len(self._batches)}
+
+
+# Global singleton
+order_book_service = OrderBookService()
@@ -0,0 +1,319 @@
+"""
+Paper Simulator - Vectorized Monte Carlo of the paper trade outcome model
+
+Runs the same per-trade model as PaperTradingEngine.execute_smart_trade
+(win/loss multipliers, AI agreement boosts, EXCHANGE_FEES, slippage, order
+rejections, execution delay, P&L sanity check and minimum profit threshold)
+across bots x paths with NumPy, one trade step at a time so that capital
+compounds exactly as it does in the engine.
+
+Slippage follows the engine's two models. Given L2 books for a bot's
+exchange, trades pay the round_trip_slippage() book walk for their size
+(averaged over the exchange's pairs, since the engine picks a pair at random
+per trade, and interpolated over order size). Without books, trades pay the
+calculate_slippage volume estimate, as the engine does when no book is
+available. The summary reports which model each bot got.
+
+Used for what-if capacity planning: given bot configs (risk_mode, capital,
+exchange), it returns distributions of final equity, max drawdown and fee
+drag. Runs are reproducible for a given seed.
+
+Model assumptions beyond the engine itself:
+- Every simulated trade has passed the engine's quality filter, so the number
+  of agreeing AI sources is drawn from agreement_probs over {2, 3, 4}
+- Four agreeing sources implies the Flokx strength adjustment; the zero-mean
+  ML predicted-change nudge is not modelled
+- Rate limiter / risk engine blocks are not modelled (use trades_per_day)
+- Books are a fixed snapshot; the engine walks the live book at trade time
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import MIN_TRADE_PROFIT_THRESHOLD_ZAR
+from paper_trading_engine import (
+    AGREEMENT_OUTCOME_BOOST,
+    AGREEMENT_SIZE_BOOST,
+    ASSUMED_DAILY_VOLUME_USD,
+    EXCHANGE_FEES,
+    MAX_POSITION_SIZE,
+    ORDER_SUCCESS_RATE,
+    POSITION_SIZES,
+    WIN_RATE,
+    calculate_slippage,
+)
+from services.order_book_service import round_trip_slippage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AGREEMENT_PROBS = {2: 0.5, 3: 0.35, 4: 0.15}
+PERCENTILES = (5, 25, 50, 75, 95)
+# Order sizes (quote currency) at which each exchange's book-walk slippage is evaluated
+SLIPPAGE_GRID = np.geomspace(1.0, 1e10, 61)
+
+# Upper bound on bots x paths x trade steps for one run (admin endpoint guard: total work)
+MAX_SIMULATION_CELLS = 2_000_000_000
+# Upper bound on bots x paths (memory: each trade step holds ~20 float arrays of that shape,
+# so 1M cells peaks around 160 MB)
+MAX_SIMULATION_STATE_CELLS = 1_000_000
+
+
+@dataclass
+class SimulationResult:
+    bots: List[Dict]
+    initial_capital: np.ndarray     # (bots,)
+    final_equity: np.ndarray        # (bots, paths)
+    max_drawdown: np.ndarray        # (bots, paths) fraction of running peak
+    fees: np.ndarray                # (bots, paths) exchange fees paid
+    slippage: np.ndarray            # (bots, paths) slippage cost
+    trades: np.ndarray              # (bots, paths) executed trades
+    slippage_models: List[str]      # (bots,) "order_book" or "volume_estimate"
+    portfolio_equity: np.ndarray    # (days + 1, paths) summed across bots
+    days: int
+    paths: int
+    seed: Optional[int]
+
+    def summary(self, per_bot: bool = True) -> Dict:
+        """Percentile summaries of equity, drawdown and fee drag"""
+        total_initial = float(self.initial_capital.sum())
+        portfolio_final = self.portfolio_equity[-1]
+        portfolio_fees = self.fees.sum(axis=0)
+
+        result = {
+            "days": self.days,
+            "paths": self.paths,
+            "seed": self.seed,
+            "bots": len(self.bots),
+            "slippage_models": {
+                model: self.slippage_models.count(model) for model in sorted(set(self.slippage_models))
+            },
+            "portfolio": {
+                "initial_capital": round(total_initial, 2),
+                "final_equity": _distribution(portfolio_final),
+                "return_pct": _distribution((portfolio_final / total_initial - 1) * 100 if total_initial else portfolio_final * 0),
+                "max_drawdown_pct": _distribution(_max_drawdown(self.portfolio_equity) * 100),
+                "fee_drag_pct": _distribution(portfolio_fees / total_initial * 100 if total_initial else portfolio_fees * 0),
+                "probability_of_loss": round(float(np.mean(portfolio_final < total_initial)), 4),
+                "daily_equity_p50": np.percentile(self.portfolio_equity, 50, axis=1).round(2).tolist()
+            }
+        }
+
+        if per_bot:
+            result["per_bot"] = [
+                {
+                    "bot_id": bot.get("id"),
+                    "risk_mode": bot.get("risk_mode", "safe"),
+                    "exchange": bot.get("exchange", "luno"),
+                    "slippage_model": model,
+                    "initial_capital": round(float(capital), 2),
+                    "final_equity": _distribution(self.final_equity[i]),
+                    "max_drawdown_pct": _distribution(self.max_drawdown[i] * 100),
+                    "fee_drag_pct": _distribution(self.fees[i] / capital * 100 if capital else self.fees[i] * 0),
+                    "avg_trades": round(float(self.trades[i].mean()), 1)
+                }
+                for i, (bot, capital, model) in enumerate(zip(self.bots, self.initial_capital, self.slippage_models))
+            ]
+        return result
+
+
+def simulate_paper_trading(
+    bots: List[Dict],
+    days: int = 30,
+    paths: int = 1000,
+    trades_per_day: Optional[int] = None,
+    seed: Optional[int] = None,
+    agreement_probs: Optional[Dict[int, float]] = None,
+    order_books: Optional[Dict[str, List[Dict]]] = None
+) -> SimulationResult:
+    """
+    Monte Carlo of paper trading for a set of bot configs
+
+    Args:
+        bots: Bot configs with risk_mode, current_capital (or initial_capital /
+            capital), exchange and optionally max_daily_trades
+        days: Simulated days
+        paths: Independent paths per bot
+        trades_per_day: Trades per bot per day (defaults to each bot's
+            max_daily_trades, else 20)
+        seed: RNG seed for reproducible runs
+        agreement_probs: Probability of 2 / 3 / 4 agreeing AI sources per trade
+            (relative weights, normalised to sum to one)
+        order_books: L2 books per exchange ({exchange: [book, ...]}, one per
+            pair the engine trades there); bots on other exchanges use the
+            volume estimate
+    """
+    if not bots:
+        raise ValueError("At least one bot config is required")
+    if days < 1 or paths < 1:
+        raise ValueError("days and paths must be positive")
+
+    n_bots = len(bots)
+    if n_bots * paths > MAX_SIMULATION_STATE_CELLS:
+        raise ValueError(
+            f"Simulation too large: bots x paths must be at most {MAX_SIMULATION_STATE_CELLS:,} "
+            f"({n_bots} x {paths}); reduce bots or paths"
+        )
+    capital = np.array([_bot_capital(b) for b in bots], dtype=np.float64)
+    position = np.array([POSITION_SIZES.get(b.get("risk_mode", "safe"), 0.20) for b in bots])
+    fee_rate = np.array([
+        EXCHANGE_FEES.get(b.get("exchange", "luno"), {"maker": 0.001, "taker": 0.001}).get("taker", 0.001)
+        for b in bots
+    ])
+    bot_tpd = np.array([
+        trades_per_day if trades_per_day is not None else int(b.get("max_daily_trades", 20))
+        for b in bots
+    ])
+    steps_per_day = int(bot_tpd.max())
+    if n_bots * paths * days * steps_per_day > MAX_SIMULATION_CELLS:
+        raise ValueError("Simulation too large: reduce bots, paths, days or trades_per_day")
+
+    # Agreement levels and their boosts as lookup tables
+    probs = agreement_probs or DEFAULT_AGREEMENT_PROBS
+    levels = np.array(sorted(probs))
+    weights = np.array([probs[level] for level in levels], dtype=np.float64)
+    if not np.all(np.isfinite(weights)) or np.any(weights < 0) or weights.sum() <= 0:
+        raise ValueError("agreement_probs weights must be non-negative with a positive total")
+    cum_probs = np.cumsum(weights)
+    cum_probs /= cum_probs[-1]
+    size_boost = np.array([AGREEMENT_SIZE_BOOST.get(int(l), 1.0) for l in levels])
+    outcome_boost = np.array([AGREEMENT_OUTCOME_BOOST.get(int(l), 1.0) for l in levels])
+    flokx_strong = levels >= 4
+
+    # calculate_slippage tiers, evaluated on order_size / volume
+    tier_edges = np.array([0.01, 0.05])
+    tier_rates = np.array([
+        calculate_slippage(0.0, ASSUMED_DAILY_VOLUME_USD),
+        calculate_slippage(0.02 * ASSUMED_DAILY_VOLUME_USD, ASSUMED_DAILY_VOLUME_USD),
+        calculate_slippage(0.1 * ASSUMED_DAILY_VOLUME_USD, ASSUMED_DAILY_VOLUME_USD)
+    ])
+
+    # Book-walk slippage curves, for bots whose exchange has books
+    exchange_curves = _book_slippage_curves(order_books or {})
+    has_book = np.array([b.get("exchange", "luno") in exchange_curves for b in bots])
+    book_curves = np.array([
+        exchange_curves.get(b.get("exchange", "luno"), np.zeros(len(SLIPPAGE_GRID))) for b in bots
+    ]) if has_book.any() else None
+    has_book_col = has_book[:, None]
+
+    rng = np.random.default_rng(seed)
+    shape = (n_bots, paths)
+    equity = np.repeat(capital[:, None], paths, axis=1)
+    peak = equity.copy()
+    max_dd = np.zeros(shape)
+    fees_paid = np.zeros(shape)
+    slippage_paid = np.zeros(shape)
+    trades = np.zeros(shape, dtype=np.int64)
+    portfolio = np.empty((days + 1, paths))
+    portfolio[0] = equity.sum(axis=0)
+
+    position_col = position[:, None]
+    fee_col = fee_rate[:, None] * 2  # Entry + exit
+
+    for day in range(days):
+        for step in range(steps_per_day):
+            active = (step < bot_tpd)[:, None]
+            u_agree, u_win, u_mult, u_reject, u_delay = rng.random((5,) + shape)
+
+            level = np.searchsorted(cum_probs, u_agree, side="right").clip(max=len(levels) - 1)
+            win = u_win < WIN_RATE
+
+            # Win / loss multiplier, then the AI confidence boost
+            mult = np.where(win, 1.005 + u_mult * 0.015, 0.985 + u_mult * 0.012)
+            boost = outcome_boost[level]
+            mult = np.where(win, 1.0 + (mult - 1.0) * boost, 1.0 - (1.0 - mult) / boost)
+            mult = np.where(flokx_strong[level], mult * np.where(win, 1.002, 0.998), mult)
+            profit_pct = (mult - 1.0) * 100
+
+            trade_amount = equity * np.minimum(position_col * size_boost[level], MAX_POSITION_SIZE)
+            fees = trade_amount * fee_col
+            slip_rate = tier_rates[np.searchsorted(tier_edges, trade_amount / ASSUMED_DAILY_VOLUME_USD, side="right")]
+            slip_rate = slip_rate * np.where(np.abs(profit_pct) > 2, 1.5, 1.0)
+            if book_curves is not None:
+                slip_rate = np.where(has_book_col, _interpolate_curves(book_curves, trade_amount), slip_rate)
+            slippage = trade_amount * slip_rate
+
+            # Execution delay moves the exit price by up to +/-0.05%
+            exit_mult = mult * (1.0 + (u_delay - 0.5) * 0.001)
+            net = trade_amount * (exit_mult - 1.0) - fees - slippage
+
+            executed = (
+                active
+                & (u_reject <= ORDER_SUCCESS_RATE)
+                & (np.abs(net) <= equity * 0.5)                # validate_trade_pnl (> 50% is an anomaly)
+                & ~((net > 0) & (net < MIN_TRADE_PROFIT_THRESHOLD_ZAR))
+            )
+
+            equity += np.where(executed, net, 0.0)
+            fees_paid += np.where(executed, fees, 0.0)
+            slippage_paid += np.where(executed, slippage, 0.0)
+            trades += executed
+            np.maximum(peak, equity, out=peak)
+            np.maximum(max_dd, np.where(peak > 0, (peak - equity) / peak, 0.0), out=max_dd)
+
+        portfolio[day + 1] = equity.sum(axis=0)
+
+    return SimulationResult(
+        bots=bots,
+        initial_capital=capital,
+        final_equity=equity,
+        max_drawdown=max_dd,
+        fees=fees_paid,
+        slippage=slippage_paid,
+        trades=trades,
+        slippage_models=["order_book" if book else "volume_estimate" for book in has_book],
+        portfolio_equity=portfolio,
+        days=days,
+        paths=paths,
+        seed=seed
+    )
+
+
+def _book_slippage_curves(order_books: Dict[str, List[Dict]]) -> Dict[str, np.ndarray]:
+    """Round-trip slippage rate at each SLIPPAGE_GRID size, averaged over an exchange's books"""
+    curves = {}
+    for exchange, books in order_books.items():
+        rates = []
+        for book in books or []:
+            walked = [round_trip_slippage(book, float(amount)) for amount in SLIPPAGE_GRID]
+            if all(walked):
+                rates.append([rate for rate, _ in walked])
+        if rates:
+            curves[exchange] = np.mean(rates, axis=0)
+    return curves
+
+
+def _interpolate_curves(curves: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Row-wise interpolation of (bots, grid) curves at (bots, paths) order sizes, on a log size axis"""
+    position = np.interp(
+        np.log(np.maximum(amounts, SLIPPAGE_GRID[0])), np.log(SLIPPAGE_GRID), np.arange(len(SLIPPAGE_GRID))
+    )
+    lower = np.minimum(position.astype(np.int64), len(SLIPPAGE_GRID) - 2)
+    weight = position - lower
+    rows = np.arange(len(curves))[:, None]
+    return curves[rows, lower] * (1.0 - weight) + curves[rows, lower + 1] * weight
+
+
+def _bot_capital(bot: Dict) -> float:
+    for field in ("current_capital", "initial_capital", "capital"):
+        if bot.get(field) is not None:
+            return float(bot[field])
+    return 1000.0
+
+
+def _distribution(values: np.ndarray) -> Dict:
+    pct = np.percentile(values, PERCENTILES)
+    return {
+        "mean": round(float(np.mean(values)), 4),
+        **{f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, pct)}
+    }
+
+
+def _max_drawdown(series: np.ndarray) -> np.ndarray:
+    """Max drawdown per column of a (time, paths) equity series"""
+    peaks = np.maximum.accumulate(series, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peaks > 0, (peaks - series) / peaks, 0.0)
+    return drawdowns.max(axis=0)
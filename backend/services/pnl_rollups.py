@@ -0,0 +1,311 @@
+"""
+PnL Rollups - Pre-aggregated profit buckets for the profit series endpoints
+
+Keeps one pnl_rollups doc per (source, user_id, bot_id, trading_mode, period,
+bucket) with trade count, net / gross PnL, fees, volume and wins / losses:
+- source "trades": closed trades, $inc-ed as each trade is inserted (through
+  the write-behind buffer on the paper hot path)
+- source "ledger": fills_ledger, $inc-ed with the PnL each fill realizes
+- period "hour" and "day" buckets (naive UTC starts); weekly and monthly
+  series are summed from the day buckets
+
+Series reads touch at most (days x bots) small docs instead of every trade,
+so dashboard cost no longer grows with trade history. rebuild() recomputes a
+user's buckets from the raw trades / fills. Rollups are built on the first
+read per user (pnl_rollup_state marks built users), and a read rebuilds
+them at once when they were marked stale (a fill that could not be folded
+in) or invalidated (deleted trades). The state also counts the closed
+trades / fills folded in; once per PNL_ROLLUP_VERIFY_INTERVAL a read
+compares that count with the source collection and rebuilds on drift: a
+trade written or closed by a path that skips record_trade, a conflicting
+write or a fill appended elsewhere.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from pymongo import DeleteOne, ReplaceOne
+
+from config import PNL_ROLLUP_VERIFY_INTERVAL
+from services.lot_matching import FillColumns, match_fifo
+from services.ledger_positions import position_key
+from services.write_behind import write_behind
+from utils.timestamps import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ("hour", "day")
+KEY_FIELDS = ("source", "user_id", "bot_id", "trading_mode", "period", "bucket")
+METRICS = ("trades", "pnl", "gross_pnl", "fees", "volume", "wins", "losses")
+
+TRADE_FIELDS = {
+    "_id": 0, "user_id": 1, "bot_id": 1, "trading_mode": 1, "timestamp": 1, "profit_loss": 1,
+    "fees": 1, "fee": 1, "gross_pnl": 1, "gross_profit": 1, "trade_amount": 1, "amount": 1,
+    "entry_price": 1, "price": 1
+}
+
+
+def bucket_start(timestamp, period: str) -> Optional[datetime]:
+    """Naive UTC start of the hour / day bucket containing timestamp"""
+    ts = parse_timestamp(timestamp)
+    if ts is None:
+        return None
+    ts = ts.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if period == "day" else ts
+
+
+def trade_metrics(trade: Dict) -> Dict[str, float]:
+    """Rollup increments for one closed trade (pnl is the net profit_loss)"""
+    pnl = float(trade.get("profit_loss", 0) or 0)
+    fees = float(trade.get("fees", trade.get("fee", 0)) or 0)
+    gross = trade.get("gross_pnl", trade.get("gross_profit"))
+    volume = trade.get("trade_amount")
+    if volume is None:
+        volume = (trade.get("amount", 0) or 0) * (trade.get("entry_price", trade.get("price", 0)) or 0)
+    return {
+        "trades": 1,
+        "pnl": pnl,
+        "gross_pnl": float(gross) if gross is not None else pnl + fees,
+        "fees": fees,
+        "volume": float(volume),
+        "wins": int(pnl > 0),
+        "losses": int(pnl < 0)
+    }
+
+
+def fill_metrics(fill: Dict, realized: float) -> Dict[str, float]:
+    """Rollup increments for one ledger fill and the PnL it realized"""
+    fee = float(fill.get("fee", 0) or 0)
+    return {
+        "trades": 1,
+        "pnl": realized - fee,
+        "gross_pnl": realized,
+        "fees": fee,
+        "volume": float(fill["qty"]) * float(fill["price"]),
+        "wins": int(realized > 0),
+        "losses": int(realized < 0)
+    }
+
+
+def _trading_mode(source: str, doc: Dict) -> Optional[str]:
+    if source == "ledger":
+        return "paper" if doc.get("is_paper", True) else "live"
+    return doc.get("trading_mode")
+
+
+def rollup_keys(source: str, doc: Dict) -> List[Dict]:
+    """pnl_rollups filters (one per period) for a trade or fill; empty if undatable"""
+    keys = []
+    for period in ROLLUP_PERIODS:
+        bucket = bucket_start(doc.get("timestamp"), period)
+        if bucket is None:
+            return []
+        keys.append({
+            "source": source,
+            "user_id": doc.get("user_id"),
+            "bot_id": doc.get("bot_id"),
+            "trading_mode": _trading_mode(source, doc),
+            "period": period,
+            "bucket": bucket
+        })
+    return keys
+
+
+class PnLRollupStore:
+    """Incrementally maintained PnL buckets derived from trades and fills_ledger"""
+
+    def __init__(self, db, verify_interval: float = PNL_ROLLUP_VERIFY_INTERVAL):
+        self.db = db
+        self.verify_interval = verify_interval
+        self.rollups = db["pnl_rollups"]
+        self.state = db["pnl_rollup_state"]
+        self.trades = db["trades"]
+        self.fills_ledger = db["fills_ledger"]
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    def _lock(self, source: str, user_id: str) -> asyncio.Lock:
+        key = (source, user_id)
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    # ------------------------------------------------------------------
+    # Incremental path
+    # ------------------------------------------------------------------
+
+    async def record_trade(self, trade: Dict):
+        """Fold a newly inserted trade into its buckets (closed trades only)"""
+        if trade.get("status") != "closed":
+            return
+        metrics = trade_metrics(trade)
+        for key in rollup_keys("trades", trade):
+            # Coalesced with the trade insert itself when the buffer is running
+            await write_behind.update_one(self.rollups, key, inc_fields=metrics, upsert=True)
+        # Watermark for drift detection (no-op until the user's rollups are built)
+        await write_behind.update_one(
+            self.state, {"source": "trades", "user_id": trade.get("user_id")}, inc_fields={"trade_count": 1}
+        )
+
+    async def record_fill(self, fill: Dict, realized: float):
+        """Fold a fill (already applied to its FIFO position) into its buckets"""
+        keys = rollup_keys("ledger", fill)
+        if not keys:
+            return
+        metrics = fill_metrics(fill, realized)
+        async with self._lock("ledger", fill["user_id"]):
+            for key in keys:
+                await self.rollups.update_one(key, {"$inc": metrics}, upsert=True)
+            await self.state.update_one(
+                {"source": "ledger", "user_id": fill["user_id"]},
+                {"$inc": {"fill_count": 1}}
+            )
+
+    async def mark_stale(self, user_id: str, source: str = "ledger"):
+        """Have the next read rebuild a user's rollups (a record that could not be folded in)"""
+        async with self._lock(source, user_id):
+            await self.state.update_one({"source": source, "user_id": user_id}, {"$set": {"stale": True}})
+
+    async def invalidate(self, user_id: Optional[str] = None, bot_id: Optional[str] = None):
+        """Drop trade rollups after trades were deleted; a user's are rebuilt on next read"""
+        if bot_id:
+            await self.rollups.delete_many({"source": "trades", "bot_id": bot_id})
+        if user_id:
+            await self.rollups.delete_many({"source": "trades", "user_id": user_id})
+            await self.state.delete_many({"source": "trades", "user_id": user_id})
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+
+    async def series(
+        self,
+        user_id: str,
+        period: str = "day",
+        since=None,
+        trading_mode: Optional[str] = None,
+        source: str = "trades"
+    ) -> Dict[datetime, Dict[str, float]]:
+        """Per-bucket totals across bots, oldest first: {bucket_start: {metric: value}}"""
+        await self.ensure_built(user_id, source)
+
+        query = {"source": source, "user_id": user_id, "period": period}
+        if since is not None:
+            query["bucket"] = {"$gte": bucket_start(since, period)}
+        if trading_mode:
+            query["trading_mode"] = trading_mode
+
+        totals: Dict[datetime, Dict[str, float]] = {}
+        async for doc in self.rollups.find(query, {"_id": 0}):
+            bucket = totals.setdefault(doc["bucket"], dict.fromkeys(METRICS, 0))
+            for metric in METRICS:
+                bucket[metric] += doc.get(metric, 0)
+        return dict(sorted(totals.items()))
+
+    async def ensure_built(self, user_id: str, source: str = "trades"):
+        """Rebuild a user's rollups if they were never built, are stale or have drifted
+
+        Reads only look at the state doc; the source collection is counted
+        once per verify_interval.
+        """
+        user_filter = {"source": source, "user_id": user_id}
+        state = await self.state.find_one(user_filter, {"_id": 0})
+        if state is not None and not state.get("stale"):
+            verified_at = state.get("verified_at") or state.get("built_at")
+            if verified_at is not None and (datetime.utcnow() - verified_at).total_seconds() < self.verify_interval:
+                return
+            if source == "ledger":
+                count_field = "fill_count"
+                total = await self.fills_ledger.count_documents({"user_id": user_id})
+            else:
+                count_field = "trade_count"
+                total = await self.trades.count_documents({"user_id": user_id, "status": "closed"})
+            if state.get(count_field) == total:
+                await self.state.update_one(user_filter, {"$set": {"verified_at": datetime.utcnow()}})
+                return
+        await self.rebuild(user_id, source)
+
+    # ------------------------------------------------------------------
+    # Rebuild
+    # ------------------------------------------------------------------
+
+    async def rebuild(self, user_id: str, source: str = "trades") -> int:
+        """Recompute a user's rollups from the raw trades / fills
+
+        Buffered trade inserts and $inc upserts are flushed first so the
+        aggregate sees them, then every bucket is replaced in place and only
+        buckets the rebuild no longer produces are deleted: readers never see
+        an empty user and a retried rebuild converges on the same docs.
+        """
+        async with self._lock(source, user_id):
+            await write_behind.flush()
+            if source == "ledger":
+                buckets, count = await self._aggregate_fills(user_id)
+            else:
+                buckets, count = await self._aggregate_trades(user_id)
+
+            user_filter = {"source": source, "user_id": user_id}
+            existing = await self.rollups.find(user_filter, {"_id": 0, **dict.fromkeys(KEY_FIELDS, 1)}).to_list(length=None)
+            stale = {tuple((f, doc.get(f)) for f in KEY_FIELDS) for doc in existing} - set(buckets)
+
+            ops = [ReplaceOne(dict(key), {**dict(key), **metrics}, upsert=True) for key, metrics in buckets.items()]
+            ops += [DeleteOne(dict(key)) for key in stale]
+            if ops:
+                await self.rollups.bulk_write(ops, ordered=False)
+
+            built_at = datetime.utcnow()
+            state = {**user_filter, "built_at": built_at, "verified_at": built_at}
+            state["fill_count" if source == "ledger" else "trade_count"] = count
+            await self.state.replace_one(user_filter, state, upsert=True)
+
+        logger.info(f"Rebuilt {len(buckets)} {source} PnL rollups ({len(stale)} stale removed) from {count} records for user {user_id}")
+        return len(buckets)
+
+    @staticmethod
+    def _add(buckets: Dict, keys: List[Dict], metrics: Dict[str, float]):
+        for key in keys:
+            bucket = buckets.setdefault(tuple(key.items()), dict.fromkeys(METRICS, 0))
+            for metric, value in metrics.items():
+                bucket[metric] += value
+
+    async def _aggregate_trades(self, user_id: str) -> Tuple[Dict, int]:
+        buckets: Dict = {}
+        count = 0
+        cursor = self.trades.find({"user_id": user_id, "status": "closed"}, TRADE_FIELDS)
+        async for trade in cursor:
+            count += 1
+            self._add(buckets, rollup_keys("trades", trade), trade_metrics(trade))
+        return buckets, count
+
+    async def _aggregate_fills(self, user_id: str) -> Tuple[Dict, int]:
+        fills = await self.fills_ledger.find({"user_id": user_id}).to_list(length=None)
+        count = len(fills)
+
+        # Legacy string and BSON timestamps don't sort together in Mongo: order here
+        dated = [(parse_timestamp(f.get("timestamp")), i, f) for i, f in enumerate(fills)]
+        dated = sorted((d for d in dated if d[0] is not None), key=lambda d: (d[0], d[1]))
+        fills = [f for _, _, f in dated]
+
+        result = match_fifo(FillColumns.from_fills(fills, key=position_key))
+        buckets: Dict = {}
+        for fill, realized in zip(fills, result.realized.tolist()):
+            self._add(buckets, rollup_keys("ledger", fill), fill_metrics(fill, realized))
+        return buckets, count
+
+
+# Singleton instance
+_pnl_rollups_instance = None
+
+
+def get_pnl_rollups(db=None) -> Optional[PnLRollupStore]:
+    """Get or create the rollup store (None until the database is connected)"""
+    global _pnl_rollups_instance
+    if _pnl_rollups_instance is None:
+        if db is None:
+            import database
+            db = database.get_database()
+        if db is None:
+            return None
+        _pnl_rollups_instance = PnLRollupStore(db)
+    return _pnl_rollups_instance
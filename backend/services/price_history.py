@@ -0,0 +1,279 @@
+"""
+Price History - Shared fixed-capacity ring buffers for per-symbol price series
+
+Each symbol gets one array-backed ring buffer indexed by time:
+- append and expiry are O(1) (expiry pops from the oldest end, amortized);
+  out-of-order points are dropped, seeding history goes through backfill()
+- mean/variance of the price column are maintained online (Welford, with
+  removals), so 24h statistics never rescan the window
+- trend is first vs last price, both read straight from the buffer
+
+The tick store is shared: the regime detectors read and write the same
+buffer per symbol instead of each keeping a list of dicts.
+
+Indexing a buffer (buffer[0], buffer[-1]) still returns a point dict, so
+callers that inspect single points keep working; bulk readers should use
+values(field) which returns one ordered numpy array.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from config import PRICE_HISTORY_CAPACITY
+
+HISTORY_WINDOW_SECONDS = 24 * 3600
+
+
+class PriceRingBuffer:
+    """Fixed-capacity, time-indexed ring buffer with streaming price statistics"""
+
+    def __init__(
+        self,
+        capacity: int = PRICE_HISTORY_CAPACITY,
+        window_seconds: Optional[float] = HISTORY_WINDOW_SECONDS,
+        fields: Sequence[str] = ('price', 'volume'),
+        stats_field: Optional[str] = None,
+        clock=time.time
+    ):
+        """
+        Args:
+            capacity: Maximum points kept; the oldest is overwritten when full
+            window_seconds: Points older than this are expired (None = capacity only)
+            fields: Value columns stored next to the timestamp
+            stats_field: Column tracked with streaming stats (default: first field)
+            clock: Wall-clock source in epoch seconds (injectable for tests)
+        """
+        self.capacity = max(1, int(capacity))
+        self.window_seconds = window_seconds
+        self.fields = tuple(fields)
+        self.stats_field = stats_field or self.fields[0]
+        self.clock = clock
+
+        self._ts = np.zeros(self.capacity)
+        self._columns: Dict[str, np.ndarray] = {f: np.zeros(self.capacity) for f in self.fields}
+        self._stats = self._columns[self.stats_field]
+        self._head = 0  # Index of the oldest point
+        self._size = 0
+
+        # Welford accumulators for the stats column
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._removals = 0  # Recompute exactly every `capacity` removals to bound drift
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __getitem__(self, index: int) -> Dict:
+        if not -self._size <= index < self._size:
+            raise IndexError("price history index out of range")
+        slot = (self._head + index % self._size) % self.capacity
+        point = {f: float(col[slot]) for f, col in self._columns.items()}
+        point['timestamp'] = datetime.fromtimestamp(self._ts[slot], tz=timezone.utc)
+        return point
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self._size):
+            yield self[i]
+
+    def append(self, timestamp: Optional[float] = None, **values: float) -> bool:
+        """
+        Add a point (timestamp in epoch seconds, default now) and expire old ones
+
+        Points older than the newest one are dropped (use backfill() to add
+        history in front); missing fields are stored as 0. Returns whether the
+        point was added.
+        """
+        ts = self.clock() if timestamp is None else float(timestamp)
+        if self._size and ts < self.last_timestamp:
+            return False
+        if self._size == self.capacity:
+            self._pop_oldest()
+
+        slot = (self._head + self._size) % self.capacity
+        self._ts[slot] = ts
+        for field, column in self._columns.items():
+            column[slot] = float(values.get(field, 0.0))
+        self._size += 1
+        self._add_stat(self._stats[slot])
+
+        self.expire(ts)
+        return True
+
+    def backfill(self, timestamps: Sequence[float], **values: Sequence[float]) -> int:
+        """
+        Merge older points (e.g. stored candles) in front of the buffered ones
+
+        Only points older than the current oldest point are taken, so seeding
+        after live ticks have arrived keeps the series in time order. When the
+        result exceeds capacity the oldest points are dropped. Returns how
+        many points were added.
+        """
+        ts = np.asarray(timestamps, dtype=float)
+        if not len(ts):
+            return 0
+        order = np.argsort(ts, kind='stable')
+        ts = ts[order]
+        columns = {f: np.asarray(values.get(f, np.zeros(len(ts))), dtype=float)[order] for f in self.fields}
+
+        keep = np.ones(len(ts), dtype=bool)
+        if self._size:
+            keep &= ts < self._ts[self._head]
+        if self.window_seconds is not None:
+            keep &= ts > self.clock() - self.window_seconds
+        added = int(keep.sum())
+        if not added:
+            return 0
+
+        merged_ts = np.concatenate((ts[keep], self.timestamps()))[-self.capacity:]
+        merged = {f: np.concatenate((columns[f][keep], self.values(f)))[-self.capacity:] for f in self.fields}
+        n = len(merged_ts)
+        self._head, self._size = 0, n
+        self._ts[:n] = merged_ts
+        for field, column in self._columns.items():
+            column[:n] = merged[field]
+        self._recompute_stats()
+        return min(added, n)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop points older than the window; returns how many were removed"""
+        if self.window_seconds is None:
+            return 0
+        cutoff = (self.clock() if now is None else now) - self.window_seconds
+        removed = 0
+        while self._size and self._ts[self._head] <= cutoff:
+            self._pop_oldest()
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self._head = self._size = self._removals = 0
+        self._mean = self._m2 = 0.0
+
+    def _pop_oldest(self) -> None:
+        value = self._stats[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        self._remove_stat(value)
+
+    def _add_stat(self, value: float) -> None:
+        delta = value - self._mean
+        self._mean += delta / self._size
+        self._m2 += delta * (value - self._mean)
+
+    def _remove_stat(self, value: float) -> None:
+        if self._size == 0:
+            self._mean = self._m2 = 0.0
+            return
+        old_mean = self._mean
+        self._mean = (old_mean * (self._size + 1) - value) / self._size
+        self._m2 = max(0.0, self._m2 - (value - old_mean) * (value - self._mean))
+
+        self._removals += 1
+        if self._removals >= self.capacity:
+            self._recompute_stats()
+
+    def _recompute_stats(self) -> None:
+        values = self.values(self.stats_field)
+        self._removals = 0
+        self._mean = float(values.mean()) if len(values) else 0.0
+        self._m2 = float(((values - self._mean) ** 2).sum()) if len(values) else 0.0
+
+    def values(self, field: Optional[str] = None) -> np.ndarray:
+        """Ordered (oldest first) copy of one column"""
+        return self._ordered(self._columns[field or self.stats_field])
+
+    def timestamps(self) -> np.ndarray:
+        """Ordered epoch-second timestamps"""
+        return self._ordered(self._ts)
+
+    def _ordered(self, column: np.ndarray) -> np.ndarray:
+        end = self._head + self._size
+        if end <= self.capacity:
+            return column[self._head:end].copy()
+        return np.concatenate((column[self._head:], column[:end - self.capacity]))
+
+    @property
+    def first(self) -> Optional[float]:
+        return float(self._stats[self._head]) if self._size else None
+
+    @property
+    def last(self) -> Optional[float]:
+        return float(self._stats[(self._head + self._size - 1) % self.capacity]) if self._size else None
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        return float(self._ts[(self._head + self._size - 1) % self.capacity]) if self._size else None
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the stats column over the window"""
+        return self._m2 / self._size if self._size else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def trend_pct(self) -> float:
+        """Percent change from the oldest to the newest point"""
+        if self._size < 2 or not self.first:
+            return 0.0
+        return (self.last - self.first) / self.first * 100
+
+
+class PriceHistoryStore:
+    """Per-symbol tick buffers, created on first use"""
+
+    def __init__(
+        self,
+        capacity: int = PRICE_HISTORY_CAPACITY,
+        window_seconds: Optional[float] = HISTORY_WINDOW_SECONDS,
+        clock=time.time
+    ):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.buffers: Dict[str, PriceRingBuffer] = {}
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.buffers
+
+    def __getitem__(self, symbol: str) -> PriceRingBuffer:
+        return self.buffers[symbol]
+
+    def __iter__(self):
+        return iter(self.buffers)
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    def get(self, symbol: str, default=None) -> Optional[PriceRingBuffer]:
+        return self.buffers.get(symbol, default)
+
+    def buffer(self, symbol: str) -> PriceRingBuffer:
+        """Buffer for a symbol, created empty if missing"""
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            buffer = self.buffers[symbol] = PriceRingBuffer(
+                self.capacity, self.window_seconds, clock=self.clock
+            )
+        return buffer
+
+    def append(self, symbol: str, price: float, volume: float = 0.0, timestamp: Optional[float] = None) -> PriceRingBuffer:
+        buffer = self.buffer(symbol)
+        buffer.append(timestamp, price=price, volume=volume)
+        return buffer
+
+
+# Global instance (shared by the regime detectors)
+price_history_store = PriceHistoryStore()
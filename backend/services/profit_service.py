@@ -9,6 +9,8 @@ from collections import defaultdict
 import logging
 
 import database as db
+from services.pnl_rollups import get_pnl_rollups
+from utils.timestamps import with_timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,14 @@ logger = logging.getLogger(__name__)
 class ProfitService:
     """Canonical profit calculation service"""
     
+    @staticmethod
+    async def _day_rollups(user_id: str, start_date: datetime, trading_mode: Optional[str]) -> Dict:
+        """Closed-trade totals per UTC day since start_date, from the PnL rollups"""
+        rollups = get_pnl_rollups()
+        if rollups is None:
+            raise RuntimeError("PnL rollups unavailable: database not connected")
+        return await rollups.series(user_id, period="day", since=start_date, trading_mode=trading_mode)
+    
     @staticmethod
     async def calculate_total_profit(
         user_id: str,
@@ -45,12 +55,7 @@ class ProfitService:
                 query["trading_mode"] = trading_mode
             
             # Add date filters if provided
-            if start_date or end_date:
-                query["timestamp"] = {}
-                if start_date:
-                    query["timestamp"]["$gte"] = start_date.isoformat()
-                if end_date:
-                    query["timestamp"]["$lte"] = end_date.isoformat()
+            query = with_timestamp_range(query, start_date, end_date)
             
             # Get trades
             trades_cursor = db.trades_collection.find(query, {"_id": 0, "profit_loss": 1})
@@ -123,36 +128,10 @@ class ProfitService:
             today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
             start_date = today_start - timedelta(days=days - 1)  # Include today
             
-            # Build query
-            query = {
-                "user_id": user_id,
-                "status": "closed",
-                "timestamp": {"$gte": start_date.isoformat()}
-            }
-            
-            if trading_mode:
-                query["trading_mode"] = trading_mode
-            
-            # Get trades
-            trades_cursor = db.trades_collection.find(
-                query,
-                {"_id": 0, "profit_loss": 1, "timestamp": 1}
-            )
-            trades = await trades_cursor.to_list(10000)
-            
-            # Group by date (day boundary at 00:00 UTC)
+            # Day buckets (00:00 UTC) from the rollups
             daily_profits = defaultdict(float)
-            
-            for trade in trades:
-                timestamp = trade.get("timestamp")
-                if isinstance(timestamp, str):
-                    try:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        # Bucket by day start (00:00 UTC)
-                        date_str = dt.strftime('%Y-%m-%d')
-                        daily_profits[date_str] += trade.get("profit_loss", 0)
-                    except:
-                        pass
+            for day, totals in (await ProfitService._day_rollups(user_id, start_date, trading_mode)).items():
+                daily_profits[day.strftime('%Y-%m-%d')] += totals["pnl"]
             
             # Build result list sorted ascending (oldest → newest)
             result = []
@@ -200,39 +179,12 @@ class ProfitService:
             # Go back weeks-1 more weeks
             start_date = current_week_start - timedelta(weeks=weeks - 1)
             
-            # Build query
-            query = {
-                "user_id": user_id,
-                "status": "closed",
-                "timestamp": {"$gte": start_date.isoformat()}
-            }
-            
-            if trading_mode:
-                query["trading_mode"] = trading_mode
-            
-            # Get trades
-            trades_cursor = db.trades_collection.find(
-                query,
-                {"_id": 0, "profit_loss": 1, "timestamp": 1}
-            )
-            trades = await trades_cursor.to_list(10000)
-            
-            # Group by week
+            # Sum day buckets into weeks
             weekly_profits = defaultdict(float)
-            
-            for trade in trades:
-                timestamp = trade.get("timestamp")
-                if isinstance(timestamp, str):
-                    try:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        # Find week start (Monday)
-                        days_since_monday = dt.weekday()
-                        week_start = dt - timedelta(days=days_since_monday)
-                        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                        week_key = week_start.strftime('%Y-%m-%d')
-                        weekly_profits[week_key] += trade.get("profit_loss", 0)
-                    except:
-                        pass
+            for day, totals in (await ProfitService._day_rollups(user_id, start_date, trading_mode)).items():
+                # Find week start (Monday)
+                week_start = day - timedelta(days=day.weekday())
+                weekly_profits[week_start.strftime('%Y-%m-%d')] += totals["pnl"]
             
             # Build result list sorted ascending
             result = []
@@ -290,36 +242,10 @@ class ProfitService:
             
             start_date = current_month_start.replace(year=year, month=month)
             
-            # Build query
-            query = {
-                "user_id": user_id,
-                "status": "closed",
-                "timestamp": {"$gte": start_date.isoformat()}
-            }
-            
-            if trading_mode:
-                query["trading_mode"] = trading_mode
-            
-            # Get trades
-            trades_cursor = db.trades_collection.find(
-                query,
-                {"_id": 0, "profit_loss": 1, "timestamp": 1}
-            )
-            trades = await trades_cursor.to_list(10000)
-            
-            # Group by month
+            # Sum day buckets into months (day 1)
             monthly_profits = defaultdict(float)
-            
-            for trade in trades:
-                timestamp = trade.get("timestamp")
-                if isinstance(timestamp, str):
-                    try:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        # Bucket by month start (day 1)
-                        month_key = dt.strftime('%Y-%m')
-                        monthly_profits[month_key] += trade.get("profit_loss", 0)
-                    except:
-                        pass
+            for day, totals in (await ProfitService._day_rollups(user_id, start_date, trading_mode)).items():
+                monthly_profits[day.strftime('%Y-%m')] += totals["pnl"]
             
             # Build result list sorted ascending
             result = []
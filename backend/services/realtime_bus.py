@@ -0,0 +1,180 @@
+"""
+Realtime Bus - Cross-worker transport for WebSocket messages
+
+Each uvicorn worker holds only some users' sockets. Messages travel on
+per-user channels (amarktai:user:<user_id>), and a worker subscribes to a
+user's channel only while it holds a connection for that user, so workers
+never receive traffic they can't deliver. Broadcasts to everyone use one
+shared channel.
+
+Backends share one small async interface:
+- RedisBusBackend: any redis.asyncio-compatible client (redis-py, fakeredis)
+  - publishes are pipelined per batch, sequences come from INCRBY and the
+    replay buffer is a per-user sorted set trimmed to the newest N
+- LocalBusBackend: in-process stand-in; backends sharing a LocalBusHub act
+  like separate workers, so multi-worker behaviour is testable offline
+
+Sequences are per user and consistent across workers, so a reconnecting
+client's last_event_id replays exactly what it missed (within the buffer).
+"""
+
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "amarktai:user:"
+BROADCAST_CHANNEL = "amarktai:broadcast"
+HISTORY_TTL_SECONDS = 86400  # Replay buffers of idle users expire after a day
+
+
+def user_channel(user_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def channel_user(channel: str) -> Optional[str]:
+    """User ID for a per-user channel, None for the broadcast channel"""
+    return channel[len(CHANNEL_PREFIX):] if channel.startswith(CHANNEL_PREFIX) else None
+
+
+class BusMessage(NamedTuple):
+    channel: str
+    user_id: Optional[str]  # None for broadcasts (not sequenced or replayable)
+    sequence: int
+    data: str               # Encoded JSON, sent to sockets as-is
+
+
+class LocalBusHub:
+    """Shared state for LocalBusBackend instances (one hub = one 'Redis')"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["LocalBusBackend"]] = defaultdict(set)
+        self.sequences: Dict[str, int] = defaultdict(int)
+        self.history: Dict[str, Deque[Tuple[int, str]]] = {}
+        self.published = 0
+
+
+class LocalBusBackend:
+    """In-process bus backend (single worker, or several sharing a hub in tests)"""
+
+    name = "local"
+
+    def __init__(self, hub: Optional[LocalBusHub] = None):
+        self.hub = hub or LocalBusHub()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels: Set[str] = set()
+
+    async def reserve_sequences(self, counts: Dict[str, int]) -> Dict[str, int]:
+        """Reserve n sequence numbers per user; returns the last one used before"""
+        start = {}
+        for user_id, n in counts.items():
+            start[user_id] = self.hub.sequences[user_id]
+            self.hub.sequences[user_id] += n
+        return start
+
+    async def publish_batch(self, messages: List[BusMessage], history_limit: int):
+        for message in messages:
+            self.hub.published += 1
+            if message.user_id is not None and history_limit:
+                history = self.hub.history.setdefault(message.user_id, deque(maxlen=history_limit))
+                history.append((message.sequence, message.data))
+            for backend in self.hub.subscribers.get(message.channel, ()):
+                backend.queue.put_nowait((message.channel, message.data))
+
+    async def history(self, user_id: str, after: int) -> List[Tuple[int, str]]:
+        """(sequence, data) of the buffered messages after a sequence, oldest first"""
+        return [(seq, data) for seq, data in self.hub.history.get(user_id, ()) if seq > after]
+
+    async def subscribe(self, channel: str):
+        self.channels.add(channel)
+        self.hub.subscribers[channel].add(self)
+
+    async def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+        self.hub.subscribers[channel].discard(self)
+
+    async def listen(self) -> AsyncIterator[Tuple[str, str]]:
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        for channel in list(self.channels):
+            await self.unsubscribe(channel)
+
+
+class RedisBusBackend:
+    """Redis pub/sub bus backend (redis.asyncio or fakeredis.aioredis client)"""
+
+    name = "redis"
+
+    def __init__(self, client, key_prefix: str = "amarktai"):
+        self.client = client
+        self.pubsub = client.pubsub()
+        self.key_prefix = key_prefix
+
+    def _seq_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:seq:{user_id}"
+
+    def _history_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:history:{user_id}"
+
+    async def reserve_sequences(self, counts: Dict[str, int]) -> Dict[str, int]:
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, n in counts.items():
+            pipe.incrby(self._seq_key(user_id), n)
+        ends = await pipe.execute()
+        return {user_id: end - n for (user_id, n), end in zip(counts.items(), ends)}
+
+    async def publish_batch(self, messages: List[BusMessage], history_limit: int):
+        # One round trip for the whole batch: history writes + publishes
+        pipe = self.client.pipeline(transaction=False)
+        trimmed = set()
+        for message in messages:
+            if message.user_id is not None and history_limit:
+                key = self._history_key(message.user_id)
+                pipe.zadd(key, {message.data: message.sequence})
+                trimmed.add(key)
+            pipe.publish(message.channel, message.data)
+        for key in trimmed:
+            pipe.zremrangebyrank(key, 0, -history_limit - 1)
+            pipe.expire(key, HISTORY_TTL_SECONDS)
+        await pipe.execute()
+
+    async def history(self, user_id: str, after: int) -> List[Tuple[int, str]]:
+        """(sequence, data) of the buffered messages after a sequence, oldest first"""
+        entries = await self.client.zrangebyscore(self._history_key(user_id), f"({after}", "+inf", withscores=True)
+        return [(int(score), data) for data, score in entries]
+
+    async def subscribe(self, channel: str):
+        await self.pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str):
+        await self.pubsub.unsubscribe(channel)
+
+    async def listen(self) -> AsyncIterator[Tuple[str, str]]:
+        while True:
+            if not self.pubsub.subscribed:
+                # listen() returns at once without subscriptions; wait for the first one
+                await asyncio.sleep(0.1)
+                continue
+            async for message in self.pubsub.listen():
+                if message.get("type") == "message":
+                    yield message["channel"], message["data"]
+
+    async def close(self):
+        await self.pubsub.close()
+        await self.client.close()
+
+
+async def create_redis_backend(redis_url: str) -> RedisBusBackend:
+    """Connect to Redis (redis-py, else legacy aioredis) and return a bus backend"""
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        import aioredis
+
+    client = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+    await client.ping()
+    return RedisBusBackend(client)
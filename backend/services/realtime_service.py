@@ -6,7 +6,7 @@ Ensures all state changes broadcast appropriate websocket events
 import logging
 from typing import Optional, Dict, List
 from realtime_events import rt_events
-from websocket_manager import manager
+from websocket_manager_redis import manager
 
 logger = logging.getLogger(__name__)
 
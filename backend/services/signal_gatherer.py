@@ -0,0 +1,156 @@
+"""
+Signal Gatherer - Concurrent AI signal fan-out for trade decisions
+
+All signal sources for a trade are awaited together instead of one after
+another, so decision latency is the slowest source rather than the sum:
+- Each source has its own timeout, capped by an overall latency budget
+- Successful results are cached per (source, key) for the source's TTL;
+  concurrent requests for the same source/key share one in-flight fetch
+- A source that times out or raises is recorded as degraded and replaced
+  by its default value - it never blocks or fails the trade
+- A timed-out fetch keeps running and warms the cache for the next caller
+- Per-source latency is exported as a Prometheus histogram
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_CACHED = "cached"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+
+class SignalSource(NamedTuple):
+    fetch: Callable[[], Awaitable[Any]]
+    default: Any
+    ttl: float                      # Seconds a successful result may be reused
+    timeout: Optional[float] = None  # Per-source timeout (defaults to the gatherer's)
+
+
+class SignalResult(NamedTuple):
+    value: Any
+    status: str
+    latency: float
+
+    @property
+    def degraded(self) -> bool:
+        return self.status in (STATUS_TIMEOUT, STATUS_ERROR)
+
+
+class SignalGatherer:
+    """Runs signal sources concurrently with timeouts, TTL caching and coalescing"""
+
+    def __init__(
+        self,
+        latency_budget: Optional[float] = None,
+        source_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if latency_budget is None or source_timeout is None:
+            from config import SIGNAL_LATENCY_BUDGET, SIGNAL_SOURCE_TIMEOUT
+            latency_budget = SIGNAL_LATENCY_BUDGET if latency_budget is None else latency_budget
+            source_timeout = SIGNAL_SOURCE_TIMEOUT if source_timeout is None else source_timeout
+
+        self.latency_budget = latency_budget
+        self.source_timeout = source_timeout
+        self._clock = clock
+
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}  # (source, key) -> (expires_at, value)
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.stats = {
+            "gathers": 0,
+            "hits": 0,
+            "fetches": 0,
+            "coalesced": 0,
+            "timeouts": 0,
+            "errors": 0
+        }
+
+    async def gather(self, key: Hashable, sources: Dict[str, SignalSource]) -> Dict[str, SignalResult]:
+        """
+        Fetch every source concurrently
+
+        Args:
+            key: Cache key shared by the sources (e.g. (exchange, symbol))
+            sources: Source name -> SignalSource
+
+        Returns:
+            Source name -> SignalResult (degraded sources carry their default)
+        """
+        self.stats["gathers"] += 1
+        names = list(sources)
+        results = await asyncio.gather(*(self._run(name, key, sources[name]) for name in names))
+        return dict(zip(names, results))
+
+    async def _run(self, name: str, key: Hashable, source: SignalSource) -> SignalResult:
+        cache_key = (name, key)
+        cached = self._cache.get(cache_key)
+        if cached is not None and self._clock() < cached[0]:
+            self.stats["hits"] += 1
+            self._record(name, STATUS_CACHED, 0.0)
+            return SignalResult(cached[1], STATUS_CACHED, 0.0)
+
+        timeout = min(source.timeout or self.source_timeout, self.latency_budget)
+        started = self._clock()
+        try:
+            value = await asyncio.wait_for(asyncio.shield(self._fetch(cache_key, source)), timeout)
+            status = STATUS_OK
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"Signal source {name} timed out after {timeout:.2f}s for {key}")
+            value, status = source.default, STATUS_TIMEOUT
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Signal source {name} failed for {key}: {e}")
+            value, status = source.default, STATUS_ERROR
+
+        latency = self._clock() - started
+        self._record(name, status, latency)
+        return SignalResult(value, status, latency)
+
+    def _fetch(self, cache_key: Tuple, source: SignalSource) -> asyncio.Future:
+        future = self._inflight.get(cache_key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+
+        self.stats["fetches"] += 1
+        future = asyncio.ensure_future(source.fetch())
+        self._inflight[cache_key] = future
+
+        def done(f: asyncio.Future):
+            if self._inflight.get(cache_key) is f:
+                del self._inflight[cache_key]
+            if f.cancelled() or f.exception() is not None:
+                return
+            self._cache[cache_key] = (self._clock() + source.ttl, f.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def _record(self, name: str, status: str, latency: float):
+        try:
+            from engines.prometheus_metrics import prometheus_metrics
+            prometheus_metrics.record_signal_source_latency(name, status, latency)
+        except Exception as e:
+            logger.debug(f"Signal latency metric unavailable: {e}")
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop cached results (all, or those for one key)"""
+        if key is None:
+            self._cache.clear()
+            return
+        for cache_key in [k for k in self._cache if k[1] == key]:
+            del self._cache[cache_key]
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "entries": len(self._cache), "inflight": len(self._inflight)}
+
+
+# Global singleton
+signal_gatherer = SignalGatherer()
@@ -0,0 +1,251 @@
+"""
+SSE Broadcaster - One shared producer per user for /api/realtime/events
+
+Every open dashboard tab used to poll bots / trades on its own timer. Now:
+- Each user with at least one SSE subscriber gets a single producer task;
+  tabs only read pre-serialized frames from their own bounded queue
+- Producers are woken by RealTimeEventBus emits (every rt_events broadcast
+  is mirrored onto the bus) and, where MongoDB runs as a replica set, by
+  change streams on bots / trades - idle users cost no queries at all
+- Bursts of events are coalesced into one refresh (one bots query for the
+  overview and bot count, one trades query for recent trades)
+- A slow periodic resync of overview and recent trades catches writes
+  that bypass both sources, and trades whose write-behind flush landed
+  after the trade_executed refresh had already read
+- Slow consumers drop their oldest frames instead of growing memory
+- New tabs get the last overview / bot count frames immediately
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+
+import database as db
+from realtime_events import event_bus
+from utils.timestamps import iso_timestamp, with_timestamp_range
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW = "overview"
+TRADES = "trades"
+
+# What each bus event invalidates (bot counts come from the overview query)
+EVENT_TRIGGERS = {
+    "trade_executed": {OVERVIEW, TRADES},
+    "profit_updated": {OVERVIEW},
+    "bot_created": {OVERVIEW},
+    "bot_updated": {OVERVIEW},
+    "bot_deleted": {OVERVIEW},
+    "bot_paused": {OVERVIEW},
+    "bot_resumed": {OVERVIEW},
+    "bot_status_changed": {OVERVIEW},
+    "bot_promoted": {OVERVIEW},
+    "self_healing": {OVERVIEW},
+    "training_completed": {OVERVIEW},
+    "training_failed": {OVERVIEW},
+    "overview_updated": {OVERVIEW},
+    "force_refresh": {OVERVIEW, TRADES},
+}
+
+QUEUE_SIZE = 100  # Frames buffered per subscriber before the oldest are dropped
+DEBOUNCE_SECONDS = 1.0
+RECENT_TRADES_WINDOW = timedelta(minutes=2)
+
+
+def sse_frame(event: str, data: dict) -> str:
+    """Serialize one SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _UserChannel:
+    """Shared producer and subscriber queues for one user"""
+
+    def __init__(self, user_id: str, refresh_interval: float, debounce: float):
+        self.user_id = user_id
+        self.refresh_interval = refresh_interval
+        self.debounce = debounce
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.snapshot: Dict[str, str] = {}  # Latest frame per event name, replayed to new tabs
+        self.dirty: Set[str] = {OVERVIEW}
+        self.wake = asyncio.Event()
+        self.wake.set()
+        self.last_overview: Optional[dict] = None
+        self.last_bot_count: Optional[int] = None
+        self.last_trades: Optional[list] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def mark(self, kinds):
+        self.dirty.update(kinds)
+        self.wake.set()
+
+    def publish(self, event: str, data: dict, snapshot: bool = False):
+        """Serialize once and hand the same frame to every subscriber"""
+        frame = sse_frame(event, data)
+        if snapshot:
+            self.snapshot[event] = frame
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()  # Drop the oldest frame for slow consumers
+            queue.put_nowait(frame)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                self.dirty.update((OVERVIEW, TRADES))
+            await asyncio.sleep(self.debounce)  # Coalesce bursts into one refresh
+            self.wake.clear()
+            dirty, self.dirty = self.dirty, set()
+            await self.refresh(dirty)
+
+    async def refresh(self, dirty: Set[str]):
+        if OVERVIEW in dirty:
+            try:
+                await self._refresh_overview()
+            except Exception as e:
+                logger.error(f"Overview update error: {e}")
+        if TRADES in dirty:
+            try:
+                await self._refresh_trades()
+            except Exception as e:
+                logger.error(f"Trade update error: {e}")
+
+    async def _refresh_overview(self):
+        bots = await db.bots_collection.find(
+            {"user_id": self.user_id},
+            {"_id": 0, "status": 1, "total_profit": 1, "current_capital": 1}
+        ).to_list(1000)
+        now = datetime.now(timezone.utc).isoformat()
+
+        overview = {
+            "type": "overview",
+            "active_bots": len([b for b in bots if b.get('status') == 'active']),
+            "total_bots": len(bots),
+            "total_profit": round(sum(b.get('total_profit', 0) for b in bots), 2),
+            "total_capital": round(sum(b.get('current_capital', 0) for b in bots), 2),
+        }
+        # Only emit if data changed
+        if overview != self.last_overview:
+            self.last_overview = overview
+            self.publish("overview_update", {**overview, "timestamp": now}, snapshot=True)
+
+        if len(bots) != self.last_bot_count:
+            self.last_bot_count = len(bots)
+            self.publish("bot_update", {
+                "type": "bot_count_changed",
+                "total_bots": len(bots),
+                "timestamp": now
+            }, snapshot=True)
+
+    async def _refresh_trades(self):
+        since = datetime.now(timezone.utc) - RECENT_TRADES_WINDOW
+        recent_trades = await db.trades_collection.find(
+            with_timestamp_range({"user_id": self.user_id}, since),
+            {"_id": 0}
+        ).sort("timestamp", -1).limit(5).to_list(5)
+
+        for trade in recent_trades:
+            trade["timestamp"] = iso_timestamp(trade.get("timestamp"))
+        # Only emit if data changed (periodic resyncs re-read the same trades)
+        if recent_trades and recent_trades != self.last_trades:
+            self.last_trades = recent_trades
+            self.publish("trade_update", {
+                "type": "recent_trades",
+                "trades": recent_trades,
+                "count": len(recent_trades),
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            })
+
+
+class SSEBroadcaster:
+    """Fans out per-user dashboard frames to every connected SSE client"""
+
+    def __init__(self, refresh_interval: Optional[float] = None, debounce: float = DEBOUNCE_SECONDS):
+        if refresh_interval is None:
+            from config import SSE_REFRESH_INTERVAL
+            refresh_interval = SSE_REFRESH_INTERVAL
+
+        self.refresh_interval = refresh_interval
+        self.debounce = debounce
+        self.channels: Dict[str, _UserChannel] = {}
+        self._bus_subscribed = False
+        self._watch_tasks: list = []
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Register a client; its queue receives ready-to-send SSE frames"""
+        self._ensure_sources()
+
+        channel = self.channels.get(user_id)
+        if channel is None:
+            channel = _UserChannel(user_id, self.refresh_interval, self.debounce)
+            channel.task = asyncio.create_task(channel.run())
+            self.channels[user_id] = channel
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for frame in channel.snapshot.values():
+            queue.put_nowait(frame)
+        channel.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        """Remove a client; the user's producer stops with its last client"""
+        channel = self.channels.get(user_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            channel.task.cancel()
+            del self.channels[user_id]
+
+    def notify(self, user_id: str, kinds):
+        """Mark a user's overview / trades as stale (no-op without subscribers)"""
+        channel = self.channels.get(user_id)
+        if channel is not None:
+            channel.mark(kinds)
+
+    def _on_event(self, data: dict):
+        kinds = EVENT_TRIGGERS.get(data.get("type"))
+        if kinds and data.get("user_id"):
+            self.notify(data["user_id"], kinds)
+
+    def _ensure_sources(self):
+        if not self._bus_subscribed:
+            for event_type in EVENT_TRIGGERS:
+                event_bus.subscribe(event_type, self._on_event)
+            self._bus_subscribed = True
+
+        if not self._watch_tasks and db.bots_collection is not None:
+            self._watch_tasks = [
+                asyncio.create_task(self._watch(db.bots_collection, {OVERVIEW})),
+                asyncio.create_task(self._watch(db.trades_collection, {OVERVIEW, TRADES})),
+            ]
+
+    async def _watch(self, collection, kinds):
+        """Wake producers from a change stream (replica sets only; else rely on the bus)"""
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        try:
+            async with collection.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    user_id = (change.get("fullDocument") or {}).get("user_id")
+                    if user_id:
+                        self.notify(user_id, kinds)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Change stream unavailable for {collection.name}, using event bus only: {e}")
+
+    async def stop(self):
+        """Cancel all producers and change stream watchers"""
+        tasks = [c.task for c in self.channels.values()] + self._watch_tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.channels.clear()
+        self._watch_tasks = []
+
+
+# Global instance
+sse_broadcaster = SSEBroadcaster()
@@ -2,11 +2,15 @@
 System Mode Service - Paper vs Live Trading Mode Management
 Enforces exclusive mode selection and data isolation
 Handles mode switching with proper bot state transitions
+Caches per-user system_modes docs in-process; every writer calls invalidate_modes()
+emergencyStop is never served from the cache: other workers and admin paths
+set it, and it must halt trading on the next scheduler tick
 """
 
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Set, Tuple
 import database as db
 
 logger = logging.getLogger(__name__)
@@ -17,6 +21,75 @@ class SystemModeService:
     
     VALID_MODES = ['paper', 'live']
     
+    def __init__(self, cache_ttl: Optional[float] = None):
+        if cache_ttl is None:
+            from config import SYSTEM_MODE_CACHE_TTL
+            cache_ttl = SYSTEM_MODE_CACHE_TTL
+        self.cache_ttl = cache_ttl
+        self._mode_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}  # user_id -> (fetched_at, doc or None)
+        self.cache_stats = {"hits": 0, "misses": 0, "queries": 0, "invalidations": 0}
+    
+    async def get_modes_snapshot(self, user_ids: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Get system_modes docs for many users at once
+        
+        Cached docs are served from memory; all remaining users are fetched
+        with a single $in query.
+        
+        Args:
+            user_ids: User IDs
+            
+        Returns:
+            Dict of user_id -> modes doc (None if the user has no doc)
+        """
+        now = time.monotonic()
+        snapshot: Dict[str, Optional[Dict]] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._mode_cache.get(user_id)
+            if cached is not None and now - cached[0] < self.cache_ttl:
+                snapshot[user_id] = cached[1]
+                self.cache_stats["hits"] += 1
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            self.cache_stats["misses"] += len(missing)
+            self.cache_stats["queries"] += 1
+            docs = await db.system_modes_collection.find(
+                {"user_id": {"$in": missing}},
+                {"_id": 0}
+            ).to_list(None)
+            
+            found = {doc.get("user_id"): doc for doc in docs}
+            for user_id in missing:
+                doc = found.get(user_id)
+                snapshot[user_id] = doc
+                self._mode_cache[user_id] = (now, doc)
+        
+        return snapshot
+    
+    async def get_emergency_stops(self, user_ids: Iterable[str]) -> Set[str]:
+        """Users with emergencyStop set, always read from MongoDB (one $in query)"""
+        docs = await db.system_modes_collection.find(
+            {"user_id": {"$in": list(dict.fromkeys(user_ids))}, "emergencyStop": True},
+            {"_id": 0, "user_id": 1}
+        ).to_list(None)
+        return {doc.get("user_id") for doc in docs}
+    
+    def update_cached_modes(self, user_id: str, fields: Dict):
+        """Apply a $set that was just written to a cached doc (no-op if not cached)"""
+        cached = self._mode_cache.get(user_id)
+        if cached is not None and cached[1] is not None:
+            self._mode_cache[user_id] = (cached[0], {**cached[1], **fields})
+    
+    def invalidate_modes(self, user_id: Optional[str] = None):
+        """Drop the cached modes doc for a user (or all users) after a write"""
+        self.cache_stats["invalidations"] += 1
+        if user_id is None:
+            self._mode_cache.clear()
+        else:
+            self._mode_cache.pop(user_id, None)
+    
     async def get_current_mode(self, user_id: str) -> str:
         """Get current system mode for user
         
@@ -27,10 +100,7 @@ class SystemModeService:
             'paper' or 'live'
         """
         try:
-            modes = await db.system_modes_collection.find_one(
-                {"user_id": user_id},
-                {"_id": 0}
-            )
+            modes = (await self.get_modes_snapshot([user_id]))[user_id]
             
             if not modes:
                 # Default to paper mode
@@ -122,6 +192,7 @@ class SystemModeService:
                 },
                 upsert=True
             )
+            self.invalidate_modes(user_id)
             
             # Broadcast mode change
             from services.realtime_service import realtime_service
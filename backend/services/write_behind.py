@@ -0,0 +1,369 @@
+"""
+Write-Behind Buffer - Batched MongoDB writes for the paper trading hot path
+
+Trade inserts and per-bot state updates are queued in memory and flushed as
+one insert_many / bulk_write per collection:
+- Updates to the same document are coalesced ($set: last write wins,
+  $inc: summed), so concurrent trades never lose a capital update
+- A background task flushes every flush_interval seconds; max_batch pending
+  writes trigger an early flush, bounding both latency and memory
+- stop() drains the buffer (called from the FastAPI lifespan shutdown)
+- Writes are never dropped: failed inserts and updates stay queued and are
+  retried on every flush; past max_pending_inserts, insert_one waits for the
+  database to take the backlog (backpressure). Writes still unflushed at
+  stop() are appended to a dead-letter JSONL file and applied on the next
+  start() (updates carry capital / profit $inc, so losing one loses money)
+- When the buffer is not running, writes go straight to the collection
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Failed writes are retried until they succeed; past this many attempts they are
+# logged as stuck, and stop() drains this many times before dead-lettering
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class _PendingUpdate:
+    __slots__ = ("collection", "filter", "set_fields", "inc_fields", "upsert", "attempts")
+
+    def __init__(self, collection, filter: Dict, upsert: bool = False):
+        self.collection = collection
+        self.filter = filter
+        self.set_fields: Dict[str, Any] = {}
+        self.inc_fields: Dict[str, float] = {}
+        self.upsert = upsert
+        self.attempts = 0
+
+    def merge(self, set_fields: Optional[Dict], inc_fields: Optional[Dict]):
+        for field, value in (set_fields or {}).items():
+            self.inc_fields.pop(field, None)  # A later $set overrides earlier increments
+            self.set_fields[field] = value
+        for field, amount in (inc_fields or {}).items():
+            if field in self.set_fields:
+                self.set_fields[field] += amount  # Fold into the pending absolute value
+            else:
+                self.inc_fields[field] = self.inc_fields.get(field, 0) + amount
+
+    def to_update(self) -> Dict:
+        update = {}
+        if self.set_fields:
+            update["$set"] = self.set_fields
+        if self.inc_fields:
+            update["$inc"] = self.inc_fields
+        return update
+
+
+class WriteBehindBuffer:
+    """Coalesces document updates and inserts into periodic bulk writes"""
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_pending_inserts: Optional[int] = None,
+        dead_letter_path: Optional[str] = None
+    ):
+        from config import (
+            WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_BATCH,
+            WRITE_BEHIND_MAX_PENDING_INSERTS, WRITE_BEHIND_DEAD_LETTER_PATH
+        )
+        self.flush_interval = WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_batch = WRITE_BEHIND_MAX_BATCH if max_batch is None else max_batch
+        self.max_pending_inserts = WRITE_BEHIND_MAX_PENDING_INSERTS if max_pending_inserts is None else max_pending_inserts
+        self.dead_letter_path = WRITE_BEHIND_DEAD_LETTER_PATH if dead_letter_path is None else dead_letter_path
+
+        self.updates: Dict[Tuple[int, Tuple], _PendingUpdate] = {}
+        self.inserts: Dict[int, Tuple[Any, List[Tuple[Dict, int]]]] = {}  # (document, failed attempts)
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self.stats = {
+            "updates_queued": 0,
+            "updates_coalesced": 0,
+            "inserts_queued": 0,
+            "flushes": 0,
+            "round_trips": 0,
+            "flush_errors": 0,
+            "dropped": 0,
+            "insert_waits": 0,
+            "dead_lettered": 0
+        }
+
+    # ------------------------------------------------------------------
+
+    async def update_one(
+        self,
+        collection,
+        filter: Dict,
+        set_fields: Optional[Dict] = None,
+        inc_fields: Optional[Dict] = None,
+        upsert: bool = False
+    ):
+        """Queue an update to the single document matched by an equality filter"""
+        if not self.is_running:
+            update = _PendingUpdate(collection, filter, upsert)
+            update.merge(set_fields, inc_fields)
+            if upsert:
+                await collection.update_one(filter, update.to_update(), upsert=True)
+            else:
+                await collection.update_one(filter, update.to_update())
+            return
+
+        key = (id(collection), tuple(sorted(filter.items())))
+        pending = self.updates.get(key)
+        if pending is None:
+            pending = self.updates[key] = _PendingUpdate(collection, filter, upsert)
+        else:
+            pending.upsert = pending.upsert or upsert
+            self.stats["updates_coalesced"] += 1
+        pending.merge(set_fields, inc_fields)
+        self.stats["updates_queued"] += 1
+        self._maybe_flush_early()
+
+    async def insert_one(self, collection, document: Dict):
+        """Queue a document insert, waiting while max_pending_inserts are already queued"""
+        if not self.is_running:
+            await collection.insert_one(document)
+            return
+
+        while self.is_running and self.pending_insert_count() >= self.max_pending_inserts:
+            # Backpressure: hold the writer until the database takes the backlog
+            self.stats["insert_waits"] += 1
+            await self.flush()
+            if self.pending_insert_count() >= self.max_pending_inserts:
+                await asyncio.sleep(self.flush_interval)
+
+        _, documents = self.inserts.setdefault(id(collection), (collection, []))
+        documents.append((document, 0))
+        self.stats["inserts_queued"] += 1
+        self._maybe_flush_early()
+
+    def pending_increment(self, collection, filter: Dict, field: str) -> float:
+        """Not-yet-flushed $inc on a field (for reporting projected values)"""
+        pending = self.updates.get((id(collection), tuple(sorted(filter.items()))))
+        return pending.inc_fields.get(field, 0) if pending else 0
+
+    def pending_count(self) -> int:
+        return len(self.updates) + self.pending_insert_count()
+
+    def pending_insert_count(self) -> int:
+        return sum(len(docs) for _, docs in self.inserts.values())
+
+    # ------------------------------------------------------------------
+
+    async def flush(self):
+        """Write everything pending: one bulk_write / insert_many per collection"""
+        async with self._flush_lock:
+            updates, self.updates = self.updates, {}
+            inserts, self.inserts = self.inserts, {}
+            if not updates and not inserts:
+                return
+
+            by_collection: Dict[int, Tuple[Any, List[_PendingUpdate]]] = {}
+            for pending in updates.values():
+                by_collection.setdefault(id(pending.collection), (pending.collection, []))[1].append(pending)
+
+            for collection, batch in by_collection.values():
+                try:
+                    await collection.bulk_write(
+                        [UpdateOne(p.filter, p.to_update(), upsert=p.upsert) for p in batch],
+                        ordered=False
+                    )
+                    self.stats["round_trips"] += 1
+                except Exception as e:
+                    self.stats["flush_errors"] += 1
+                    logger.error(f"Write-behind bulk update of {len(batch)} docs failed: {e}")
+                    failed = _failed_indexes(e)
+                    if failed is not None:
+                        # Applied $inc updates must not be replayed
+                        batch = [p for i, p in enumerate(batch) if i in failed]
+                    self._requeue_updates(batch)
+
+            for collection, documents in inserts.values():
+                try:
+                    await collection.insert_many([document for document, _ in documents], ordered=False)
+                    self.stats["round_trips"] += 1
+                except Exception as e:
+                    self.stats["flush_errors"] += 1
+                    logger.error(f"Write-behind insert of {len(documents)} docs failed: {e}")
+                    self._requeue_inserts(collection, documents, e)
+
+            self.stats["flushes"] += 1
+
+    def _requeue_updates(self, batch: List[_PendingUpdate]):
+        for pending in batch:
+            pending.attempts += 1
+            if pending.attempts == MAX_FLUSH_ATTEMPTS:
+                logger.error(f"Update {pending.filter} still failing after {pending.attempts} attempts; keeping it queued")
+            key = (id(pending.collection), tuple(sorted(pending.filter.items())))
+            newer = self.updates.get(key)
+            if newer is not None:
+                # Replay newer writes on top of the failed ones to keep ordering
+                pending.merge(newer.set_fields, newer.inc_fields)
+            self.updates[key] = pending
+
+    def _requeue_inserts(self, collection, documents: List[Tuple[Dict, int]], error: Exception):
+        failed = _failed_indexes(error)
+        if failed is not None:
+            # Unordered insert_many stored every other doc
+            documents = [entry for i, entry in enumerate(documents) if i in failed]
+
+        retry = [(document, attempts + 1) for document, attempts in documents]
+        stuck = [document for document, attempts in retry if attempts == MAX_FLUSH_ATTEMPTS]
+        if stuck:
+            logger.error(f"{len(stuck)} inserts still failing after {MAX_FLUSH_ATTEMPTS} attempts; keeping them queued")
+        if retry:
+            # Ahead of inserts queued since, to keep insert order
+            queued = self.inserts.setdefault(id(collection), (collection, []))[1]
+            queued[:0] = retry
+
+    def _dead_letter_pending(self):
+        """Append unflushed inserts and updates to the dead-letter file (stop() with the database down)"""
+        inserts, self.inserts = self.inserts, {}
+        updates, self.updates = self.updates, {}
+        lines = [
+            json_util.dumps({"collection": collection.name, "document": document})
+            for collection, documents in inserts.values()
+            for document, _ in documents
+        ] + [
+            json_util.dumps({
+                "collection": p.collection.name, "filter": p.filter, "update": p.to_update(), "upsert": p.upsert
+            })
+            for p in updates.values()
+        ]
+        if not lines:
+            return
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+            self.stats["dead_lettered"] += len(lines)
+            logger.error(f"Wrote {len(lines)} unflushed writes to {self.dead_letter_path}; they are applied on next start")
+        except OSError as e:
+            self.stats["dropped"] += len(lines)
+            logger.error(f"Could not dead-letter {len(lines)} unflushed writes to {self.dead_letter_path}: {e}")
+
+    async def replay_dead_letters(self, db=None) -> int:
+        """Apply writes dead-lettered by an earlier stop(); returns how many were stored"""
+        if not self.dead_letter_path or not os.path.exists(self.dead_letter_path):
+            return 0
+        if db is None:
+            from database import get_database
+            db = get_database()
+
+        inserts: Dict[str, List[Dict]] = {}
+        updates: Dict[str, List[Dict]] = {}
+        with open(self.dead_letter_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json_util.loads(line)
+                    if "update" in entry:
+                        updates.setdefault(entry["collection"], []).append(entry)
+                    else:
+                        inserts.setdefault(entry["collection"], []).append(entry)
+
+        stored, left = 0, []
+        for by_collection in (inserts, updates):
+            for name, entries in by_collection.items():
+                try:
+                    if by_collection is inserts:
+                        await db[name].insert_many([e["document"] for e in entries], ordered=False)
+                    else:
+                        await db[name].bulk_write(
+                            [UpdateOne(e["filter"], e["update"], upsert=e["upsert"]) for e in entries], ordered=False
+                        )
+                    stored += len(entries)
+                except Exception as e:
+                    failed = _failed_indexes(e)
+                    kept = entries if failed is None else [entry for i, entry in enumerate(entries) if i in failed]
+                    stored += len(entries) - len(kept)
+                    left.extend(json_util.dumps(entry) for entry in kept)
+                    logger.error(f"Dead-letter replay into {name} left {len(kept)} writes: {e}")
+
+        if left:
+            with open(self.dead_letter_path, "w") as f:
+                f.write("\n".join(left) + "\n")
+        else:
+            os.remove(self.dead_letter_path)
+        logger.info(f"✍️ Replayed {stored} dead-lettered writes ({len(left)} left in {self.dead_letter_path})")
+        return stored
+
+    def _maybe_flush_early(self):
+        if self.pending_count() >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        if self.is_running:
+            return
+        try:
+            await self.replay_dead_letters()
+        except Exception as e:
+            logger.error(f"Write-behind dead-letter replay failed: {e}")
+        self.is_running = True
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✍️ Write-behind buffer started (flush every {self.flush_interval}s or {self.max_batch} writes)")
+
+    async def stop(self):
+        """Stop the flush loop and drain everything still buffered
+
+        Idempotent: once stopped, later calls return without flushing or
+        dead-lettering again.
+        """
+        if not self.is_running and self._task is None:
+            return
+        self.is_running = False
+        if self._task:
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.warning(f"Write-behind flush loop ended with error: {e}")
+            self._task = None
+        for _ in range(MAX_FLUSH_ATTEMPTS):
+            await self.flush()
+            if not self.pending_count():
+                break
+        self._dead_letter_pending()
+        logger.info(f"✍️ Write-behind buffer stopped ({self.pending_count()} writes left unflushed)")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": self.pending_count(), "is_running": self.is_running}
+
+
+def _failed_indexes(error: Exception) -> Optional[set]:
+    """Batch positions that failed in a BulkWriteError (duplicate keys count as stored), else None"""
+    write_errors = (getattr(error, "details", None) or {}).get("writeErrors")
+    if write_errors is None:
+        return None
+    return {err["index"] for err in write_errors if err.get("code") != 11000}
+
+
+# Global singleton
+write_behind = WriteBehindBuffer()
@@ -8,6 +8,7 @@ from trading_scheduler import trading_scheduler
 from rate_limiter import rate_limiter
 from risk_engine import risk_engine
 from bot_lifecycle import bot_lifecycle
+from utils.timestamps import timestamp_range
 
 logger = logging.getLogger(__name__)
 
@@ -105,12 +106,12 @@ class SystemHealth:
             # Trades in last 24 hours
             yesterday = datetime.now(timezone.utc) - timedelta(days=1)
             trades_24h = await db.trades_collection.count_documents({
-                "timestamp": {"$gte": yesterday.isoformat()}
+                **timestamp_range(yesterday)
             })
             
             # Total profit last 24h
             trades = await db.trades_collection.find({
-                "timestamp": {"$gte": yesterday.isoformat()}
+                **timestamp_range(yesterday)
             }, {"_id": 0, "profit_loss": 1}).to_list(10000)
             
             total_profit_24h = sum(t.get("profit_loss", 0) for t in trades)
@@ -0,0 +1,308 @@
+"""
+Shared in-memory fakes for the tests
+
+- FakeClock: injectable clock for TTL / interval logic
+- FakeCollection / FakeCursor / FakeDB: the subset of Motor the services use.
+  Cursors behave like Motor's: to_list() and async iteration consume them.
+  Finds, projections, counts and bulk writes are recorded for assertions.
+- matches(): the MongoDB filter operators the fakes understand. Range
+  comparisons never cross BSON types (a datetime bound skips ISO strings)
+"""
+
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.timestamps import parse_timestamp
+
+
+class FakeClock:
+    """Callable clock; tests move it with clock.now += seconds"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _bson_type(value):
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float)):
+        return float
+    return type(value)
+
+
+def _compare(value, op, bound) -> bool:
+    if value is None or _bson_type(value) is not _bson_type(bound):
+        return False
+    if isinstance(value, datetime):  # BSON dates compare as UTC instants
+        value, bound = parse_timestamp(value), parse_timestamp(bound)
+    if op == "$gte":
+        return value >= bound
+    if op == "$gt":
+        return value > bound
+    if op == "$lte":
+        return value <= bound
+    return value < bound
+
+
+def _matches_condition(value, condition: Dict) -> bool:
+    for op, bound in condition.items():
+        if op in ("$gte", "$gt", "$lte", "$lt"):
+            if not _compare(value, op, bound):
+                return False
+        elif op == "$in":
+            if value not in bound:
+                return False
+        elif op == "$nin":
+            if value in bound:
+                return False
+        elif op == "$ne":
+            if value == bound:
+                return False
+        elif op == "$exists":
+            if (value is not None) != bool(bound):
+                return False
+        elif op == "$type":
+            expected = {"string": str, "date": datetime}[bound]
+            if not isinstance(value, expected):
+                return False
+        else:
+            raise NotImplementedError(f"FakeCollection does not support {op}")
+    return True
+
+
+def matches(doc: Dict, query: Optional[Dict]) -> bool:
+    """Whether doc satisfies a MongoDB filter"""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            if not _matches_condition(doc.get(key), condition):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def _evaluate(doc: Dict, expression):
+    """Aggregation expression: "$field", a constant or {"$multiply": [...]}"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:], 0) or 0
+    if isinstance(expression, dict) and "$multiply" in expression:
+        product = 1
+        for factor in expression["$multiply"]:
+            product *= _evaluate(doc, factor)
+        return product
+    return expression
+
+
+def _sort_key(value):
+    # None sorts first, as in MongoDB; mixed types group by type name
+    return (value is not None, type(value).__name__, value if value is not None else 0)
+
+
+class FakeCursor:
+    """Motor cursor over a snapshot of matching documents"""
+
+    def __init__(self, docs: List[Dict]):
+        self.docs = docs
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda d: _sort_key(d.get(field)), reverse=order == -1)
+        return self
+
+    def skip(self, n: int):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n: int):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        # Consumes the cursor: the next call continues where this one stopped
+        n = len(self.docs) if length is None else length
+        docs, self.docs = self.docs[:n], self.docs[n:]
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+
+class FakeCollection:
+    """In-memory Motor collection; reads return copies, writes change self.docs"""
+
+    def __init__(self, docs: Optional[List[Dict]] = None, name: str = ""):
+        self.name = name
+        self.docs = docs if docs is not None else []
+        self.next_id = len(self.docs)
+        self.finds: List[Dict] = []
+        self.projections: List[Optional[Dict]] = []
+        self.counts: List[Dict] = []
+        self.bulk_writes: List[List] = []
+
+    def stored(self, **fields) -> Optional[Dict]:
+        """The stored (not copied) document with these field values, for tests to edit"""
+        return next((d for d in self.docs if matches(d, fields)), None)
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    # Reads
+
+    def find(self, query=None, projection=None):
+        self.finds.append(query or {})
+        self.projections.append(projection)
+        return FakeCursor([dict(d) for d in self.docs if matches(d, query)])
+
+    async def find_one(self, query=None, projection=None):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        return dict(doc) if doc is not None else None
+
+    async def count_documents(self, query):
+        self.counts.append(query)
+        return sum(1 for d in self.docs if matches(d, query))
+
+    def aggregate(self, pipeline: List[Dict]):
+        """$match stages and one ungrouped ($group _id None) $sum / $avg stage"""
+        docs = [dict(d) for d in self.docs]
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if matches(d, stage["$match"])]
+            elif "$group" in stage and stage["$group"]["_id"] is None:
+                if not docs:
+                    return FakeCursor([])
+                group = {"_id": None}
+                for field, accumulator in stage["$group"].items():
+                    if field == "_id":
+                        continue
+                    (op, expression), = accumulator.items()
+                    values = [_evaluate(d, expression) for d in docs]
+                    group[field] = sum(values) if op == "$sum" else sum(values) / len(values)
+                docs = [group]
+            else:
+                raise NotImplementedError(f"FakeCollection does not support stage {stage}")
+        return FakeCursor(docs)
+
+    # Writes
+
+    async def insert_one(self, doc: Dict):
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs: List[Dict], ordered=True):
+        return SimpleNamespace(inserted_ids=[self._insert(doc) for doc in docs])
+
+    async def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    async def replace_one(self, query, doc, upsert=False):
+        return self._replace(query, doc, upsert)
+
+    async def delete_one(self, query):
+        return SimpleNamespace(deleted_count=self._delete_one(query))
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs[:] = [d for d in self.docs if not matches(d, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append(list(requests))
+        modified = 0
+        for request in requests:
+            if isinstance(request, UpdateOne):
+                modified += self._update(request._filter, request._doc, request._upsert, many=False).modified_count
+            elif isinstance(request, ReplaceOne):
+                modified += self._replace(request._filter, request._doc, request._upsert).modified_count
+            elif isinstance(request, DeleteOne):
+                self._delete_one(request._filter)
+            elif isinstance(request, InsertOne):
+                self._insert(request._doc)
+        return SimpleNamespace(modified_count=modified)
+
+    # Write primitives (subclasses that record calls override the public methods only)
+
+    def _insert(self, doc: Dict):
+        if "_id" not in doc:
+            doc["_id"] = self.next_id
+            self.next_id += 1
+        self.docs.append(dict(doc))
+        return doc["_id"]
+
+    def _replace(self, query, doc, upsert):
+        for i, existing in enumerate(self.docs):
+            if matches(existing, query):
+                self.docs[i] = {"_id": existing.get("_id"), **doc} if "_id" in existing else dict(doc)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=self._insert(dict(doc)))
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    def _delete_one(self, query) -> int:
+        for i, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[i]
+                return 1
+        return 0
+
+    def _update(self, query, update, upsert, many):
+        targets = [d for d in self.docs if matches(d, query)]
+        if not many:
+            targets = targets[:1]
+        if not targets and upsert:
+            self._insert({k: v for k, v in query.items() if not k.startswith("$")})
+            targets = [self.docs[-1]]
+            result = SimpleNamespace(matched_count=0, modified_count=0, upserted_id=targets[0]["_id"])
+        else:
+            result = SimpleNamespace(matched_count=len(targets), modified_count=0, upserted_id=None)
+
+        for doc in targets:
+            before = dict(doc)
+            doc.update(update.get("$set", {}))
+            for field, amount in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + amount
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+            if result.upserted_id is not None:
+                doc.update(update.get("$setOnInsert", {}))
+            elif doc != before:
+                result.modified_count += 1
+        return result
+
+
+class FakeDB(dict):
+    """Motor database: collections are created on first access, by key or attribute"""
+
+    def __missing__(self, name):
+        self[name] = FakeCollection(name=name)
+        return self[name]
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self[name]
@@ -79,7 +79,7 @@ class TestLedgerFirstTruth:
         
         # Mock methods for reconciliation
         ledger.compute_equity = AsyncMock(return_value=10000.00)
-        ledger.get_fills = AsyncMock(return_value=[{"id": "fill1"}] * 50)
+        ledger.fills_ledger.count_documents = AsyncMock(return_value=50)
         
         # Mock trades collection with different total
         mock_trades = AsyncMock()
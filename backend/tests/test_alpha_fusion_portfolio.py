@@ -0,0 +1,105 @@
+"""
+Tests for portfolio-mode alpha fusion
+
+- Shared inputs are fetched once per cycle: macro once, whale/sentiment once per coin
+- Input fetches run concurrently, bounded by max_concurrency
+- Portfolio results match per-symbol fusion; a failing input drops only its symbols
+- The latest signal matrix is readable without recomputing
+"""
+
+import asyncio
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import engines.alpha_fusion_engine as fusion_module
+from engines.alpha_fusion_engine import AlphaFusionEngine
+from engines.macro_news_monitor import MacroSignal
+from engines.on_chain_monitor import WhaleSignal
+
+
+class FakeSources:
+    """Stands in for the OFI, whale, sentiment and macro engines, counting calls"""
+
+    def __init__(self, fail_coin=None):
+        self.calls = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_coin = fail_coin
+
+    async def _call(self, name, result):
+        self.calls[name] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def get_signal(self, symbol):
+        return await self._call(("ofi", symbol), None)
+
+    async def get_whale_signal(self, coin):
+        error = RuntimeError(f"{coin} feed down") if coin == self.fail_coin else None
+        return await self._call(("whale", coin), error or WhaleSignal(
+            timestamp=None, coin=coin, signal='bullish', strength=0.8,
+            reason="Exchange outflows", recent_transactions=[], metrics={}
+        ))
+
+    async def analyze_coin_sentiment(self, coin, hours=24):
+        return await self._call(("sentiment", coin), None)
+
+    async def get_macro_signal(self):
+        return await self._call("macro", MacroSignal(
+            timestamp=None, signal='maintain', risk_multiplier=1.1,
+            reason="Calm", recent_events=[]
+        ))
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    fake = FakeSources()
+    for name in ("ofi_calculator", "whale_monitor", "sentiment_analyzer", "macro_monitor"):
+        monkeypatch.setattr(fusion_module, name, fake)
+    return fake
+
+
+SYMBOLS = ["BTC/USDT", "BTC/ZAR", "ETH/USDT", "ETH/ZAR", "SOL/USDT", "XRP/ZAR"]
+
+
+@pytest.mark.asyncio
+async def test_shared_inputs_fetched_once_with_bounded_concurrency(sources):
+    engine = AlphaFusionEngine(max_concurrency=3)
+    matrix = await engine.fuse_portfolio(SYMBOLS)
+
+    assert sorted(matrix.signals) == sorted(SYMBOLS)
+    assert sources.calls["macro"] == 1
+    assert all(sources.calls[("whale", coin)] == 1 for coin in ("BTC", "ETH", "SOL", "XRP"))
+    assert all(sources.calls[("sentiment", coin)] == 1 for coin in ("BTC", "ETH", "SOL", "XRP"))
+    assert sum(sources.calls.values()) == 1 + 4 + 4 + len(SYMBOLS)
+    assert sources.max_in_flight == 3
+
+    # Same result as fusing each symbol on its own
+    single = await engine.fuse_signals("BTC/ZAR")
+    assert matrix.signals["BTC/ZAR"].score == pytest.approx(single.score)
+    assert matrix.signals["BTC/ZAR"].position_size_multiplier == pytest.approx(single.position_size_multiplier)
+
+
+@pytest.mark.asyncio
+async def test_failed_input_drops_only_its_symbols_and_matrix_is_readable(sources):
+    sources.fail_coin = "ETH"
+    engine = AlphaFusionEngine()
+
+    signals = await engine.get_portfolio_signals(SYMBOLS)
+
+    assert "ETH/USDT" not in signals and "ETH/ZAR" not in signals
+    assert len(signals) == len(SYMBOLS) - 2
+    assert "feed down" in engine.latest_matrix.errors["ETH/ZAR"]
+    assert engine.get_latest_signal("BTC/USDT") is signals["BTC/USDT"]
+    assert engine.get_latest_signal("BTC/USDT", max_age=-1) is None
+    assert engine.get_summary(signals)["total_symbols"] == len(signals)
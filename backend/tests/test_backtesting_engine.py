@@ -0,0 +1,149 @@
+"""
+Tests for the candle-replay backtester
+
+- Trades follow the candles: stops, take-profits, fees and trend filter
+- Results are deterministic and cached by (params, data hash)
+- Process-pool sweeps match inline runs
+- Candle series are cached unless the range ends within a bar of now
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import backtesting_engine
+from backtesting_engine import BacktestingEngine, candles_hash, run_backtest
+from fakes import FakeClock
+from paper_trading_engine import EXCHANGE_FEES
+
+START_MS = 1_700_000_000_000
+BAR_MS = 300_000
+
+
+def make_candles(closes, spread=0.001, volume=50.0):
+    """5m candles opening at the previous close, with a small high/low range"""
+    closes = np.asarray(closes, dtype=np.float64)
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    highs = np.maximum(opens, closes) * (1 + spread)
+    lows = np.minimum(opens, closes) * (1 - spread)
+    timestamps = START_MS + BAR_MS * np.arange(len(closes))
+    return np.column_stack([timestamps, opens, highs, lows, closes, np.full(len(closes), volume)])
+
+
+def trending(days, daily_pct, start=1_000_000.0):
+    bars = days * 288
+    return start * (1 + daily_pct / 100) ** (np.arange(bars) / 288)
+
+
+def test_trades_follow_candles():
+    up = make_candles(trending(5, 10.0))
+    result = run_backtest(up, {"risk_mode": "balanced", "exchange": "valr"}, 1000)
+    trades, metrics = result["trades"], result["metrics"]
+
+    assert metrics["total_trades"] == len(trades) > 10
+    assert metrics["total_return"] > 0
+    assert all(t["entry_price"] < t["exit_price"] for t in trades)
+    fee_rate = EXCHANGE_FEES["valr"]["taker"]
+    assert trades[0]["fees"] == pytest.approx(trades[0]["amount"] * fee_rate * 2, rel=1e-3)
+
+    # A crash inside the holding window is cut at the stop
+    crash = trending(2, 3.0)
+    crash[180:] *= 0.9  # Inside the position opened at bar 160
+    stopped = run_backtest(make_candles(crash), {"min_trend": -1, "stop_loss_pct": 1.0, "hold_minutes": 240}, 1000)
+    reasons = {t["exit_reason"] for t in stopped["trades"]}
+    assert "stop_loss" in reasons
+    losses = [t for t in stopped["trades"] if t["exit_reason"] == "stop_loss"]
+    assert all(t["exit_price"] <= t["entry_price"] * 0.99 + 1e-6 for t in losses)
+
+    # Skips bearish markets once the regime is confident, unless told to always enter
+    down = make_candles(trending(5, -6.0))
+    filtered = run_backtest(down, {}, 1000)["trades"]
+    always = run_backtest(down, {"min_trend": -1}, 1000)
+    assert len(filtered) <= 1
+    assert always["metrics"]["total_trades"] > len(filtered)
+    assert always["metrics"]["total_return"] < 0
+
+
+@pytest.mark.asyncio
+async def test_sweep_caches_by_params_and_data_hash():
+    engine = BacktestingEngine(workers=1, cache_size=100)
+    candles = make_candles(trending(3, 1.0))
+
+    async def load_candles(exchange, symbol, timeframe, start, end):
+        return candles, candles_hash(candles)
+    engine.load_candles = load_candles
+
+    params = [{"risk_mode": mode} for mode in ("safe", "balanced", "risky")]
+    first = await engine.sweep(params, "2023-11-14T00:00:00", "2023-11-17T00:00:00")
+    second = await engine.sweep(params, "2023-11-14T00:00:00", "2023-11-17T00:00:00")
+
+    assert [r["metrics"] for r in first] == [r["metrics"] for r in second]
+    assert engine.stats["runs"] == 3
+    assert engine.stats["cache_hits"] == 3
+    assert first[0]["data"]["data_hash"] == candles_hash(candles)
+
+    # Explicit defaults resolve to the same cache entry; new data does not
+    await engine.sweep([{"risk_mode": "safe", "timeframe": "5m"}], "2023-11-14", "2023-11-17")
+    assert engine.stats["runs"] == 3
+    candles = make_candles(trending(3, 2.0))
+    await engine.sweep([{"risk_mode": "safe"}], "2023-11-14", "2023-11-17")
+    assert engine.stats["runs"] == 4
+
+    bad = await engine.sweep([{"timeframe": "7m"}], "2023-11-14", "2023-11-17")
+    assert "error" in bad[0]
+
+
+@pytest.mark.asyncio
+async def test_process_pool_matches_inline():
+    candles = make_candles(trending(4, 2.0) * (1 + 0.01 * np.sin(np.arange(4 * 288) / 20)))
+    grid = [
+        {"risk_mode": mode, "take_profit_pct": tp, "stop_loss_pct": 1.0}
+        for mode in ("safe", "risky") for tp in (0.5, 1.0, 2.0, 3.0)
+    ]
+
+    async def load_candles(exchange, symbol, timeframe, start, end):
+        return candles, candles_hash(candles)
+
+    pooled = BacktestingEngine(workers=2, cache_size=100)
+    pooled.load_candles = load_candles
+    try:
+        results = await pooled.sweep(grid, "2023-11-14", "2023-11-18")
+    finally:
+        pooled.shutdown()
+
+    assert pooled.stats["pool_batches"] == 1
+    inline = [run_backtest(candles, params, 1000, include_trades=False)["metrics"] for params in grid]
+    assert [r["metrics"] for r in results] == inline
+
+
+@pytest.mark.asyncio
+async def test_recent_ranges_skip_the_dataset_cache(monkeypatch):
+    candles = make_candles(trending(1, 1.0))
+    reads = []
+
+    async def get_candles(exchange, symbol, timeframe, start=None, end=None):
+        reads.append((start, end))
+        return SimpleNamespace(as_array=lambda: candles)
+    monkeypatch.setattr(backtesting_engine.candle_store, "get_candles", get_candles)
+
+    start = datetime(2023, 11, 14, tzinfo=timezone.utc)
+    end = datetime(2023, 11, 15, tzinfo=timezone.utc)
+    clock = FakeClock(end.timestamp() + 120)  # The range ends inside the current 5m bar
+    engine = BacktestingEngine(workers=1, cache_size=100, clock=clock)
+
+    await engine.load_candles("binance", "BTC/USDT", "5m", start, end)
+    await engine.load_candles("binance", "BTC/USDT", "5m", start, end)
+    assert len(reads) == 2
+    assert engine.get_stats()["datasets"] == 0
+
+    clock.now += 300  # A full bar later the range is settled
+    await engine.load_candles("binance", "BTC/USDT", "5m", start, end)
+    await engine.load_candles("binance", "BTC/USDT", "5m", start, end)
+    assert len(reads) == 3
+    assert engine.get_stats()["datasets"] == 1
@@ -0,0 +1,105 @@
+"""
+Tests for the cached bot name index used by the AI command router
+
+- Lookups resolve by ID, normalized name and fuzzy name from one projected load
+- Create/rename/delete events keep the index current; old indexes are reloaded
+- Renaming a bot through PUT /api/bots/{bot_id} updates the index without a reload
+- "pause alpha, beta and gamma" resolves all three bots without re-reading the collection
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import services.ai_command_router_enhanced as router_module
+from realtime_events import event_bus
+from services.ai_command_router_enhanced import EnhancedAICommandRouter
+from services.bot_name_index import BotNameIndex
+from fakes import FakeClock, FakeCollection
+
+
+def make_bots():
+    return FakeCollection([
+        {"id": "b1", "user_id": "u1", "name": "Alpha Scalper", "status": "active", "current_capital": 1000},
+        {"id": "b2", "user_id": "u1", "name": "Beta", "status": "active", "current_capital": 1000},
+        {"id": "b3", "user_id": "u1", "name": "Gamma-Ray", "status": "active", "current_capital": 1000},
+        {"id": "b4", "user_id": "u2", "name": "Delta", "status": "active", "current_capital": 1000},
+    ])
+
+
+@pytest.mark.asyncio
+async def test_resolves_from_one_projected_load():
+    bots = make_bots()
+    index = BotNameIndex(clock=FakeClock())
+
+    assert await index.resolve(bots, "u1", "b2") == {"id": "b2", "name": "Beta"}
+    assert (await index.resolve(bots, "u1", "BETA"))["id"] == "b2"
+    assert (await index.resolve(bots, "u1", "gamma ray"))["id"] == "b3"
+    assert (await index.resolve(bots, "u1", "alpha"))["id"] == "b1"  # Partial name
+    assert (await index.resolve(bots, "u1", "alpah scalper"))["id"] == "b1"  # Typo
+    assert await index.resolve(bots, "u1", "delta") is None  # Another user's bot
+    assert await index.resolve(bots, "u1", "zzz") is None
+
+    assert len(bots.finds) == 1
+    assert bots.projections == [{"_id": 0, "id": 1, "name": 1}]
+
+
+@pytest.mark.asyncio
+async def test_events_and_max_age_keep_index_current():
+    bots = make_bots()
+    clock = FakeClock()
+    index = BotNameIndex(max_age=300, clock=clock)
+    await index.get(bots, "u1")
+
+    await event_bus.emit("bot_created", {"type": "bot_created", "user_id": "u1", "bot": {"id": "b5", "name": "Epsilon"}})
+    await event_bus.emit("bot_updated", {"type": "bot_updated", "user_id": "u1", "bot_id": "b2", "changes": {"name": "Bravo"}})
+    assert (await index.resolve(bots, "u1", "epsilon"))["id"] == "b5"
+    assert (await index.resolve(bots, "u1", "bravo"))["id"] == "b2"
+    assert len(bots.finds) == 1
+
+    await event_bus.emit("bot_deleted", {"type": "bot_deleted", "user_id": "u1", "message": "🗑️ Bot 'Bravo' deleted"})
+    assert "u1" not in index.users
+    await index.get(bots, "u1")
+    assert len(bots.finds) == 2
+
+    # A rename that emitted no event is picked up once the index ages out
+    bots.docs[0]["name"] = "Omega"
+    assert (await index.resolve(bots, "u1", "omega")) is None
+    clock.now += 301
+    assert (await index.resolve(bots, "u1", "omega"))["id"] == "b1"
+    assert len(bots.finds) == 3
+
+
+@pytest.mark.asyncio
+async def test_update_bot_endpoint_renames_in_index(monkeypatch):
+    import database
+    import server
+
+    bots = make_bots()
+    monkeypatch.setattr(database, "bots_collection", bots)
+    index = BotNameIndex(clock=FakeClock())
+    await index.get(bots, "u1")
+
+    updated = await server.update_bot("b2", {"name": "Bravo", "current_capital": None}, user_id="u1")
+    assert updated["name"] == "Bravo"
+    assert (await index.resolve(bots, "u1", "bravo"))["id"] == "b2"
+    assert await index.resolve(bots, "u1", "beta") is None
+    assert len(bots.finds) == 1
+
+
+@pytest.mark.asyncio
+async def test_multi_command_resolves_without_rereading(monkeypatch):
+    bots = make_bots()
+    monkeypatch.setattr(router_module, "bot_name_index", BotNameIndex(clock=FakeClock()))
+    db = {"bots": bots, "users": FakeCollection(), "system_modes": FakeCollection(), "trades": FakeCollection()}
+    router = EnhancedAICommandRouter(db)
+
+    is_command, result = await router.parse_and_execute("u1", "pause alpha, beta and gamma", confirmed=True)
+
+    assert is_command and result["multi_command"]
+    assert [r["data"]["bot_id"] for r in result["results"]] == ["b1", "b2", "b3"]
+    assert all(bot["status"] == "paused" for bot in bots.docs[:3])
+    assert len(bots.finds) == 1
@@ -0,0 +1,123 @@
+"""
+Tests for the memory-mapped OHLCV candle store
+
+- Appends, forming-bar updates and out-of-order merges keep one sorted row per bar
+- Reads are zero-copy, read-only views with range / limit queries
+- sync() backfills incrementally, fills holes once, and history survives a restart
+- Regime detectors start warm from stored candles
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.candle_store import CandleStore
+
+BAR = 300_000  # 5m in ms
+T0 = 1_700_000_000_000 - (1_700_000_000_000 % BAR)
+
+
+def bars(start, count, price=100.0):
+    return [[T0 + (start + i) * BAR, price + i, price + i + 1, price + i - 1, price + i + 0.5, 10.0] for i in range(count)]
+
+
+class FakeExchange:
+    """fetch_ohlcv over a fixed history, recording each call's since"""
+
+    def __init__(self, history, page=50):
+        self.history = history
+        self.page = page
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append(since)
+        rows = [r for r in self.history if since is None or r[0] >= since]
+        return rows[:min(limit or self.page, self.page)]
+
+
+def test_write_and_zero_copy_reads(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    store.write("Luno", "BTC/ZAR", "5m", bars(0, 10))
+    store.write("luno", "BTC/ZAR", "5m", bars(9, 5, price=200.0))   # Updates bar 9, appends 10-13
+    store.write("luno", "BTC/ZAR", "5m", bars(-3, 3))               # Backfill before the first bar
+
+    candles = store.read("luno", "BTC/ZAR", "5m")
+    assert len(candles) == 17
+    assert np.all(np.diff(candles.timestamp) == BAR)
+    assert candles.close[12] == 200.5  # Bar 9, replaced by the later write
+
+    window = store.read("luno", "BTC/ZAR", "5m", start=T0, end=T0 + 5 * BAR)
+    assert list(window.timestamp) == [T0 + i * BAR for i in range(5)]
+    assert len(store.read("luno", "BTC/ZAR", "5m", limit=4)) == 4
+
+    series = store._series[("luno", "BTC/ZAR", "5m")]
+    assert np.shares_memory(window.close, series.mm)
+    with pytest.raises(ValueError):
+        window.close[0] = 0.0
+
+    # A fresh instance (another worker / after restart) reads the same rows
+    assert len(CandleStore(root=str(tmp_path)).read("luno", "BTC/ZAR", "5m")) == 17
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental_and_fills_gaps(tmp_path):
+    now_ms = T0 + 200 * BAR
+    store = CandleStore(root=str(tmp_path), clock=lambda: now_ms / 1000)
+    history = bars(0, 201)
+    exchange = FakeExchange(history)
+
+    # Empty series: backfill from the requested start, paging through the exchange
+    candles = await store.get_candles("binance", "ETH/USDT", "5m", start=T0, exchange_obj=exchange)
+    assert len(candles) == 201
+    assert len(exchange.calls) == 5
+
+    # Fresh: no exchange call; stale: only from the last stored bar
+    exchange.calls.clear()
+    await store.get_candles("binance", "ETH/USDT", "5m", limit=20, exchange_obj=exchange)
+    assert exchange.calls == []
+    written = await store.sync("binance", "ETH/USDT", "5m", exchange)
+    assert exchange.calls == [T0 + 200 * BAR]
+    assert written == 1
+
+    # A hole inside the stored range is fetched once
+    gapped = CandleStore(root=str(tmp_path / "gapped"), clock=lambda: now_ms / 1000)
+    gapped.write("binance", "ETH/USDT", "5m", history[:50] + history[60:])
+    exchange.calls.clear()
+    await gapped.sync("binance", "ETH/USDT", "5m", exchange)
+    assert T0 + 50 * BAR in exchange.calls
+    assert len(gapped.read("binance", "ETH/USDT", "5m")) == 201
+    exchange.calls.clear()
+    await gapped.sync("binance", "ETH/USDT", "5m", exchange)
+    assert exchange.calls == [T0 + 200 * BAR]
+
+
+@pytest.mark.asyncio
+async def test_regime_detectors_start_warm(tmp_path, monkeypatch):
+    import services.candle_store as candle_store_module
+    from engines.regime_detector import RegimeDetector
+
+    store = CandleStore(root=str(tmp_path))
+    monkeypatch.setattr(candle_store_module, "candle_store", store)
+
+    now_ms = int(__import__("time").time() * 1000)
+    rows = [[now_ms - (100 - i) * BAR, 100 + i, 101 + i, 99 + i, 100.5 + i, 5.0] for i in range(100)]
+    store.write("luno", "XRP/ZAR", "5m", rows)
+
+    async def no_sync(*args, **kwargs):
+        return 0
+    monkeypatch.setattr(store, "sync", no_sync)
+
+    detector = RegimeDetector()
+    assert await detector.load_history("XRP/ZAR", "luno") == 100
+    assert len(detector.price_history["XRP/ZAR"]) == 100
+    assert await detector.load_history("XRP/ZAR", "luno") == 0  # Already warm
+
+    # First use of a symbol seeds it without any prior load_history call
+    cold = RegimeDetector()
+    state = await cold.detect_regime("XRP/ZAR")
+    assert len(cold.price_history["XRP/ZAR"]) == 100
+    assert state.regime.value != "unknown"
@@ -0,0 +1,135 @@
+"""
+Tests for the risk engine's in-memory exposure book
+
+- After the first load, risk checks run without MongoDB queries and give the same answers
+- Trade/bot events and recorded results keep capital, exposure and daily loss current
+- A stale book is reconciled in the background, picking up changes that had no event
+- Reconciling keeps PnL of trades MongoDB does not have yet, without counting any twice
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database
+from realtime_events import rt_events
+from risk_engine import RiskEngine
+from services.exposure_book import ExposureBook
+from fakes import FakeClock, FakeCollection
+
+NOW = datetime.utcnow()  # Naive UTC, as Motor returns BSON dates
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    bots = FakeCollection([
+        {"id": "b1", "user_id": "u1", "current_capital": 1000, "exchange": "luno"},
+        {"id": "b2", "user_id": "u1", "current_capital": 1000, "exchange": "binance"},
+    ])
+    trades = FakeCollection([
+        {"id": "t1", "user_id": "u1", "pair": "BTC/ZAR", "entry_price": 100, "amount": 5, "status": "open", "timestamp": NOW},
+        {"id": "t2", "user_id": "u1", "pair": "ETH/ZAR", "entry_price": 10, "amount": 2, "status": "closed", "profit_loss": -20,
+         "timestamp": NOW},
+    ])
+    monkeypatch.setattr(database, "bots_collection", bots)
+    monkeypatch.setattr(database, "trades_collection", trades)
+    return bots, trades
+
+
+def queries(collections):
+    return sum(len(c.finds) for c in collections)
+
+
+@pytest.mark.asyncio
+async def test_checks_answer_from_book_without_queries(collections):
+    clock = FakeClock()
+    engine = RiskEngine(ExposureBook(reconcile_interval=60, clock=clock))
+
+    assert await engine.check_trade_risk("u1", "b1", "luno", 200, "safe") == (True, "Risk check passed")
+    loaded = queries(collections)
+    assert loaded == 3
+
+    for _ in range(50):
+        await engine.check_trade_risk("u1", "b1", "luno", 200, "safe")
+    assert queries(collections) == loaded
+    assert engine.user_daily_loss["u1"] == -20
+
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 300, "safe")
+    assert not allowed and "too large" in reason
+    assert await engine.check_trade_risk("u1", "missing", "luno", 200, "safe") == (False, "Bot not found")
+
+
+@pytest.mark.asyncio
+async def test_events_keep_book_current(collections):
+    book = ExposureBook(reconcile_interval=60, clock=FakeClock())
+    engine = RiskEngine(book)
+    await engine.check_trade_risk("u1", "b1", "luno", 200, "safe")
+
+    # Capital grows with a trade: the larger size passes without a reload
+    await rt_events.trade_executed("u1", {"bot_id": "b1", "pair": "BTC/ZAR", "new_capital": 1400})
+    assert book.users["u1"].bots["b1"]["current_capital"] == 1400
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 300, "safe"))[0]
+
+    # A losing trade shrinks equity until the open BTC position passes 35% of it
+    await rt_events.trade_executed("u1", {"bot_id": "b1", "pair": "BTC/ZAR", "new_capital": 100})
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 20, "safe")
+    assert not allowed and "BTC" in reason
+
+    # Closing the position clears it
+    book.close_trade("u1", "t1")
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 20, "safe"))[0]
+
+    # Losses recorded after a trade trip the daily limit
+    await engine.record_trade_result("u1", -100)
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 200, "safe")
+    assert not allowed and "Daily loss" in reason
+    assert queries(collections) == 3
+
+
+@pytest.mark.asyncio
+async def test_stale_book_reconciles_in_background(collections):
+    bots, _ = collections
+    clock = FakeClock()
+    book = ExposureBook(reconcile_interval=60, clock=clock)
+    engine = RiskEngine(book)
+    await engine.check_trade_risk("u1", "b1", "luno", 200, "safe")
+
+    # An allocator moves capital without emitting an event
+    bots.docs[0]["current_capital"] = 100
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 200, "safe"))[0]
+
+    clock.now += 61
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 200, "safe"))[0]  # Answers from the current book
+    await asyncio.sleep(0.01)
+    assert book.reconciles == 2
+    assert not (await engine.check_trade_risk("u1", "b1", "luno", 200, "safe"))[0]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_pnl_not_yet_in_mongodb(collections):
+    _, trades = collections
+    book = ExposureBook(reconcile_interval=60, clock=FakeClock())
+    await book.get("u1")
+
+    # t3 is still queued in the write-behind buffer
+    book.record_pnl("u1", -50, "t3")
+    assert (await book.reconcile("u1")).daily_pnl == -70
+
+    # t4 is recorded while the reconcile's queries are in flight
+    reconcile = asyncio.create_task(book.reconcile("u1"))
+    await asyncio.sleep(0)
+    book.record_pnl("u1", -5, "t4")
+    assert (await reconcile).daily_pnl == -75
+
+    # Once t3 is flushed it is counted from MongoDB only
+    trades.docs.append(
+        {"id": "t3", "user_id": "u1", "pair": "BTC/ZAR", "status": "closed", "profit_loss": -50, "timestamp": NOW}
+    )
+    reconciled = await book.reconcile("u1")
+    assert reconciled.daily_pnl == -75
+    assert reconciled.unconfirmed_pnl == {"t4": -5}
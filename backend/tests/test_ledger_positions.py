@@ -0,0 +1,206 @@
+"""
+Tests for materialized ledger positions
+
+- append_fill keeps positions, fees and the equity curve current
+- Reads catch up on fills the incremental path missed
+- Backdated fills force a rebuild
+- Results match a full replay beyond the old 10k fill cap
+- The replay fallback matches lots per bot, like the materialized positions
+- Replays stream every fill in batches instead of capping the history
+- Legacy fills without user or bot ids replay, apply and verify without errors
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import ledger_service
+from services.ledger_service import LedgerService
+from services import ledger_positions
+from fakes import FakeDB
+
+
+T0 = datetime(2025, 1, 1)
+
+
+async def append(ledger, side, qty, price, minutes, fee=1.0, symbol="BTC/USDT", bot_id="bot_1"):
+    return await ledger.append_fill(
+        user_id="user_1", bot_id=bot_id, exchange="binance", symbol=symbol,
+        side=side, qty=qty, price=price, fee=fee, fee_currency="USDT",
+        timestamp=T0 + timedelta(minutes=minutes), order_id=f"order_{minutes}"
+    )
+
+
+async def full_replay_realized(db, user_id):
+    """Reference FIFO replay straight off the fills"""
+    positions = {}
+    cursor = db["fills_ledger"].find({"user_id": user_id}).sort([("timestamp", 1), ("_id", 1)])
+    for fill in await cursor.to_list():
+        key = (fill["bot_id"], fill["symbol"])
+        if key not in positions:
+            positions[key] = ledger_positions.new_position(fill["user_id"], *key)
+        ledger_positions.apply_fill_to_position(positions[key], fill)
+    return sum(p["realized_pnl"] for p in positions.values())
+
+
+@pytest.mark.asyncio
+async def test_append_fill_updates_materialized_state():
+    db = FakeDB()
+    ledger = LedgerService(db)
+    await ledger.append_event("user_1", "funding", 10000, "USDT", T0)
+
+    await append(ledger, "buy", 1.0, 100.0, 1)
+    await append(ledger, "buy", 1.0, 110.0, 2)
+    await append(ledger, "sell", 1.5, 120.0, 3)
+
+    position = await db["ledger_positions"].find_one({"bot_id": "bot_1", "symbol": "BTC/USDT"})
+    assert position["realized_pnl"] == pytest.approx(20.0 + 5.0)
+    assert position["lots"] == [[0.5, 110.0]]
+    assert position["fees"] == 3.0
+    assert position["fill_count"] == 3
+
+    assert await ledger.compute_realized_pnl(user_id="user_1") == pytest.approx(25.0)
+    assert await ledger.compute_fees_paid(bot_id="bot_1") == 3.0
+
+    current_dd, max_dd = await ledger.compute_drawdown(user_id="user_1")
+    # 10000 -> 9899 -> 9788 -> 9967 (peak stays at the starting capital)
+    assert max_dd == pytest.approx((10000 - 9788) / 10000)
+    assert current_dd == pytest.approx((10000 - 9967) / 10000)
+
+    # Later fills advance the materialized equity curve incrementally
+    await append(ledger, "sell", 0.5, 130.0, 4)
+    state = await db["ledger_equity_state"].find_one({"scope": "user", "scope_id": "user_1"})
+    assert state["fill_count"] == 4
+    assert (await ledger.verify_positions(user_id="user_1"))["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_reads_catch_up_and_rebuild_after_backdated_fill():
+    db = FakeDB()
+    ledger = LedgerService(db)
+    await append(ledger, "buy", 2.0, 100.0, 10)
+
+    # Fill committed without a state update (e.g. a crash between the two writes)
+    await db["fills_ledger"].insert_one({
+        "user_id": "user_1", "bot_id": "bot_1", "exchange": "binance", "symbol": "BTC/USDT",
+        "side": "sell", "qty": 1.0, "price": 150.0, "fee": 0.0, "timestamp": T0 + timedelta(minutes=20)
+    })
+    assert await ledger.compute_realized_pnl(bot_id="bot_1") == pytest.approx(50.0)
+
+    # Backdated buy changes FIFO order: the position is marked stale and rebuilt
+    await append(ledger, "buy", 1.0, 50.0, 5)
+    position = await db["ledger_positions"].find_one({"bot_id": "bot_1"})
+    assert position["stale"] is True
+
+    assert await ledger.compute_realized_pnl(bot_id="bot_1") == pytest.approx(100.0)
+    assert await ledger.compute_realized_pnl(bot_id="bot_1") == await full_replay_realized(db, "user_1")
+    assert (await ledger.verify_positions(bot_id="bot_1"))["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_rebuild_covers_more_than_ten_thousand_fills(monkeypatch):
+    monkeypatch.setattr(ledger_positions, "REBUILD_BATCH_SIZE", 997)
+    db = FakeDB()
+    fills = db["fills_ledger"]
+    for i in range(10500):
+        await fills.insert_one({
+            "user_id": "user_1", "bot_id": f"bot_{i % 3}", "exchange": "binance", "symbol": "ETH/USDT",
+            "side": "buy" if i % 2 == 0 else "sell", "qty": 1.0, "price": 100.0 + (i % 7),
+            "fee": 0.1, "timestamp": T0 + timedelta(seconds=i)
+        })
+
+    ledger = LedgerService(db)
+    assert await ledger.rebuild_positions(user_id="user_1") == 3
+    assert await ledger.compute_realized_pnl(user_id="user_1") == pytest.approx(await full_replay_realized(db, "user_1"))
+    assert await ledger.compute_fees_paid(user_id="user_1") == pytest.approx(1050.0)
+
+    # Drift in the materialized state is reported by the consistency check
+    await db["ledger_positions"].update_many({"bot_id": "bot_0"}, {"$set": {"realized_pnl": 12345.0}})
+    report = await ledger.verify_positions(user_id="user_1")
+    assert report["status"] == "mismatch"
+    assert report["mismatches"][0]["field"] == "realized_pnl"
+
+
+@pytest.mark.asyncio
+async def test_replay_fallback_matches_lots_per_bot():
+    db = FakeDB()
+    ledger = LedgerService(db)
+    # bot_2 sells BTC it bought itself; FIFO across bots would close bot_1's cheaper lot
+    await append(ledger, "buy", 1.0, 100.0, 1, fee=0.0, bot_id="bot_1")
+    await append(ledger, "buy", 1.0, 200.0, 2, fee=0.0, bot_id="bot_2")
+    await append(ledger, "sell", 0.5, 190.0, 3, fee=0.0, bot_id="bot_2")
+    await append(ledger, "sell", 0.5, 150.0, 4, fee=0.0, bot_id="bot_1")
+
+    materialized_realized = await ledger.compute_realized_pnl(user_id="user_1")
+    materialized_win_rate = await ledger.calculate_win_rate(user_id="user_1")
+
+    ledger.positions = None  # Served by the full replay from here on
+    assert materialized_realized == pytest.approx(-5.0 + 25.0)
+    assert await ledger.compute_realized_pnl(user_id="user_1") == pytest.approx(materialized_realized)
+    assert await ledger.calculate_win_rate(user_id="user_1") == materialized_win_rate == 0.5
+    assert await ledger.get_consecutive_losses(user_id="user_1") == 0
+
+
+@pytest.mark.asyncio
+async def test_replays_stream_all_fills_in_batches(monkeypatch):
+    db = FakeDB()
+    ledger = LedgerService(db)
+    ledger.positions = None
+    ledger.rollups = None
+    ledger.compute_equity = AsyncMock(return_value=0.0)  # No mark prices needed here
+    await ledger.append_event("user_1", "funding", 1000, "USDT", T0)
+    now = datetime.utcnow()
+    for i in range(23):
+        await db["fills_ledger"].insert_one({
+            "user_id": "user_1", "bot_id": f"bot_{i % 2}", "exchange": "binance", "symbol": "BTC/USDT",
+            "side": "buy" if i % 4 < 2 else "sell", "qty": 1.0, "price": 100.0 + (i * 5) % 13,
+            "fee": 0.5, "timestamp": now - timedelta(hours=23 - i)
+        })
+
+    async def figures():
+        return (
+            await ledger.compute_realized_pnl(user_id="user_1"),
+            await ledger.calculate_win_rate(user_id="user_1"),
+            await ledger.compute_drawdown(user_id="user_1"),
+            await ledger.profit_series("user_1", period="daily", limit=5),
+            (await ledger.verify_integrity("user_1"))["details"]["total_fills"],
+        )
+
+    whole = await figures()
+    monkeypatch.setattr(ledger_service, "REPLAY_BATCH_SIZE", 4)
+    batched = await figures()
+
+    assert batched[0] == pytest.approx(whole[0]) and whole[0] != 0
+    assert batched[1] == whole[1]
+    assert batched[2] == pytest.approx(whole[2])
+    assert batched[3] == whole[3] and sum(p["trades"] for p in whole[3]) > 0
+    assert batched[4] == whole[4] == 23
+
+
+@pytest.mark.asyncio
+async def test_fills_without_ids_replay_and_verify():
+    db = FakeDB()
+    ledger = LedgerService(db)
+    legacy = [
+        {"exchange": "binance", "symbol": "ETH/USDT", "side": side, "qty": 1.0, "price": price, "fee": 0.0,
+         "timestamp": T0 + timedelta(minutes=i)}
+        for i, (side, price) in enumerate([("buy", 100.0), ("sell", 110.0)])
+    ]
+
+    positions = {}
+    ledger_positions.apply_fills_to_positions(positions, legacy)
+    assert positions[(None, None, "ETH/USDT")]["realized_pnl"] == pytest.approx(10.0)
+
+    for fill in legacy:
+        await db["fills_ledger"].insert_one(dict(fill))
+        await ledger.positions.apply_fill(fill)
+    assert (await ledger.positions.verify("symbol", "ETH/USDT"))["status"] == "ok"
+
+    await db["ledger_positions"].delete_many({"symbol": "ETH/USDT"})
+    report = await ledger.positions.verify("symbol", "ETH/USDT")
+    assert report["mismatches"] == [{"position": "None/None/ETH/USDT", "issue": "missing"}]
@@ -0,0 +1,106 @@
+"""
+Tests for the shared FIFO lot-matching engine
+
+- Matches a straightforward per-fill FIFO loop on random fill streams
+- Oversold sells are dropped, as in the original ledger loops
+- Initial lots, per-period aggregates and the incremental deque path
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.lot_matching import FillColumns, consume_fifo, lots_deque, match_fifo
+
+
+def reference_fifo(fills):
+    """Per-fill FIFO as the ledger used to compute it"""
+    positions, realized, wins, losses = {}, [], 0, 0
+    for fill in fills:
+        lots = positions.setdefault(fill["symbol"], [])
+        pnl = 0.0
+        if fill["side"] == "buy":
+            lots.append([fill["qty"], fill["price"]])
+        else:
+            remaining = fill["qty"]
+            while remaining > 0 and lots:
+                closed = min(lots[0][0], remaining)
+                chunk = closed * (fill["price"] - lots[0][1])
+                pnl += chunk
+                wins += chunk > 0
+                losses += chunk < 0
+                remaining -= closed
+                lots[0][0] -= closed
+                if lots[0][0] <= 0:
+                    lots.pop(0)
+        realized.append(pnl)
+    return realized, positions, wins, losses
+
+
+def random_fills(n, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "symbol": rng.choice(["BTC/USDT", "ETH/USDT", "XRP/USDT"]),
+            "side": rng.choice(["buy", "buy", "sell"]),
+            "qty": rng.choice([0.5, 1.0, 1.5, 2.0, 3.0]),
+            "price": float(rng.randint(90, 110)),
+            "fee": 0.1
+        }
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_reference_loop(seed):
+    fills = random_fills(2000, seed)
+    expected_realized, expected_lots, wins, losses = reference_fifo(fills)
+
+    result = match_fifo(FillColumns.from_fills(fills))
+
+    np.testing.assert_allclose(result.realized, expected_realized, atol=1e-9)
+    assert (result.wins, result.losses) == (wins, losses)
+    for symbol, lots in expected_lots.items():
+        assert result.open_lots[symbol] == pytest.approx([tuple(lot) for lot in lots if lot[0] > 0])
+
+
+def test_oversold_sells_are_dropped_and_initial_lots_used():
+    fills = [
+        {"symbol": "BTC/USDT", "side": "sell", "qty": 1.0, "price": 120.0},   # Nothing open yet besides the initial lot
+        {"symbol": "BTC/USDT", "side": "sell", "qty": 5.0, "price": 130.0},   # Oversold: only 1.0 closes
+        {"symbol": "BTC/USDT", "side": "buy", "qty": 2.0, "price": 100.0},
+        {"symbol": "BTC/USDT", "side": "sell", "qty": 0.5, "price": 110.0},
+    ]
+    result = match_fifo(FillColumns.from_fills(fills), initial_lots={"BTC/USDT": [(2.0, 90.0)], "ETH/USDT": [(1.0, 5.0)]})
+
+    assert result.realized.tolist() == pytest.approx([30.0, 40.0, 0.0, 5.0])
+    assert result.matched_qty.tolist() == pytest.approx([1.0, 1.0, 0.0, 0.5])
+    assert result.open_lots["BTC/USDT"] == [(1.5, 100.0)]
+    assert result.open_lots["ETH/USDT"] == [(1.0, 5.0)]
+
+
+def test_period_aggregates():
+    fills = [
+        {"symbol": "BTC/USDT", "side": "buy", "qty": 1.0, "price": 100.0, "fee": 1.0},
+        {"symbol": "BTC/USDT", "side": "buy", "qty": 1.0, "price": 110.0, "fee": 1.0},
+        {"symbol": "BTC/USDT", "side": "sell", "qty": 2.0, "price": 120.0, "fee": 2.0},
+    ]
+    result = match_fifo(FillColumns.from_fills(fills), period_codes=np.array([0, 1, 1]))
+
+    assert result.periods["realized_pnl"].tolist() == pytest.approx([0.0, 30.0])
+    assert result.periods["fees"].tolist() == pytest.approx([1.0, 3.0])
+    assert result.periods["volume"].tolist() == pytest.approx([100.0, 350.0])
+    assert result.periods["trades"].tolist() == [1, 2]
+
+
+def test_consume_fifo_incremental():
+    lots = lots_deque([(1.0, 100.0), (1.0, 110.0)])
+    assert consume_fifo(lots, 1.5, 120.0) == pytest.approx((25.0, 1.5))
+    assert list(lots) == [[0.5, 110.0]]
+    assert consume_fifo(lots, 2.0, 100.0) == pytest.approx((-5.0, 0.5))
+    assert not lots
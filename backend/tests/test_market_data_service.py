@@ -0,0 +1,103 @@
+"""
+Tests for the shared market data snapshot cache
+
+- TTL hits avoid refetching
+- Concurrent readers of one key share a single fetch
+- Stale values are served while a background refresh runs
+- Fetch failures fall back to the last snapshot
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.market_data_service import MarketDataService
+from fakes import FakeClock
+
+
+def make_fetcher(prices, delay=0.0):
+    calls = {"count": 0}
+
+    async def fetch():
+        calls["count"] += 1
+        if delay:
+            await asyncio.sleep(delay)
+        price = prices[min(calls["count"] - 1, len(prices) - 1)]
+        if isinstance(price, Exception):
+            raise price
+        return {"last": price}
+
+    return fetch, calls
+
+
+@pytest.mark.asyncio
+async def test_ticker_cached_within_ttl():
+    clock = FakeClock()
+    service = MarketDataService(ticker_ttl=5, stale_window=10, clock=clock)
+    fetch, calls = make_fetcher([100.0, 200.0])
+
+    assert (await service.get_ticker("binance", "BTC/USDT", fetch))["last"] == 100.0
+    clock.now += 4
+    assert (await service.get_ticker("BINANCE", "BTC/USDT", fetch))["last"] == 100.0
+    assert calls["count"] == 1
+    assert service.peek_price("binance", "BTC/USDT") == 100.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced():
+    service = MarketDataService()
+    fetch, calls = make_fetcher([42.0], delay=0.02)
+
+    results = await asyncio.gather(*(
+        service.get_ticker("luno", "BTC/ZAR", fetch) for _ in range(10)
+    ))
+
+    assert calls["count"] == 1
+    assert all(r["last"] == 42.0 for r in results)
+    assert service.stats["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    clock = FakeClock()
+    service = MarketDataService(ticker_ttl=5, stale_window=10, clock=clock)
+    fetch, calls = make_fetcher([100.0, 110.0])
+
+    await service.get_ticker("kucoin", "ETH/USDT", fetch)
+    clock.now += 7  # past TTL, inside stale window
+
+    stale = await service.get_ticker("kucoin", "ETH/USDT", fetch)
+    assert stale["last"] == 100.0  # served immediately
+
+    await asyncio.sleep(0)  # let the background refresh complete
+    await asyncio.sleep(0)
+    assert calls["count"] == 2
+    assert (await service.get_ticker("kucoin", "ETH/USDT", fetch))["last"] == 110.0
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_refetches_and_survives_errors():
+    clock = FakeClock()
+    service = MarketDataService(ticker_ttl=5, stale_window=10, clock=clock)
+    fetch, calls = make_fetcher([100.0, RuntimeError("exchange down")])
+
+    await service.get_ticker("luno", "ETH/ZAR", fetch)
+    clock.now += 60  # beyond stale window - must block on a refetch
+
+    result = await service.get_ticker("luno", "ETH/ZAR", fetch)
+    assert calls["count"] == 2
+    assert result["last"] == 100.0  # last snapshot when the refetch fails
+    assert service.stats["fetch_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_miss_without_snapshot_raises():
+    service = MarketDataService()
+    fetch, _ = make_fetcher([RuntimeError("exchange down")])
+
+    with pytest.raises(RuntimeError):
+        await service.get_ohlcv("binance", "BTC/USDT", "5m", 20, fetch)
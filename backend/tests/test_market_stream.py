@@ -0,0 +1,224 @@
+"""
+Tests for streaming ticker ingestion against a local fake websocket server
+
+- Ticks land in the top-of-book table and the shared market data cache
+- get_real_price reads streamed prices without touching ccxt
+- Subscribers (OFI feed) receive top-of-book snapshots
+- Dropped connections are re-established
+- Exchanges without a ticker stream (Luno) stream top of book from order books
+- A watcher error reaches the reconnect loop even when the tick queue is full
+- Regime history backfills run in the background, off the tick path
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import market_stream_service as stream_module
+from services.market_stream_service import (
+    CcxtProOrderBookSource, CcxtProTickerSource, MarketStreamService, WebSocketTickerSource, create_ccxtpro_source
+)
+from services.market_data_service import market_data_service
+from engines.order_flow_imbalance import OrderFlowImbalanceCalculator
+
+
+TICKS = [
+    {"symbol": "BTC/ZAR", "last": 1200000.0, "bid": 1199990.0, "bidVolume": 0.5, "ask": 1200010.0, "askVolume": 0.4},
+    {"symbol": "BTC/ZAR", "last": 1200100.0, "bid": 1200090.0, "bidVolume": 0.7, "ask": 1200110.0, "askVolume": 0.3},
+    {"symbol": "ETH/ZAR", "last": 60000.0, "bid": 59990.0, "bidVolume": 2.0, "ask": 60010.0, "askVolume": 1.5},
+]
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met before timeout")
+        await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def fake_feed():
+    """Local websocket server that sends TICKS after a subscribe message, then closes"""
+    state = {"connections": 0, "subscriptions": []}
+
+    async def handler(connection):
+        state["connections"] += 1
+        state["subscriptions"].append(json.loads(await connection.recv()))
+        await connection.send("not json")
+        for tick in TICKS:
+            await connection.send(json.dumps(tick))
+        await asyncio.sleep(0.05)
+
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    state["url"] = f"ws://127.0.0.1:{port}"
+    yield state
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_stream_populates_top_of_book(fake_feed):
+    service = MarketStreamService(reconnect_delay=0.05)
+    service.add_source("luno", WebSocketTickerSource(fake_feed["url"], subscribe_message={"op": "subscribe"}))
+    received = []
+
+    async def record(quote):
+        received.append(quote)
+
+    service.subscribe(record)
+    await service.start()
+    try:
+        await wait_for(lambda: len(received) >= 3)
+    finally:
+        await service.stop()
+
+    assert fake_feed["subscriptions"][0] == {"op": "subscribe"}
+    quote = service.book[("luno", "BTC/ZAR")]
+    assert quote.last == 1200100.0
+    assert (quote.bid, quote.bid_qty, quote.ask, quote.ask_qty) == (1200090.0, 0.7, 1200110.0, 0.3)
+    assert market_data_service.peek_price("luno", "ETH/ZAR") == 60000.0
+
+
+@pytest.mark.asyncio
+async def test_get_real_price_reads_stream_without_rest(fake_feed, monkeypatch):
+    import paper_trading_engine
+    from paper_trading_engine import PaperTradingEngine
+
+    service = MarketStreamService(reconnect_delay=0.05)
+    service.add_source("luno", WebSocketTickerSource(fake_feed["url"], subscribe_message={}))
+    service.subscribe(lambda quote: asyncio.sleep(0))
+    monkeypatch.setattr(paper_trading_engine, "market_stream_service", service)
+
+    engine = PaperTradingEngine()
+
+    async def no_rest(*args, **kwargs):
+        raise AssertionError("REST path must not be used while streaming")
+
+    monkeypatch.setattr(engine, "init_exchanges", no_rest)
+
+    await service.start()
+    try:
+        await wait_for(lambda: ("luno", "ETH/ZAR") in service.book)
+        assert await engine.get_real_price("ETH/ZAR", "luno") == 60000.0
+        labelled = await engine.get_real_price("BTC/ZAR", "luno", with_label=True)
+        assert labelled["source"] == "stream"
+    finally:
+        await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_stream_feeds_ofi_and_reconnects(fake_feed):
+    service = MarketStreamService(reconnect_delay=0.05)
+    service.add_source("luno", WebSocketTickerSource(fake_feed["url"], subscribe_message={}))
+    ofi = OrderFlowImbalanceCalculator()
+
+    async def feed_ofi(quote):
+        await ofi.add_snapshot(quote.symbol, quote.bid, quote.bid_qty, quote.ask, quote.ask_qty)
+
+    service.subscribe(feed_ofi)
+    await service.start()
+    try:
+        # Server closes after each batch - the service must reconnect and keep ingesting
+        await wait_for(lambda: fake_feed["connections"] >= 2)
+    finally:
+        await service.stop()
+
+    assert len(ofi.snapshots["BTC/ZAR"]) >= 2
+    assert len(ofi.ofi_history["BTC/ZAR"]) >= 1
+    assert service.get_status()["is_running"] is False
+
+
+@pytest.mark.asyncio
+async def test_source_chosen_from_exchange_capabilities():
+    pytest.importorskip("ccxt.pro")
+
+    assert type(create_ccxtpro_source("luno", ["BTC/ZAR"])) is CcxtProOrderBookSource
+    assert type(create_ccxtpro_source("binance", ["BTC/USDT"])) is CcxtProTickerSource
+    assert create_ccxtpro_source("not_an_exchange", ["BTC/ZAR"]) is None
+
+    class FakeExchange:
+        async def watch_order_book(self, symbol):
+            return {"bids": [[1199990.0, 0.5, 1], [1199980.0, 1.0, 2]], "asks": [[1200010.0, 0.4, 1]]}
+
+    source = CcxtProOrderBookSource("luno", ["BTC/ZAR"])
+    source.exchange = FakeExchange()
+    service = MarketStreamService()
+    await service.handle_tick("luno", await source._watch("BTC/ZAR"))
+
+    quote = service.get_top_of_book("luno", "BTC/ZAR")
+    assert (quote.bid, quote.bid_qty, quote.ask, quote.ask_qty) == (1199990.0, 0.5, 1200010.0, 0.4)
+    assert quote.price == 1200000.0
+
+
+@pytest.mark.asyncio
+async def test_watcher_error_surfaces_through_full_queue(monkeypatch):
+    class FakeExchange:
+        def __init__(self, config):
+            self.calls = 0
+
+        async def watch_ticker(self, symbol):
+            self.calls += 1
+            if self.calls > 1500:
+                raise ConnectionError("socket closed")
+            await asyncio.sleep(0)
+            return {"symbol": symbol, "last": float(self.calls)}
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(stream_module, "ccxtpro", SimpleNamespace(fakex=FakeExchange))
+    stream = CcxtProTickerSource("fakex", ["BTC/ZAR"]).stream()
+    await stream.__anext__()
+    await asyncio.sleep(0.2)  # The watcher fills the queue, then fails
+
+    async def drain():
+        async for _ in stream:
+            pass
+
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(drain(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_regime_backfill_does_not_block_ticks(monkeypatch):
+    from engines.order_flow_imbalance import ofi_calculator
+    from engines.regime_detector import regime_detector
+
+    release = asyncio.Event()
+    loaded, prices = [], []
+
+    async def slow_load_history(symbol, exchange):
+        await release.wait()
+        loaded.append((symbol, exchange))
+        return 0
+
+    async def record_price(symbol, price, volume=0):
+        prices.append((symbol, price))
+
+    async def no_ofi(*args):
+        pass
+
+    monkeypatch.setattr(regime_detector, "load_history", slow_load_history)
+    monkeypatch.setattr(regime_detector, "update_price_data", record_price)
+    monkeypatch.setattr(ofi_calculator, "add_snapshot", no_ofi)
+
+    service = MarketStreamService()
+    service._subscribe_default_consumers()
+    await asyncio.wait_for(service.handle_tick("luno", TICKS[0]), timeout=0.5)
+    assert prices == [("BTC/ZAR", 1200000.0)] and loaded == []
+    assert len(service.background_tasks) == 1
+
+    release.set()
+    await wait_for(lambda: not service.background_tasks)
+    assert loaded == [("BTC/ZAR", "luno")]
+    await service.stop()
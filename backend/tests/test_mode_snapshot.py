@@ -0,0 +1,89 @@
+"""
+Tests for the per-tick system mode snapshot
+
+- Many users' modes are fetched with one $in query and then served from cache
+- Mode writes invalidate the cached doc
+- Emergency stops are always read fresh, even while the rest of the doc is cached
+- The scheduler only bulk-writes users whose paperTrading flag is out of sync
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database as db
+from services.system_mode_service import SystemModeService
+from fakes import FakeCollection
+
+
+@pytest.fixture
+def modes(monkeypatch):
+    collection = FakeCollection([
+        {"user_id": "u1", "autopilot": True, "paperTrading": True, "liveTrading": False},
+        {"user_id": "u2", "autopilot": True, "paperTrading": True, "liveTrading": True},
+        {"user_id": "u3", "autopilot": True, "emergencyStop": True},
+        {"user_id": "u4", "autopilot": False},
+    ])
+    monkeypatch.setattr(db, "system_modes_collection", collection, raising=False)
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_snapshot_uses_one_query_then_cache(modes):
+    service = SystemModeService(cache_ttl=60)
+
+    snapshot = await service.get_modes_snapshot(["u1", "u2", "u1", "u3", "u4", "missing"])
+    assert len(modes.finds) == 1
+    assert set(modes.finds[0]["user_id"]["$in"]) == {"u1", "u2", "u3", "u4", "missing"}
+    assert snapshot["missing"] is None
+    assert snapshot["u3"]["emergencyStop"] is True
+
+    assert await service.get_current_mode("u2") == "live"
+    await service.get_modes_snapshot(["u1", "missing"])
+    assert len(modes.finds) == 1  # Served from cache, including the negative entry
+
+    modes.stored(user_id="u2")["liveTrading"] = False
+    service.invalidate_modes("u2")
+    assert await service.get_current_mode("u2") == "paper"
+    assert modes.finds[-1] == {"user_id": {"$in": ["u2"]}}
+
+
+@pytest.mark.asyncio
+async def test_emergency_stop_bypasses_cache(modes):
+    service = SystemModeService(cache_ttl=60)
+    await service.get_modes_snapshot(["u1", "u3"])
+    assert await service.get_emergency_stops(["u1", "u3", "u1"]) == {"u3"}
+
+    # Set by another worker: no local invalidation, still seen immediately
+    modes.stored(user_id="u1")["emergencyStop"] = True
+    assert await service.get_emergency_stops(["u1", "u3"]) == {"u1", "u3"}
+    assert (await service.get_modes_snapshot(["u1"]))["u1"].get("emergencyStop") is None  # Cached doc is stale
+    assert modes.finds[-1] == {"user_id": {"$in": ["u1", "u3"]}, "emergencyStop": True}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_writes_only_changed_modes(modes, monkeypatch):
+    import trading_scheduler
+    from trading_scheduler import TradingScheduler
+
+    service = SystemModeService(cache_ttl=60)
+    monkeypatch.setattr(trading_scheduler, "system_mode_service", service)
+    scheduler = TradingScheduler()
+
+    user_modes = await service.get_modes_snapshot(["u1", "u2", "u3", "u4"])
+    users_with_trading = {"u1": True, "u2": True, "u3": False, "u4": False}
+
+    await scheduler.sync_paper_trading_flags(user_modes, users_with_trading)
+    assert [[(r._filter, r._doc) for r in batch] for batch in modes.bulk_writes] == [
+        [({"user_id": "u2"}, {"$set": {"paperTrading": False}})]
+    ]
+
+    # The cached doc was updated in place, so the next tick has nothing to write
+    user_modes = await service.get_modes_snapshot(["u1", "u2", "u3", "u4"])
+    assert user_modes["u2"]["paperTrading"] is False
+    await scheduler.sync_paper_trading_flags(user_modes, users_with_trading)
+    assert len(modes.bulk_writes) == 1
+    assert len(modes.finds) == 1
@@ -0,0 +1,119 @@
+"""
+Tests for order-book-depth fill simulation
+
+- walk_book VWAP across levels, for base and quote sized orders
+- Orders larger than the visible book are flagged as exhausted
+- Recorded snapshots: thin ZAR books slip far more than deep USDT books
+- Concurrent fetches on fetchOrderBooks exchanges are batched into one call
+- The simulator's per-exchange books are prefetched in one batch
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.market_data_service import market_data_service
+from services.order_book_service import OrderBookService, walk_book
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), 'fixtures', 'order_books_snapshot.json')
+
+BOOK = {
+    "bids": [[99.0, 1.0], [98.0, 2.0], [97.0, 3.0]],
+    "asks": [[101.0, 1.0], [102.0, 2.0], [103.0, 3.0]],
+}
+
+
+class FakeBatchExchange:
+    has = {"fetchOrderBooks": True}
+
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_order_books(self, symbols, limit=None):
+        self.calls.append(sorted(symbols))
+        return {s: BOOK for s in symbols}
+
+    async def fetch_order_book(self, symbol, limit=None):
+        raise AssertionError("should batch through fetch_order_books")
+
+
+def test_walk_book_vwap_and_exhaustion():
+    fill = walk_book(BOOK, "buy", qty=2.0)
+    assert fill.avg_price == pytest.approx((101.0 + 102.0) / 2)
+    assert fill.levels_used == 2 and not fill.exhausted
+    assert fill.mid_price == 100.0
+    assert fill.slippage_rate == pytest.approx(1.5 / 100)
+
+    sell = walk_book(BOOK, "sell", qty=1.0)
+    assert sell.avg_price == 99.0
+    assert sell.slippage_rate == pytest.approx(0.01)
+
+    # Quote-sized: 101 buys level one, the next 102 buys one unit of level two
+    quote = walk_book(BOOK, "buy", quote_amount=203.0)
+    assert quote.filled_qty == pytest.approx(2.0)
+    assert quote.notional == pytest.approx(203.0)
+
+    # Larger than the book: remainder fills at the last level
+    big = walk_book(BOOK, "buy", qty=10.0)
+    assert big.exhausted and big.levels_used == 3
+    assert big.filled_qty == pytest.approx(10.0)
+    assert big.avg_price == pytest.approx((101 + 2 * 102 + 7 * 103) / 10)
+
+    assert walk_book({"bids": [], "asks": []}, "buy", qty=1.0) is None
+    with pytest.raises(ValueError):
+        walk_book(BOOK, "buy", qty=1.0, quote_amount=100.0)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_books_thin_zar_vs_deep_usdt():
+    service = OrderBookService(depth=20, snapshot_path=SNAPSHOT)
+
+    zar = walk_book(await service.get_order_book("LUNO", "BTC/ZAR"), "buy", quote_amount=50000)
+    usdt = walk_book(await service.get_order_book("binance", "BTC/USDT"), "buy", quote_amount=50000)
+
+    assert zar.levels_used == 3
+    assert usdt.levels_used == 1
+    assert zar.slippage_rate > 10 * usdt.slippage_rate
+    assert zar.slippage_rate > 0.0005 * 2  # Well above the old flat rate
+    assert service.get_stats()["snapshot_hits"] == 2
+
+    assert await service.get_order_book("kraken", "BTC/USD") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_batch():
+    service = OrderBookService(depth=20, snapshot_path="")
+    exchange = FakeBatchExchange()
+    symbols = ["AAA/USDT", "BBB/USDT", "CCC/USDT"]
+    market_data_service.invalidate(exchange="fakebatch")
+
+    books = await asyncio.gather(*(service.get_order_book("fakebatch", s, exchange) for s in symbols))
+    assert all(book == BOOK for book in books)
+    assert exchange.calls == [symbols]
+
+    # Served from the cache while fresh
+    assert await service.prefetch("fakebatch", exchange, symbols) == []
+    await service.get_order_book("fakebatch", "AAA/USDT", exchange)
+    assert len(exchange.calls) == 1
+    market_data_service.invalidate(exchange="fakebatch")
+
+
+@pytest.mark.asyncio
+async def test_engine_prefetches_books_for_simulation(monkeypatch):
+    import paper_trading_engine
+    from paper_trading_engine import PaperTradingEngine
+
+    engine = PaperTradingEngine()
+    exchange = FakeBatchExchange()
+    engine.binance_exchange = exchange
+    engine.available_pairs_cache["binance"] = ["AAA/USDT", "BBB/USDT"]
+    monkeypatch.setattr(paper_trading_engine, "order_book_service", OrderBookService(depth=20, snapshot_path=""))
+    market_data_service.invalidate(exchange="binance")
+
+    assert await engine.get_order_books("binance") == [BOOK, BOOK]
+    assert exchange.calls == [["AAA/USDT", "BBB/USDT"]]
+    market_data_service.invalidate(exchange="binance")
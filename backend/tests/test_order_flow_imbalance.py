@@ -0,0 +1,95 @@
+"""
+Tests for the vectorized, multi-level OFI engine
+
+- Batch OFI matches the scalar formula, across batch boundaries and one-by-one adds
+- Multi-level OFI combines per-level values with level weights; shallow books pad neutrally
+- Windowed aggregates from prefix sums match a brute-force sum after the ring wraps
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engines.order_flow_imbalance import OrderFlowImbalanceCalculator
+from fakes import FakeClock
+
+
+def scalar_ofi(prev, cur):
+    """The original per-pair implementation"""
+    (pb0, qb0, pa0, qa0), (pb1, qb1, pa1, qa1) = prev, cur
+    return (
+        (pb1 >= pb0) * qb1 - (pb1 <= pb0) * qb0
+        - (pa1 <= pa0) * qa1 + (pa1 >= pa0) * qa0
+    )
+
+
+def random_book(n, seed=1):
+    rng = np.random.default_rng(seed)
+    mid = 100 + np.cumsum(rng.choice([-0.5, 0, 0.5], n))
+    return mid - 0.5, rng.uniform(0.1, 5, n), mid + 0.5, rng.uniform(0.1, 5, n)
+
+
+@pytest.mark.asyncio
+async def test_batch_matches_scalar_formula():
+    bid, bid_qty, ask, ask_qty = random_book(200)
+    rows = list(zip(bid, bid_qty, ask, ask_qty))
+    expected = [scalar_ofi(prev, cur) for prev, cur in zip(rows, rows[1:])]
+
+    batched = OrderFlowImbalanceCalculator(capacity=500)
+    out = await batched.add_snapshots("BTC/ZAR", bid[:120], bid_qty[:120], ask[:120], ask_qty[:120])
+    out2 = await batched.add_snapshots("BTC/ZAR", bid[120:], bid_qty[120:], ask[120:], ask_qty[120:])
+    np.testing.assert_allclose(np.concatenate((out, out2)), expected)
+
+    single = OrderFlowImbalanceCalculator(capacity=500)
+    for row in rows:
+        await single.add_snapshot("BTC/ZAR", *row)
+    np.testing.assert_allclose(single.ofi_history["BTC/ZAR"].values(), expected)
+    assert single.ofi_history["BTC/ZAR"][-1][1] == pytest.approx(expected[-1])
+    assert single.snapshots["BTC/ZAR"][-1].bid_price == bid[-1]
+
+
+@pytest.mark.asyncio
+async def test_multi_level_weights_and_shallow_books():
+    ofi = OrderFlowImbalanceCalculator(levels=3, level_weights=[1.0, 0.5, 0.25])
+    await ofi.add_order_book("ETH/ZAR", {"bids": [[99, 1], [98, 2], [97, 3]], "asks": [[101, 1], [102, 2], [103, 3]]})
+    await ofi.add_order_book("ETH/ZAR", {"bids": [[99, 2], [98, 2], [97, 1]], "asks": [[101, 1], [102, 4], [103, 3]]})
+
+    # Level OFI: bid qty change minus ask qty change (prices unchanged)
+    levels = np.array([2 - 1 - 0, 0 - (4 - 2), (1 - 3) - 0])
+    buffer = ofi.snapshots["ETH/ZAR"]
+    np.testing.assert_allclose(buffer.level_ofi[1], levels)
+    assert buffer.series[-1][1] == pytest.approx(levels @ [1.0, 0.5, 0.25])
+
+    # A one-level book pads deeper levels at the inside price with zero size: no OFI from them
+    assert await ofi.add_order_book("ETH/ZAR", {"bids": [[99, 2]], "asks": [[101, 1]]})
+    np.testing.assert_allclose(buffer.level_ofi[2], [0, 0, 0])
+    assert not await ofi.add_order_book("ETH/ZAR", {"bids": [], "asks": [[101, 1]]})
+
+
+@pytest.mark.asyncio
+async def test_windowed_aggregate_from_prefix_sums():
+    clock = FakeClock(1_700_000_000.0)
+    ofi = OrderFlowImbalanceCalculator(capacity=64, clock=clock)
+    bid, bid_qty, ask, ask_qty = random_book(1000, seed=4)
+    times = clock.now + np.arange(1000) * 0.1
+    values = []
+    for start in range(0, 1000, 37):  # Uneven batches wrap the ring many times
+        batch = slice(start, start + 37)
+        values.extend(await ofi.add_snapshots(
+            "BTC/ZAR", bid[batch], bid_qty[batch], ask[batch], ask_qty[batch], times[batch]
+        ))
+    clock.now = times[-1]
+    values = np.array(values)
+
+    for window in (0.05, 1, 3.3, 6.3, 100):
+        in_window = times[1:] >= clock.now - window
+        expected = values[in_window][-64:].sum()
+        assert await ofi.get_aggregated_ofi("BTC/ZAR", window) == pytest.approx(expected, abs=1e-9)
+
+    clock.now += 60
+    assert await ofi.get_aggregated_ofi("BTC/ZAR", 1) is None
+    assert len(ofi.snapshots["BTC/ZAR"]) == len(ofi.ofi_history["BTC/ZAR"]) == 64
@@ -0,0 +1,132 @@
+"""
+Tests for the vectorized paper-trade Monte Carlo simulator
+
+- Same seed, same distributions
+- Mean outcome matches a per-trade scalar loop of the engine's model
+- Fee drag follows EXCHANGE_FEES
+- Bots with order books pay the engine's book-walk slippage
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import MIN_TRADE_PROFIT_THRESHOLD_ZAR
+from paper_trading_engine import (
+    AGREEMENT_OUTCOME_BOOST, AGREEMENT_SIZE_BOOST, EXCHANGE_FEES, POSITION_SIZES, calculate_slippage
+)
+from services.order_book_service import round_trip_slippage
+from services.paper_simulator import simulate_paper_trading
+
+BOOK = {
+    "bids": [[99.0, 1.0], [98.0, 2.0], [97.0, 3.0]],
+    "asks": [[101.0, 1.0], [102.0, 2.0], [103.0, 3.0]],
+}
+
+
+def scalar_path(bot, days, trades_per_day, agreement_probs, rng):
+    """One path of the engine's outcome model, one trade at a time"""
+    capital = bot["current_capital"]
+    fee_rate = EXCHANGE_FEES[bot["exchange"]]["taker"]
+    levels, weights = zip(*sorted(agreement_probs.items()))
+    for _ in range(days * trades_per_day):
+        agreement = rng.choices(levels, weights)[0]
+        trade_amount = capital * min(POSITION_SIZES[bot["risk_mode"]] * AGREEMENT_SIZE_BOOST[agreement], 0.60)
+        if rng.random() < 0.55:
+            mult = 1 + (rng.uniform(1.005, 1.020) - 1) * AGREEMENT_OUTCOME_BOOST[agreement]
+        else:
+            mult = 1 - (1 - rng.uniform(0.985, 0.997)) / AGREEMENT_OUTCOME_BOOST[agreement]
+        if agreement >= 4:
+            mult *= 1.002 if mult > 1 else 0.998
+        fees = trade_amount * fee_rate * 2
+        slippage = trade_amount * calculate_slippage(trade_amount) * (1.5 if abs(mult - 1) * 100 > 2 else 1)
+        if rng.random() > 0.97:
+            continue
+        net = trade_amount * (mult * (1 + rng.uniform(-0.0005, 0.0005)) - 1) - fees - slippage
+        if 0 < net < MIN_TRADE_PROFIT_THRESHOLD_ZAR:
+            continue
+        capital += net
+    return capital
+
+
+def test_seeded_runs_are_reproducible():
+    bots = [
+        {"id": "a", "risk_mode": "safe", "current_capital": 1000, "exchange": "luno"},
+        {"id": "b", "risk_mode": "aggressive", "current_capital": 5000, "exchange": "binance"},
+    ]
+    first = simulate_paper_trading(bots, days=5, paths=200, trades_per_day=10, seed=42)
+    second = simulate_paper_trading(bots, days=5, paths=200, trades_per_day=10, seed=42)
+    other = simulate_paper_trading(bots, days=5, paths=200, trades_per_day=10, seed=43)
+
+    np.testing.assert_array_equal(first.final_equity, second.final_equity)
+    assert first.summary() == second.summary()
+    assert not np.array_equal(first.final_equity, other.final_equity)
+
+
+def test_matches_scalar_model_in_distribution():
+    bot = {"id": "x", "risk_mode": "balanced", "current_capital": 2000, "exchange": "kucoin"}
+    probs = {2: 0.5, 3: 0.35, 4: 0.15}
+
+    result = simulate_paper_trading([bot], days=4, paths=4000, trades_per_day=5, seed=7, agreement_probs=probs)
+    rng = random.Random(7)
+    scalar = np.array([scalar_path(bot, 4, 5, probs, rng) for _ in range(4000)])
+
+    vectorized = result.final_equity[0]
+    assert vectorized.mean() == pytest.approx(scalar.mean(), rel=0.002)
+    assert vectorized.std() == pytest.approx(scalar.std(), rel=0.1)
+    assert result.trades[0].mean() == pytest.approx(20 * 0.97, rel=0.05)
+
+
+def test_summary_reports_drawdown_and_fee_drag():
+    bots = [
+        {"id": "cheap", "risk_mode": "risky", "current_capital": 1000, "exchange": "valr"},
+        {"id": "dear", "risk_mode": "risky", "current_capital": 1000, "exchange": "ovex"},
+    ]
+    summary = simulate_paper_trading(bots, days=10, paths=300, trades_per_day=10, seed=1).summary()
+
+    cheap, dear = summary["per_bot"]
+    assert dear["fee_drag_pct"]["p50"] > 2 * cheap["fee_drag_pct"]["p50"]
+    assert 0 < cheap["max_drawdown_pct"]["p50"] < 100
+    assert len(summary["portfolio"]["daily_equity_p50"]) == 11
+    assert 0.0 <= summary["portfolio"]["probability_of_loss"] <= 1.0
+
+    with pytest.raises(ValueError):
+        simulate_paper_trading([], days=1, paths=1)
+
+    # Memory guard: bots x paths is capped even when total work is small
+    with pytest.raises(ValueError, match="bots x paths"):
+        simulate_paper_trading([{"risk_mode": "safe"}] * 2000, days=1, paths=10000, trades_per_day=1)
+
+
+def test_order_books_use_the_engine_book_walk():
+    bots = [
+        {"id": "book", "risk_mode": "safe", "current_capital": 1000, "exchange": "luno"},
+        {"id": "volume", "risk_mode": "safe", "current_capital": 1000, "exchange": "binance"},
+    ]
+    result = simulate_paper_trading(
+        bots, days=1, paths=500, trades_per_day=1, seed=3,
+        agreement_probs={2: 1.0}, order_books={"luno": [BOOK]}
+    )
+
+    trade_amount = 1000 * 0.20 * AGREEMENT_SIZE_BOOST[2]
+    book_rate, _ = round_trip_slippage(BOOK, trade_amount)
+    executed = result.trades[0] == 1
+    assert executed.any()
+    np.testing.assert_allclose(result.slippage[0][executed], trade_amount * book_rate, rtol=0.01)
+    volume_slippage = np.unique(result.slippage[1][result.trades[1] == 1].round(6))
+    np.testing.assert_allclose(volume_slippage, trade_amount * calculate_slippage(trade_amount) * np.array([1.0, 1.5]))
+
+    summary = result.summary()
+    assert summary["slippage_models"] == {"order_book": 1, "volume_estimate": 1}
+    assert [b["slippage_model"] for b in summary["per_bot"]] == ["order_book", "volume_estimate"]
+
+
+@pytest.mark.parametrize("probs", [{2: 0.0, 3: 0.0, 4: 0.0}, {2: -0.5, 3: 1.0}, {2: float("nan")}])
+def test_invalid_agreement_probs_are_rejected(probs):
+    with pytest.raises(ValueError, match="agreement_probs"):
+        simulate_paper_trading([{"risk_mode": "safe"}], days=1, paths=10, agreement_probs=probs)
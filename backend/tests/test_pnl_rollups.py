@@ -0,0 +1,204 @@
+"""
+Tests for pre-aggregated PnL rollups
+
+- Trade inserts update hour / day buckets; a rebuild from raw trades matches
+- A rebuild flushes buffered writes first, replaces buckets in place and is idempotent
+- Reads check only the built marker; trades written, closed or deleted without
+  record_trade are caught by the count watermark once per verify interval
+- Profit series (daily / weekly / monthly) read the day buckets
+- Ledger profit series match the fill replay and rebuild after a backdated fill
+- Ledger rebuilds match lots by position_key, so fills without ids replay too
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import pnl_rollups as rollups_module
+from services.ledger_service import LedgerService
+from services.pnl_rollups import PnLRollupStore
+from services.profit_service import ProfitService
+from services.write_behind import WriteBehindBuffer
+from fakes import FakeDB
+
+
+def trade(day_offset, pnl, bot_id="bot_1", mode="paper", status="closed", hours=10):
+    now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "id": f"t{day_offset}{bot_id}{pnl}", "user_id": "user_1", "bot_id": bot_id,
+        "status": status, "trading_mode": mode, "profit_loss": pnl, "fees": 0.5,
+        "trade_amount": 100.0, "timestamp": now - timedelta(days=day_offset) + timedelta(hours=hours)
+    }
+
+
+def bucket_docs(db, source, period):
+    return sorted(
+        ({k: v for k, v in d.items() if k != "_id"} for d in db["pnl_rollups"].docs
+         if d["source"] == source and d["period"] == period),
+        key=lambda d: (d["bot_id"], str(d["trading_mode"]), d["bucket"])
+    )
+
+
+@pytest.mark.asyncio
+async def test_trade_rollups_match_rebuild_and_feed_series(monkeypatch):
+    db = FakeDB()
+    store = PnLRollupStore(db)
+    monkeypatch.setattr(rollups_module, "_pnl_rollups_instance", store)
+
+    trades = [
+        trade(0, 10.0), trade(0, -4.0), trade(0, 3.0, bot_id="bot_2"),
+        trade(1, 7.0, mode="live"), trade(9, 2.5), trade(40, 100.0),
+        trade(0, 50.0, status="open")  # Open trades never count
+    ]
+    for t in trades:
+        await db["trades"].insert_one(dict(t))
+        await store.record_trade(t)
+
+    today = max((d for d in bucket_docs(db, "trades", "day") if d["bot_id"] == "bot_1"),
+                key=lambda d: d["bucket"])
+    assert today["trades"] == 2 and today["pnl"] == 6.0
+    assert today["wins"] == 1 and today["losses"] == 1
+    assert len(bucket_docs(db, "trades", "hour")) == len(bucket_docs(db, "trades", "day"))
+
+    # A rebuild from the raw trades reproduces the incremental buckets
+    incremental = bucket_docs(db, "trades", "day"), bucket_docs(db, "trades", "hour")
+    await store.rebuild("user_1")
+    assert (bucket_docs(db, "trades", "day"), bucket_docs(db, "trades", "hour")) == incremental
+
+    daily = await ProfitService.get_daily_profit_series("user_1", days=7)
+    assert [d["profit"] for d in daily[-2:]] == [7.0, 9.0]
+    paper = await ProfitService.get_daily_profit_series("user_1", days=7, trading_mode="paper")
+    assert [d["profit"] for d in paper[-2:]] == [0, 9.0]
+
+    weekly = await ProfitService.get_weekly_profit_series("user_1", weeks=4)
+    assert round(sum(w["profit"] for w in weekly), 2) == 18.5
+    monthly = await ProfitService.get_monthly_profit_series("user_1", months=6)
+    assert round(sum(m["profit"] for m in monthly), 2) == 118.5
+
+    # In sync with the trades: reads don't rebuild
+    built_at = db["pnl_rollup_state"].docs[0]["built_at"]
+    await store.record_trade(trade(0, 1.0))
+    await db["trades"].insert_one(trade(0, 1.0))
+    assert [d["profit"] for d in (await ProfitService.get_daily_profit_series("user_1", days=7))[-1:]] == [10.0]
+    assert db["pnl_rollup_state"].docs[0]["built_at"] == built_at
+
+
+@pytest.mark.asyncio
+async def test_trades_written_without_record_trade_trigger_rebuild(monkeypatch):
+    db = FakeDB()
+    store = PnLRollupStore(db)
+    monkeypatch.setattr(rollups_module, "_pnl_rollups_instance", store)
+    for t in (trade(0, 10.0), trade(1, -4.0)):
+        await db["trades"].insert_one(dict(t))
+        await store.record_trade(t)
+    assert [d["profit"] for d in (await ProfitService.get_daily_profit_series("user_1", days=7))[-2:]] == [-4.0, 10.0]
+
+    # Another path inserts a closed trade and closes an open one, skipping the rollups
+    await db["trades"].insert_one(trade(0, 5.0))
+    await db["trades"].insert_one(trade(1, 2.0, status="open"))
+    db["trades"].docs[-1]["status"] = "closed"
+    assert db["pnl_rollup_state"].docs[0]["trade_count"] == 2
+
+    # Within the verify interval reads trust the built marker and count nothing
+    assert [d["profit"] for d in (await ProfitService.get_daily_profit_series("user_1", days=7))[-2:]] == [-4.0, 10.0]
+    assert len(db["trades"].counts) == 0
+
+    state = db["pnl_rollup_state"].docs[0]
+    state["verified_at"] -= timedelta(seconds=store.verify_interval)
+    assert [d["profit"] for d in (await ProfitService.get_daily_profit_series("user_1", days=7))[-2:]] == [-2.0, 15.0]
+    assert len(db["trades"].counts) == 1
+    assert db["pnl_rollup_state"].docs[0]["trade_count"] == 4
+
+    # Deleted trades are picked up the same way
+    db["trades"].docs = [t for t in db["trades"].docs if t["profit_loss"] != -4.0]
+    db["pnl_rollup_state"].docs[0]["verified_at"] -= timedelta(seconds=store.verify_interval)
+    assert [d["profit"] for d in (await ProfitService.get_daily_profit_series("user_1", days=7))[-2:]] == [2.0, 15.0]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_flushes_buffer_and_replaces_in_place(monkeypatch):
+    db = FakeDB()
+    store = PnLRollupStore(db)
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000)
+    buffer.is_running = True  # Queue writes without the background flush loop
+    monkeypatch.setattr(rollups_module, "write_behind", buffer)
+
+    for t in (trade(0, 10.0), trade(1, -4.0), trade(2, 3.0, bot_id="bot_2")):
+        await buffer.insert_one(db["trades"], dict(t))
+        await store.record_trade(t)
+    assert not db["trades"].docs and buffer.pending_count()
+
+    # Buffered trades and $inc upserts land before aggregating: no double count
+    await store.rebuild("user_1")
+    assert not buffer.pending_count()
+    built = bucket_docs(db, "trades", "day")
+    assert sorted(d["pnl"] for d in built) == [-4.0, 3.0, 10.0]
+
+    # A bucket whose trades are gone is removed; the rest are replaced in place
+    db["trades"].docs = [t for t in db["trades"].docs if t["bot_id"] == "bot_1"]
+    await store.rebuild("user_1")
+    rebuilt = bucket_docs(db, "trades", "day")
+    assert rebuilt == [d for d in built if d["bot_id"] == "bot_1"]
+    assert len(db["pnl_rollups"].docs) == 2 * len(rebuilt)  # One hour and one day bucket per trade
+
+    # Rebuilding again (e.g. a retry) converges on the same docs
+    await store.rebuild("user_1")
+    assert bucket_docs(db, "trades", "day") == rebuilt
+    assert len(db["pnl_rollups"].docs) == 2 * len(rebuilt)
+
+
+async def append(ledger, side, qty, price, minutes, base):
+    return await ledger.append_fill(
+        user_id="user_1", bot_id="bot_1", exchange="binance", symbol="BTC/USDT",
+        side=side, qty=qty, price=price, fee=1.0, fee_currency="USDT",
+        timestamp=base + timedelta(minutes=minutes), order_id=f"order_{minutes}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_ledger_series_from_rollups_matches_replay():
+    db = FakeDB()
+    ledger = LedgerService(db)
+    base = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=3)
+
+    # First read builds the (empty) rollups; later fills are folded in incrementally
+    assert await ledger.profit_series("user_1", period="daily", limit=7) == []
+    for i, (side, price) in enumerate([("buy", 100), ("buy", 110), ("sell", 130), ("sell", 90)]):
+        await append(ledger, side, 1.0, price, i * 24 * 60, base)
+    rebuilds = db["pnl_rollup_state"].docs[0]["built_at"]
+
+    from_rollups = await ledger.profit_series("user_1", period="daily", limit=7)
+    assert db["pnl_rollup_state"].docs[0]["built_at"] == rebuilds
+    assert [d["realized_pnl"] for d in from_rollups] == [0.0, 0.0, 30.0, -20.0]
+    assert [d["net_profit"] for d in from_rollups] == [-1.0, -1.0, 29.0, -21.0]
+
+    rollups, ledger.rollups = ledger.rollups, None
+    assert await ledger.profit_series("user_1", period="daily", limit=7) == from_rollups
+    ledger.rollups = rollups
+
+    # A backdated buy changes FIFO matching: the fill count drifts and the next read rebuilds
+    await append(ledger, "buy", 1.0, 50, -60, base)
+    series = await ledger.profit_series("user_1", period="daily", limit=7)
+    assert db["pnl_rollup_state"].docs[0]["fill_count"] == 5
+    assert [d["realized_pnl"] for d in series][-2:] == [80.0, -10.0]
+
+
+@pytest.mark.asyncio
+async def test_ledger_rebuild_replays_fills_without_ids():
+    db = FakeDB()
+    store = PnLRollupStore(db)
+    base = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    for minutes, side, price in [(0, "buy", 100.0), (60, "sell", 120.0)]:
+        await db["fills_ledger"].insert_one({
+            "user_id": "user_1", "symbol": "BTC/USDT", "side": side, "qty": 1.0, "price": price,
+            "fee": 0.0, "timestamp": base + timedelta(minutes=minutes)  # Legacy fill: no bot_id
+        })
+
+    await store.rebuild("user_1", "ledger")
+    days = await store.series("user_1", period="day", source="ledger")
+    assert [day["gross_pnl"] for day in days.values()] == [20.0]
+    assert all(doc["bot_id"] is None for doc in db["pnl_rollups"].docs)
@@ -0,0 +1,115 @@
+"""
+Tests for the shared price ring buffers
+
+- Streaming mean/variance/trend match a full recomputation after wraps and expiry
+- Points older than the window expire; indexing and ordered arrays stay consistent
+- The regime detectors share one buffer per symbol through the store
+- Seeding from stored candles after live ticks keeps the series in time order
+- Chandelier ATR on the ring buffer matches the per-candle reference
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.price_history import PriceHistoryStore, PriceRingBuffer
+from fakes import FakeClock
+
+
+def test_streaming_stats_match_recompute_across_wrap_and_expiry():
+    clock = FakeClock(1_700_000_000.0)
+    buffer = PriceRingBuffer(capacity=50, window_seconds=120, clock=clock)
+    rng = np.random.default_rng(3)
+    prices = 1_000_000 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+
+    for i, price in enumerate(prices):
+        clock.now += 1 if i < 300 else 5  # Later points space out so the time window bites
+        buffer.append(price=price)
+        window = buffer.values('price')
+        assert buffer.mean == pytest.approx(window.mean(), rel=1e-9)
+        assert buffer.variance == pytest.approx(window.var(), rel=1e-6, abs=1e-6)
+
+    assert len(buffer) == 24  # 120s window at 5s spacing
+    assert buffer.first == buffer[0]['price'] == prices[-24]
+    assert buffer.last == buffer[-1]['price'] == prices[-1]
+    assert buffer.trend_pct() == pytest.approx((prices[-1] - prices[-24]) / prices[-24] * 100)
+    assert np.all(np.diff(buffer.timestamps()) > 0)
+
+    clock.now += 1000
+    assert buffer.expire() == 24 and len(buffer) == 0 and buffer.variance == 0.0
+
+
+@pytest.mark.asyncio
+async def test_regime_detectors_share_one_buffer():
+    from engines.regime_detector import RegimeDetector
+    from market_regime import MarketRegimeDetector
+
+    store = PriceHistoryStore(capacity=100)
+    detector = RegimeDetector(history=store)
+    market = MarketRegimeDetector(history=store)
+    await detector.update_price_data("BTC/ZAR", 50000.0, 1.5)
+
+    assert market.price_history["BTC/ZAR"] is detector.price_history["BTC/ZAR"]
+    assert detector.price_history["BTC/ZAR"][0]['volume'] == 1.5
+    assert "BTC/ZAR" not in RegimeDetector().price_history  # Private store by default
+
+
+@pytest.mark.asyncio
+async def test_candle_seed_after_live_ticks_stays_ordered(monkeypatch):
+    import services.candle_store as candle_store_module
+    from engines.regime_detector import RegimeDetector
+
+    clock = FakeClock(1_700_000_000.0)
+    store = PriceHistoryStore(capacity=1000, clock=clock)
+    detector = RegimeDetector(history=store)
+    candle_ms = (clock.now - 24 * 3600 + 300 * np.arange(1, 289)) * 1000  # 5m closes, last 24h
+    candles = SimpleNamespace(timestamp=candle_ms, close=np.linspace(100, 150, 288), volume=np.ones(288))
+
+    class FakeCandleStore:
+        async def get_candles(self, *args, **kwargs):
+            # A live tick lands while the candles load
+            store.append("BTC/ZAR", 200.0, 1.0, timestamp=clock.now + 1)
+            return candles
+
+    monkeypatch.setattr(candle_store_module, "candle_store", FakeCandleStore())
+    assert await detector.load_history("BTC/ZAR") == 288
+
+    buffer = store["BTC/ZAR"]
+    assert len(buffer) == 289 and buffer.last == 200.0
+    assert np.all(np.diff(buffer.timestamps()) > 0)
+    assert buffer.mean == pytest.approx(buffer.values().mean())
+    assert buffer.trend_pct() == pytest.approx((200.0 - candles.close[0]) / candles.close[0] * 100)
+
+    # A second exchange seeding the same symbol, or a stale point, cannot rewind it
+    assert await detector.load_history("BTC/ZAR", exchange="valr") == 0
+    assert not buffer.append(clock.now - 60, price=128.7)
+    assert buffer.last == 200.0 and len(buffer) == 289
+
+
+def test_chandelier_atr_matches_reference():
+    from engines.chandelier_exits import ChandelierExits
+
+    exits = ChandelierExits(atr_period=14, lookback_period=20)
+    rng = np.random.default_rng(5)
+    candles = []
+    close = 100.0
+    for _ in range(60):
+        high, low = close + rng.uniform(0, 2), close - rng.uniform(0, 2)
+        close = rng.uniform(low, high)
+        candles.append((high, low, close))
+        exits.add_price_data("ETH/ZAR", high, low, close)
+
+    recent = candles[-15:]
+    true_ranges = [
+        max(h - l, abs(h - prev[2]), abs(l - prev[2]))
+        for prev, (h, l, _) in zip(recent, recent[1:])
+    ]
+    assert len(exits.price_history["ETH/ZAR"]) == 21
+    assert exits.calculate_atr("ETH/ZAR") == pytest.approx(np.mean(true_ranges))
+    stop = exits.calculate_stop_loss("ETH/ZAR", "long", entry_price=200.0)
+    assert stop['reference_level'] == max(h for h, _, _ in candles[-20:])
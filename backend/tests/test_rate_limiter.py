@@ -0,0 +1,101 @@
+"""
+Tests for the sliding-window, shared-state rate limiter
+
+- Limiters sharing one backend (workers sharing Redis) cannot jointly exceed a limit
+- The Redis Lua script grants exactly the burst limit to workers sharing a fakeredis server
+- Capacity refills continuously rather than on a fixed window boundary
+- Endpoint weights charge the exchange's request-weight budget
+- acquire() waits for capacity, or rejects with the binding limit's reason past max_wait
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rate_limiter import LocalLimiterBackend, RateLimiter, RedisLimiterBackend
+from fakes import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_backend_respect_burst_limit():
+    clock = FakeClock()
+    backend = LocalLimiterBackend(clock)
+    workers = [RateLimiter(backend, max_wait=0) for _ in range(3)]
+
+    granted = 0
+    for i in range(30):
+        allowed, reason = await workers[i % 3].acquire("luno", bot_id=f"bot{i}")
+        granted += allowed
+    assert granted == 10  # Luno: 10 orders per 10 seconds across all workers
+    assert reason == "Burst limit reached for LUNO (max 10 orders per 10 seconds)"
+    assert not (await workers[0].can_trade("bot99", "luno"))[0]
+
+    # Sliding refill: one order's worth of capacity after 1 second, not a full window reset
+    clock.now += 1
+    assert (await workers[1].acquire("luno"))[0]
+    assert not (await workers[2].acquire("luno"))[0]
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_redis_respect_burst_limit():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis runs EVAL scripts through lupa
+    server = fakeredis.FakeServer()
+    workers = [
+        RateLimiter(RedisLimiterBackend(fakeredis.FakeAsyncRedis(server=server, decode_responses=True)), max_wait=0)
+        for _ in range(2)
+    ]
+
+    results = [await workers[i % 2].acquire("luno", bot_id=f"bot{i}") for i in range(20)]
+    assert sum(allowed for allowed, _ in results) == 10
+    assert results[-1][1] == "Burst limit reached for LUNO (max 10 orders per 10 seconds)"
+    assert all(w.backend.name == "redis" for w in workers)  # No fallback to per-worker limits
+
+    usage = await workers[1].get_usage("luno")
+    assert usage["orders:10s"]["used"] == pytest.approx(10, abs=0.1)
+    for worker in workers:
+        await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_bot_limit_and_endpoint_weights():
+    clock = FakeClock()
+    limiter = RateLimiter(LocalLimiterBackend(clock), max_wait=0)
+
+    for _ in range(50):
+        await limiter.record_trade("bot1", "binance")
+        clock.now += 2
+    allowed, reason = await limiter.can_trade("bot1", "binance")
+    assert not allowed and reason == "Bot daily limit reached (50 orders)"
+    assert (await limiter.can_trade("bot2", "binance"))[0]
+    assert limiter.get_stats("binance")["orders_today"] == 50
+
+    # fetch_balance weighs 20 on Binance: 6000/min allows 300 of them at once
+    calls, allowed = 0, True
+    while allowed:
+        allowed, reason = await limiter.acquire("binance", "fetch_balance")
+        calls += allowed
+    assert 295 <= calls < 300  # Recent orders also used weight
+    assert reason.startswith("Request weight limit reached for BINANCE")
+    assert (await limiter.acquire("kucoin", "fetch_ticker"))[0]  # Budgets are per exchange
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_capacity():
+    limiter = RateLimiter(LocalLimiterBackend(), max_wait=1.0)
+    limiter._limits = lambda exchange, endpoint, bot_id=None: [
+        limit._replace(window=3) if limit.key.endswith("10s") else limit
+        for limit in RateLimiter._limits(limiter, exchange, endpoint, bot_id)
+    ]
+
+    for _ in range(10):
+        assert (await limiter.acquire("luno"))[0]
+    assert await limiter.acquire("luno") == (True, "OK")  # Waited ~0.3s for the next slot
+    assert limiter.get_stats("luno")["waits"] == 1
+
+    allowed, reason = await limiter.acquire("luno", max_wait=0.01)
+    assert not allowed and "Burst limit" in reason
+    assert limiter.get_stats("luno")["rejections"] == 1
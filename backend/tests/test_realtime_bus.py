@@ -0,0 +1,266 @@
+"""
+Tests for the cross-worker realtime bus (two managers on one LocalBusHub = two workers)
+
+- A user's messages reach only the worker holding that user's sockets
+- Sends are published in batches with per-user sequences shared across workers
+- Reconnects with last_event_id replay missed messages from a bounded buffer
+- Live messages during a replay are held back and deduped by sequence
+- A client's request_replay resends from its last sequence; callers' dicts are not stamped
+- Broadcasts reach every worker; a failed publish falls back to local sockets
+- The Redis backend behaves the same over a shared fakeredis server
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.realtime_bus import LocalBusBackend, LocalBusHub, channel_user, user_channel
+from websocket_manager_redis import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        pass
+
+    def messages(self, kind="update"):
+        return [m for m in self.sent if m.get("type") == kind]
+
+
+class CountingBackend(LocalBusBackend):
+    def __init__(self, hub):
+        super().__init__(hub)
+        self.batches = 0
+        self.received = []
+
+    async def publish_batch(self, messages, history_limit):
+        self.batches += 1
+        await super().publish_batch(messages, history_limit)
+
+    async def listen(self):
+        async for channel, data in super().listen():
+            self.received.append(channel)
+            yield channel, data
+
+
+async def settle():
+    await asyncio.sleep(0.05)
+
+
+async def eventually(predicate, timeout=2.0):
+    """Wait for a condition that depends on a real pub/sub round trip"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    return predicate()
+
+
+def test_channel_names():
+    assert channel_user(user_channel("user_1")) == "user_1"
+    assert channel_user("amarktai:broadcast") is None
+
+
+@pytest.mark.asyncio
+async def test_workers_receive_only_their_users():
+    hub = LocalBusHub()
+    worker_a = ConnectionManager(CountingBackend(hub), history_limit=10)
+    worker_b = ConnectionManager(CountingBackend(hub), history_limit=10)
+    ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect(ws1, "user_1")
+    await worker_b.connect(ws2, "user_2")
+
+    # Published from worker B (e.g. the scheduler runs there), delivered by A
+    for i in range(20):
+        await worker_b.send_message("user_1", {"type": "update", "n": i})
+    await worker_b.send_message("user_2", {"type": "update", "n": 100})
+    await settle()
+
+    assert worker_b.backend.batches == 1
+    assert [m["n"] for m in ws1.messages()] == list(range(20))
+    assert [m["sequence"] for m in ws1.messages()] == list(range(1, 21))
+    assert [m["n"] for m in ws2.messages()] == [100]
+    assert user_channel("user_1") not in worker_b.backend.received
+    assert user_channel("user_2") not in worker_a.backend.received
+
+    # Sequences continue across workers
+    await worker_a.send_message("user_1", {"type": "update", "n": 20})
+    await settle()
+    assert ws1.messages()[-1]["sequence"] == 21
+
+    # Broadcasts reach every worker's sockets
+    await worker_a.broadcast_all({"type": "live_gate", "status": "open"})
+    await settle()
+    assert ws1.messages("live_gate") and ws2.messages("live_gate")
+
+    await worker_a.close()
+    await worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_from_bounded_buffer():
+    hub = LocalBusHub()
+    worker_a = ConnectionManager(LocalBusBackend(hub), history_limit=5)
+    worker_b = ConnectionManager(LocalBusBackend(hub), history_limit=5)
+    ws = FakeWebSocket()
+    await worker_a.connect(ws, "user_1")
+    for i in range(3):
+        await worker_a.send_message("user_1", {"type": "update", "n": i})
+    await settle()
+    last_seen = ws.messages()[-1]["sequence"]
+
+    # Socket drops; more messages are published while it is away
+    worker_a.disconnect(ws, "user_1")
+    await settle()
+    for i in range(3, 10):
+        await worker_a.send_message("user_1", {"type": "update", "n": i})
+    await settle()
+    assert not hub.subscribers.get(user_channel("user_1"))  # No worker listens for user_1 now
+
+    # Reconnect lands on the other worker: only the newest 5 are still buffered
+    ws_again = FakeWebSocket()
+    await worker_b.connect(ws_again, "user_1", last_event_id=last_seen)
+    await settle()
+    assert [m["n"] for m in ws_again.messages()] == [5, 6, 7, 8, 9]
+
+    await worker_a.close()
+    await worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_request_replay_and_shared_message_dicts():
+    manager = ConnectionManager(LocalBusBackend(LocalBusHub()), history_limit=10)
+    ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(ws1, "user_1")
+    await manager.connect(ws2, "user_2")
+
+    # One dict sent to two users: each gets its own sequence, the caller's dict is untouched
+    message = {"type": "update", "n": 0}
+    await manager.send_message("user_1", message)
+    await manager.send_message("user_2", message)
+    await manager.send_message("user_1", {"type": "update", "n": 1})
+    await settle()
+    assert message == {"type": "update", "n": 0}
+    assert [m["sequence"] for m in ws1.messages()] == [1, 2]
+    assert [m["sequence"] for m in ws2.messages()] == [1]
+
+    # request_replay from sequence 1 resends only what came after it
+    await manager.replay(ws1, "user_1", 1)
+    await settle()
+    assert [m["n"] for m in ws1.messages()] == [0, 1, 1]
+
+    await manager.close()
+
+
+class FailingBackend(LocalBusBackend):
+    async def publish_batch(self, messages, history_limit):
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_publish_failure_falls_back_to_local():
+    manager = ConnectionManager(FailingBackend(), history_limit=5)
+    ws = FakeWebSocket()
+    await manager.connect(ws, "user_1")
+    await manager.send_message("user_1", {"type": "update", "n": 1})
+    await settle()
+    assert [m["n"] for m in ws.messages()] == [1]
+    assert manager.get_status()["bus_backend"] == "local"
+    await manager.close()
+
+
+class SlowHistoryBackend(LocalBusBackend):
+    """History lookup that waits, so live messages land mid-replay"""
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self.release = asyncio.Event()
+
+    async def history(self, user_id, after):
+        entries = await super().history(user_id, after)
+        await self.release.wait()
+        return entries
+
+
+@pytest.mark.asyncio
+async def test_replay_and_live_messages_arrive_once_in_order():
+    hub = LocalBusHub()
+    publisher = ConnectionManager(LocalBusBackend(hub), history_limit=50)
+    worker = ConnectionManager(SlowHistoryBackend(hub), history_limit=50)
+    for i in range(3):
+        await publisher.send_message("user_1", {"type": "update", "n": i})
+    await settle()
+
+    # Reconnect from sequence 1; two more messages are published while the replay is looked up
+    ws = FakeWebSocket()
+    connecting = asyncio.create_task(worker.connect(ws, "user_1", last_event_id=1))
+    await settle()
+    for i in range(3, 5):
+        await publisher.send_message("user_1", {"type": "update", "n": i})
+    await settle()
+    assert ws.messages() == []  # Live traffic is held back during the replay
+
+    worker.backend.release.set()
+    await connecting
+    await settle()
+    assert [m["n"] for m in ws.messages()] == [1, 2, 3, 4]
+    assert [m["sequence"] for m in ws.messages()] == [2, 3, 4, 5]
+
+    await publisher.close()
+    await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_across_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    from services.realtime_bus import RedisBusBackend
+
+    server = fakeredis.FakeServer()
+
+    def redis_worker():
+        client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        return ConnectionManager(RedisBusBackend(client), history_limit=5)
+
+    worker_a, worker_b = redis_worker(), redis_worker()
+    ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect(ws1, "user_1")
+    await worker_b.connect(ws2, "user_2")
+    await settle()
+
+    # Published on B, delivered by A with Redis-assigned sequences
+    for i in range(3):
+        await worker_b.send_message("user_1", {"type": "update", "n": i})
+    await worker_a.send_message("user_2", {"type": "update", "n": 100})
+    assert await eventually(lambda: len(ws1.messages()) == 3 and ws2.messages())
+    assert [m["n"] for m in ws1.messages()] == [0, 1, 2]
+    assert [m["sequence"] for m in ws1.messages()] == [1, 2, 3]
+    assert [m["n"] for m in ws2.messages()] == [100]
+
+    # Missed messages replay from the trimmed sorted set on the other worker
+    worker_a.disconnect(ws1, "user_1")
+    await settle()
+    for i in range(3, 10):
+        await worker_a.send_message("user_1", {"type": "update", "n": i})
+    await worker_a.flush()
+    ws_again = FakeWebSocket()
+    await worker_b.connect(ws_again, "user_1", last_event_id=3)
+    assert await eventually(lambda: len(ws_again.messages()) == 5)
+    assert [m["n"] for m in ws_again.messages()] == [5, 6, 7, 8, 9]
+
+    await worker_a.broadcast_all({"type": "live_gate", "status": "open"})
+    assert await eventually(lambda: ws2.messages("live_gate") and ws_again.messages("live_gate"))
+
+    await worker_a.close()
+    await worker_b.close()
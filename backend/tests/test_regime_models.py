@@ -0,0 +1,96 @@
+"""
+Tests for per-symbol, warm-started regime models
+
+- Vectorized rolling features match the original per-point computation
+- Fitted models are reused between refits and kept separately per symbol
+- Refits happen on schedule or on feature drift, warm-started from the last fit
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engines.regime_detector import RegimeDetector, MarketRegime
+from fakes import FakeClock
+
+
+def reference_features(prices):
+    """The original list-comprehension implementation"""
+    log_returns = np.diff(np.log(prices))
+    window = min(20, len(log_returns) // 2)
+    volatility = np.array([
+        np.std(log_returns[max(0, i-window):i+1])
+        for i in range(len(log_returns))
+    ])
+    momentum = np.array([
+        (prices[i] - prices[max(0, i-window)]) / prices[max(0, i-window)]
+        if prices[max(0, i-window)] != 0 else 0
+        for i in range(1, len(prices))
+    ])
+    z_scores = (prices[1:] - np.mean(prices[:-1])) / (np.std(prices[:-1]) or 1)
+    return np.column_stack([log_returns, volatility, momentum, z_scores])
+
+
+def random_walk(n, seed=7, drift=0.0, vol=0.002):
+    rng = np.random.default_rng(seed)
+    return 50000 * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+
+
+async def feed(detector, symbol, prices):
+    for price in prices:
+        await detector.update_price_data(symbol, float(price))
+
+
+def test_vectorized_features_match_reference():
+    detector = RegimeDetector(refit_interval=60)
+    for n in (12, 41, 300):
+        prices = random_walk(n)
+        np.testing.assert_allclose(detector._extract_features(prices), reference_features(prices), rtol=1e-7, atol=1e-12)
+
+
+@pytest.mark.asyncio
+async def test_models_reused_between_scheduled_warm_refits():
+    clock = FakeClock()
+    detector = RegimeDetector(refit_interval=60, clock=clock)
+    await feed(detector, "BTC/ZAR", random_walk(150))
+    await feed(detector, "ETH/ZAR", random_walk(150, seed=11))
+
+    state = await detector.detect_regime("BTC/ZAR")
+    assert state.regime != MarketRegime.UNKNOWN and 0.0 <= state.confidence <= 1.0
+    btc = detector.models["BTC/ZAR"]
+    fitted_hmm = btc.hmm
+    assert btc.refits == 1 and fitted_hmm.init_params == ""  # Next fit is warm-started
+
+    # Similar data within the interval: predictions reuse the fitted models
+    for price in random_walk(5, seed=8) / 50000 * float(detector.price_history["BTC/ZAR"][-1]["price"]):
+        await detector.update_price_data("BTC/ZAR", float(price))
+        await detector.detect_regime("BTC/ZAR")
+    assert btc.refits == 1
+
+    # Symbols have their own models
+    await detector.detect_regime("ETH/ZAR")
+    assert detector.models["ETH/ZAR"].hmm is not fitted_hmm
+
+    # Schedule elapses: refit in place, starting from the fitted parameters
+    clock.now += 61
+    await detector.detect_regime("BTC/ZAR")
+    assert btc.refits == 2 and btc.hmm is fitted_hmm
+
+
+@pytest.mark.asyncio
+async def test_feature_drift_triggers_early_refit():
+    clock = FakeClock()
+    detector = RegimeDetector(refit_interval=3600, clock=clock)
+    await feed(detector, "BTC/ZAR", random_walk(150, vol=0.001))
+    await detector.detect_regime("BTC/ZAR")
+    assert detector.models["BTC/ZAR"].refits == 1
+
+    # A volatility shock moves recent features far outside the training range
+    last = detector.price_history["BTC/ZAR"][-1]["price"]
+    await feed(detector, "BTC/ZAR", last * random_walk(15, seed=3, vol=0.05) / 50000)
+    await detector.detect_regime("BTC/ZAR")
+    assert detector.models["BTC/ZAR"].refits == 2
@@ -0,0 +1,90 @@
+"""
+Tests for the concurrent AI signal fan-out
+
+- Sources run concurrently: latency is the slowest source, not the sum
+- Timed-out / failing sources degrade to their default without failing the gather
+- Results are cached per source TTL, and concurrent gathers share one fetch
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.signal_gatherer import SignalGatherer, SignalSource
+
+
+def slow(value, delay, calls=None):
+    async def fetch():
+        if calls is not None:
+            calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return fetch
+
+
+@pytest.mark.asyncio
+async def test_sources_run_concurrently():
+    gatherer = SignalGatherer(latency_budget=1.0, source_timeout=1.0)
+    sources = {f"s{i}": SignalSource(slow({"confidence": i}, 0.1), {}, ttl=0) for i in range(5)}
+
+    started = time.monotonic()
+    results = await gatherer.gather(("luno", "BTC/ZAR"), sources)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.3  # ~max(0.1), not 5 x 0.1
+    assert results["s3"].value == {"confidence": 3}
+    assert all(r.status == "ok" for r in results.values())
+
+
+@pytest.mark.asyncio
+async def test_degraded_sources_use_defaults_and_warm_cache():
+    gatherer = SignalGatherer(latency_budget=0.1, source_timeout=1.0)
+
+    async def broken():
+        raise RuntimeError("upstream down")
+
+    results = await gatherer.gather("BTC", {
+        "fast": SignalSource(slow("up", 0.0), "neutral", ttl=60),
+        "slow": SignalSource(slow({"signal": "BUY"}, 0.2), {}, ttl=60),
+        "broken": SignalSource(broken, {}, ttl=60),
+    })
+
+    assert results["fast"].value == "up"
+    assert (results["slow"].status, results["slow"].value) == ("timeout", {})
+    assert (results["broken"].status, results["broken"].value) == ("error", {})
+    assert results["slow"].latency < 0.2
+    assert [name for name, r in results.items() if r.degraded] == ["slow", "broken"]
+
+    # The timed-out fetch finishes in the background and is served from cache next time
+    await asyncio.sleep(0.15)
+    again = await gatherer.gather("BTC", {"slow": SignalSource(slow("unused", 0.0), {}, ttl=60)})
+    assert (again["slow"].status, again["slow"].value) == ("cached", {"signal": "BUY"})
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_and_coalescing():
+    now = [0.0]
+    gatherer = SignalGatherer(latency_budget=1.0, source_timeout=1.0, clock=lambda: now[0])
+    calls = []
+
+    def sources():
+        return {"regime": SignalSource(slow("trending", 0.01, calls), {}, ttl=30)}
+
+    await asyncio.gather(*(gatherer.gather(("luno", "BTC/ZAR"), sources()) for _ in range(10)))
+    assert len(calls) == 1
+    assert gatherer.stats["coalesced"] == 9
+
+    await gatherer.gather(("luno", "BTC/ZAR"), sources())
+    assert len(calls) == 1  # Fresh cache hit
+
+    await gatherer.gather(("luno", "ETH/ZAR"), sources())
+    assert len(calls) == 2  # Different key
+
+    now[0] = 31.0
+    await gatherer.gather(("luno", "BTC/ZAR"), sources())
+    assert len(calls) == 3  # TTL expired
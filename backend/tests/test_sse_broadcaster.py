@@ -0,0 +1,146 @@
+"""
+Tests for the shared SSE broadcaster
+
+- Tabs of one user share a producer: one bots query per refresh, same frame object
+- Idle users cost no queries; event bus emits wake the producer and bursts coalesce
+- New tabs get the latest snapshot; the producer stops with the last tab
+- Slow consumers drop their oldest frames
+- The periodic resync picks up trades that landed after the event's refresh
+"""
+
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database
+import realtime_events
+from realtime_events import event_bus
+from services import sse_broadcaster as sse_module
+from services.sse_broadcaster import SSEBroadcaster
+from fakes import FakeCollection
+
+
+class UnwatchableCollection(FakeCollection):
+    def watch(self, *args, **kwargs):
+        raise RuntimeError("The $changeStream stage is only supported on replica sets")
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    bots = UnwatchableCollection([
+        {"user_id": "user_1", "status": "active", "total_profit": 12.5, "current_capital": 1000},
+        {"user_id": "user_1", "status": "paused", "total_profit": -2.5, "current_capital": 500},
+    ], name="bots")
+    trades = UnwatchableCollection([
+        {"user_id": "user_1", "bot_id": "b1", "profit_loss": 3.0, "timestamp": datetime.utcnow()}
+    ], name="trades")
+    monkeypatch.setattr(database, "bots_collection", bots)
+    monkeypatch.setattr(database, "trades_collection", trades)
+    monkeypatch.setattr(event_bus, "listeners", defaultdict(list))
+    return bots, trades
+
+
+def drain(queue):
+    frames = []
+    while not queue.empty():
+        frames.append(queue.get_nowait())
+    return frames
+
+
+@pytest.mark.asyncio
+async def test_tabs_share_one_event_driven_producer(collections):
+    bots, trades = collections
+    broadcaster = SSEBroadcaster(refresh_interval=60, debounce=0.01)
+
+    tab1 = broadcaster.subscribe("user_1")
+    tab2 = broadcaster.subscribe("user_1")
+    await asyncio.sleep(0.05)
+    assert len(bots.finds) == 1 and len(trades.finds) == 0
+    frames1, frames2 = drain(tab1), drain(tab2)
+    assert [f.split("\n")[0] for f in frames1] == ["event: overview_update", "event: bot_update"]
+    assert all(a is b for a, b in zip(frames1, frames2))  # Serialized once
+    assert '"total_profit": 10.0' in frames1[0]
+
+    # Nothing happens while idle
+    await asyncio.sleep(0.05)
+    assert len(bots.finds) == 1
+
+    # A burst of trade events becomes one refresh; unchanged overview isn't re-sent
+    for _ in range(5):
+        await realtime_events.rt_events.trade_executed("user_1", {"pair": "BTC/ZAR"})
+    await realtime_events.rt_events.trade_executed("user_2", {"pair": "ETH/ZAR"})
+    await asyncio.sleep(0.05)
+    assert len(bots.finds) == 2 and len(trades.finds) == 1
+    frames = drain(tab1)
+    assert len(frames) == 1 and frames[0].startswith("event: trade_update")
+    assert drain(tab2) == frames
+
+    # A late tab starts from the snapshot without another query
+    tab3 = broadcaster.subscribe("user_1")
+    assert [f.split("\n")[0] for f in drain(tab3)] == ["event: overview_update", "event: bot_update"]
+    assert len(bots.finds) == 2
+
+    task = broadcaster.channels["user_1"].task
+    for tab in (tab1, tab2, tab3):
+        broadcaster.unsubscribe("user_1", tab)
+    await asyncio.gather(task, return_exceptions=True)
+    assert "user_1" not in broadcaster.channels and task.cancelled()
+    await broadcaster.stop()
+
+
+@pytest.mark.asyncio
+async def test_periodic_resync_catches_late_trades(collections):
+    _, trades = collections
+    pending = trades.docs
+    trades.docs = []
+    broadcaster = SSEBroadcaster(refresh_interval=0.05, debounce=0.01)
+    queue = broadcaster.subscribe("user_1")
+
+    # trade_executed fires before the write-behind flush inserts the trade
+    await realtime_events.rt_events.trade_executed("user_1", {"pair": "BTC/ZAR"})
+    await asyncio.sleep(0.03)
+    assert len(trades.finds) == 1
+    assert not any(f.startswith("event: trade_update") for f in drain(queue))
+
+    # The flush lands; the next periodic resync sends it exactly once
+    trades.docs = pending
+    await asyncio.sleep(0.2)
+    assert len(trades.finds) > 2
+    frames = [f for f in drain(queue) if f.startswith("event: trade_update")]
+    assert len(frames) == 1 and '"bot_id": "b1"' in frames[0]
+    await broadcaster.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_drops_oldest(collections, monkeypatch):
+    monkeypatch.setattr(sse_module, "QUEUE_SIZE", 3)
+    broadcaster = SSEBroadcaster(refresh_interval=60, debounce=0.01)
+    queue = broadcaster.subscribe("user_1")
+    channel = broadcaster.channels["user_1"]
+
+    await asyncio.sleep(0.05)
+    drain(queue)
+    for i in range(5):
+        channel.publish("trade_update", {"n": i})
+    assert [f.split("data: ")[1].strip() for f in drain(queue)] == ['{"n": 2}', '{"n": 3}', '{"n": 4}']
+    await broadcaster.stop()
+
+
+@pytest.mark.asyncio
+async def test_event_generator_forwards_frames(collections, monkeypatch):
+    from routes import realtime
+
+    monkeypatch.setattr(realtime, "sse_broadcaster", SSEBroadcaster(refresh_interval=60, debounce=0.01))
+    gen = realtime._event_generator("user_1")
+    events = [await asyncio.wait_for(gen.__anext__(), timeout=1) for _ in range(3)]
+    assert [e.split("\n")[0] for e in events] == ["event: heartbeat", "event: overview_update", "event: bot_update"]
+
+    await gen.aclose()
+    assert realtime.sse_broadcaster.channels == {}
+    await realtime.sse_broadcaster.stop()
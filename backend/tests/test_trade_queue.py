@@ -0,0 +1,105 @@
+"""
+Tests for the TradeStaggerer scheduling queue
+
+- A bot is queued at most once; re-queueing can only raise its priority
+- Ready requests come out by priority, then arrival order
+- Bots in cooldown wait in the pending heap until eligible
+- get_next_trade honours exchange max_concurrent / min_delay
+- Depth and wait-time metrics
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engines.trade_staggerer import TradeStaggerer
+
+
+@pytest.mark.asyncio
+async def test_dedup_and_priority_order():
+    staggerer = TradeStaggerer()
+
+    await staggerer.add_to_queue("a", "binance")
+    await staggerer.add_to_queue("b", "binance")
+    await staggerer.add_to_queue("a", "binance")               # Duplicate: ignored
+    await staggerer.add_to_queue("c", "binance", priority=1)
+    await staggerer.add_to_queue("b", "binance", priority=2)   # Raised priority
+
+    assert staggerer.get_queued_bot_ids() == {"a", "b", "c"}
+    assert staggerer.queue_stats["deduplicated"] == 1
+    assert staggerer.queue_stats["reprioritized"] == 1
+
+    ready = await staggerer.get_ready_trades(max_trades=10, window_seconds=10)
+    assert [r['bot_id'] for r in ready] == ["b", "c", "a"]
+    assert ready[0]['priority'] == 2
+    assert not staggerer.get_queued_bot_ids()
+
+
+@pytest.mark.asyncio
+async def test_cooldown_bots_wait_until_eligible():
+    staggerer = TradeStaggerer()
+    staggerer.active_trades["cool"] = datetime.now(timezone.utc) - timedelta(seconds=30)
+
+    await staggerer.add_to_queue("cool", "kucoin", priority=5)
+    await staggerer.add_to_queue("warm", "kucoin")
+
+    assert [r['bot_id'] for r in await staggerer.get_ready_trades(10, 10)] == ["warm"]
+    assert staggerer.is_queued("cool")
+
+    # Cooldown over: the entry becomes ready on its own
+    del staggerer.active_trades["cool"]
+    staggerer._pending["kucoin"] = [(0.0, seq, entry) for _, seq, entry in staggerer._pending["kucoin"]]
+    assert [r['bot_id'] for r in await staggerer.get_ready_trades(10, 10)] == ["cool"]
+
+
+@pytest.mark.asyncio
+async def test_get_next_trade_respects_exchange_limits():
+    staggerer = TradeStaggerer()
+    for i in range(3):
+        await staggerer.add_to_queue(f"luno_{i}", "luno")
+    await staggerer.add_to_queue("bin_0", "binance")
+
+    first = await staggerer.get_next_trade()
+    assert first['bot_id'] == "luno_0"
+    await staggerer.register_trade_start("luno_0", "luno")
+
+    # luno is inside its 10s min_delay, so the binance request is next
+    second = await staggerer.get_next_trade()
+    assert second['bot_id'] == "bin_0"
+    await staggerer.register_trade_start("bin_0", "binance")
+
+    assert await staggerer.get_next_trade() is None
+    assert staggerer.get_queued_bot_ids() == {"luno_1", "luno_2"}
+
+    staggerer.last_trade_per_exchange["luno"] = datetime.now(timezone.utc) - timedelta(seconds=20)
+    staggerer.concurrent_trades_per_exchange["luno"] = 2  # At max_concurrent
+    assert await staggerer.get_next_trade() is None
+
+    await staggerer.register_trade_complete("luno_0", "luno")
+    assert (await staggerer.get_next_trade())['bot_id'] == "luno_1"
+
+
+@pytest.mark.asyncio
+async def test_queue_metrics():
+    staggerer = TradeStaggerer()
+    for i in range(4):
+        await staggerer.add_to_queue(f"luno_{i}", "luno")
+    await staggerer.add_to_queue("bin_0", "binance")
+
+    metrics = staggerer.get_queue_metrics()
+    assert metrics["depth"] == 5
+    assert metrics["depth_by_exchange"] == {"luno": 4, "binance": 1}
+
+    await staggerer.get_ready_trades(max_trades=3, window_seconds=10)
+    metrics = staggerer.get_queue_metrics()
+    assert metrics["dequeued"] == 3
+    assert metrics["depth_by_exchange"] == {"luno": 2}
+    assert metrics["max_wait_seconds"] >= metrics["avg_wait_seconds"] >= 0
+
+    status = await staggerer.get_queue_status()
+    assert status["queue_size"] == 2
+    assert [item["bot_id"] for item in status["queue_items"]] == ["luno_2", "luno_3"]
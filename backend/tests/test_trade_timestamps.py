@@ -0,0 +1,102 @@
+"""
+Tests for BSON datetime trade timestamps
+
+- parse_timestamp normalizes strings, naive/aware datetimes and epochs to aware UTC
+- Range filters match both legacy ISO strings and datetimes during rollover
+- Disabling dual read leaves a single index-friendly datetime range
+- The migration converts string timestamps once and leaves bad values alone
+- The daily email report counts yesterday's trades in either format
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.timestamps import iso_timestamp, parse_timestamp, timestamp_range, with_timestamp_range
+from fakes import FakeCollection, matches
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp("2026-03-10T12:00:00+00:00") == NOW
+    assert parse_timestamp("2026-03-10T12:00:00Z") == NOW
+    assert parse_timestamp("2026-03-10T14:00:00+02:00") == NOW
+    assert parse_timestamp(datetime(2026, 3, 10, 12, 0)) == NOW  # Naive BSON read-back
+    assert parse_timestamp(NOW.timestamp()) == NOW
+    assert parse_timestamp(NOW.timestamp() * 1000) == NOW
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp(None) is None
+    assert iso_timestamp(datetime(2026, 3, 10, 12, 0)) == "2026-03-10T12:00:00+00:00"
+
+
+def test_range_matches_mixed_formats(monkeypatch):
+    monkeypatch.setenv("TIMESTAMP_DUAL_READ", "true")
+    trades = [
+        {"id": "old-in", "user_id": "u1", "timestamp": (NOW - timedelta(hours=2)).isoformat()},
+        {"id": "old-out", "user_id": "u1", "timestamp": (NOW - timedelta(days=2)).isoformat()},
+        {"id": "new-in", "user_id": "u1", "timestamp": (NOW - timedelta(hours=1)).replace(tzinfo=None)},
+        {"id": "new-out", "user_id": "u1", "timestamp": (NOW - timedelta(days=3)).replace(tzinfo=None)},
+        {"id": "other", "user_id": "u2", "timestamp": NOW.replace(tzinfo=None)},
+    ]
+    since = NOW - timedelta(days=1)
+
+    query = with_timestamp_range({"user_id": "u1"}, since)
+    assert [t["id"] for t in trades if matches(t, query)] == ["old-in", "new-in"]
+
+    # Existing $or clauses are preserved, not overwritten
+    merged = with_timestamp_range({"$or": [{"bot_id": "a"}, {"bot_id": "b"}]}, since, NOW)
+    assert merged["$and"][0] == {"$or": [{"bot_id": "a"}, {"bot_id": "b"}]}
+    assert merged["$and"][1] == timestamp_range(since, NOW)
+    assert timestamp_range() == {}
+
+
+def test_dual_read_off_uses_datetime_only(monkeypatch):
+    monkeypatch.setenv("TIMESTAMP_DUAL_READ", "false")
+    since = NOW - timedelta(days=1)
+    assert timestamp_range(since.isoformat(), NOW) == {"timestamp": {"$gte": since, "$lt": NOW}}
+
+
+@pytest.mark.asyncio
+async def test_migration_converts_strings_once():
+    from migrations.convert_trade_timestamps import convert_collection
+
+    docs = [{"_id": i, "timestamp": (NOW - timedelta(minutes=i)).isoformat()} for i in range(5)]
+    docs.append({"_id": 5, "timestamp": NOW.replace(tzinfo=None)})
+    docs.append({"_id": 6, "timestamp": "garbage"})
+    collection = FakeCollection(docs)
+
+    counts = await convert_collection(collection, batch_size=2)
+    assert counts == {"converted": 5, "skipped": 1}
+    assert len(collection.bulk_writes) == 3
+    assert docs[3]["timestamp"] == (NOW - timedelta(minutes=3)).replace(tzinfo=None)
+    assert docs[6]["timestamp"] == "garbage"
+
+    # Re-running only revisits the unparseable value
+    assert await convert_collection(collection) == {"converted": 0, "skipped": 1}
+
+
+@pytest.mark.asyncio
+async def test_daily_report_counts_datetime_trades(monkeypatch):
+    import database
+    from engines.email_reporter import EmailReporter
+
+    monkeypatch.setenv("TIMESTAMP_DUAL_READ", "true")
+    yesterday_noon = (datetime.now(timezone.utc) - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+    trades = FakeCollection([
+        {"user_id": "u1", "profit_loss": 5, "timestamp": yesterday_noon.replace(tzinfo=None)},
+        {"user_id": "u1", "profit_loss": -1, "timestamp": (yesterday_noon - timedelta(hours=1)).isoformat()},
+        {"user_id": "u1", "profit_loss": 9, "timestamp": (yesterday_noon - timedelta(days=1)).replace(tzinfo=None)},
+    ])
+    monkeypatch.setattr(database, "trades_collection", trades)
+    monkeypatch.setattr(database, "bots_collection", FakeCollection([]))
+    monkeypatch.setattr(database, "alerts_collection", FakeCollection([]))
+
+    report = await EmailReporter().generate_daily_report("u1", "u1@example.com")
+
+    assert report["summary"]["total_trades_yesterday"] == 2
+    assert report["summary"]["total_profit_yesterday"] == 4
@@ -0,0 +1,134 @@
+"""
+Tests for the pooled TradingScheduler mode
+
+- Tick budget follows the throughput target
+- Per-exchange pools never exceed max_concurrent
+- Each concurrency slot starts trades at least min_delay apart, across ticks
+- get_ready_trades honours per-exchange tick capacity and bot cooldowns
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from trading_scheduler import TradingScheduler
+from engines.trade_staggerer import TradeStaggerer
+
+
+def test_tick_budget_follows_target():
+    scheduler = TradingScheduler()
+    scheduler.check_interval = 10
+
+    scheduler.target_trades_per_minute = 30
+    assert scheduler.get_tick_trade_budget() == 5  # legacy range(5)
+
+    scheduler.target_trades_per_minute = 240
+    assert scheduler.get_tick_trade_budget() == 40
+
+    scheduler.target_trades_per_minute = 0
+    assert scheduler.get_tick_trade_budget() == 1
+
+
+@pytest.mark.asyncio
+async def test_exchange_pool_respects_max_concurrent(monkeypatch):
+    scheduler = TradingScheduler()
+    staggerer = TradeStaggerer()
+    staggerer.exchange_limits['luno']['min_delay'] = 0
+    monkeypatch.setattr('trading_scheduler.trade_staggerer', staggerer)
+    in_flight = 0
+    peak = 0
+    executed = []
+
+    async def fake_execute(bot):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        executed.append(bot['id'])
+        in_flight -= 1
+
+    monkeypatch.setattr(scheduler, 'execute_queued_trade', fake_execute)
+
+    bots = [{"id": f"bot_{i}", "name": f"Bot {i}", "exchange": "luno"} for i in range(7)]
+    await scheduler.run_exchange_pool("luno", bots)
+
+    assert sorted(executed) == sorted(b['id'] for b in bots)
+    assert peak == 2  # luno max_concurrent
+
+
+@pytest.mark.asyncio
+async def test_exchange_pool_paces_starts_by_min_delay(monkeypatch):
+    scheduler = TradingScheduler()
+    staggerer = TradeStaggerer()
+    staggerer.exchange_limits['luno']['min_delay'] = 0.1
+    monkeypatch.setattr('trading_scheduler.trade_staggerer', staggerer)
+    loop = asyncio.get_running_loop()
+    starts = []
+
+    async def fake_execute(bot):
+        starts.append(loop.time())
+
+    monkeypatch.setattr(scheduler, 'execute_queued_trade', fake_execute)
+
+    bots = [{"id": f"bot_{i}", "name": f"Bot {i}", "exchange": "luno"} for i in range(4)]
+    await scheduler.run_exchange_pool("luno", bots[:2])
+    await scheduler.run_exchange_pool("luno", bots[2:])  # Next tick shares the slots
+
+    offsets = [t - starts[0] for t in starts]
+    assert offsets[1] < 0.05  # Two slots start together
+    assert all(offset >= 0.09 for offset in offsets[2:])
+
+
+@pytest.mark.asyncio
+async def test_exchange_pools_run_in_parallel(monkeypatch):
+    scheduler = TradingScheduler()
+    staggerer = TradeStaggerer()
+    monkeypatch.setattr('trading_scheduler.trade_staggerer', staggerer)
+
+    started = {}
+
+    async def fake_execute(bot):
+        started.setdefault(bot['exchange'], asyncio.get_running_loop().time())
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(scheduler, 'execute_queued_trade', fake_execute)
+
+    bots = {
+        "a": {"id": "a", "name": "A", "exchange": "luno"},
+        "b": {"id": "b", "name": "B", "exchange": "binance"},
+        "c": {"id": "c", "name": "C", "exchange": "kucoin"},
+    }
+    for bot in bots.values():
+        await staggerer.add_to_queue(bot['id'], bot['exchange'])
+
+    await scheduler.run_exchange_pools(bots, trade_budget=10)
+
+    assert set(started) == {"luno", "binance", "kucoin"}
+    assert max(started.values()) - min(started.values()) < 0.04
+
+
+@pytest.mark.asyncio
+async def test_get_ready_trades_caps_per_exchange_and_skips_cooldown():
+    staggerer = TradeStaggerer()
+
+    for i in range(6):
+        await staggerer.add_to_queue(f"luno_{i}", "luno")
+    for i in range(3):
+        await staggerer.add_to_queue(f"binance_{i}", "binance")
+
+    staggerer.active_trades["binance_0"] = datetime.now(timezone.utc)
+
+    ready = await staggerer.get_ready_trades(max_trades=50, window_seconds=10)
+    ready_ids = [r['bot_id'] for r in ready]
+
+    # luno: 2 concurrent x ceil(10s / 10s) = 2 per tick
+    assert len([b for b in ready_ids if b.startswith("luno")]) == 2
+    assert "binance_0" not in ready_ids
+    assert {"binance_1", "binance_2"} <= set(ready_ids)
+    # Everything not taken stays queued
+    assert staggerer.get_queued_bot_ids() == {"luno_2", "luno_3", "luno_4", "luno_5", "binance_0"}
@@ -0,0 +1,95 @@
+"""
+Tests for WebSocket fan-out in ConnectionManager
+
+- Messages are encoded once and match the sanitize_for_json output
+- Broadcasts return without waiting for a stalled socket; other sockets still receive
+- A slow socket's queue coalesces snapshots and drops the oldest past its bound
+- A socket whose send stalls past the timeout is dropped, the rest keep going
+"""
+
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import websocket_manager
+from websocket_manager import ConnectionManager, encode_message, sanitize_for_json
+
+
+class FakeWebSocket:
+    def __init__(self, stall: bool = False):
+        self.sent = []
+        self.stall = asyncio.Event() if stall else None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.stall is not None:
+            await self.stall.wait()
+        self.sent.append(json.loads(text))
+
+
+def test_encode_matches_sanitize(monkeypatch):
+    message = {
+        "type": "trade_executed",
+        "_id": ObjectId("65f1c0ffee0000000000abcd"),
+        "trade": {"timestamp": datetime(2026, 3, 10, 12, 0), "tags": ("a", "b"), "pnl": 1.5},
+        "at": datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc),
+    }
+    expected = sanitize_for_json(message)
+    assert json.loads(encode_message(message)) == expected
+
+    monkeypatch.setattr(websocket_manager, "ORJSON_AVAILABLE", False)
+    assert json.loads(encode_message(message)) == expected
+
+
+@pytest.mark.asyncio
+async def test_stalled_socket_does_not_block_broadcast():
+    manager = ConnectionManager(queue_size=3, send_timeout=60)
+    fast, slow = FakeWebSocket(), FakeWebSocket(stall=True)
+    await manager.connect(fast, "user_1")
+    await manager.connect(slow, "user_1")
+
+    # Returns immediately even though one socket never completes a send
+    for i in range(5):
+        await asyncio.wait_for(manager.send_message("user_1", {"type": "trade_executed", "n": i}), timeout=0.1)
+    await manager.send_message("user_1", {"type": "overview_updated", "v": 1})
+    await manager.send_message("user_1", {"type": "overview_updated", "v": 2})
+    await asyncio.sleep(0.01)
+
+    # Back-to-back overviews coalesce even for a fast socket whose writer hadn't run yet
+    assert [m.get("n", m.get("v")) for m in fast.sent[1:]] == [0, 1, 2, 3, 4, 2]
+
+    # Slow socket: first message is in flight; its queue kept the newest, one overview
+    slow.stall.set()
+    await asyncio.sleep(0.01)
+    assert slow.sent[0]["type"] == "connection"
+    assert [m.get("n", m.get("v")) for m in slow.sent[1:]] == [3, 4, 2]
+    assert manager.outbound[slow].dropped == 4
+
+    await manager.disconnect(fast, "user_1")
+    await manager.disconnect(slow, "user_1")
+    assert manager.active_connections == {} and manager.outbound == {}
+
+
+@pytest.mark.asyncio
+async def test_stuck_send_drops_only_that_socket():
+    manager = ConnectionManager(queue_size=10, send_timeout=0.05)
+    fast, stuck = FakeWebSocket(), FakeWebSocket(stall=True)
+    await manager.connect(fast, "user_1")
+    await manager.connect(stuck, "user_2")
+
+    await manager.broadcast_to_all({"type": "system", "message": "hello"})
+    await asyncio.sleep(0.1)
+
+    assert fast.sent[-1]["message"] == "hello"
+    assert "user_2" not in manager.active_connections and stuck not in manager.outbound
+    assert manager.active_connections == {"user_1": {fast}}
+    await manager.disconnect(fast, "user_1")
@@ -0,0 +1,227 @@
+"""
+Tests for the write-behind buffer used by the paper trading path
+
+- Concurrent updates to one bot coalesce into a single $inc
+- Flushes are bounded by interval and batch size, and drained on stop
+- Partially failed bulk writes only retry the failed operations
+- Failed inserts are never dropped: retried in order, with backpressure, dead-lettered on stop
+- Failed updates ($inc on capital) are kept queued, dead-lettered on stop and replayed on start
+- run_trading_cycle records trades through the buffer
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.write_behind import WriteBehindBuffer
+from fakes import FakeCollection
+
+
+class RecordingCollection(FakeCollection):
+    """FakeCollection that records each batch it receives and can fail on demand"""
+
+    def __init__(self, fail_bulk_indexes=None, fail_inserts=0, fail_bulk=0, name="trades"):
+        super().__init__(name=name)
+        self.inserted = []
+        self.direct = []
+        self.fail_bulk_indexes = fail_bulk_indexes
+        self.fail_inserts = fail_inserts  # insert_many calls that fail (an outage)
+        self.fail_bulk = fail_bulk  # bulk_write calls that fail (an outage)
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_bulk:
+            self.fail_bulk -= 1
+            raise ConnectionError("mongo unavailable")
+        if self.fail_bulk_indexes is not None:
+            failed, self.fail_bulk_indexes = self.fail_bulk_indexes, None
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 1} for i in failed]})
+        result = await super().bulk_write(requests, ordered)
+        self.bulk_writes[-1] = [(r._filter, r._doc) for r in requests]  # As (filter, update) pairs
+        return result
+
+    async def insert_many(self, documents, ordered=True):
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            raise ConnectionError("mongo unavailable")
+        self.inserted.append([dict(d) for d in documents])
+        return await super().insert_many([dict(d) for d in documents], ordered)
+
+    async def update_one(self, filter, update, upsert=False):
+        self.direct.append((filter, update))
+        return await super().update_one(filter, update, upsert)
+
+    async def insert_one(self, document):
+        self.direct.append(dict(document))
+        return await super().insert_one(document)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_coalesce_into_one_inc():
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000)
+    bots = RecordingCollection()
+    trades = RecordingCollection()
+    await buffer.start()
+    try:
+        await asyncio.gather(*(
+            buffer.update_one(bots, {"id": "bot_1"}, set_fields={"status": "active"}, inc_fields={"current_capital": 1.5, "trades_count": 1})
+            for _ in range(20)
+        ))
+        await buffer.update_one(bots, {"id": "bot_2"}, inc_fields={"current_capital": -2.0})
+        for i in range(3):
+            await buffer.insert_one(trades, {"id": f"t{i}"})
+        assert buffer.pending_increment(bots, {"id": "bot_1"}, "current_capital") == pytest.approx(30.0)
+    finally:
+        await buffer.stop()
+
+    assert len(bots.bulk_writes) == 1
+    ops = dict((f["id"], doc) for f, doc in bots.bulk_writes[0])
+    assert ops["bot_1"] == {"$set": {"status": "active"}, "$inc": {"current_capital": pytest.approx(30.0), "trades_count": 20}}
+    assert ops["bot_2"] == {"$inc": {"current_capital": -2.0}}
+    assert trades.inserted == [[{"id": "t0"}, {"id": "t1"}, {"id": "t2"}]]
+    assert buffer.stats["round_trips"] == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_latency_and_batch_bounds():
+    buffer = WriteBehindBuffer(flush_interval=0.05, max_batch=5)
+    trades = RecordingCollection()
+    await buffer.start()
+    try:
+        await buffer.insert_one(trades, {"id": "slow"})
+        await asyncio.sleep(0.15)
+        assert trades.inserted == [[{"id": "slow"}]]  # Flushed by the interval
+
+        buffer.flush_interval = 60
+        await asyncio.sleep(0.06)  # Let the loop pick up the new interval
+        for i in range(5):
+            await buffer.insert_one(trades, {"id": i})
+        await asyncio.sleep(0.01)
+        assert len(trades.inserted) == 2  # max_batch forced an early flush
+    finally:
+        await buffer.stop()
+
+    # Not running: writes go straight through
+    await buffer.update_one(trades, {"id": "x"}, inc_fields={"n": 1})
+    assert trades.direct == [({"id": "x"}, {"$inc": {"n": 1}})]
+
+
+@pytest.mark.asyncio
+async def test_partial_bulk_failure_retries_only_failed_updates():
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000)
+    bots = RecordingCollection(fail_bulk_indexes=[1])
+    await buffer.start()
+    await buffer.update_one(bots, {"id": "a"}, inc_fields={"current_capital": 1.0})
+    await buffer.update_one(bots, {"id": "b"}, inc_fields={"current_capital": 2.0})
+    await buffer.flush()
+
+    # A newer write to the failed doc is merged with the retry
+    await buffer.update_one(bots, {"id": "b"}, inc_fields={"current_capital": 3.0})
+    await buffer.stop()
+
+    assert bots.bulk_writes == [[({"id": "b"}, {"$inc": {"current_capital": 5.0}})]]
+    assert buffer.stats["flush_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_inserts_are_kept_with_backpressure_and_dead_lettered(tmp_path):
+    dead_letters = str(tmp_path / "dead_letter.jsonl")
+    buffer = WriteBehindBuffer(flush_interval=0.01, max_batch=1000, max_pending_inserts=3, dead_letter_path=dead_letters)
+    trades = RecordingCollection(fail_inserts=6)
+    await buffer.start()
+    try:
+        for i in range(3):
+            await buffer.insert_one(trades, {"id": f"t{i}"})
+        for _ in range(4):
+            await buffer.flush()
+        assert buffer.pending_insert_count() == 3  # Kept past MAX_FLUSH_ATTEMPTS
+
+        # Queue full: the writer waits until the outage ends, then queues behind the backlog
+        await buffer.insert_one(trades, {"id": "t3"})
+        assert buffer.stats["insert_waits"] >= 1 and not trades.fail_inserts
+        await buffer.flush()
+    finally:
+        await buffer.stop()
+
+    assert [d["id"] for batch in trades.inserted for d in batch] == ["t0", "t1", "t2", "t3"]
+    assert buffer.stats["dropped"] == 0
+
+    # Still down at shutdown: inserts go to the dead-letter file, then in on the next start
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000, dead_letter_path=dead_letters)
+    trades = RecordingCollection(fail_inserts=10)
+    await buffer.start()
+    await buffer.insert_one(trades, {"id": "t4", "pnl": 1.5})
+    await buffer.stop()
+    assert buffer.stats["dead_lettered"] == 1 and not trades.inserted
+
+    trades.fail_inserts = 0
+    assert await WriteBehindBuffer(dead_letter_path=dead_letters).replay_dead_letters({"trades": trades}) == 1
+    assert trades.inserted == [[{"id": "t4", "pnl": 1.5}]]
+    assert not os.path.exists(dead_letters)
+
+
+@pytest.mark.asyncio
+async def test_failed_updates_are_kept_and_dead_lettered(tmp_path):
+    dead_letters = str(tmp_path / "dead_letter.jsonl")
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000, dead_letter_path=dead_letters)
+    bots = RecordingCollection(fail_bulk=100, name="bots")
+    await buffer.start()
+    await buffer.update_one(bots, {"id": "bot_1"}, inc_fields={"current_capital": 2.5, "total_profit": 2.5})
+    for _ in range(4):
+        await buffer.flush()
+    assert buffer.pending_increment(bots, {"id": "bot_1"}, "current_capital") == 2.5  # Kept past MAX_FLUSH_ATTEMPTS
+
+    await buffer.stop()
+    await buffer.stop()  # Idempotent: nothing is flushed or dead-lettered twice
+    assert buffer.stats["dead_lettered"] == 1 and buffer.stats["dropped"] == 0
+    with open(dead_letters) as f:
+        assert len(f.readlines()) == 1
+
+    bots.fail_bulk = 0
+    assert await WriteBehindBuffer(dead_letter_path=dead_letters).replay_dead_letters({"bots": bots}) == 1
+    assert bots.bulk_writes == [[({"id": "bot_1"}, {"$inc": {"current_capital": 2.5, "total_profit": 2.5}})]]
+    assert not os.path.exists(dead_letters)
+
+
+@pytest.mark.asyncio
+async def test_run_trading_cycle_uses_atomic_increments(monkeypatch):
+    import paper_trading_engine
+    from paper_trading_engine import PaperTradingEngine
+
+    buffer = WriteBehindBuffer(flush_interval=60, max_batch=1000)
+    monkeypatch.setattr(paper_trading_engine, "write_behind", buffer)
+    engine = PaperTradingEngine()
+
+    async def fake_trade(bot_id, bot_data):
+        return {
+            "success": True, "bot_id": bot_id, "symbol": "BTC/ZAR", "exchange": "luno",
+            "entry_price": 1000.0, "exit_price": 1010.0, "amount": 0.1, "gross_profit": 1.0,
+            "profit_loss": 0.8, "net_profit": 0.8, "fees": 0.2, "is_paper": True,
+            "timestamp": "2025-01-01T00:00:00+00:00", "data_source": "LUNO_PUBLIC",
+            "fee_rate": 0.1, "slippage_rate": 0.01
+        }
+
+    monkeypatch.setattr(engine, "execute_smart_trade", fake_trade)
+    bots, trades = RecordingCollection(), RecordingCollection()
+    bot = {"id": "bot_1", "user_id": "user_1", "current_capital": 1000.0, "initial_capital": 1000.0}
+
+    await buffer.start()
+    try:
+        results = await asyncio.gather(*(
+            engine.run_trading_cycle("bot_1", bot, {"bots": bots, "trades": trades}) for _ in range(3)
+        ))
+    finally:
+        await buffer.stop()
+
+    assert results[-1]["new_capital"] == pytest.approx(1002.4)
+    (op,) = bots.bulk_writes[0]
+    assert op[1]["$inc"] == {"current_capital": pytest.approx(2.4), "total_profit": pytest.approx(2.4), "trades_count": 3}
+    docs = trades.inserted[0]
+    assert len(docs) == 3
+    assert docs[0]["price_source"] == "LUNO_PUBLIC"
+    assert docs[0]["slippage_bps"] == 1.0
+    assert docs[0]["fee_rate"] == 0.001
@@ -6,16 +6,25 @@ Actually uses live_trading_engine for live bots
 
 import asyncio
 import logging
+import math
+from collections import defaultdict
 from datetime import datetime, timezone
+from pymongo import UpdateOne
 from paper_trading_engine import paper_engine
 from engines.trading_engine_live import live_trading_engine
 from engines.trade_staggerer import trade_staggerer
 import database as db
-from websocket_manager import manager
+from websocket_manager_redis import manager
 from realtime_events import rt_events
-from config import PAPER_SUPPORTED_EXCHANGES
+from config import (
+    PAPER_SUPPORTED_EXCHANGES,
+    TRADING_SCHEDULER_MODE,
+    TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE
+)
 from services.bot_quarantine import quarantine_service
 from services.system_gate import system_gate
+from services.write_behind import write_behind
+from services.system_mode_service import system_mode_service
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +48,155 @@ class TradingScheduler:
         self.check_interval = 10  # Check every 10 seconds for ready trades
         self.last_heartbeat = None
         self.heartbeat_interval = 10  # Emit heartbeat every 10 seconds
-        
+        self.mode = TRADING_SCHEDULER_MODE  # 'sequential' or 'pooled'
+        self.target_trades_per_minute = TRADING_SCHEDULER_TARGET_TRADES_PER_MINUTE
+
+    def get_tick_trade_budget(self) -> int:
+        """Trades allowed per tick to meet the configured throughput target"""
+        return max(1, math.ceil(self.target_trades_per_minute * self.check_interval / 60))
+
+    async def run_exchange_pools(self, bots_by_id: dict, trade_budget: int):
+        """Run this tick's ready trades through one bounded worker pool per exchange"""
+        trade_requests = await trade_staggerer.get_ready_trades(trade_budget, self.check_interval)
+
+        bots_per_exchange = defaultdict(list)
+        for trade_request in trade_requests:
+            bot = bots_by_id.get(trade_request['bot_id'])
+            if bot:
+                bots_per_exchange[trade_request['exchange'].lower()].append(bot)
+
+        if not bots_per_exchange:
+            return
+
+        logger.info(
+            f"📊 Pooled tick: {sum(len(b) for b in bots_per_exchange.values())} trades across "
+            f"{len(bots_per_exchange)} exchanges (budget {trade_budget})"
+        )
+
+        await asyncio.gather(*(
+            self.run_exchange_pool(exchange, bots)
+            for exchange, bots in bots_per_exchange.items()
+        ))
+
+    async def run_exchange_pool(self, exchange: str, bots: list):
+        """Drain one exchange's trades with at most max_concurrent workers in flight, paced by min_delay"""
+        pending = asyncio.Queue()
+        for bot in bots:
+            pending.put_nowait(bot)
+
+        async def worker():
+            while True:
+                try:
+                    bot = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # Keep trade starts on this exchange min_delay apart
+                await asyncio.sleep(trade_staggerer.reserve_start(exchange))
+                await self.execute_queued_trade(bot)
+
+        max_concurrent = trade_staggerer.get_exchange_limits(exchange)['max_concurrent']
+        await asyncio.gather(*(worker() for _ in range(min(max_concurrent, len(bots)))))
+
+    async def execute_queued_trade(self, bot: dict):
+        """Execute one dequeued trade for a bot and broadcast the result"""
+        bot_id = bot['id']
+
+        try:
+            # Check both 'mode' and 'trading_mode' for backwards compatibility
+            mode = bot.get('mode') or bot.get('trading_mode', 'paper')
+            is_paper_mode = mode == 'paper'
+
+            # Register trade start
+            await trade_staggerer.register_trade_start(bot_id, bot.get('exchange'))
+
+            if is_paper_mode:
+                # Paper trading
+                logger.info(f"📊 Trade candidate: {bot['name']} on {bot.get('exchange')}")
+
+                result = await paper_engine.run_trading_cycle(
+                    bot['id'],
+                    bot,
+                    {'bots': db.bots_collection, 'trades': db.trades_collection}
+                )
+
+                if result and result.get('trade'):
+                    trade = result['trade']
+                    trade_id = trade.get('bot_id', 'unknown')
+                    profit = trade.get('profit_loss', 0)
+                    logger.info(f"✅ Trade inserted: id={trade_id}, profit={profit:.2f}")
+                    logger.info(f"📡 Realtime event emitted: trade_id={trade_id}")
+            else:
+                # LIVE TRADING - Use live_trading_engine
+                logger.info(f"🔴 LIVE TRADING: {bot['name']} on {bot.get('exchange')}")
+
+                # Execute live trade
+                result = await self.execute_live_trade(bot)
+
+            # Register trade complete
+            await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
+
+            # Send WebSocket update via rt_events for enhanced tracking
+            if result and isinstance(result, dict):
+                trade_data = result.get('trade', {})
+                if trade_data:
+                    # Broadcast trade execution event
+                    try:
+                        await rt_events.trade_executed(bot['user_id'], {
+                            "bot_id": bot['id'],
+                            "bot_name": bot['name'],
+                            "pair": trade_data.get('pair', 'unknown'),
+                            "side": trade_data.get('side', 'unknown'),
+                            "profit_loss": trade_data.get('profit_loss', 0),
+                            "new_capital": result.get('new_capital', 0),
+                            "total_profit": result.get('total_profit', 0),
+                            "timestamp": datetime.now(timezone.utc).isoformat()
+                        })
+                    except Exception as e:
+                        logger.warning(f"Failed to emit trade_executed event: {e}")
+
+                # Legacy WebSocket update (keep for backwards compatibility)
+                await manager.send_message(bot['user_id'], {
+                    "type": "trade_executed",
+                    "bot_id": result['bot_id'],
+                    "bot_name": bot['name'],
+                    "new_capital": result.get('new_capital', 0),
+                    "total_profit": result.get('total_profit', 0),
+                    "trade": trade_data
+                })
+
+        except Exception as e:
+            logger.error(f"Trade execution error for {bot['name']}: {e}")
+            await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
+
+    async def sync_paper_trading_flags(self, user_modes: dict, users_with_trading: dict):
+        """Keep paperTrading == not liveTrading for trading users, in one bulk_write of only the changed docs"""
+        changed = {}
+        for user_id, modes in user_modes.items():
+            if not users_with_trading.get(user_id) or not modes:
+                continue
+            # Default to paper trading if liveTrading is not explicitly enabled
+            is_paper_trading = not modes.get('liveTrading', False)
+            if modes.get('paperTrading') != is_paper_trading:
+                changed[user_id] = is_paper_trading
+
+        if not changed:
+            return
+
+        try:
+            await db.system_modes_collection.bulk_write(
+                [
+                    UpdateOne({"user_id": user_id}, {"$set": {"paperTrading": is_paper_trading}}, upsert=False)
+                    for user_id, is_paper_trading in changed.items()
+                ],
+                ordered=False
+            )
+            for user_id, is_paper_trading in changed.items():
+                system_mode_service.update_cached_modes(user_id, {"paperTrading": is_paper_trading})
+        except Exception as e:
+            logger.warning(f"Failed to sync paperTrading flags for {len(changed)} users: {e}")
+            for user_id in changed:
+                system_mode_service.invalidate_modes(user_id)
+
     async def execute_bot_trades(self):
         """Execute trades using staggered queue - CONTINUOUS OPERATION"""
         try:
@@ -78,14 +235,15 @@ class TradingScheduler:
             for bot in unsupported_bots:
                 exchange = bot.get('exchange', 'unknown')
                 logger.warning(f"⚠️ Bot {bot['name']} on unsupported exchange {exchange} - pausing")
-                await db.bots_collection.update_one(
+                await write_behind.update_one(
+                    db.bots_collection,
                     {"id": bot['id']},
-                    {"$set": {
+                    set_fields={
                         "status": "paused",
                         "pause_reason": BotPauseReason.UNSUPPORTED_EXCHANGE,
                         "paused_by_system": True,
                         "paused_at": datetime.now(timezone.utc).isoformat()
-                    }}
+                    }
                 )
                 
                 # Place bot in quarantine for auto-retraining
@@ -112,43 +270,31 @@ class TradingScheduler:
                 return
             
             # Check each user's System Mode settings and track reasons
+            # (one snapshot per tick: cached docs plus a single $in query for the rest;
+            # emergency stops are read uncached so another worker's stop applies this tick)
             users_with_trading = {}
             users_pause_reasons = {}
-            for bot in active_bots:
-                user_id = bot['user_id']
-                if user_id not in users_with_trading:
-                    modes = await db.system_modes_collection.find_one({"user_id": user_id}, {"_id": 0})
-                    
-                    # Check various conditions
-                    if not modes:
-                        users_with_trading[user_id] = False
-                        users_pause_reasons[user_id] = BotPauseReason.MODE_DISABLED
-                    elif modes.get('emergencyStop', False):
-                        users_with_trading[user_id] = False
-                        users_pause_reasons[user_id] = BotPauseReason.EMERGENCY_STOP
-                    elif not modes.get('autopilot'):
-                        users_with_trading[user_id] = False
-                        users_pause_reasons[user_id] = BotPauseReason.MODE_DISABLED
-                    else:
-                        # Autopilot is ON and no emergency stop
-                        users_with_trading[user_id] = True
-                        users_pause_reasons[user_id] = None
+            user_ids = [bot['user_id'] for bot in active_bots]
+            user_modes = await system_mode_service.get_modes_snapshot(user_ids)
+            emergency_stops = await system_mode_service.get_emergency_stops(user_ids)
+            for user_id, modes in user_modes.items():
+                # Check various conditions
+                if not modes:
+                    users_with_trading[user_id] = False
+                    users_pause_reasons[user_id] = BotPauseReason.MODE_DISABLED
+                elif user_id in emergency_stops:
+                    users_with_trading[user_id] = False
+                    users_pause_reasons[user_id] = BotPauseReason.EMERGENCY_STOP
+                elif not modes.get('autopilot'):
+                    users_with_trading[user_id] = False
+                    users_pause_reasons[user_id] = BotPauseReason.MODE_DISABLED
+                else:
+                    # Autopilot is ON and no emergency stop
+                    users_with_trading[user_id] = True
+                    users_pause_reasons[user_id] = None
             
             # Update system_state to reflect paper trading status
-            for user_id in users_with_trading.keys():
-                if users_with_trading[user_id]:
-                    # Update system modes to show paperTrading=true by default for safety
-                    modes = await db.system_modes_collection.find_one({"user_id": user_id}, {"_id": 0})
-                    if modes:
-                        # Default to paper trading if liveTrading is not explicitly enabled
-                        is_live_trading = modes.get('liveTrading', False)
-                        is_paper_trading = not is_live_trading  # Paper by default
-                        
-                        await db.system_modes_collection.update_one(
-                            {"user_id": user_id},
-                            {"$set": {"paperTrading": is_paper_trading}},
-                            upsert=False
-                        )
+            await self.sync_paper_trading_flags(user_modes, users_with_trading)
             
             # Filter bots with trading enabled and pause others with reason
             paused_bots = [bot for bot in active_bots if not users_with_trading.get(bot['user_id'], False)]
@@ -159,14 +305,15 @@ class TradingScheduler:
                 user_id = bot['user_id']
                 pause_reason = users_pause_reasons.get(user_id, BotPauseReason.MODE_DISABLED)
                 
-                await db.bots_collection.update_one(
+                await write_behind.update_one(
+                    db.bots_collection,
                     {"id": bot['id']},
-                    {"$set": {
+                    set_fields={
                         "status": "paused",
                         "pause_reason": pause_reason,
                         "paused_by_system": True,
                         "paused_at": datetime.now(timezone.utc).isoformat()
-                    }}
+                    }
                 )
                 
                 # Place bot in quarantine for auto-retraining
@@ -190,98 +337,44 @@ class TradingScheduler:
                 return
             
             # Process ready trades from queue
-            for _ in range(5):  # Process up to 5 trades per cycle
-                trade_request = await trade_staggerer.get_next_trade()
-                
-                if not trade_request:
-                    break
-                
-                bot_id = trade_request['bot_id']
-                bot = next((b for b in active_bots if b['id'] == bot_id), None)
-                
-                if not bot:
-                    continue
-                
-                # Execute trade based on mode
-                try:
-                    # Check both 'mode' and 'trading_mode' for backwards compatibility
-                    mode = bot.get('mode') or bot.get('trading_mode', 'paper')
-                    is_paper_mode = mode == 'paper'
-                    
-                    # Register trade start
-                    await trade_staggerer.register_trade_start(bot_id, bot.get('exchange'))
-                    
-                    if is_paper_mode:
-                        # Paper trading
-                        logger.info(f"📊 Trade candidate: {bot['name']} on {bot.get('exchange')}")
-                        
-                        result = await paper_engine.run_trading_cycle(
-                            bot['id'],
-                            bot,
-                            {'bots': db.bots_collection, 'trades': db.trades_collection}
-                        )
-                        
-                        if result and result.get('trade'):
-                            trade = result['trade']
-                            trade_id = trade.get('bot_id', 'unknown')
-                            profit = trade.get('profit_loss', 0)
-                            logger.info(f"✅ Trade inserted: id={trade_id}, profit={profit:.2f}")
-                            logger.info(f"📡 Realtime event emitted: trade_id={trade_id}")
-                    else:
-                        # LIVE TRADING - Use live_trading_engine
-                        logger.info(f"🔴 LIVE TRADING: {bot['name']} on {bot.get('exchange')}")
-                        
-                        # Execute live trade
-                        result = await self.execute_live_trade(bot)
-                    
-                    # Register trade complete
-                    await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
-                    
-                    # Send WebSocket update via rt_events for enhanced tracking
-                    if result and isinstance(result, dict):
-                        trade_data = result.get('trade', {})
-                        if trade_data:
-                            # Broadcast trade execution event
-                            try:
-                                await rt_events.trade_executed(bot['user_id'], {
-                                    "bot_id": bot['id'],
-                                    "bot_name": bot['name'],
-                                    "pair": trade_data.get('pair', 'unknown'),
-                                    "side": trade_data.get('side', 'unknown'),
-                                    "profit_loss": trade_data.get('profit_loss', 0),
-                                    "new_capital": result.get('new_capital', 0),
-                                    "total_profit": result.get('total_profit', 0),
-                                    "timestamp": datetime.now(timezone.utc).isoformat()
-                                })
-                            except Exception as e:
-                                logger.warning(f"Failed to emit trade_executed event: {e}")
-                        
-                        # Legacy WebSocket update (keep for backwards compatibility)
-                        await manager.send_message(bot['user_id'], {
-                            "type": "trade_executed",
-                            "bot_id": result['bot_id'],
-                            "bot_name": bot['name'],
-                            "new_capital": result.get('new_capital', 0),
-                            "total_profit": result.get('total_profit', 0),
-                            "trade": trade_data
-                        })
-                    
-                except Exception as e:
-                    logger.error(f"Trade execution error for {bot['name']}: {e}")
-                    await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
-            
-            # Add new trades to queue
+            trade_budget = self.get_tick_trade_budget()
+            bots_by_id = {b['id']: b for b in active_bots}
+
+            if self.mode == 'pooled':
+                await self.run_exchange_pools(bots_by_id, trade_budget)
+            else:
+                for _ in range(trade_budget):
+                    trade_request = await trade_staggerer.get_next_trade()
+
+                    if not trade_request:
+                        break
+
+                    bot = bots_by_id.get(trade_request['bot_id'])
+
+                    if not bot:
+                        continue
+
+                    await self.execute_queued_trade(bot)
+
+            # Add new trades to queue (the staggerer dedups bots that are already queued)
             for bot in active_bots:
                 bot_id = bot['id']
                 exchange = bot.get('exchange', 'binance')
-                
+
+                if self.mode == 'pooled':
+                    # Exchange limits are enforced by the worker pools - only check the bot itself
+                    if trade_staggerer.is_queued(bot_id) or trade_staggerer.get_bot_cooldown(bot_id):
+                        continue
+                    await trade_staggerer.add_to_queue(bot_id, exchange, priority=0)
+                    continue
+
                 # Check if bot can trade
                 can_execute, reason = await trade_staggerer.can_execute_now(bot_id, exchange)
-                
+
                 if can_execute:
                     # Add to queue
                     await trade_staggerer.add_to_queue(bot_id, exchange, priority=0)
-        
+
         except Exception as e:
             logger.error(f"Trading cycle error: {e}")
     
@@ -354,7 +447,7 @@ class TradingScheduler:
                 "amount": trade_result.get('amount', 0),
                 "profit_loss": trade_result.get('net_profit', 0),
                 "is_paper": False,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "exchange": exchange
             }
             
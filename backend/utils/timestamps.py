@@ -0,0 +1,98 @@
+"""
+Trade Timestamp Helpers - BSON datetime storage with a dual-read rollover
+
+Trades used to store `timestamp` as an ISO string; new writes store a BSON
+datetime (see migrations/convert_trade_timestamps.py). Until the migration has
+run everywhere, range queries must match both representations:
+
+1. parse_timestamp: str / datetime / epoch -> aware UTC datetime
+2. timestamp_range: Mongo filter matching a [start, end) window in either format
+3. with_timestamp_range: merge that filter into an existing query
+4. iso_timestamp: aware ISO string for API / realtime payloads
+
+Set TIMESTAMP_DUAL_READ=false once the migration reports zero string
+timestamps; queries then use the datetime branch (and its index) only.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from utils.env_utils import env_bool
+
+logger = logging.getLogger(__name__)
+
+
+def dual_read_enabled() -> bool:
+    """Whether range queries still match legacy ISO-string timestamps"""
+    return env_bool('TIMESTAMP_DUAL_READ', True)
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Normalize a stored timestamp to an aware UTC datetime.
+
+    Accepts BSON datetimes (naive values are UTC, as Motor returns them),
+    ISO strings with or without offset / 'Z', and epoch seconds or milliseconds.
+    Returns None for missing or unparseable values.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    if isinstance(value, str):
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return parse_timestamp(parsed)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return None
+
+
+def iso_timestamp(value: Any) -> Optional[str]:
+    """Aware ISO-8601 string for a stored timestamp (API and JSON payloads)"""
+    parsed = parse_timestamp(value)
+    return parsed.isoformat() if parsed else value
+
+
+def timestamp_range(start: Any = None, end: Any = None, field: str = 'timestamp') -> Dict:
+    """
+    Mongo filter for start <= field < end, matching datetimes and legacy ISO strings.
+
+    Bounds may be datetimes or ISO strings. BSON comparisons never cross types,
+    so the string branch only ever sees legacy documents and vice versa.
+    """
+    start_dt, end_dt = parse_timestamp(start), parse_timestamp(end)
+    native: Dict[str, Any] = {}
+    if start_dt:
+        native['$gte'] = start_dt
+    if end_dt:
+        native['$lt'] = end_dt
+    if not native:
+        return {}
+
+    if not dual_read_enabled():
+        return {field: native}
+
+    legacy = {op: bound.isoformat() for op, bound in native.items()}
+    return {'$or': [{field: native}, {field: legacy}]}
+
+
+def with_timestamp_range(query: Dict, start: Any = None, end: Any = None,
+                         field: str = 'timestamp') -> Dict:
+    """Return a copy of query restricted to the [start, end) window"""
+    window = timestamp_range(start, end, field)
+    if not window:
+        return dict(query)
+    if '$or' in query and '$or' in window:
+        merged = {k: v for k, v in query.items() if k != '$or'}
+        merged['$and'] = list(query.get('$and', [])) + [{'$or': query['$or']}, window]
+        return merged
+    return {**query, **window}
@@ -1,17 +1,43 @@
 """
 WebSocket Manager for Real-Time Updates
 Handles WebSocket connections and broadcasts
+
+Broadcasts never wait on sockets: each message is encoded once (orjson when
+installed) and queued on every target connection's bounded outbound queue;
+a writer task per connection does the actual send. A slow or stalled browser
+only backs up its own queue - newer snapshots replace queued ones of the same
+type and, when full, the oldest message is dropped - so other connections and
+callers such as the trading scheduler are never blocked.
+
+ConnectionManager here is the single-process manager. The app's instance is
+websocket_manager_redis.manager, which uses the same queues and encoding on
+top of the cross-worker bus.
 """
 import asyncio
+from collections import deque
 from fastapi import WebSocket
-from typing import Dict, Set, Any
+from typing import Deque, Dict, Optional, Set, Any, Tuple
 import json
 import logging
 from datetime import datetime, timezone
 from bson import ObjectId
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from config import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT
+
 logger = logging.getLogger(__name__)
 
+# Snapshot messages where only the latest matters: a queued one is replaced
+COALESCE_TYPES = {
+    "ping", "overview_updated", "metrics_updated", "balance_updated",
+    "wallet", "countdown_update", "force_refresh"
+}
+
 
 def sanitize_for_json(obj: Any) -> Any:
     """
@@ -41,12 +67,77 @@ def sanitize_for_json(obj: Any) -> Any:
         # Fallback: convert to string for unknown types
         return str(obj)
 
+
+def encode_message(message: Any) -> str:
+    """Serialize a message once for every socket it goes to.
+    
+    Equivalent to json.dumps(sanitize_for_json(message)) without the recursive
+    copy: ObjectIds become strings and naive datetimes are treated as UTC.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(
+                message,
+                default=str,
+                option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits - use the portable path
+    return json.dumps(sanitize_for_json(message))
+
+
+class OutboundQueue:
+    """Bounded send queue and writer task for one WebSocket"""
+    
+    def __init__(self, websocket: WebSocket, user_id: str, maxsize: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.maxsize = maxsize
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+    
+    def put(self, text: str, kind: Optional[str] = None):
+        """Queue an encoded message without waiting (coalesce, then drop oldest)"""
+        if kind in COALESCE_TYPES:
+            for i, (queued_kind, _) in enumerate(self.queue):
+                if queued_kind == kind:
+                    del self.queue[i]
+                    self._record_drop("coalesced")
+                    break
+        if len(self.queue) >= self.maxsize:
+            self.queue.popleft()
+            self._record_drop("overflow")
+        self.queue.append((kind, text))
+        self.ready.set()
+    
+    def _record_drop(self, reason: str):
+        self.dropped += 1
+        try:
+            from engines.prometheus_metrics import prometheus_metrics
+            prometheus_metrics.record_websocket_drop(reason)
+        except Exception:
+            pass
+    
+    async def run(self, send_timeout: float):
+        """Send queued messages in order; returns when the socket fails"""
+        while True:
+            await self.ready.wait()
+            while self.queue:
+                _, text = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=send_timeout)
+            self.ready.clear()
+
+
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
         self.ping_intervals: Dict[WebSocket, asyncio.Task] = {}
         self.ping_interval = 30  # Ping every 30 seconds
-        self.pong_timeout = 10  # Wait 10 seconds for pong
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout  # A send stuck this long drops the connection
         
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept and register new WebSocket connection"""
@@ -58,9 +149,11 @@ class ConnectionManager:
         self.active_connections[user_id].add(websocket)
         logger.info(f"WebSocket connected for user {user_id}")
         
-        # Start ping task
-        task = asyncio.create_task(self._ping_loop(websocket))
-        self.ping_intervals[websocket] = task
+        # Start writer and ping tasks
+        outbound = OutboundQueue(websocket, user_id, self.queue_size)
+        outbound.task = asyncio.create_task(self._writer(outbound))
+        self.outbound[websocket] = outbound
+        self.ping_intervals[websocket] = asyncio.create_task(self._ping_loop(websocket))
         
         # Send initial connection message
         await self.send_personal_message({
@@ -71,93 +164,80 @@ class ConnectionManager:
         
     async def disconnect(self, websocket: WebSocket, user_id: str):
         """Remove WebSocket connection"""
+        self._remove(websocket, user_id)
+        logger.info(f"WebSocket disconnected for user {user_id}")
+    
+    def _remove(self, websocket: WebSocket, user_id: str):
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
         
-        # Cancel ping task
-        if websocket in self.ping_intervals:
-            self.ping_intervals[websocket].cancel()
-            del self.ping_intervals[websocket]
-            
-        logger.info(f"WebSocket disconnected for user {user_id}")
+        # Cancel ping and writer tasks (but not the writer calling us)
+        current = asyncio.current_task()
+        ping_task = self.ping_intervals.pop(websocket, None)
+        if ping_task:
+            ping_task.cancel()
+        outbound = self.outbound.pop(websocket, None)
+        if outbound and outbound.task and outbound.task is not current:
+            outbound.task.cancel()
+    
+    async def _writer(self, outbound: OutboundQueue):
+        try:
+            await outbound.run(self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Failed or stalled send: this socket is gone, the rest are unaffected
+            logger.error(f"Broadcast error: {e!r}")
+            self._remove(outbound.websocket, outbound.user_id)
         
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific WebSocket"""
         try:
-            # Sanitize message before sending
-            sanitized = sanitize_for_json(message)
-            await websocket.send_json(sanitized)
+            self._enqueue(websocket, encode_message(message), message.get("type"))
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
+    
+    def _enqueue(self, websocket: WebSocket, text: str, kind: Optional[str] = None):
+        outbound = self.outbound.get(websocket)
+        if outbound is not None:
+            outbound.put(text, kind)
             
     async def send_message(self, user_id: str, message: dict):
         """Send message to all connections of a user (alias for broadcast_to_user)"""
         await self.broadcast_to_user(message, user_id)
     
     async def broadcast_to_user(self, message: dict, user_id: str):
-        """Broadcast message to all connections of a specific user"""
-        if user_id in self.active_connections:
-            disconnected = set()
-            
-            # Sanitize message once before broadcasting
-            sanitized = sanitize_for_json(message)
-            
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(sanitized)
-                except Exception as e:
-                    logger.error(f"Broadcast error: {e}")
-                    disconnected.add(connection)
-            
-            # Clean up disconnected sockets
-            for ws in disconnected:
-                await self.disconnect(ws, user_id)
+        """Broadcast message to all connections of a specific user (never blocks on sockets)"""
+        connections = self.active_connections.get(user_id)
+        if connections:
+            # Encode once before broadcasting
+            text = encode_message(message)
+            kind = message.get("type")
+            for connection in connections:
+                self._enqueue(connection, text, kind)
                 
     async def broadcast_to_all(self, message: dict):
         """Broadcast message to all connected users"""
-        for user_id in list(self.active_connections.keys()):
-            await self.broadcast_to_user(message, user_id)
+        if self.outbound:
+            text = encode_message(message)
+            kind = message.get("type")
+            for outbound in list(self.outbound.values()):
+                outbound.put(text, kind)
             
     async def _ping_loop(self, websocket: WebSocket):
-        """Send periodic pings and wait for pongs to keep connection alive"""
+        """Queue periodic pings to keep the connection alive (the client answers with pong)"""
         try:
             while True:
                 await asyncio.sleep(self.ping_interval)
-                
-                # Send ping
-                try:
-                    await websocket.send_json({
-                        "type": "ping",
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    })
-                    
-                    # Wait for pong (frontend should respond with pong)
-                    # If no pong within timeout, connection is stale
-                    try:
-                        await asyncio.wait_for(
-                            self._wait_for_pong(websocket),
-                            timeout=self.pong_timeout
-                        )
-                    except asyncio.TimeoutError:
-                        logger.warning("Pong timeout - connection may be stale")
-                        # Continue anyway, let disconnect handle cleanup
-                        
-                except Exception as e:
-                    logger.debug(f"Ping send error: {e}")
-                    break
+                await self.send_personal_message({
+                    "type": "ping",
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                }, websocket)
                     
         except asyncio.CancelledError:
             pass
         except Exception as e:
             logger.error(f"Ping loop error: {e}")
-    
-    async def _wait_for_pong(self, websocket: WebSocket):
-        """Wait for pong message (handled by frontend)"""
-        # This is a placeholder - actual pong handling is in the websocket endpoint
-        await asyncio.sleep(0.1)
-
-# Global instance
-manager = ConnectionManager()
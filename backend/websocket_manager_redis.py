@@ -2,279 +2,404 @@
 WebSocket Manager with Redis Pub/Sub Support
 Handles realtime communication with graceful degradation
 Supports multi-worker deployments via Redis broadcast
+
+Messages go through services.realtime_bus: queued sends are published in
+batches on per-user channels, each worker subscribes only to the users it
+holds sockets for, and a bounded per-user replay buffer serves
+last_event_id reconnects. Without REDIS_URL the in-process backend is used.
+
+This is the app's connection manager: /api/ws and every publisher
+(realtime_events, the scheduler, the AI engines) use the instance below.
+A replay holds back live messages for the socket until the missed ones are
+sent, then drops anything with a sequence it already delivered, so replayed
+and live events never arrive twice or out of order.
 """
 
 import asyncio
 import json
 import logging
-from typing import Dict, Set, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timezone
 import os
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from config import REALTIME_REPLAY_LIMIT, WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT
+from services.realtime_bus import (
+    BROADCAST_CHANNEL, BusMessage, LocalBusBackend, channel_user, create_redis_backend, user_channel
+)
+from websocket_manager import OutboundQueue, encode_message
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+BATCH_INTERVAL = 0.01  # Seconds queued sends wait to be published together
+MAX_BATCH = 500
+PING_INTERVAL = 30  # Seconds between keep-alive pings per socket
+
+
+def message_meta(data: str) -> Tuple[Optional[str], Optional[int]]:
+    """Type (for coalescing) and sequence (for replay dedupe) of an encoded message"""
+    try:
+        message = _loads(data)
+        return message.get("type"), message.get("sequence")
+    except Exception:
+        return None, None
+
 
 class ConnectionManager:
     """Manages WebSocket connections with Redis pub/sub support"""
-    
-    def __init__(self):
+
+    def __init__(self, backend=None, history_limit: int = REALTIME_REPLAY_LIMIT):
         # Local connections (in-memory for single worker)
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        
-        # Redis support for multi-worker
-        self.redis_client = None
-        self.redis_pubsub = None
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
+        self.ping_tasks: Dict[WebSocket, asyncio.Task] = {}
+        self.ping_interval = PING_INTERVAL
+
+        # Sockets mid-replay: live messages wait here as (sequence, type, data)
+        self.replaying: Dict[WebSocket, List[Tuple[Optional[int], Optional[str], str]]] = {}
+
+        # Bus backend (Redis for multi-worker, in-process otherwise)
+        self.backend = backend or LocalBusBackend()
         self.redis_enabled = False
-        self.redis_listener_task = None
-        
-        # Message sequence tracking for reconnect/replay
-        self.message_sequence = 0
-        self.message_history: Dict[str, list] = {}  # user_id -> last N messages
-        self.history_limit = 50
-        
+        self.listener_task: Optional[asyncio.Task] = None
+
+        # Batched publishing
+        self._pending: List[Tuple[Optional[str], dict]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.messages_published = 0
+
+        # Per-user replay buffer for reconnects
+        self.history_limit = history_limit
+
     async def init_redis(self):
         """Initialize Redis connection for pub/sub"""
         try:
             redis_url = os.getenv('REDIS_URL', os.getenv('REDIS_HOST'))
-            
+
             if not redis_url:
                 logger.info("Redis not configured, using in-memory realtime only")
                 return
-            
-            import aioredis
-            
-            self.redis_client = await aioredis.from_url(
-                redis_url,
-                encoding="utf-8",
-                decode_responses=True
-            )
-            
-            # Test connection
-            await self.redis_client.ping()
-            
-            # Setup pubsub
-            self.redis_pubsub = self.redis_client.pubsub()
-            await self.redis_pubsub.subscribe('amarktai:broadcast')
-            
-            # Start listener
-            self.redis_listener_task = asyncio.create_task(self._redis_listener())
-            
+
+            backend = await create_redis_backend(redis_url)
+
+            # Re-subscribe channels already held on the in-process backend
+            await self.close_backend()
+            self.backend = backend
+            for user_id in self.active_connections:
+                await self.backend.subscribe(user_channel(user_id))
+
             self.redis_enabled = True
+            await self._ensure_listener()
             logger.info("✅ Redis pub/sub initialized for realtime broadcast")
-            
+
         except ImportError:
-            logger.warning("aioredis not installed, realtime limited to single worker")
+            logger.warning("redis not installed, realtime limited to single worker")
         except Exception as e:
             logger.warning(f"Redis connection failed, using in-memory only: {e}")
             self.redis_enabled = False
-    
-    async def _redis_listener(self):
-        """Listen for Redis pub/sub messages and broadcast locally"""
+
+    async def _ensure_listener(self):
+        if self.listener_task is None or self.listener_task.done():
+            await self.backend.subscribe(BROADCAST_CHANNEL)
+            self.listener_task = asyncio.create_task(self._listener())
+
+    async def _listener(self):
+        """Deliver bus messages for locally held users (no polling)"""
         try:
-            while True:
-                message = await self.redis_pubsub.get_message(ignore_subscribe_messages=True)
-                if message and message['type'] == 'message':
-                    data = json.loads(message['data'])
-                    user_id = data.get('user_id')
-                    payload = data.get('payload')
-                    
-                    if user_id and payload:
-                        # Broadcast to local connections for this user
-                        await self._send_to_local_connections(user_id, payload)
-                        
-                await asyncio.sleep(0.01)  # Small delay to prevent tight loop
-                
+            async for channel, data in self.backend.listen():
+                user_id = channel_user(channel)
+                if user_id is None:
+                    self._deliver_all(data)
+                else:
+                    self._deliver_local(user_id, data)
+
         except asyncio.CancelledError:
-            logger.info("Redis listener stopped")
+            logger.info("Realtime bus listener stopped")
         except Exception as e:
-            logger.error(f"Redis listener error: {e}")
-    
+            logger.error(f"Realtime bus listener error: {e}")
+
     async def connect(self, websocket: WebSocket, user_id: str, last_event_id: Optional[int] = None):
         """Connect a WebSocket client
-        
+
         Args:
             websocket: WebSocket connection
             user_id: User ID
             last_event_id: Optional last event ID for replay
         """
         await websocket.accept()
-        
-        # Add to active connections
+
+        outbound = OutboundQueue(websocket, user_id, WS_SEND_QUEUE_SIZE)
+        outbound.task = asyncio.create_task(self._writer(outbound))
+        self.outbound[websocket] = outbound
+        self.ping_tasks[websocket] = asyncio.create_task(self._ping_loop(websocket))
+        if last_event_id is not None:
+            # Hold live traffic until the missed messages have gone out
+            self.replaying[websocket] = []
+
+        # Add to active connections; the first socket for a user subscribes its channel
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
+            await self.backend.subscribe(user_channel(user_id))
+            await self._ensure_listener()
         self.active_connections[user_id].add(websocket)
-        
+
         logger.info(f"WebSocket connected for user {user_id[:8]}")
-        
-        # Send connection confirmation with sequence
-        await self._send_to_websocket(websocket, {
-            "type": "connection_established",
+
+        # Send connection confirmation
+        outbound.put(encode_message({
+            "type": "connection",
+            "status": "Connected",
             "user_id": user_id,
-            "current_sequence": self.message_sequence,
             "redis_enabled": self.redis_enabled,
             "timestamp": datetime.now(timezone.utc).isoformat()
-        })
-        
+        }))
+
         # Replay missed messages if requested
         if last_event_id is not None:
-            await self._replay_messages(websocket, user_id, last_event_id)
-    
+            await self.replay(websocket, user_id, last_event_id)
+
     def disconnect(self, websocket: WebSocket, user_id: str):
         """Disconnect a WebSocket client
-        
+
         Args:
             websocket: WebSocket connection
             user_id: User ID
         """
+        current = asyncio.current_task()
+        self.replaying.pop(websocket, None)
+        ping_task = self.ping_tasks.pop(websocket, None)
+        if ping_task:
+            ping_task.cancel()
+        outbound = self.outbound.pop(websocket, None)
+        if outbound and outbound.task and outbound.task is not current:
+            outbound.task.cancel()
+
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-        
+                # Last local socket for this user: stop receiving the user's traffic
+                asyncio.create_task(self._unsubscribe_user(user_id))
+
         logger.info(f"WebSocket disconnected for user {user_id[:8]}")
-    
+
+    async def _unsubscribe_user(self, user_id: str):
+        try:
+            if user_id not in self.active_connections:
+                await self.backend.unsubscribe(user_channel(user_id))
+        except Exception as e:
+            logger.error(f"Realtime bus unsubscribe failed: {e}")
+
+    async def _writer(self, outbound: OutboundQueue):
+        try:
+            await outbound.run(WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Send failed, marking for disconnect: {e!r}")
+            self.disconnect(outbound.websocket, outbound.user_id)
+
+    async def _ping_loop(self, websocket: WebSocket):
+        """Queue periodic pings to keep the connection alive (the client answers with pong)"""
+        try:
+            while True:
+                await asyncio.sleep(self.ping_interval)
+                await self.send_personal_message({
+                    "type": "ping",
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                }, websocket)
+        except asyncio.CancelledError:
+            pass
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        """Send a message to one WebSocket only (not published or replayable)"""
+        outbound = self.outbound.get(websocket)
+        if outbound is not None:
+            outbound.put(encode_message(message), message.get("type"))
+
     async def send_message(self, user_id: str, message: dict):
         """Send message to all connections for a user
-        
-        Broadcasts via Redis if enabled, otherwise sends to local connections only
-        
+
+        Queued and published with other pending messages in one batch on the
+        user's channel; every worker holding a socket for the user delivers it.
+
         Args:
             user_id: User ID
             message: Message dict to send
         """
-        # Add sequence number
-        self.message_sequence += 1
-        message['sequence'] = self.message_sequence
-        message['timestamp'] = message.get('timestamp', datetime.now(timezone.utc).isoformat())
-        
-        # Store in history for replay
-        if user_id not in self.message_history:
-            self.message_history[user_id] = []
-        self.message_history[user_id].append(message)
-        
-        # Trim history
-        if len(self.message_history[user_id]) > self.history_limit:
-            self.message_history[user_id] = self.message_history[user_id][-self.history_limit:]
-        
-        # Broadcast via Redis if enabled
-        if self.redis_enabled and self.redis_client:
-            try:
-                await self.redis_client.publish(
-                    'amarktai:broadcast',
-                    json.dumps({
-                        'user_id': user_id,
-                        'payload': message
-                    })
-                )
-                # Redis will broadcast back to us via listener
-                return
-            except Exception as e:
-                logger.error(f"Redis publish failed, falling back to local: {e}")
-        
-        # Fallback to local connections
-        await self._send_to_local_connections(user_id, message)
-    
-    async def _send_to_local_connections(self, user_id: str, message: dict):
-        """Send message to local WebSocket connections
-        
+        self._enqueue(user_id, message)
+
+    async def broadcast_to_user(self, message: dict, user_id: str):
+        """Alias for send_message (argument order of the single-worker manager)"""
+        self._enqueue(user_id, message)
+
+    async def broadcast_all(self, message: dict):
+        """Broadcast message to all connected users (on every worker)
+
         Args:
-            user_id: User ID
             message: Message dict
         """
-        if user_id not in self.active_connections:
+        self._enqueue(None, message)
+
+    async def broadcast_to_all(self, message: dict):
+        """Alias for broadcast_all"""
+        self._enqueue(None, message)
+
+    def _enqueue(self, user_id: Optional[str], message: dict):
+        self._pending.append((user_id, message))
+        if len(self._pending) >= MAX_BATCH:
+            asyncio.create_task(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(BATCH_INTERVAL)
+        await self.flush()
+
+    async def flush(self):
+        """Publish all queued messages in one batch"""
+        pending, self._pending = self._pending, []
+        if not pending:
             return
-        
-        disconnected = set()
-        
-        for connection in self.active_connections[user_id]:
-            try:
-                await self._send_to_websocket(connection, message)
-            except Exception as e:
-                logger.error(f"Send failed, marking for disconnect: {e}")
-                disconnected.add(connection)
-        
-        # Clean up disconnected
-        for connection in disconnected:
-            self.active_connections[user_id].discard(connection)
-    
-    async def _send_to_websocket(self, websocket: WebSocket, message: dict):
-        """Send message to a single WebSocket
-        
-        Args:
-            websocket: WebSocket connection
-            message: Message dict
-        """
-        await websocket.send_json(message)
-    
-    async def _replay_messages(self, websocket: WebSocket, user_id: str, last_event_id: int):
-        """Replay missed messages since last_event_id
-        
+
+        # Stamp copies: callers may reuse one dict for several users
+        now = datetime.now(timezone.utc).isoformat()
+        pending = [(user_id, {**message, 'timestamp': message.get('timestamp', now)}) for user_id, message in pending]
+
+        batch: List[BusMessage] = []
+        try:
+            # One sequence reservation per user per batch
+            counts: Dict[str, int] = {}
+            for user_id, _ in pending:
+                if user_id is not None:
+                    counts[user_id] = counts.get(user_id, 0) + 1
+            sequences = await self.backend.reserve_sequences(counts) if counts else {}
+
+            for user_id, message in pending:
+                if user_id is None:
+                    batch.append(BusMessage(BROADCAST_CHANNEL, None, 0, encode_message(message)))
+                    continue
+                sequences[user_id] += 1
+                message['sequence'] = sequences[user_id]
+                batch.append(BusMessage(user_channel(user_id), user_id, sequences[user_id], encode_message(message)))
+
+            await self.backend.publish_batch(batch, self.history_limit)
+            self.messages_published += len(batch)
+
+        except Exception as e:
+            # Fall back to this worker's sockets
+            logger.error(f"Realtime bus publish failed, falling back to local: {e}")
+            for user_id, message in pending:
+                data = encode_message(message)
+                if user_id is None:
+                    self._deliver_all(data)
+                else:
+                    self._deliver_local(user_id, data)
+
+    def _deliver(self, connection: WebSocket, data: str, kind: Optional[str], sequence: Optional[int]):
+        buffered = self.replaying.get(connection)
+        if buffered is not None:
+            buffered.append((sequence, kind, data))
+            return
+        outbound = self.outbound.get(connection)
+        if outbound is not None:
+            outbound.put(data, kind)
+
+    def _deliver_local(self, user_id: str, data: str):
+        """Queue an encoded message on this worker's sockets for the user"""
+        connections = self.active_connections.get(user_id)
+        if connections:
+            kind, sequence = message_meta(data)
+            for connection in list(connections):
+                self._deliver(connection, data, kind, sequence)
+
+    def _deliver_all(self, data: str):
+        """Queue an encoded broadcast on every socket of this worker"""
+        if self.outbound:
+            kind, _ = message_meta(data)
+            for connection in list(self.outbound):
+                self._deliver(connection, data, kind, None)
+
+    async def replay(self, websocket: WebSocket, user_id: str, last_sequence: int):
+        """Replay missed messages since last_sequence (on connect, or a client's request_replay)
+
         Args:
             websocket: WebSocket connection
             user_id: User ID
-            last_event_id: Last sequence ID client received
+            last_sequence: Last sequence ID client received
         """
-        if user_id not in self.message_history:
+        buffered = self.replaying.setdefault(websocket, [])
+        try:
+            missed_messages = await self.backend.history(user_id, last_sequence)
+        except Exception as e:
+            logger.error(f"Replay failed: {e}")
+            missed_messages = []
+        finally:
+            # Live messages that arrived meanwhile go out after the replay
+            if self.replaying.get(websocket) is buffered:
+                del self.replaying[websocket]
+
+        outbound = self.outbound.get(websocket)
+        if outbound is None:
             return
-        
-        # Find messages after last_event_id
-        missed_messages = [
-            msg for msg in self.message_history[user_id]
-            if msg.get('sequence', 0) > last_event_id
-        ]
-        
         if missed_messages:
             logger.info(f"Replaying {len(missed_messages)} messages for user {user_id[:8]}")
-            for msg in missed_messages:
-                try:
-                    await self._send_to_websocket(websocket, msg)
-                except Exception as e:
-                    logger.error(f"Replay failed: {e}")
-                    break
-    
-    async def broadcast_all(self, message: dict):
-        """Broadcast message to all connected users
-        
-        Args:
-            message: Message dict
-        """
-        for user_id in list(self.active_connections.keys()):
-            await self.send_message(user_id, message)
-    
-    async def close(self):
-        """Close all connections and cleanup"""
-        # Cancel Redis listener
-        if self.redis_listener_task:
-            self.redis_listener_task.cancel()
+        delivered = last_sequence
+        for sequence, data in missed_messages:
+            outbound.put(data)
+            delivered = max(delivered, sequence)
+        for sequence, kind, data in buffered:
+            if sequence is None or sequence > delivered:
+                outbound.put(data, kind)
+                if sequence is not None:
+                    delivered = sequence
+
+    async def close_backend(self):
+        if self.listener_task:
+            self.listener_task.cancel()
             try:
-                await self.redis_listener_task
+                await self.listener_task
             except asyncio.CancelledError:
                 pass
-        
-        # Close Redis connection
-        if self.redis_pubsub:
-            await self.redis_pubsub.unsubscribe('amarktai:broadcast')
-            await self.redis_pubsub.close()
-        
-        if self.redis_client:
-            await self.redis_client.close()
-        
+            self.listener_task = None
+        try:
+            await self.backend.close()
+        except Exception as e:
+            logger.error(f"Error closing realtime bus: {e}")
+
+    async def close(self):
+        """Close all connections and cleanup"""
+        # Publish anything still queued, then stop the listener and bus
+        await self.flush()
+        await self.close_backend()
+
         # Close all WebSocket connections
         for user_id, connections in list(self.active_connections.items()):
             for connection in list(connections):
+                ping_task = self.ping_tasks.pop(connection, None)
+                if ping_task:
+                    ping_task.cancel()
+                outbound = self.outbound.pop(connection, None)
+                if outbound and outbound.task:
+                    outbound.task.cancel()
                 try:
                     await connection.close()
                 except:
                     pass
-        
+
         self.active_connections.clear()
         logger.info("WebSocket manager closed")
-    
+
     def get_status(self) -> dict:
         """Get realtime status for preflight
-        
+
         Returns:
             Status dict with connection info
         """
@@ -282,9 +407,10 @@ class ConnectionManager:
             "enabled": True,
             "redis_enabled": self.redis_enabled,
             "transport": "websocket",
+            "bus_backend": self.backend.name,
             "active_users": len(self.active_connections),
             "total_connections": sum(len(conns) for conns in self.active_connections.values()),
-            "message_sequence": self.message_sequence,
+            "messages_published": self.messages_published,
             "status": "ok" if self.redis_enabled else "degraded",
             "message": "Multi-worker support active" if self.redis_enabled else "Single-worker mode (realtime degraded)"
         }